@@ -0,0 +1,227 @@
+import argparse
+import math
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Same alphabet as util.RandBytes.
+LETTERS = b"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+# Each worker writes through a buffer of this size instead of flushing every line.
+WRITE_BUFFER_BYTES = 16 * 1024 * 1024
+# Operations generated per vectorized step of a worker.
+OPS_PER_BLOCK = 65536
+# SET values are windows into one random pool that is this much longer than a value.
+VALUE_POOL_SLACK_BYTES = 64 * 1024
+
+# generator.ZipfianConstant and the precomputed zeta of NewScrambledZipfian.
+ZIPFIAN_CONSTANT = 0.99
+SCRAMBLED_ZIPFIAN_ITEMS = 10000000000
+SCRAMBLED_ZIPFIAN_ZETAN = 26.46902820178302
+
+# zeta is summed exactly up to this many items and extrapolated beyond.
+EXACT_ZETA_ITEMS = 10000000
+
+FNV64_OFFSET_BASIS = np.uint64(0xcbf29ce484222325)
+FNV64_PRIME = np.uint64(0x100000001b3)
+
+READ, UPDATE, READ_MODIFY_WRITE = 0, 1, 2
+
+
+def load_properties(filepath: str, overrides: Optional[List[str]] = None) -> Dict[str, str]:
+    """Reads a YCSB .properties file such as the ones written by workloads.py; overrides are key=value strings."""
+    props = {}
+    with open(filepath, 'r') as f:
+        lines = f.read().splitlines()
+    for line in lines + (overrides or []):
+        line = line.strip()
+        if not line or line.startswith('#') or '=' not in line:
+            continue
+        key, value = line.split('=', 1)
+        props[key.strip()] = value.strip()
+    return props
+
+
+def hash64(values: np.ndarray) -> np.ndarray:
+    """Vectorized util.Hash64: FNV-64a over the big-endian bytes, as a non-negative int64."""
+    keys = values.astype(np.uint64)
+    h = np.full(keys.shape, FNV64_OFFSET_BASIS, dtype=np.uint64)
+    for shift in range(56, -8, -8):
+        h ^= (keys >> np.uint64(shift)) & np.uint64(0xff)
+        h *= FNV64_PRIME
+    return np.abs(h.view(np.int64))
+
+
+def zeta(items: int, theta: float) -> float:
+    """Sum of 1 / i^theta for i in [1, items].
+
+    Large item counts are extrapolated with Euler-Maclaurin after the first
+    EXACT_ZETA_ITEMS terms, which keeps the error far below float precision of
+    the sampled ranks without the minutes-long loop of zetaStatic.
+    """
+    exact = min(items, EXACT_ZETA_ITEMS)
+    total = 0.0
+    for start in range(1, exact + 1, 1 << 20):
+        i = np.arange(start, min(start + (1 << 20), exact + 1), dtype=np.float64)
+        total += float(np.sum(i ** -theta))
+    if items == exact:
+        return total
+    m, n = float(exact), float(items)
+    integral = math.log(n / m) if theta == 1 else (n ** (1 - theta) - m ** (1 - theta)) / (1 - theta)
+    return total + integral + (n ** -theta - m ** -theta) / 2 - theta * (n ** (-theta - 1) - m ** (-theta - 1)) / 12
+
+
+class Zipfian:
+    """Vectorized generator.Zipfian (Gray et al.) over items in [0, items)."""
+
+    def __init__(self, items: int, theta: float = ZIPFIAN_CONSTANT, zetan: Optional[float] = None):
+        self.items = items
+        self.theta = theta
+        self.zetan = zeta(items, theta) if zetan is None else zetan
+        self.alpha = 1.0 / (1.0 - theta)
+        self.eta = (1 - math.pow(2.0 / items, 1 - theta)) / (1 - zeta(2, theta) / self.zetan)
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        u = rng.random(size)
+        uz = u * self.zetan
+        ranks = (self.items * np.power(self.eta * u - self.eta + 1, self.alpha)).astype(np.int64)
+        ranks[uz < 1.0 + math.pow(0.5, self.theta)] = 1
+        ranks[uz < 1.0] = 0
+        return ranks
+
+
+def key_chooser(props: Dict[str, str]) -> Callable[[np.random.Generator, int], np.ndarray]:
+    """Returns a function drawing key numbers the way core.Create sets up its keyChooser."""
+    record_count = int(props.get("recordcount", 0)) or (2**31 - 1)
+    insert_start = int(props.get("insertstart", 0))
+    insert_count = int(props.get("insertcount", record_count - insert_start))
+    low, high = insert_start, insert_start + insert_count - 1
+    distribution = props.get("requestdistribution", "uniform")
+
+    if distribution == "uniform":
+        return lambda rng, size: rng.integers(low, high + 1, size=size)
+    if distribution == "zipfian":
+        # go-ycsb ignores zipfianconstant and always uses 0.99; a non-zero value is honoured here.
+        theta = float(props.get("zipfianconstant", 0)) or ZIPFIAN_CONSTANT
+        zetan = SCRAMBLED_ZIPFIAN_ZETAN if theta == ZIPFIAN_CONSTANT else None
+        zipfian = Zipfian(SCRAMBLED_ZIPFIAN_ITEMS, theta, zetan)
+        # Like core.Create, the key range ends one past the last record when nothing is inserted.
+        item_count = insert_count + 1
+        return lambda rng, size: low + hash64(zipfian.sample(rng, size)) % item_count
+    if distribution == "hotspot":
+        hotset = float(props.get("hotspotdatafraction", 0.2))
+        hot_operations = float(props.get("hotspotopnfraction", 0.8))
+        interval = high - low + 1
+        hot_interval = int(interval * hotset)
+        cold_interval = interval - hot_interval
+
+        def hotspot(rng, size):
+            hot = rng.random(size) < hot_operations if hot_interval > 0 else np.zeros(size, dtype=bool)
+            keys = low + hot_interval + rng.integers(0, max(cold_interval, 1), size=size)
+            keys[hot] = low + rng.integers(0, hot_interval, size=int(hot.sum()))
+            return keys
+        return hotspot
+    if distribution == "latest":
+        # Without inserts the acknowledged counter stays at recordcount - 1.
+        latest = record_count - 1
+        zipfian = Zipfian(latest)
+        return lambda rng, size: latest - zipfian.sample(rng, size)
+    raise ValueError(f"unsupported request distribution {distribution}")
+
+
+def operation_weights(props: Dict[str, str]) -> np.ndarray:
+    for key in ("insertproportion", "scanproportion"):
+        if float(props.get(key, 0)) > 0:
+            raise ValueError(f"{key} is not supported by the text trace format")
+    weights = np.array([
+        float(props.get("readproportion", 0.95)),
+        float(props.get("updateproportion", 0.05)),
+        float(props.get("readmodifywriteproportion", 0)),
+    ])
+    if weights.sum() <= 0:
+        raise ValueError("the workload has no read or update operations")
+    return weights / weights.sum()
+
+
+def key_formatter(props: Dict[str, str]) -> Callable[[int], bytes]:
+    """Mirrors core.buildKeyName for already hashed key numbers."""
+    prefix = props.get("keyprefix", "user")
+    padding = int(props.get("zeropadding", 1))
+    return lambda num: f"{prefix}{num:0{padding}d}".encode()
+
+
+def write_chunk(props: Dict[str, str], operations: int, seed_sequence: np.random.SeedSequence, filepath: str) -> int:
+    """Writes operations trace lines to filepath and returns the number of bytes written."""
+    rng = np.random.default_rng(seed_sequence)
+    choose_keys = key_chooser(props)
+    weights = operation_weights(props)
+    format_key = key_formatter(props)
+    hashed = props.get("insertorder", "hashed") == "hashed"
+    value_length = int(props.get("fieldlength", 100))
+    pool = np.frombuffer(LETTERS, dtype=np.uint8)[rng.integers(0, len(LETTERS), size=value_length + VALUE_POOL_SLACK_BYTES)].tobytes()
+    values = memoryview(pool)
+
+    written = 0
+    with open(filepath, 'wb', buffering=WRITE_BUFFER_BYTES) as f:
+        for start in range(0, operations, OPS_PER_BLOCK):
+            size = min(OPS_PER_BLOCK, operations - start)
+            keys = choose_keys(rng, size)
+            if hashed:
+                keys = hash64(keys)
+            kinds = rng.choice(3, size=size, p=weights)
+            offsets = rng.integers(0, VALUE_POOL_SLACK_BYTES + 1, size=size)
+            lines = []
+            for key, kind, offset in zip(keys.tolist(), kinds.tolist(), offsets.tolist()):
+                key = format_key(key)
+                if kind != UPDATE:
+                    lines.append(b"GET " + key + b"\n")
+                if kind != READ:
+                    lines += [b"SET " + key + b" ", values[offset:offset + value_length], b"\n"]
+            f.writelines(lines)
+            written += sum(len(line) for line in lines)
+    return written
+
+
+def split_operations(operations: int, workers: int) -> List[int]:
+    chunk = math.ceil(operations / workers)
+    return [min(chunk, operations - start) for start in range(0, operations, chunk)] if operations > 0 else []
+
+
+def generate_trace(props: Dict[str, str], output: str, workers: Optional[int] = None, seed: Optional[int] = None) -> Tuple[int, int]:
+    """Generates operationcount trace lines in parallel chunks and concatenates them into output."""
+    operations = int(props.get("operationcount", 0))
+    workers = workers or os.cpu_count() or 1
+    sizes = split_operations(operations, workers)
+    children = np.random.SeedSequence(seed).spawn(len(sizes))
+    parts = [f"{output}.part{i}" for i in range(len(sizes))]
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(write_chunk, props, size, child, part) for size, child, part in zip(sizes, children, parts)]
+        written = sum(future.result() for future in futures)
+    with open(output, 'wb') as out:
+        for part in parts:
+            with open(part, 'rb') as f:
+                shutil.copyfileobj(f, out, WRITE_BUFFER_BYTES)
+            os.remove(part)
+    return operations, written
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generates a GET/SET trace.txt from a YCSB .properties file without go-ycsb.")
+    parser.add_argument("-P", dest="workload", required=True, help="workload .properties file")
+    parser.add_argument("-p", dest="overrides", action="append", default=[], help="override a property as key=value")
+    parser.add_argument("--output", default=None, help="trace file (defaults to text.output.dir/table like the text binding)")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--seed", type=int, default=None, help="random seed")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    props = load_properties(args.workload, args.overrides)
+    output = args.output or os.path.join(props.get("text.output.dir", "./"), props.get("table", "usertable"))
+    operations, written = generate_trace(props, output, args.workers, args.seed)
+    print(f"Generated: {output} ({operations} operations, {written} bytes)")
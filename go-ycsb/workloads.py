@@ -56,25 +56,30 @@ BASE_PROPERTIES = {
 
 }
 
+def render_properties(properties: Dict[str, Any]) -> str:
+    """Returns the text of a YCSB .properties file for the dictionary of properties."""
+    # Sort keys to ensure consistent file order, placing comments first
+    # Simple list of keys to ensure order: Comments, field, record, op_mix, distribution
+    ordered_keys = list(BASE_PROPERTIES.keys())
+    lines = []
+    # Write keys in the desired order
+    for key in ordered_keys:
+        value = properties.get(key)
+        if key.startswith('#'):
+            # Write comments or section headers
+            lines.append(f"\n{value}\n")
+        elif value is not None and value != "":
+            # Write key=value pair
+            lines.append(f"{key}={value}\n")
+    return "".join(lines)
+
+
 def generate_properties_file(filepath: str, properties: Dict[str, Any]):
     """Writes the dictionary of properties to a YCSB .properties file."""
     # Ensure the directory exists
     os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    
-    # Sort keys to ensure consistent file order, placing comments first
-    # Simple list of keys to ensure order: Comments, field, record, op_mix, distribution
-    ordered_keys = list(BASE_PROPERTIES.keys())
-    # print(ordered_keys)
     with open(filepath, 'w') as f:
-        # Write keys in the desired order
-        for key in ordered_keys:
-            value = properties.get(key)
-            if key.startswith('#'):
-                # Write comments or section headers
-                f.write(f"\n{value}\n")
-            elif value is not None and value != "":
-                # Write key=value pair
-                f.write(f"{key}={value}\n")
+        f.write(render_properties(properties))
 
     print(f"Generated: {os.path.basename(filepath)}")
 
@@ -89,74 +94,75 @@ def format_block_size(size_bytes: int) -> str:
         return f"{size_bytes}B"
 
 
+# The two operation mixes: (Name, readproportion, updateproportion)
+OP_MIXES: List[Tuple[str, str, str]] = [
+    ("read", "1.0", "0.0"),
+    ("update", "0.0", "1.0"),
+]
+
+
+def operation_count(block_size_bytes: int) -> int:
+    """Operation count for a block size, stepping down as blocks grow."""
+    if block_size_bytes <= BLOCK_SIZE_THRESHOLD_BYTES:
+        return OPERATION_COUNT_LOW_BLOCK
+    elif block_size_bytes <= BLOCK_SIZE_THRESHOLD_MEDIUM_BYTES:
+        return OPERATION_COUNT_STANDARD_BLOCK
+    elif block_size_bytes <= BLOCK_SIZE_THRESHOLD_STANDARD_BYTES:
+        return OPERATION_COUNT_MEDIUM_BLOCK
+    return OPERATION_COUNT_HIGH_BLOCK
+
+
+def workload_properties(block_size_bytes: int, op_name: str, read_prop: str, update_prop: str) -> Dict[str, Any]:
+    """Properties of the workload_{block_size}_{op_name} workload."""
+    # Calculate Record Count: 16 GB / block_size_bytes
+    record_count = TOTAL_DATA_SIZE_BYTES // block_size_bytes + TOTAL_DATA_SIZE_BYTES % block_size_bytes
+    block_size_label = format_block_size(block_size_bytes)
+
+    # Start with base properties
+    props = BASE_PROPERTIES.copy()
+
+    # --- Override Calculated and Custom Values ---
+
+    # Header
+    props['# Configuration for Record and Field'] = \
+        f"# Custom Workload: {block_size_label} size, {op_name}-only"
+
+    # Block Size / Field Length
+    props['fieldlength'] = str(block_size_bytes)
+
+    # Record Count
+    props['recordcount'] = str(record_count)
+
+    # Operation Count
+    props['operationcount'] = str(operation_count(block_size_bytes))
+
+    # Operation Mix
+    props['readproportion'] = read_prop
+    props['updateproportion'] = update_prop
+
+    # Unique Table Assignment
+    props['table'] = f"usertable_{block_size_label}_{op_name}"
+    return props
+
+
 def generate_custom_workloads(output_dir: str):
     """
     Generates workloads based on 16GB total size, varying block size, and 
     switching between read-only and update-only.
     """
     print("\n--- Generating Custom Workloads (16GB Data Size) ---")
-    
-    # Define the two operation mixes
-    op_mixes: List[Tuple[str, str, str]] = [
-        ("read", "1.0", "0.0"),  # (Name, readproportion, updateproportion)
-        ("update", "0.0", "1.0"),
-    ]
 
     for block_size_bytes in BLOCK_SIZES_BYTES:
-        
-        # 1. Calculate Record Count: 16 GB / block_size_bytes
-        record_count = TOTAL_DATA_SIZE_BYTES // block_size_bytes + TOTAL_DATA_SIZE_BYTES % block_size_bytes
-        
-        # 2. Set Operation Count based on 4KB threshold
-        if block_size_bytes <= BLOCK_SIZE_THRESHOLD_BYTES:
-            op_count = OPERATION_COUNT_LOW_BLOCK
-        elif block_size_bytes <= BLOCK_SIZE_THRESHOLD_MEDIUM_BYTES:
-            op_count = OPERATION_COUNT_STANDARD_BLOCK
-        elif block_size_bytes <= BLOCK_SIZE_THRESHOLD_STANDARD_BYTES:
-            op_count = OPERATION_COUNT_MEDIUM_BLOCK
-        else:
-            op_count = OPERATION_COUNT_HIGH_BLOCK
-            
-        # 3. Format block size for file naming
         block_size_label = format_block_size(block_size_bytes)
-        
-        for op_name, read_prop, update_prop in op_mixes:
-            
-            # 4. Set filename convention: workload_{block_size}_{read or update}
+
+        for op_name, read_prop, update_prop in OP_MIXES:
+
+            # Set filename convention: workload_{block_size}_{read or update}
             filename = f"workload_{block_size_label}_{op_name}.properties"
             filepath = os.path.join(output_dir, filename)
-            
-            # Start with base properties
-            props = BASE_PROPERTIES.copy()
-            
-            # --- Override Calculated and Custom Values ---
-            
-            # Header
-            props['# Configuration for Record and Field'] = \
-                f"# Custom Workload: {block_size_label} size, {op_name}-only"
-            
-            # Block Size / Field Length
-            props['fieldlength'] = str(block_size_bytes)
-            
-            # Record Count
-            props['recordcount'] = str(record_count)
-            
-            # Operation Count
-            props['operationcount'] = str(op_count)
-            
-            # Operation Mix
-            props['readproportion'] = read_prop
-            props['updateproportion'] = update_prop
-            
-            # Unique Table Assignment
-            table_name = f"usertable_{block_size_label}_{op_name}"
-            props['table'] = table_name
-
-            # Field Length
-            props['fieldlength'] = block_size_bytes
 
             # Generate the file
-            generate_properties_file(filepath, props)
+            generate_properties_file(filepath, workload_properties(block_size_bytes, op_name, read_prop, update_prop))
 
 
 if __name__ == "__main__":
@@ -22,6 +22,12 @@ func main() {
 	configsPath := flag.String("conf", "../../configs/default", "configs directory path")
 	duration := flag.Int("duration", 10, "duration of the experiment in seconds")
 	outputFilePath := flag.String("output", "", "output file path")
+	mode := flag.String("mode", string(client.ClosedLoop), "load mode: closed (fixed workers), open (fixed rate) or ramp (growing rate until saturation)")
+	workers := flag.Int("workers", 0, "closed-loop workers; 0 uses max-requests")
+	rate := flag.Float64("rate", 1000, "requests per second of the open loop or of the first ramp step")
+	arrivals := flag.String("arrivals", client.PoissonArrivals, "gaps between open-loop requests: poisson or constant")
+	rampStep := flag.Float64("ramp-step", 1000, "requests per second added by every ramp step")
+	rampInterval := flag.Int("ramp-interval", 5, "seconds of every ramp step")
 	flag.Parse()
 	parameters, err := config.ReadParameters(path.Join(*configsPath, "parameters.yaml"))
 	if err != nil {
@@ -45,7 +51,7 @@ func main() {
 		log.Fatal().Msgf("Failed to start clients; %v", err)
 	}
 
-	requests, err := client.ReadTraceFile(path.Join(*configsPath, "trace.txt"), parameters.BlockSize)
+	requests, err := client.OpenTrace(*configsPath, parameters.BlockSize)
 	if err != nil {
 		log.Fatal().Msgf("Failed to read trace file; %v", err)
 	}
@@ -62,7 +68,21 @@ func main() {
 
 	tracer := otel.Tracer("")
 
-	c := client.NewClient(client.NewRateLimit(parameters.MaxRequests), tracer, rpcClients, requests)
+	load := client.LoadOptions{
+		Mode:         client.LoadMode(*mode),
+		Workers:      *workers,
+		Rate:         *rate,
+		Arrivals:     *arrivals,
+		RampStep:     *rampStep,
+		RampInterval: time.Duration(*rampInterval) * time.Second,
+	}
+	if load.Workers == 0 {
+		load.Workers = parameters.MaxRequests
+	}
+	if err := load.Validate(); err != nil {
+		log.Fatal().Msgf("Invalid load options; %v", err)
+	}
+	c := client.NewClient(client.NewRateLimit(parameters.MaxRequests), tracer, rpcClients, requests, load)
 	err = c.WaitForStorageToBeReady(redisEndpoints, parameters)
 	if err != nil {
 		log.Fatal().Msgf("Failed to check if storages are ready; %v", err)
@@ -74,7 +94,20 @@ func main() {
 	ctx, cancel := context.WithTimeout(context.Background(), time.Duration(*duration)*time.Second)
 	defer cancel()
 
-	go c.SendRequestsForever(ctx, readResponseChannel, writeResponseChannel)
+	go func() {
+		c.SendRequestsForever(ctx, readResponseChannel, writeResponseChannel)
+		if load.Mode == client.RampLoad {
+			throughput, saturated := c.SaturationThroughput()
+			if c.SaturatedAtFirstStep() {
+				fmt.Printf("Saturation throughput: %f; the starting -rate %f is already above saturation\n", throughput, load.Rate)
+			} else if saturated {
+				fmt.Printf("Saturation throughput: %f\n", throughput)
+			} else {
+				fmt.Printf("Did not saturate; highest throughput: %f\n", throughput)
+			}
+			cancel()
+		}
+	}()
 	responseCounts := c.GetResponsesForever(ctx, readResponseChannel, writeResponseChannel)
 	err = client.WriteOutputToFile(*outputFilePath, responseCounts)
 	if err != nil {
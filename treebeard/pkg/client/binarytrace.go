@@ -0,0 +1,167 @@
+package client
+
+import (
+	"bytes"
+	"encoding/binary"
+	"fmt"
+	"os"
+	"syscall"
+
+	"github.com/rs/zerolog/log"
+)
+
+// Binary trace layout, all integers little endian:
+//
+//	header  (64 bytes)  magic, version, record size, record count, key table offset,
+//	                    key count, value pool offset, value pool length
+//	records (24 bytes)  op (1), reserved (3), key index (4), value length (4),
+//	                    reserved (4), value pool offset or value seed (8)
+//	key table           (key count + 1) uint64 offsets followed by the key bytes
+//	value pool          raw SET values referenced by offset
+//
+// scripts/binary_trace.py converts trace.txt files to this format.
+const (
+	binaryTraceMagic      = "TBTRACE\x00"
+	binaryTraceVersion    = 1
+	binaryTraceHeaderSize = 64
+	binaryTraceRecordSize = 24
+)
+
+const (
+	BinaryGet = iota
+	BinarySetPooled
+	BinarySetSeeded
+)
+
+// BinaryTrace serves the requests of a memory mapped binary trace without loading them.
+type BinaryTrace struct {
+	data        []byte
+	recordCount int
+	keyCount    int
+	keyTable    []byte
+	keys        []byte
+	valuePool   []byte
+	blockSize   int
+}
+
+func OpenBinaryTrace(traceFilePath string, blockSizeBytes int) (*BinaryTrace, error) {
+	log.Debug().Msgf("Opening binary trace file %s", traceFilePath)
+	file, err := os.Open(traceFilePath)
+	if err != nil {
+		return nil, err
+	}
+	defer file.Close()
+	info, err := file.Stat()
+	if err != nil {
+		return nil, err
+	}
+	if info.Size() < binaryTraceHeaderSize {
+		return nil, fmt.Errorf("binary trace is shorter than its header")
+	}
+	data, err := syscall.Mmap(int(file.Fd()), 0, int(info.Size()), syscall.PROT_READ, syscall.MAP_SHARED)
+	if err != nil {
+		return nil, err
+	}
+	trace, err := parseBinaryTrace(data, blockSizeBytes)
+	if err != nil {
+		syscall.Munmap(data)
+		return nil, err
+	}
+	return trace, nil
+}
+
+func parseBinaryTrace(data []byte, blockSizeBytes int) (*BinaryTrace, error) {
+	if !bytes.Equal(data[:8], []byte(binaryTraceMagic)) {
+		return nil, fmt.Errorf("not a binary trace file")
+	}
+	if version := binary.LittleEndian.Uint32(data[8:12]); version != binaryTraceVersion {
+		return nil, fmt.Errorf("unsupported binary trace version %d", version)
+	}
+	if recordSize := binary.LittleEndian.Uint32(data[12:16]); recordSize != binaryTraceRecordSize {
+		return nil, fmt.Errorf("unsupported binary trace record size %d", recordSize)
+	}
+	recordCount := binary.LittleEndian.Uint64(data[16:24])
+	keyTableOffset := binary.LittleEndian.Uint64(data[24:32])
+	keyCount := binary.LittleEndian.Uint64(data[32:40])
+	valuePoolOffset := binary.LittleEndian.Uint64(data[40:48])
+	valuePoolLength := binary.LittleEndian.Uint64(data[48:56])
+
+	size := uint64(len(data))
+	keyTableEnd := keyTableOffset + 8*(keyCount+1)
+	if binaryTraceHeaderSize+recordCount*binaryTraceRecordSize > keyTableOffset || keyTableEnd > valuePoolOffset || valuePoolOffset+valuePoolLength > size {
+		return nil, fmt.Errorf("binary trace sections do not fit in the file")
+	}
+	return &BinaryTrace{
+		data:        data,
+		recordCount: int(recordCount),
+		keyCount:    int(keyCount),
+		keyTable:    data[keyTableOffset:keyTableEnd],
+		keys:        data[keyTableEnd:valuePoolOffset],
+		valuePool:   data[valuePoolOffset : valuePoolOffset+valuePoolLength],
+		blockSize:   blockSizeBytes,
+	}, nil
+}
+
+func (t *BinaryTrace) Len() int {
+	return t.recordCount
+}
+
+func (t *BinaryTrace) key(index int) (string, error) {
+	if index >= t.keyCount {
+		return "", fmt.Errorf("key index %d is out of range", index)
+	}
+	start := binary.LittleEndian.Uint64(t.keyTable[8*index:])
+	end := binary.LittleEndian.Uint64(t.keyTable[8*(index+1):])
+	if start > end || end > uint64(len(t.keys)) {
+		return "", fmt.Errorf("key %d is out of range", index)
+	}
+	return string(t.keys[start:end]), nil
+}
+
+// Request decodes the i-th request. Only this request's key and value are copied out of the mapping.
+func (t *BinaryTrace) Request(i int) (Request, error) {
+	if i < 0 || i >= t.recordCount {
+		return Request{}, fmt.Errorf("request %d is out of range", i)
+	}
+	record := t.data[binaryTraceHeaderSize+i*binaryTraceRecordSize:]
+	op := record[0]
+	block, err := t.key(int(binary.LittleEndian.Uint32(record[4:8])))
+	if err != nil {
+		return Request{}, err
+	}
+	valueLength := int(binary.LittleEndian.Uint32(record[8:12]))
+	value := binary.LittleEndian.Uint64(record[16:24])
+	switch op {
+	case BinaryGet:
+		return Request{Block: block, OperationType: Read}, nil
+	case BinarySetPooled:
+		if value+uint64(valueLength) > uint64(len(t.valuePool)) {
+			return Request{}, fmt.Errorf("value of request %d is out of the value pool", i)
+		}
+		newValue := string(t.valuePool[value : value+uint64(valueLength)])
+		return Request{Block: block, OperationType: Write, NewValue: padBlockValue(newValue, t.blockSize)}, nil
+	case BinarySetSeeded:
+		return Request{Block: block, OperationType: Write, NewValue: padBlockValue(valueFromSeed(value, valueLength), t.blockSize)}, nil
+	}
+	return Request{}, fmt.Errorf("unknown operation %d in request %d", op, i)
+}
+
+func (t *BinaryTrace) Close() error {
+	return syscall.Munmap(t.data)
+}
+
+var valueLetters = []byte("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ")
+
+// valueFromSeed expands a seed into letters with splitmix64, one output per byte.
+func valueFromSeed(seed uint64, length int) string {
+	value := make([]byte, length)
+	for i := range value {
+		seed += 0x9E3779B97F4A7C15
+		z := seed
+		z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9
+		z = (z ^ (z >> 27)) * 0x94D049BB133111EB
+		z ^= z >> 31
+		value[i] = valueLetters[z%uint64(len(valueLetters))]
+	}
+	return string(value)
+}
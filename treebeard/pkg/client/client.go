@@ -5,6 +5,7 @@ import (
 	"fmt"
 	"math"
 	"math/rand"
+	"sync/atomic"
 	"time"
 
 	routerpb "github.com/dsg-uwaterloo/treebeard/api/router"
@@ -32,18 +33,29 @@ type WriteResponse struct {
 }
 
 type client struct {
-	rateLimit        *RateLimit
+	rateLimit        *RateLimit // bounds the requests that an open loop has in flight
 	tracer           trace.Tracer
 	routerRPCClients RouterClients
-	requests         []Request
+	requests         RequestSource
+	load             LoadOptions
+
+	nextRequestIndex     atomic.Int64
+	completedRequests    atomic.Int64
+	saturationThroughput float64
+	saturated            bool
+	saturatedAtFirstStep bool
 }
 
-func NewClient(rateLimit *RateLimit, tracer trace.Tracer, routerRPCClients RouterClients, requests []Request) *client {
-	return &client{rateLimit: rateLimit, tracer: tracer, routerRPCClients: routerRPCClients, requests: requests}
+func NewClient(rateLimit *RateLimit, tracer trace.Tracer, routerRPCClients RouterClients, requests RequestSource, load LoadOptions) *client {
+	return &client{rateLimit: rateLimit, tracer: tracer, routerRPCClients: routerRPCClients, requests: requests, load: load}
 }
 
 func (c *client) WaitForStorageToBeReady(redisEndpoints []config.RedisEndpoint, parameters config.Parameters) error {
 	for _, redisEndpoint := range redisEndpoints {
+		if redisEndpoint.Backend == config.MmapBackend {
+			// The oram node initializes an mmap storage before it starts serving.
+			continue
+		}
 		redisClient := redis.NewClient(&redis.Options{
 			Addr: fmt.Sprintf("%s:%d", redisEndpoint.IP, redisEndpoint.Port)})
 		for {
@@ -62,84 +74,86 @@ func (c *client) WaitForStorageToBeReady(redisEndpoints []config.RedisEndpoint,
 	return nil
 }
 
-func (c *client) asyncRead(block string, routerRPCClient RouterRPCClient, readResponseChannel chan ReadResponse) {
-	c.rateLimit.Acquire()
-	ctx, span := c.tracer.Start(context.Background(), "client read request")
-	startTime := time.Now()
-	value, err := routerRPCClient.Read(ctx, block)
+// read sends a read request and measures its latency from startTime.
+func (c *client) read(ctx context.Context, block string, routerRPCClient RouterRPCClient, startTime time.Time, readResponseChannel chan ReadResponse) {
+	requestCtx, span := c.tracer.Start(context.Background(), "client read request")
+	value, err := routerRPCClient.Read(requestCtx, block)
 	latency := time.Since(startTime)
 	log.Debug().Msgf("Got value %s for block %s", value, block)
 	span.End()
-	c.rateLimit.Release()
+	response := ReadResponse{block: block, value: value, latency: latency, err: nil}
 	if err != nil {
-		readResponseChannel <- ReadResponse{block: block, value: "", err: fmt.Errorf("failed to call Read block %s on router; %v", block, err)}
-	} else if value == "" {
-		readResponseChannel <- ReadResponse{block: block, value: "", latency: latency, err: nil}
+		response = ReadResponse{block: block, value: "", err: fmt.Errorf("failed to call Read block %s on router; %v", block, err)}
 	} else {
-		readResponseChannel <- ReadResponse{block: block, value: value, latency: latency, err: nil}
+		c.completedRequests.Add(1)
+	}
+	select {
+	case readResponseChannel <- response:
+	case <-ctx.Done():
 	}
 }
 
-func (c *client) asyncWrite(block string, newValue string, routerRPCClient RouterRPCClient, writeResponseChannel chan WriteResponse) {
-	c.rateLimit.Acquire()
-	ctx, span := c.tracer.Start(context.Background(), "client write request")
-	startTime := time.Now()
-	value, err := routerRPCClient.Write(ctx, block, newValue)
+// write sends a write request and measures its latency from startTime.
+func (c *client) write(ctx context.Context, block string, newValue string, routerRPCClient RouterRPCClient, startTime time.Time, writeResponseChannel chan WriteResponse) {
+	requestCtx, span := c.tracer.Start(context.Background(), "client write request")
+	value, err := routerRPCClient.Write(requestCtx, block, newValue)
 	latency := time.Since(startTime)
 	log.Debug().Msgf("Got success %v for block %s", value, block)
 	span.End()
-	c.rateLimit.Release()
+	response := WriteResponse{block: block, success: value, latency: latency, err: nil}
 	if err != nil {
-		writeResponseChannel <- WriteResponse{block: block, success: false, err: fmt.Errorf("failed to call Write block %s on router; %v", block, err)}
+		response = WriteResponse{block: block, success: false, err: fmt.Errorf("failed to call Write block %s on router; %v", block, err)}
 	} else {
-		writeResponseChannel <- WriteResponse{block: block, success: value, latency: latency, err: nil}
+		c.completedRequests.Add(1)
+	}
+	select {
+	case writeResponseChannel <- response:
+	case <-ctx.Done():
 	}
 }
 
-// TODO: I can add a counter channel to know about the operations that we sent
+func (c *client) send(ctx context.Context, request Request, startTime time.Time, readResponseChannel chan ReadResponse, writeResponseChannel chan WriteResponse) {
+	routerRPCClient := c.routerRPCClients.GetRandomRouter()
+	if request.OperationType == Read {
+		c.read(ctx, request.Block, routerRPCClient, startTime, readResponseChannel)
+	} else if request.OperationType == Write {
+		c.write(ctx, request.Block, request.NewValue, routerRPCClient, startTime, writeResponseChannel)
+	}
+}
 
-// sendRequestsForever cancels remaining operations and returns when the context is cancelled
+// SendRequestsForever sends the trace in the load mode of the client.
+// It returns when the trace is used up, when a ramp saturates the system or when the context is cancelled.
 func (c *client) SendRequestsForever(ctx context.Context, readResponseChannel chan ReadResponse, writeResponseChannel chan WriteResponse) {
-	for _, request := range c.requests {
-		select {
-		case <-ctx.Done():
-			return
-		default:
-			routerRPCClient := c.routerRPCClients.GetRandomRouter()
-			if request.OperationType == Read {
-				go c.asyncRead(request.Block, routerRPCClient, readResponseChannel)
-			} else if request.OperationType == Write {
-				go c.asyncWrite(request.Block, request.NewValue, routerRPCClient, writeResponseChannel)
-			}
-		}
+	if c.load.Mode == ClosedLoop {
+		c.runClosedLoop(ctx, readResponseChannel, writeResponseChannel)
+	} else {
+		c.runOpenLoop(ctx, readResponseChannel, writeResponseChannel)
 	}
 }
 
 type ResponseStatus struct {
 	readOperations  int
 	writeOperations int
-	latencies       []time.Duration
+	readLatencies   *Histogram
+	writeLatencies  *Histogram
 }
 
 // getResponsesForever cancels remaining operations and returns when the context is cancelled
 // returns the number of read and write operations over fixed intervals in the duration
 func (c *client) GetResponsesForever(ctx context.Context, readResponseChannel chan ReadResponse, writeResponseChannel chan WriteResponse) []ResponseStatus {
 	readOperations, writeOperations := 0, 0
-	var latencies []time.Duration
+	readLatencies, writeLatencies := NewHistogram(), NewHistogram()
 	var responseCounts []ResponseStatus
-	timout := time.After(1 * time.Second)
+	interval := time.NewTicker(1 * time.Second)
+	defer interval.Stop()
 	for {
 		select {
 		case <-ctx.Done():
 			return responseCounts
-		case <-timout:
-			responseCounts = append(responseCounts, ResponseStatus{readOperations, writeOperations, latencies})
+		case <-interval.C:
+			responseCounts = append(responseCounts, ResponseStatus{readOperations, writeOperations, readLatencies, writeLatencies})
 			readOperations, writeOperations = 0, 0
-			latencies = nil
-			timout = time.After(1 * time.Second)
-		default:
-		}
-		select {
+			readLatencies, writeLatencies = NewHistogram(), NewHistogram()
 		case readResponse := <-readResponseChannel:
 			if readResponse.err != nil {
 				fmt.Println(readResponse.err.Error())
@@ -147,7 +161,7 @@ func (c *client) GetResponsesForever(ctx context.Context, readResponseChannel ch
 			} else {
 				log.Debug().Msgf("Sucess in Read of block %s. Got value: %v\n", readResponse.block, readResponse.value)
 				readOperations++
-				latencies = append(latencies, readResponse.latency)
+				readLatencies.Record(readResponse.latency)
 			}
 		case writeResponse := <-writeResponseChannel:
 			if writeResponse.err != nil {
@@ -156,9 +170,8 @@ func (c *client) GetResponsesForever(ctx context.Context, readResponseChannel ch
 			} else {
 				log.Debug().Msgf("Finished writing block %s. Success: %v\n", writeResponse.block, writeResponse.success)
 				writeOperations++
-				latencies = append(latencies, writeResponse.latency)
+				writeLatencies.Record(writeResponse.latency)
 			}
-		default:
 		}
 	}
 }
@@ -0,0 +1,160 @@
+package client
+
+import (
+	"encoding/json"
+	"io"
+	"math/bits"
+	"time"
+)
+
+// histogramSubBucketBits sets the precision of Histogram: values below
+// 2^histogramSubBucketBits nanoseconds are exact, larger ones are kept within
+// a relative error of 2^-(histogramSubBucketBits-1), about three significant digits.
+const (
+	histogramSubBucketBits  = 10
+	histogramSubBucketCount = 1 << histogramSubBucketBits
+	histogramSubBucketHalf  = histogramSubBucketCount / 2
+)
+
+// Histogram counts latencies in the log-linear buckets of HdrHistogram.
+// Its memory only grows with the largest recorded latency, not with the number of latencies.
+type Histogram struct {
+	counts []int64
+	total  int64
+	sum    int64
+	max    int64
+}
+
+func NewHistogram() *Histogram {
+	return &Histogram{}
+}
+
+func histogramIndex(value int64) int {
+	shift := bits.Len64(uint64(value)) - histogramSubBucketBits
+	if shift < 0 {
+		shift = 0
+	}
+	return shift*histogramSubBucketHalf + int(value>>shift)
+}
+
+// histogramHighestEquivalentValue is the largest value counted at index.
+func histogramHighestEquivalentValue(index int) int64 {
+	shift := index/histogramSubBucketHalf - 1
+	if shift < 0 {
+		shift = 0
+	}
+	subBucket := int64(index - shift*histogramSubBucketHalf)
+	return (subBucket+1)<<shift - 1
+}
+
+func (h *Histogram) Record(latency time.Duration) {
+	value := int64(latency)
+	if value < 0 {
+		value = 0
+	}
+	index := histogramIndex(value)
+	if index >= len(h.counts) {
+		counts := make([]int64, index+1)
+		copy(counts, h.counts)
+		h.counts = counts
+	}
+	h.counts[index]++
+	h.total++
+	h.sum += value
+	if value > h.max {
+		h.max = value
+	}
+}
+
+// Merge adds the counts of other; merging is lossless since both use the same buckets.
+func (h *Histogram) Merge(other *Histogram) {
+	if len(other.counts) > len(h.counts) {
+		counts := make([]int64, len(other.counts))
+		copy(counts, h.counts)
+		h.counts = counts
+	}
+	for index, count := range other.counts {
+		h.counts[index] += count
+	}
+	h.total += other.total
+	h.sum += other.sum
+	if other.max > h.max {
+		h.max = other.max
+	}
+}
+
+func (h *Histogram) Count() int64 {
+	return h.total
+}
+
+// Mean returns the exact mean latency in milliseconds; it is NaN for an empty histogram.
+func (h *Histogram) Mean() float64 {
+	return float64(h.sum) / float64(h.total) / float64(time.Millisecond)
+}
+
+func (h *Histogram) Max() time.Duration {
+	return time.Duration(h.max)
+}
+
+// ValueAtPercentile returns the highest latency equivalent to the given percentile, so it never under-reports.
+func (h *Histogram) ValueAtPercentile(percentile float64) time.Duration {
+	if h.total == 0 {
+		return 0
+	}
+	target := int64(percentile / 100 * float64(h.total))
+	if float64(target) < percentile/100*float64(h.total) {
+		target++
+	}
+	if target < 1 {
+		target = 1
+	}
+	seen := int64(0)
+	for index, count := range h.counts {
+		seen += count
+		if seen >= target {
+			value := histogramHighestEquivalentValue(index)
+			if value > h.max {
+				value = h.max
+			}
+			return time.Duration(value)
+		}
+	}
+	return h.Max()
+}
+
+type serializedHistogram struct {
+	Interval      int        `json:"interval"`
+	Operation     string     `json:"operation"`
+	SubBucketBits int        `json:"sub_bucket_bits"`
+	Unit          string     `json:"unit"`
+	Total         int64      `json:"total"`
+	Sum           int64      `json:"sum"`
+	Max           int64      `json:"max"`
+	Counts        [][2]int64 `json:"counts"`
+}
+
+// WriteJSONLine writes the histogram as one JSON line with its non-zero buckets as [index, count] pairs.
+// scripts/latency_histograms.py reads and merges these lines.
+func (h *Histogram) WriteJSONLine(writer io.Writer, interval int, operation string) error {
+	serialized := serializedHistogram{
+		Interval:      interval,
+		Operation:     operation,
+		SubBucketBits: histogramSubBucketBits,
+		Unit:          "ns",
+		Total:         h.total,
+		Sum:           h.sum,
+		Max:           h.max,
+		Counts:        [][2]int64{},
+	}
+	for index, count := range h.counts {
+		if count != 0 {
+			serialized.Counts = append(serialized.Counts, [2]int64{int64(index), count})
+		}
+	}
+	line, err := json.Marshal(serialized)
+	if err != nil {
+		return err
+	}
+	_, err = writer.Write(append(line, '\n'))
+	return err
+}
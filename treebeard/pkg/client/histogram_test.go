@@ -0,0 +1,77 @@
+package client
+
+import (
+	"bytes"
+	"encoding/json"
+	"testing"
+	"time"
+)
+
+func TestHistogramIsExactForSmallValues(t *testing.T) {
+	h := NewHistogram()
+	for i := 1; i <= 100; i++ {
+		h.Record(time.Duration(i))
+	}
+	if p50 := h.ValueAtPercentile(50); p50 != 50 {
+		t.Errorf("expected p50 of 50ns, got %v", p50)
+	}
+	if p99 := h.ValueAtPercentile(99); p99 != 99 {
+		t.Errorf("expected p99 of 99ns, got %v", p99)
+	}
+}
+
+func TestHistogramPercentilesHaveBoundedRelativeError(t *testing.T) {
+	h := NewHistogram()
+	for i := 1; i <= 1000; i++ {
+		h.Record(time.Duration(i) * time.Millisecond)
+	}
+	for _, percentile := range []float64{50, 90, 99, 99.9} {
+		expected := float64(time.Duration(percentile*10) * time.Millisecond)
+		got := float64(h.ValueAtPercentile(percentile))
+		if got < expected || got > expected*(1+1.0/histogramSubBucketHalf) {
+			t.Errorf("p%v: expected about %v, got %v", percentile, time.Duration(expected), time.Duration(got))
+		}
+	}
+	if h.Max() != time.Second {
+		t.Errorf("expected max of 1s, got %v", h.Max())
+	}
+}
+
+func TestHistogramMergeIsLossless(t *testing.T) {
+	merged, whole := NewHistogram(), NewHistogram()
+	for part := 0; part < 3; part++ {
+		h := NewHistogram()
+		for i := 0; i < 500; i++ {
+			latency := time.Duration(i*(part+1)) * time.Microsecond
+			h.Record(latency)
+			whole.Record(latency)
+		}
+		merged.Merge(h)
+	}
+	if merged.Count() != whole.Count() || merged.Mean() != whole.Mean() {
+		t.Errorf("merged histogram differs from the histogram of all values")
+	}
+	for _, percentile := range []float64{1, 50, 99.9} {
+		if merged.ValueAtPercentile(percentile) != whole.ValueAtPercentile(percentile) {
+			t.Errorf("p%v differs after merge", percentile)
+		}
+	}
+}
+
+func TestHistogramWriteJSONLineListsNonZeroBuckets(t *testing.T) {
+	h := NewHistogram()
+	h.Record(3)
+	h.Record(3)
+	h.Record(5000)
+	var buffer bytes.Buffer
+	if err := h.WriteJSONLine(&buffer, 2, "read"); err != nil {
+		t.Fatal(err)
+	}
+	var serialized serializedHistogram
+	if err := json.Unmarshal(buffer.Bytes(), &serialized); err != nil {
+		t.Fatal(err)
+	}
+	if serialized.Interval != 2 || serialized.Total != 3 || len(serialized.Counts) != 2 || serialized.Counts[0] != [2]int64{3, 2} {
+		t.Errorf("unexpected serialized histogram %+v", serialized)
+	}
+}
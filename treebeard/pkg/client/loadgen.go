@@ -0,0 +1,171 @@
+package client
+
+import (
+	"context"
+	"fmt"
+	"math/rand"
+	"sync"
+	"time"
+
+	"github.com/rs/zerolog/log"
+)
+
+// LoadMode selects how the client offers the requests of the trace to the routers.
+type LoadMode string
+
+const (
+	// ClosedLoop runs a fixed number of workers that each send their next request when the previous one returns.
+	ClosedLoop LoadMode = "closed"
+	// OpenLoop sends requests at a target rate whether or not the earlier requests returned.
+	OpenLoop LoadMode = "open"
+	// RampLoad runs an open loop whose rate grows step by step until the throughput stops following it.
+	RampLoad LoadMode = "ramp"
+)
+
+const (
+	PoissonArrivals  = "poisson"
+	ConstantArrivals = "constant"
+)
+
+// A ramp step whose throughput stays below this share of its rate means that the system is saturated.
+const rampSaturationRatio = 0.9
+
+type LoadOptions struct {
+	Mode         LoadMode
+	Workers      int           // the closed-loop workers
+	Rate         float64       // requests per second of the open loop, or of the first ramp step
+	Arrivals     string        // poisson or constant gaps between open-loop requests
+	RampStep     float64       // requests per second added by every ramp step
+	RampInterval time.Duration // the length of a ramp step
+}
+
+func (o LoadOptions) Validate() error {
+	switch o.Mode {
+	case ClosedLoop:
+		if o.Workers <= 0 {
+			return fmt.Errorf("closed loop needs a positive number of workers; got %d", o.Workers)
+		}
+		return nil
+	case OpenLoop, RampLoad:
+		if o.Rate <= 0 {
+			return fmt.Errorf("%s load needs a positive rate; got %f", o.Mode, o.Rate)
+		}
+		if o.Arrivals != PoissonArrivals && o.Arrivals != ConstantArrivals {
+			return fmt.Errorf("unknown arrivals %q; use %s or %s", o.Arrivals, PoissonArrivals, ConstantArrivals)
+		}
+		if o.Mode == RampLoad && (o.RampStep <= 0 || o.RampInterval <= 0) {
+			return fmt.Errorf("ramp load needs a positive step and interval; got %f and %v", o.RampStep, o.RampInterval)
+		}
+		return nil
+	}
+	return fmt.Errorf("unknown load mode %q; use %s, %s or %s", o.Mode, ClosedLoop, OpenLoop, RampLoad)
+}
+
+// interarrival returns the time until the next open-loop request at rate requests per second.
+func (o LoadOptions) interarrival(rate float64) time.Duration {
+	mean := float64(time.Second) / rate
+	if o.Arrivals == PoissonArrivals {
+		return time.Duration(rand.ExpFloat64() * mean)
+	}
+	return time.Duration(mean)
+}
+
+// nextRequest returns the next request of the trace; ok is false once the trace is used up.
+func (c *client) nextRequest() (request Request, ok bool) {
+	i := int(c.nextRequestIndex.Add(1) - 1)
+	if i >= c.requests.Len() {
+		return Request{}, false
+	}
+	request, err := c.requests.Request(i)
+	if err != nil {
+		log.Error().Msgf("Failed to decode request %d of the trace; %v", i, err)
+		return Request{}, false
+	}
+	return request, true
+}
+
+// runClosedLoop returns when the trace is used up or the context is cancelled.
+// The latencies of a closed loop only cover the time a request spent in the system,
+// since a worker never sends while it waits for a slow request.
+func (c *client) runClosedLoop(ctx context.Context, readResponseChannel chan ReadResponse, writeResponseChannel chan WriteResponse) {
+	var workers sync.WaitGroup
+	for i := 0; i < c.load.Workers; i++ {
+		workers.Add(1)
+		go func() {
+			defer workers.Done()
+			for ctx.Err() == nil {
+				request, ok := c.nextRequest()
+				if !ok {
+					return
+				}
+				c.send(ctx, request, time.Now(), readResponseChannel, writeResponseChannel)
+			}
+		}()
+	}
+	workers.Wait()
+}
+
+// runOpenLoop sends requests on a fixed schedule and returns when the trace is used up, the context is cancelled
+// or, for a ramp, the system saturates.
+// A request's latency starts at its scheduled time, so requests that wait for a free rate limit token
+// or for a late scheduler count their wait, which avoids coordinated omission.
+func (c *client) runOpenLoop(ctx context.Context, readResponseChannel chan ReadResponse, writeResponseChannel chan WriteResponse) {
+	rate := c.load.Rate
+	stepStart, stepCompleted := time.Now(), c.completedRequests.Load()
+	scheduled := stepStart
+	timer := time.NewTimer(0)
+	defer timer.Stop()
+	<-timer.C
+	for {
+		if c.load.Mode == RampLoad && time.Since(stepStart) >= c.load.RampInterval {
+			throughput := float64(c.completedRequests.Load()-stepCompleted) / time.Since(stepStart).Seconds()
+			log.Info().Msgf("Ramp step at %f requests per second completed %f requests per second", rate, throughput)
+			if throughput < rampSaturationRatio*rate {
+				c.saturated = true
+				if c.saturationThroughput == 0 {
+					// Already the first step fell behind, so its throughput is all there is to report.
+					c.saturationThroughput = throughput
+					c.saturatedAtFirstStep = true
+				}
+				return
+			}
+			if throughput > c.saturationThroughput {
+				c.saturationThroughput = throughput
+			}
+			rate += c.load.RampStep
+			stepStart, stepCompleted = time.Now(), c.completedRequests.Load()
+		}
+		if wait := time.Until(scheduled); wait > 0 {
+			timer.Reset(wait)
+			select {
+			case <-ctx.Done():
+				return
+			case <-timer.C:
+			}
+		} else if ctx.Err() != nil {
+			return
+		}
+		request, ok := c.nextRequest()
+		if !ok {
+			return
+		}
+		c.rateLimit.Acquire()
+		go func(request Request, scheduled time.Time) {
+			defer c.rateLimit.Release()
+			c.send(ctx, request, scheduled, readResponseChannel, writeResponseChannel)
+		}(request, scheduled)
+		scheduled = scheduled.Add(c.load.interarrival(rate))
+	}
+}
+
+// SaturationThroughput returns the highest throughput of the ramp steps that kept up with their rate,
+// and whether a later step fell behind its rate.
+// If already the first step fell behind, it returns the throughput of that step.
+func (c *client) SaturationThroughput() (throughput float64, saturated bool) {
+	return c.saturationThroughput, c.saturated
+}
+
+// SaturatedAtFirstStep reports whether the starting rate of the ramp was already above the saturation throughput.
+func (c *client) SaturatedAtFirstStep() bool {
+	return c.saturatedAtFirstStep
+}
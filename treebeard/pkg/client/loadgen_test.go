@@ -0,0 +1,182 @@
+package client
+
+import (
+	"context"
+	"sync/atomic"
+	"testing"
+	"time"
+
+	routerpb "github.com/dsg-uwaterloo/treebeard/api/router"
+	"go.opentelemetry.io/otel"
+	"google.golang.org/grpc"
+)
+
+type mockRouterClient struct {
+	delay       time.Duration
+	inFlight    atomic.Int32
+	maxInFlight atomic.Int32
+}
+
+func (m *mockRouterClient) call() {
+	inFlight := m.inFlight.Add(1)
+	for {
+		maxInFlight := m.maxInFlight.Load()
+		if inFlight <= maxInFlight || m.maxInFlight.CompareAndSwap(maxInFlight, inFlight) {
+			break
+		}
+	}
+	time.Sleep(m.delay)
+	m.inFlight.Add(-1)
+}
+
+func (m *mockRouterClient) Read(ctx context.Context, in *routerpb.ReadRequest, opts ...grpc.CallOption) (*routerpb.ReadReply, error) {
+	m.call()
+	return &routerpb.ReadReply{Value: "value"}, nil
+}
+
+func (m *mockRouterClient) Write(ctx context.Context, in *routerpb.WriteRequest, opts ...grpc.CallOption) (*routerpb.WriteReply, error) {
+	m.call()
+	return &routerpb.WriteReply{Success: true}, nil
+}
+
+func newTestClient(router *mockRouterClient, requestCount int, maxRequests int, load LoadOptions) *client {
+	requests := make(RequestList, requestCount)
+	for i := range requests {
+		requests[i] = Request{Block: "a", OperationType: i % 2, NewValue: "b"}
+	}
+	routers := RouterClients{0: {ClientAPI: router}}
+	return NewClient(NewRateLimit(maxRequests), otel.Tracer(""), routers, requests, load)
+}
+
+// collect reads the responses until count arrived and returns their latencies.
+func collect(t *testing.T, count int, readResponseChannel chan ReadResponse, writeResponseChannel chan WriteResponse) []time.Duration {
+	var latencies []time.Duration
+	timeout := time.After(5 * time.Second)
+	for len(latencies) < count {
+		select {
+		case response := <-readResponseChannel:
+			latencies = append(latencies, response.latency)
+		case response := <-writeResponseChannel:
+			latencies = append(latencies, response.latency)
+		case <-timeout:
+			t.Fatalf("expected %d responses, but got %d", count, len(latencies))
+		}
+	}
+	return latencies
+}
+
+func TestLoadOptionsValidate(t *testing.T) {
+	valid := []LoadOptions{
+		{Mode: ClosedLoop, Workers: 1},
+		{Mode: OpenLoop, Rate: 10, Arrivals: PoissonArrivals},
+		{Mode: RampLoad, Rate: 10, Arrivals: ConstantArrivals, RampStep: 10, RampInterval: time.Second},
+	}
+	for _, options := range valid {
+		if err := options.Validate(); err != nil {
+			t.Errorf("expected %+v to be valid; %s", options, err)
+		}
+	}
+	invalid := []LoadOptions{
+		{Mode: ClosedLoop},
+		{Mode: OpenLoop, Arrivals: PoissonArrivals},
+		{Mode: OpenLoop, Rate: 10, Arrivals: "bursty"},
+		{Mode: RampLoad, Rate: 10, Arrivals: PoissonArrivals},
+		{Mode: "steady"},
+	}
+	for _, options := range invalid {
+		if err := options.Validate(); err == nil {
+			t.Errorf("expected %+v to be invalid", options)
+		}
+	}
+}
+
+func TestClosedLoopKeepsWorkersRequestsInFlight(t *testing.T) {
+	router := &mockRouterClient{delay: time.Millisecond}
+	c := newTestClient(router, 100, 100, LoadOptions{Mode: ClosedLoop, Workers: 4})
+	readResponseChannel, writeResponseChannel := make(chan ReadResponse), make(chan WriteResponse)
+	go c.SendRequestsForever(context.Background(), readResponseChannel, writeResponseChannel)
+	collect(t, 100, readResponseChannel, writeResponseChannel)
+	if router.maxInFlight.Load() > 4 {
+		t.Errorf("expected at most 4 requests in flight, but got %d", router.maxInFlight.Load())
+	}
+}
+
+func TestOpenLoopCountsQueueingInLatency(t *testing.T) {
+	// Requests are scheduled every 5ms, but the router takes 20ms and only one request may be in flight.
+	router := &mockRouterClient{delay: 20 * time.Millisecond}
+	c := newTestClient(router, 5, 1, LoadOptions{Mode: OpenLoop, Rate: 200, Arrivals: ConstantArrivals})
+	readResponseChannel, writeResponseChannel := make(chan ReadResponse), make(chan WriteResponse)
+	go c.SendRequestsForever(context.Background(), readResponseChannel, writeResponseChannel)
+	latencies := collect(t, 5, readResponseChannel, writeResponseChannel)
+	longest := time.Duration(0)
+	for _, latency := range latencies {
+		if latency > longest {
+			longest = latency
+		}
+	}
+	// The last request is scheduled at 20ms and can only finish after 100ms.
+	if longest < 75*time.Millisecond {
+		t.Errorf("expected the waiting time of the last request in its latency, but the longest latency is %v", longest)
+	}
+}
+
+func TestRampStopsWhenThroughputFallsBehindRate(t *testing.T) {
+	// One request in flight at 10ms each caps the throughput at 100 requests per second.
+	router := &mockRouterClient{delay: 10 * time.Millisecond}
+	c := newTestClient(router, 1000000, 1, LoadOptions{Mode: RampLoad, Rate: 50, Arrivals: ConstantArrivals, RampStep: 100, RampInterval: 500 * time.Millisecond})
+	readResponseChannel, writeResponseChannel := make(chan ReadResponse), make(chan WriteResponse)
+	ctx, cancel := context.WithTimeout(context.Background(), 5*time.Second)
+	defer cancel()
+	go func() {
+		for {
+			select {
+			case <-readResponseChannel:
+			case <-writeResponseChannel:
+			case <-ctx.Done():
+				return
+			}
+		}
+	}()
+	c.SendRequestsForever(ctx, readResponseChannel, writeResponseChannel)
+	throughput, saturated := c.SaturationThroughput()
+	if !saturated {
+		t.Fatalf("expected the ramp to saturate")
+	}
+	if throughput <= 0 || throughput > 110 {
+		t.Errorf("expected a saturation throughput of at most about 100 requests per second, but got %f", throughput)
+	}
+}
+
+func TestRampReportsTheFirstStepWhenItIsAlreadySaturated(t *testing.T) {
+	// One request in flight at 10ms each caps the throughput at 100 requests per second, well below the first step.
+	router := &mockRouterClient{delay: 10 * time.Millisecond}
+	c := newTestClient(router, 1000000, 1, LoadOptions{Mode: RampLoad, Rate: 400, Arrivals: ConstantArrivals, RampStep: 100, RampInterval: 500 * time.Millisecond})
+	readResponseChannel, writeResponseChannel := make(chan ReadResponse), make(chan WriteResponse)
+	ctx, cancel := context.WithTimeout(context.Background(), 5*time.Second)
+	defer cancel()
+	go func() {
+		for {
+			select {
+			case <-readResponseChannel:
+			case <-writeResponseChannel:
+			case <-ctx.Done():
+				return
+			}
+		}
+	}()
+	c.SendRequestsForever(ctx, readResponseChannel, writeResponseChannel)
+	throughput, saturated := c.SaturationThroughput()
+	if !saturated || !c.SaturatedAtFirstStep() {
+		t.Fatalf("expected the first ramp step to saturate")
+	}
+	if throughput <= 0 || throughput > 110 {
+		t.Errorf("expected the throughput of the first step, at most about 100 requests per second, but got %f", throughput)
+	}
+}
+
+func TestConstantInterarrivalMatchesRate(t *testing.T) {
+	options := LoadOptions{Arrivals: ConstantArrivals}
+	if gap := options.interarrival(1000); gap != time.Millisecond {
+		t.Errorf("expected 1ms between requests at 1000 requests per second, but got %v", gap)
+	}
+}
@@ -1,10 +1,36 @@
 package client
 
 import (
+	"bufio"
 	"fmt"
 	"os"
+	"time"
 )
 
+// reportedPercentiles are written for every interval and for the whole experiment.
+var reportedPercentiles = []struct {
+	name       string
+	percentile float64
+}{
+	{"P50", 50},
+	{"P90", 90},
+	{"P99", 99},
+	{"P99.9", 99.9},
+}
+
+func milliseconds(latency time.Duration) float64 {
+	return float64(latency) / float64(time.Millisecond)
+}
+
+func writeLatencyPercentiles(file *os.File, prefix string, latencies *Histogram) {
+	for _, reported := range reportedPercentiles {
+		file.WriteString(fmt.Sprintf("%s%s Latency: %f\n", prefix, reported.name, milliseconds(latencies.ValueAtPercentile(reported.percentile))))
+	}
+	file.WriteString(fmt.Sprintf("%sMax Latency: %f\n", prefix, milliseconds(latencies.Max())))
+}
+
+// WriteOutputToFile writes per-interval throughput and latencies in milliseconds to outputFilePath,
+// and the latency histograms of every interval and operation type to outputFilePath.hist.
 func WriteOutputToFile(outputFilePath string, responseCount []ResponseStatus) error {
 	file, err := os.Create(outputFilePath)
 	if err != nil {
@@ -13,20 +39,47 @@ func WriteOutputToFile(outputFilePath string, responseCount []ResponseStatus) er
 	defer file.Close()
 	sum := 0.0
 	experimentAverageLatency := 0.0
+	experimentReadLatencies, experimentWriteLatencies := NewHistogram(), NewHistogram()
 
 	for _, count := range responseCount {
 		throughput := float64(count.readOperations + count.writeOperations)
-		averageLatency := 0.0
-		for _, latency := range count.latencies {
-			averageLatency += float64(latency.Milliseconds())
-		}
-		averageLatency = averageLatency / float64(len(count.latencies))
+		latencies := NewHistogram()
+		latencies.Merge(count.readLatencies)
+		latencies.Merge(count.writeLatencies)
+		averageLatency := latencies.Mean()
 		sum += throughput
 		experimentAverageLatency += averageLatency
+		experimentReadLatencies.Merge(count.readLatencies)
+		experimentWriteLatencies.Merge(count.writeLatencies)
 		file.WriteString(fmt.Sprintf("Throughput: %f\n", throughput))
 		file.WriteString(fmt.Sprintf("Average Latency: %f\n", averageLatency))
+		writeLatencyPercentiles(file, "", latencies)
 	}
 	file.WriteString(fmt.Sprintf("Average Throughput: %f\n", sum/float64(len(responseCount))))
 	file.WriteString(fmt.Sprintf("Experiment Average Latency: %f\n", experimentAverageLatency/float64(len(responseCount))))
-	return nil
+	experimentLatencies := NewHistogram()
+	experimentLatencies.Merge(experimentReadLatencies)
+	experimentLatencies.Merge(experimentWriteLatencies)
+	writeLatencyPercentiles(file, "Experiment ", experimentLatencies)
+	writeLatencyPercentiles(file, "Experiment Read ", experimentReadLatencies)
+	writeLatencyPercentiles(file, "Experiment Write ", experimentWriteLatencies)
+	return writeHistogramsToFile(outputFilePath+".hist", responseCount)
+}
+
+func writeHistogramsToFile(histogramFilePath string, responseCount []ResponseStatus) error {
+	file, err := os.Create(histogramFilePath)
+	if err != nil {
+		return err
+	}
+	defer file.Close()
+	writer := bufio.NewWriter(file)
+	for interval, count := range responseCount {
+		if err := count.readLatencies.WriteJSONLine(writer, interval, "read"); err != nil {
+			return err
+		}
+		if err := count.writeLatencies.WriteJSONLine(writer, interval, "write"); err != nil {
+			return err
+		}
+	}
+	return writer.Flush()
 }
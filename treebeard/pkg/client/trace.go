@@ -4,6 +4,7 @@ import (
 	"bufio"
 	"fmt"
 	"os"
+	"path"
 	"strings"
 
 	"github.com/rs/zerolog/log"
@@ -20,6 +21,36 @@ type Request struct {
 	NewValue      string
 }
 
+// RequestSource gives the requests of a trace by index.
+// BinaryTrace decodes them lazily; RequestList holds an in-memory trace.
+type RequestSource interface {
+	Len() int
+	Request(i int) (Request, error)
+}
+
+type RequestList []Request
+
+func (r RequestList) Len() int {
+	return len(r)
+}
+
+func (r RequestList) Request(i int) (Request, error) {
+	return r[i], nil
+}
+
+// OpenTrace memory maps trace.bin in configsPath if it exists and reads trace.txt otherwise.
+func OpenTrace(configsPath string, blockSizeBytes int) (RequestSource, error) {
+	binaryTracePath := path.Join(configsPath, "trace.bin")
+	if _, err := os.Stat(binaryTracePath); err == nil {
+		return OpenBinaryTrace(binaryTracePath, blockSizeBytes)
+	}
+	requests, err := ReadTraceFile(path.Join(configsPath, "trace.txt"), blockSizeBytes)
+	if err != nil {
+		return nil, err
+	}
+	return RequestList(requests), nil
+}
+
 func padBlockValue(blockValue string, blockSizeBytes int) string {
 	if len(blockValue) < blockSizeBytes {
 		return strings.Repeat("0", blockSizeBytes-len(blockValue)) + blockValue
@@ -1,6 +1,10 @@
 package client
 
 import (
+	"bytes"
+	"encoding/binary"
+	"os"
+	"path/filepath"
 	"testing"
 )
 
@@ -12,3 +16,105 @@ func TestPadBlockValueMakesBlocksOfCorrectSize(t *testing.T) {
 		t.Errorf("padded block value is not of the correct size")
 	}
 }
+
+func writeBinaryTrace(t *testing.T, records [][]byte, keys []string, valuePool []byte) string {
+	var body bytes.Buffer
+	for _, record := range records {
+		body.Write(record)
+	}
+	keyTableOffset := binaryTraceHeaderSize + body.Len()
+	offset := uint64(0)
+	body.Write(binary.LittleEndian.AppendUint64(nil, offset))
+	for _, key := range keys {
+		offset += uint64(len(key))
+		body.Write(binary.LittleEndian.AppendUint64(nil, offset))
+	}
+	for _, key := range keys {
+		body.WriteString(key)
+	}
+	valuePoolOffset := binaryTraceHeaderSize + body.Len()
+	body.Write(valuePool)
+
+	header := make([]byte, binaryTraceHeaderSize)
+	copy(header, binaryTraceMagic)
+	binary.LittleEndian.PutUint32(header[8:], binaryTraceVersion)
+	binary.LittleEndian.PutUint32(header[12:], binaryTraceRecordSize)
+	binary.LittleEndian.PutUint64(header[16:], uint64(len(records)))
+	binary.LittleEndian.PutUint64(header[24:], uint64(keyTableOffset))
+	binary.LittleEndian.PutUint64(header[32:], uint64(len(keys)))
+	binary.LittleEndian.PutUint64(header[40:], uint64(valuePoolOffset))
+	binary.LittleEndian.PutUint64(header[48:], uint64(len(valuePool)))
+
+	tracePath := filepath.Join(t.TempDir(), "trace.bin")
+	err := os.WriteFile(tracePath, append(header, body.Bytes()...), 0644)
+	if err != nil {
+		t.Fatal(err)
+	}
+	return tracePath
+}
+
+func binaryRecord(op byte, key uint32, valueLength uint32, value uint64) []byte {
+	record := make([]byte, binaryTraceRecordSize)
+	record[0] = op
+	binary.LittleEndian.PutUint32(record[4:], key)
+	binary.LittleEndian.PutUint32(record[8:], valueLength)
+	binary.LittleEndian.PutUint64(record[16:], value)
+	return record
+}
+
+func TestBinaryTraceDecodesRequests(t *testing.T) {
+	tracePath := writeBinaryTrace(t,
+		[][]byte{binaryRecord(BinaryGet, 1, 0, 0), binaryRecord(BinarySetPooled, 0, 3, 2), binaryRecord(BinarySetSeeded, 1, 16, 42)},
+		[]string{"user1", "user22"},
+		[]byte("xxabcxx"),
+	)
+	trace, err := OpenBinaryTrace(tracePath, 5)
+	if err != nil {
+		t.Fatal(err)
+	}
+	defer trace.Close()
+	if trace.Len() != 3 {
+		t.Errorf("expected 3 requests, but got %d", trace.Len())
+	}
+	expected := []Request{
+		{Block: "user22", OperationType: Read},
+		{Block: "user1", OperationType: Write, NewValue: "00abc"},
+		// Same expansion as value_from_seed(42, 16) in scripts/binary_trace.py.
+		{Block: "user22", OperationType: Write, NewValue: "jBkqUUXmrgVcYViE"},
+	}
+	for i, want := range expected {
+		got, err := trace.Request(i)
+		if err != nil {
+			t.Fatal(err)
+		}
+		if got != want {
+			t.Errorf("expected request %v, but got %v", want, got)
+		}
+	}
+	if _, err := trace.Request(3); err == nil {
+		t.Errorf("expected an error for a request out of range")
+	}
+}
+
+func TestBinaryTraceRejectsValuesOutsideThePool(t *testing.T) {
+	tracePath := writeBinaryTrace(t, [][]byte{binaryRecord(BinarySetPooled, 0, 10, 0)}, []string{"user1"}, []byte("abc"))
+	trace, err := OpenBinaryTrace(tracePath, 5)
+	if err != nil {
+		t.Fatal(err)
+	}
+	defer trace.Close()
+	if _, err := trace.Request(0); err == nil {
+		t.Errorf("expected an error for a value outside of the value pool")
+	}
+}
+
+func TestOpenBinaryTraceRejectsOtherFiles(t *testing.T) {
+	tracePath := filepath.Join(t.TempDir(), "trace.bin")
+	err := os.WriteFile(tracePath, make([]byte, 128), 0644)
+	if err != nil {
+		t.Fatal(err)
+	}
+	if _, err := OpenBinaryTrace(tracePath, 5); err == nil {
+		t.Errorf("expected an error for a file without the binary trace magic")
+	}
+}
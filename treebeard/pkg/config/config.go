@@ -28,11 +28,16 @@ type OramNodeEndpoint struct {
 	ReplicaID int
 }
 
+// MmapBackend keeps a storage in a memory-mapped file on its oram node instead of in redis.
+const MmapBackend = "mmap"
+
 type RedisEndpoint struct {
 	IP         string `yaml:"exposed_ip"`
 	Port       int
 	ID         int
-	ORAMNodeID int `yaml:"oramnode_id"`
+	ORAMNodeID int    `yaml:"oramnode_id"`
+	Backend    string // redis (the default) or mmap
+	Path       string // the file of an mmap storage
 }
 
 type RouterConfig struct {
@@ -52,21 +57,30 @@ type RedisConfig struct {
 }
 
 type Parameters struct {
-	MaxBlocksToSend   int     `yaml:"max-blocks-to-send"`
-	EvictionRate      int     `yaml:"eviction-rate"`
-	EvictPathCount    int     `yaml:"evict-path-count"`
-	BatchTimout       float64 `yaml:"batch-timeout"`
-	EpochTime         float64 `yaml:"epoch-time"`
-	Trace             bool    `yaml:"trace"`
-	Z                 int     `yaml:"Z"`
-	S                 int     `yaml:"S"`
-	Shift             int     `yaml:"shift"`
-	TreeHeight        int     `yaml:"tree-height"`
-	RedisPipelineSize int     `yaml:"redis-pipeline-size"`
-	MaxRequests       int     `yaml:"max-requests"`
-	BlockSize         int     `yaml:"block-size"`
-	Log               bool    `yaml:"log"`
-	Profile           bool    `yaml:"profile"`
+	MaxBlocksToSend      int     `yaml:"max-blocks-to-send"`
+	EvictionRate         int     `yaml:"eviction-rate"`
+	EvictPathCount       int     `yaml:"evict-path-count"`
+	BatchTimout          float64 `yaml:"batch-timeout"`
+	BatchSize            int     `yaml:"batch-size"`
+	MaxInFlightReadPaths int     `yaml:"max-in-flight-read-paths"`
+	EpochTime            float64 `yaml:"epoch-time"`
+	Trace                bool    `yaml:"trace"`
+	Z                    int     `yaml:"Z"`
+	S                    int     `yaml:"S"`
+	Shift                int     `yaml:"shift"`
+	TreeHeight           int     `yaml:"tree-height"`
+	RedisPipelineSize    int     `yaml:"redis-pipeline-size"`
+	MaxRequests          int     `yaml:"max-requests"`
+	BlockSize            int     `yaml:"block-size"`
+	Log                  bool    `yaml:"log"`
+	Profile              bool    `yaml:"profile"`
+	ValueEncoding        string  `yaml:"value-encoding"`
+	ReadPathScript       bool    `yaml:"read-path-script"`
+	TreeTopCacheLevels   int     `yaml:"tree-top-cache-levels"`
+	BucketLocking        bool    `yaml:"bucket-locking"`
+	AdaptiveEpochTime    bool    `yaml:"adaptive-epoch-time"`
+	MinEpochTime         float64 `yaml:"min-epoch-time"`
+	MaxEpochTime         float64 `yaml:"max-epoch-time"`
 }
 
 func (o Parameters) String() string {
@@ -75,6 +89,8 @@ func (o Parameters) String() string {
 	output += "EvictionRate: " + strconv.Itoa(o.EvictionRate) + "\n"
 	output += "EvictPathCount: " + strconv.Itoa(o.EvictPathCount) + "\n"
 	output += "BatchTimout: " + strconv.FormatFloat(o.BatchTimout, 'f', -1, 64) + "\n"
+	output += "BatchSize: " + strconv.Itoa(o.BatchSize) + "\n"
+	output += "MaxInFlightReadPaths: " + strconv.Itoa(o.MaxInFlightReadPaths) + "\n"
 	output += "EpochTime: " + strconv.FormatFloat(o.EpochTime, 'f', -1, 64) + "\n"
 	output += "Z: " + strconv.Itoa(o.Z) + "\n"
 	output += "S: " + strconv.Itoa(o.S) + "\n"
@@ -82,7 +98,14 @@ func (o Parameters) String() string {
 	output += "TreeHeight: " + strconv.Itoa(o.TreeHeight) + "\n"
 	output += "RedisPipelineSize: " + strconv.Itoa(o.RedisPipelineSize) + "\n"
 	output += "MaxRequests: " + strconv.Itoa(o.MaxRequests) + "\n"
-	output += "BlockSize: " + strconv.Itoa(o.BlockSize)
+	output += "BlockSize: " + strconv.Itoa(o.BlockSize) + "\n"
+	output += "ValueEncoding: " + o.ValueEncoding + "\n"
+	output += "ReadPathScript: " + strconv.FormatBool(o.ReadPathScript) + "\n"
+	output += "TreeTopCacheLevels: " + strconv.Itoa(o.TreeTopCacheLevels) + "\n"
+	output += "BucketLocking: " + strconv.FormatBool(o.BucketLocking) + "\n"
+	output += "AdaptiveEpochTime: " + strconv.FormatBool(o.AdaptiveEpochTime) + "\n"
+	output += "MinEpochTime: " + strconv.FormatFloat(o.MinEpochTime, 'f', -1, 64) + "\n"
+	output += "MaxEpochTime: " + strconv.FormatFloat(o.MaxEpochTime, 'f', -1, 64)
 	return output
 }
 
@@ -0,0 +1,129 @@
+package oramnode
+
+import (
+	"fmt"
+	"math"
+	"sync"
+)
+
+// accessCounts keeps the access count of every bucket of the storages of an oram node in memory,
+// so that ReadPath decides on early reshuffles without reading the counts from redis.
+// Redis still counts every access, and the counts are loaded from it again whenever the node becomes the leader.
+type accessCounts struct {
+	mu     sync.Mutex
+	counts map[int][]uint8 // map of storage id to the access count of every bucket id
+	load   func(storageID int) ([]uint8, error)
+}
+
+func newAccessCounts(load func(storageID int) ([]uint8, error)) *accessCounts {
+	return &accessCounts{
+		counts: make(map[int][]uint8),
+		load:   load,
+	}
+}
+
+// storageCounts returns the counts of a storage and loads them on the first access.
+// The caller holds a.mu.
+func (a *accessCounts) storageCounts(storageID int) ([]uint8, error) {
+	if counts, loaded := a.counts[storageID]; loaded {
+		return counts, nil
+	}
+	counts, err := a.load(storageID)
+	if err != nil {
+		return nil, fmt.Errorf("unable to load the access counts of storage %d; %s", storageID, err)
+	}
+	a.counts[storageID] = counts
+	return counts, nil
+}
+
+// preload loads the counts of a storage ahead of its first access, so no ReadPath waits for the load.
+func (a *accessCounts) preload(storageID int) error {
+	a.mu.Lock()
+	defer a.mu.Unlock()
+	_, err := a.storageCounts(storageID)
+	return err
+}
+
+// setEmpty sets every count of a storage to zero without loading them, for a storage that holds an empty tree.
+func (a *accessCounts) setEmpty(storageID int, bucketCount int) {
+	a.mu.Lock()
+	defer a.mu.Unlock()
+	a.counts[storageID] = make([]uint8, bucketCount)
+}
+
+func saturate(count int) uint8 {
+	if count > math.MaxUint8 {
+		return math.MaxUint8
+	}
+	return uint8(count)
+}
+
+// grow makes room for a bucket outside of the tree height, which only happens in tests.
+func (a *accessCounts) grow(storageID int, counts []uint8, bucketID int) []uint8 {
+	if bucketID < len(counts) {
+		return counts
+	}
+	counts = append(counts, make([]uint8, bucketID+1-len(counts))...)
+	a.counts[storageID] = counts
+	return counts
+}
+
+// add counts one access of every bucket and returns the buckets that reached maxAccessCount.
+func (a *accessCounts) add(storageID int, bucketIDs []int, maxAccessCount int) (full []int, err error) {
+	a.mu.Lock()
+	defer a.mu.Unlock()
+	counts, err := a.storageCounts(storageID)
+	if err != nil {
+		return nil, err
+	}
+	for _, bucketID := range bucketIDs {
+		counts = a.grow(storageID, counts, bucketID)
+		if counts[bucketID] < math.MaxUint8 {
+			counts[bucketID]++
+		}
+		if int(counts[bucketID]) >= maxAccessCount {
+			full = append(full, bucketID)
+		}
+	}
+	return full, nil
+}
+
+// full returns the buckets that reached maxAccessCount.
+func (a *accessCounts) full(storageID int, bucketIDs []int, maxAccessCount int) (full []int, err error) {
+	a.mu.Lock()
+	defer a.mu.Unlock()
+	counts, err := a.storageCounts(storageID)
+	if err != nil {
+		return nil, err
+	}
+	for _, bucketID := range bucketIDs {
+		counts = a.grow(storageID, counts, bucketID)
+		if int(counts[bucketID]) >= maxAccessCount {
+			full = append(full, bucketID)
+		}
+	}
+	return full, nil
+}
+
+// clear resets the counts of buckets that were rewritten, like BatchWriteBucket does in redis.
+func (a *accessCounts) clear(storageID int, bucketIDs []int) {
+	a.mu.Lock()
+	defer a.mu.Unlock()
+	counts, loaded := a.counts[storageID]
+	if !loaded {
+		// They are read from redis when the storage is loaded.
+		return
+	}
+	for _, bucketID := range bucketIDs {
+		if bucketID < len(counts) {
+			counts[bucketID] = 0
+		}
+	}
+}
+
+// reset drops the counts of every storage, which are loaded from redis again on their next access.
+func (a *accessCounts) reset() {
+	a.mu.Lock()
+	defer a.mu.Unlock()
+	a.counts = make(map[int][]uint8)
+}
@@ -0,0 +1,80 @@
+package oramnode
+
+import (
+	"fmt"
+	"testing"
+)
+
+func TestAccessCountsAreLoadedOnceAndReturnFullBuckets(t *testing.T) {
+	loads := 0
+	a := newAccessCounts(func(storageID int) ([]uint8, error) {
+		loads++
+		return []uint8{0, 2, 0, 1}, nil
+	})
+	full, err := a.add(0, []int{1, 2, 3}, 3)
+	if err != nil {
+		t.Fatalf("expected successful add; %s", err)
+	}
+	if len(full) != 1 || full[0] != 1 {
+		t.Errorf("expected bucket 1 to be full, but got %v", full)
+	}
+	a.clear(0, []int{1})
+	full, _ = a.full(0, []int{1, 2, 3}, 2)
+	if len(full) != 1 || full[0] != 3 {
+		t.Errorf("expected bucket 3 to be full after clearing bucket 1, but got %v", full)
+	}
+	if loads != 1 {
+		t.Errorf("expected the counts to be loaded once, but got %d loads", loads)
+	}
+	a.reset()
+	a.full(0, []int{1}, 2)
+	if loads != 2 {
+		t.Errorf("expected the counts to be loaded again after reset, but got %d loads", loads)
+	}
+}
+
+func TestAccessCountsSaturate(t *testing.T) {
+	a := newAccessCounts(func(storageID int) ([]uint8, error) {
+		return []uint8{0, 255}, nil
+	})
+	full, _ := a.add(0, []int{1}, 300)
+	if len(full) != 0 {
+		t.Errorf("expected no full bucket below the maximum access count, but got %v", full)
+	}
+	if a.counts[0][1] != 255 {
+		t.Errorf("expected the count to stay at 255, but got %d", a.counts[0][1])
+	}
+}
+
+func TestAccessCountsReturnLoadErrors(t *testing.T) {
+	a := newAccessCounts(func(storageID int) ([]uint8, error) {
+		return nil, fmt.Errorf("redis is down")
+	})
+	if _, err := a.add(0, []int{1}, 1); err == nil {
+		t.Errorf("expected an error when the counts cannot be loaded")
+	}
+	if _, loaded := a.counts[0]; loaded {
+		t.Errorf("expected the counts not to be cached after a failed load")
+	}
+}
+
+func TestAccessCountsArePreloadedOrSetEmpty(t *testing.T) {
+	loads := 0
+	a := newAccessCounts(func(storageID int) ([]uint8, error) {
+		loads++
+		return []uint8{0, 2}, nil
+	})
+	a.setEmpty(1, 4)
+	if err := a.preload(0); err != nil {
+		t.Fatalf("expected successful preload; %s", err)
+	}
+	a.preload(1)
+	a.add(0, []int{1}, 3)
+	a.add(1, []int{1}, 3)
+	if loads != 1 {
+		t.Errorf("expected only storage 0 to be loaded once, but got %d loads", loads)
+	}
+	if a.counts[0][1] != 3 || a.counts[1][1] != 1 {
+		t.Errorf("expected counts 3 and 1, but got %d and %d", a.counts[0][1], a.counts[1][1])
+	}
+}
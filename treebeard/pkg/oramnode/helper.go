@@ -11,3 +11,26 @@ func distributeBucketIDs(bucketIDs []int, maxElementCount int) [][]int {
 	}
 	return bucketIDBatches
 }
+
+// groupBucketIDsByLevel groups the buckets by their level in the tree, starting at the deepest level.
+func groupBucketIDsByLevel(bucketIDs []int, shift int) [][]int {
+	levelOf := func(bucketID int) int {
+		level := 0
+		for bucketID >>= shift; bucketID > 0; bucketID >>= shift {
+			level++
+		}
+		return level
+	}
+	var levels [][]int
+	for _, bucketID := range bucketIDs {
+		level := levelOf(bucketID)
+		for len(levels) <= level {
+			levels = append(levels, nil)
+		}
+		levels[level] = append(levels[level], bucketID)
+	}
+	for i, j := 0, len(levels)-1; i < j; i, j = i+1, j-1 {
+		levels[i], levels[j] = levels[j], levels[i]
+	}
+	return levels
+}
@@ -32,3 +32,21 @@ func TestDistributeBucketIDs(t *testing.T) {
 		}
 	}
 }
+
+func TestGroupBucketIDsByLevelStartsAtTheLeaves(t *testing.T) {
+	levels := groupBucketIDsByLevel([]int{1, 2, 3, 4, 7, 9}, 1)
+	expected := [][]int{{9}, {4, 7}, {2, 3}, {1}}
+	if len(levels) != len(expected) {
+		t.Fatalf("expected levels %v, but got %v", expected, levels)
+	}
+	for i := range expected {
+		if len(levels[i]) != len(expected[i]) {
+			t.Fatalf("expected levels %v, but got %v", expected, levels)
+		}
+		for j := range expected[i] {
+			if levels[i][j] != expected[i][j] {
+				t.Errorf("expected levels %v, but got %v", expected, levels)
+			}
+		}
+	}
+}
@@ -3,6 +3,7 @@ package oramnode
 import (
 	"context"
 	"fmt"
+	"math"
 	"net"
 	"strconv"
 	"sync/atomic"
@@ -24,14 +25,21 @@ type storage interface {
 	GetMaxAccessCount() int
 	LockStorage(storageID int)
 	UnlockStorage(storageID int)
+	LockBuckets(storageID int, bucketIDs []int)
+	UnlockBuckets(storageID int, bucketIDs []int)
+	SyncStorage(storageID int) error
 	BatchGetBlockOffset(bucketIDs []int, storageID int, blocks []string) (offsets map[int]strg.BlockOffsetStatus, err error)
 	BatchGetAccessCount(bucketIDs []int, storageID int) (counts map[int]int, err error)
 	BatchReadBucket(bucketIDs []int, storageID int) (blocks map[int]map[string]string, err error)
 	BatchWriteBucket(storageID int, readBucketBlocksList map[int]map[string]string, shardNodeBlocks map[string]strg.BlockInfo) (writtenBlocks map[string]string, err error)
 	BatchReadBlock(offsets map[int]int, storageID int) (values map[int]string, err error)
+	BatchReadPath(bucketIDs []int, storageID int, blocks []string) (values map[string]string, accessCounts map[int]int, err error)
 	GetBucketsInPaths(paths []int) (bucketIDs []int, err error)
+	GetStorageIDs() []int
 	GetRandomStorageID() int
 	GetMultipleReverseLexicographicPaths(evictionCount int, count int) (paths []int)
+	ResetTreeTopCache()
+	TreeTopCacheStats() (hits uint64, misses uint64)
 }
 
 type oramNodeServer struct {
@@ -39,29 +47,41 @@ type oramNodeServer struct {
 	oramNodeServerID    int
 	replicaID           int
 	raftNode            *raft.Raft
+	leaderCh            <-chan bool // delivers true when the node becomes the leader and false when it stops leading
 	oramNodeFSM         *oramNodeFSM
 	shardNodeRPCClients ShardNodeRPCClients
 	readPathCounter     atomic.Int32
 	storageHandler      storage
+	accessCounts        *accessCounts
+	emptyStorageIDs     []int // storages that hold the empty tree of InitDatabase until this node first leads
 	parameters          config.Parameters
 }
 
 func newOramNodeServer(oramNodeServerID int, replicaID int, raftNode *raft.Raft, oramNodeFSM *oramNodeFSM, shardNodeRPCClients map[int]ReplicaRPCClientMap, storageHandler storage, parameters config.Parameters) *oramNodeServer {
-	return &oramNodeServer{
+	o := &oramNodeServer{
 		oramNodeServerID:    oramNodeServerID,
 		replicaID:           replicaID,
 		raftNode:            raftNode,
+		leaderCh:            raftNode.LeaderCh(),
 		oramNodeFSM:         oramNodeFSM,
 		shardNodeRPCClients: shardNodeRPCClients,
 		readPathCounter:     atomic.Int32{},
 		storageHandler:      storageHandler,
 		parameters:          parameters,
 	}
+	o.accessCounts = newAccessCounts(o.loadAccessCounts)
+	return o
 }
 
 // It runs the failed eviction and read path as the new leader.
 func (o *oramNodeServer) performFailedOperations() error {
-	<-o.raftNode.LeaderCh()
+	if isLeader := <-o.leaderCh; !isLeader {
+		return nil
+	}
+	// The previous leader wrote to the storages since this node last cached them.
+	o.storageHandler.ResetTreeTopCache()
+	o.accessCounts.reset()
+	o.loadAllAccessCounts()
 	o.oramNodeFSM.unfinishedEvictionMu.Lock()
 	o.oramNodeFSM.unfinishedReadPathMu.Lock()
 	needsEviction := o.oramNodeFSM.unfinishedEviction
@@ -83,7 +103,14 @@ func (o *oramNodeServer) performFailedOperations() error {
 		o.oramNodeFSM.unfinishedReadPathMu.Unlock()
 		buckets, _ := o.storageHandler.GetBucketsInPaths(paths)
 		log.Debug().Msgf("Performing failed read path with paths %v and storageID %d", paths, storageID)
-		o.earlyReshuffle(buckets, storageID)
+		if o.parameters.BucketLocking {
+			// An eviction may be rewriting the same buckets.
+			o.storageHandler.LockBuckets(storageID, buckets)
+			o.earlyReshuffle(buckets, storageID)
+			o.storageHandler.UnlockBuckets(storageID, buckets)
+		} else {
+			o.earlyReshuffle(buckets, storageID)
+		}
 	}
 	return nil
 }
@@ -98,28 +125,69 @@ func (o *oramNodeServer) asyncGetAccessCount(bucketIDs []int, storageID int, res
 	responseChan <- getAccessCountResponse{counts: counts, err: err}
 }
 
-func (o *oramNodeServer) earlyReshuffle(buckets []int, storageID int) error {
-	log.Debug().Msgf("Performing early reshuffle with buckets %v and storageID %d", buckets, storageID)
-	// TODO: can we make this a background thread?
-	batches := distributeBucketIDs(buckets, o.parameters.RedisPipelineSize)
+// loadAllAccessCounts loads the access counts of every storage of the node as it becomes the leader.
+// The counts of a storage that still holds an empty tree are all zero, so they are not read.
+func (o *oramNodeServer) loadAllAccessCounts() {
+	bucketCount := int(math.Pow(2, float64(o.parameters.TreeHeight)))
+	for _, storageID := range o.emptyStorageIDs {
+		o.accessCounts.setEmpty(storageID, bucketCount)
+	}
+	// Other leaders may write to them from now on.
+	o.emptyStorageIDs = nil
+	for _, storageID := range o.storageHandler.GetStorageIDs() {
+		err := o.accessCounts.preload(storageID)
+		if err != nil {
+			// ReadPath tries again on its first access to the storage.
+			log.Error().Msgf("Unable to preload access counts; %s", err)
+		}
+	}
+}
+
+// loadAccessCounts reads the access count of every bucket of a storage from redis.
+func (o *oramNodeServer) loadAccessCounts(storageID int) ([]uint8, error) {
+	bucketCount := int(math.Pow(2, float64(o.parameters.TreeHeight)))
+	counts := make([]uint8, bucketCount)
+	bucketIDs := make([]int, 0, bucketCount)
+	for bucketID := 1; bucketID < bucketCount; bucketID++ {
+		bucketIDs = append(bucketIDs, bucketID)
+	}
+	batches := distributeBucketIDs(bucketIDs, o.parameters.RedisPipelineSize)
 	accessCountChan := make(chan getAccessCountResponse)
 	for _, bucketIDs := range batches {
 		go o.asyncGetAccessCount(bucketIDs, storageID, accessCountChan)
 	}
-	var bucketsToWrite []int
+	var err error
 	for i := 0; i < len(batches); i++ {
 		response := <-accessCountChan
 		if response.err != nil {
-			return fmt.Errorf("unable to get access count from the server; %s", response.err)
+			err = fmt.Errorf("unable to get access count from the server; %s", response.err)
+			continue
 		}
-		for bucket, accessCount := range response.counts {
-			if accessCount >= o.storageHandler.GetMaxAccessCount() {
-				bucketsToWrite = append(bucketsToWrite, bucket)
-			}
+		for bucketID, accessCount := range response.counts {
+			counts[bucketID] = saturate(accessCount)
 		}
 	}
+	if err != nil {
+		return nil, err
+	}
+	log.Info().Msgf("Loaded the access counts of %d buckets of storage %d", len(bucketIDs), storageID)
+	return counts, nil
+}
+
+// earlyReshuffle rewrites the buckets that reached the maximum access count.
+func (o *oramNodeServer) earlyReshuffle(buckets []int, storageID int) error {
+	log.Debug().Msgf("Performing early reshuffle with buckets %v and storageID %d", buckets, storageID)
+	bucketsToWrite, err := o.accessCounts.full(storageID, buckets, o.storageHandler.GetMaxAccessCount())
+	if err != nil {
+		return err
+	}
+	return o.reshuffleBuckets(bucketsToWrite, storageID)
+}
+
+// reshuffleBuckets reads and rewrites the buckets that reached the maximum access count.
+func (o *oramNodeServer) reshuffleBuckets(bucketsToWrite []int, storageID int) error {
 	readBucketChan := make(chan readBucketResponse)
-	batches = distributeBucketIDs(bucketsToWrite, o.parameters.RedisPipelineSize)
+	batches := distributeBucketIDs(bucketsToWrite, o.parameters.RedisPipelineSize)
 	for _, bucketIDs := range batches {
 		go o.asyncReadBucket(bucketIDs, storageID, readBucketChan)
 	}
@@ -131,12 +199,31 @@ func (o *oramNodeServer) earlyReshuffle(buckets []int, storageID int) error {
 		}
 		blocksFromReadBucketBatches[i] = response.bucketValues
 	}
+	writeBucketChan := make(chan writeBucketResponse)
 	for _, blocks := range blocksFromReadBucketBatches {
-		go o.storageHandler.BatchWriteBucket(storageID, blocks, nil)
+		go o.asyncWriteBucket(storageID, blocks, nil, writeBucketChan)
+	}
+	// The buckets have to be written before the caller unlocks them.
+	for i := 0; i < len(blocksFromReadBucketBatches); i++ {
+		response := <-writeBucketChan
+		if response.err != nil {
+			return fmt.Errorf("unable to write bucket to the server; %s", response.err)
+		}
 	}
+	o.accessCounts.clear(storageID, bucketsToWrite)
 	return nil
 }
 
+type writeBucketResponse struct {
+	writtenBlocks map[string]string
+	err           error
+}
+
+func (o *oramNodeServer) asyncWriteBucket(storageID int, readBucketBlocksList map[int]map[string]string, shardNodeBlocks map[string]strg.BlockInfo, responseChan chan writeBucketResponse) {
+	writtenBlocks, err := o.storageHandler.BatchWriteBucket(storageID, readBucketBlocksList, shardNodeBlocks)
+	responseChan <- writeBucketResponse{writtenBlocks: writtenBlocks, err: err}
+}
+
 type readBucketResponse struct {
 	bucketValues map[int]map[string]string
 	err          error
@@ -232,6 +319,48 @@ func (o *oramNodeServer) writeBackBlocksToAllBuckets(buckets []int, storageID in
 	return receivedBlocksIsWritten, nil
 }
 
+// evictLevelByLevel reads and rewrites the buckets one level at a time, starting at the leaves,
+// so that the received blocks go as deep as their paths allow.
+// It only locks one batch of buckets at a time, so ReadPaths on the other buckets go on.
+// Every bucket is read and written back under the same lock, so no block is ever outside the tree.
+func (o *oramNodeServer) evictLevelByLevel(buckets []int, storageID int, receivedBlocks map[string]strg.BlockInfo) (receivedBlocksIsWritten map[string]bool, err error) {
+	log.Debug().Msgf("Evicting level by level with buckets %v and storageID %d", buckets, storageID)
+	receivedBlocksIsWritten = make(map[string]bool)
+	for block := range receivedBlocks {
+		receivedBlocksIsWritten[block] = false
+	}
+	for _, level := range groupBucketIDsByLevel(buckets, o.parameters.Shift) {
+		for _, bucketIDs := range distributeBucketIDs(level, o.parameters.RedisPipelineSize) {
+			o.storageHandler.LockBuckets(storageID, bucketIDs)
+			writtenBlocks, err := o.rewriteBuckets(bucketIDs, storageID, receivedBlocks)
+			o.storageHandler.UnlockBuckets(storageID, bucketIDs)
+			if err != nil {
+				return nil, err
+			}
+			for block := range writtenBlocks {
+				if _, exists := receivedBlocks[block]; exists {
+					delete(receivedBlocks, block)
+					receivedBlocksIsWritten[block] = true
+				}
+			}
+		}
+	}
+	return receivedBlocksIsWritten, nil
+}
+
+func (o *oramNodeServer) rewriteBuckets(bucketIDs []int, storageID int, receivedBlocks map[string]strg.BlockInfo) (writtenBlocks map[string]string, err error) {
+	blocksFromReadBucket, err := o.storageHandler.BatchReadBucket(bucketIDs, storageID)
+	if err != nil {
+		return nil, fmt.Errorf("unable to read bucket; %s", err)
+	}
+	writtenBlocks, err = o.storageHandler.BatchWriteBucket(storageID, blocksFromReadBucket, receivedBlocks)
+	if err != nil {
+		return nil, fmt.Errorf("unable to atomic write bucket; %s", err)
+	}
+	o.accessCounts.clear(storageID, bucketIDs)
+	return writtenBlocks, nil
+}
+
 func (o *oramNodeServer) evict(storageID int) error {
 	o.storageHandler.LockStorage(storageID)
 	defer o.storageHandler.UnlockStorage(storageID)
@@ -251,22 +380,41 @@ func (o *oramNodeServer) evict(storageID int) error {
 	if err != nil {
 		return fmt.Errorf("unable to get buckets for paths; %v", err)
 	}
-	blocksFromReadBucket, err := o.readAllBuckets(buckets, storageID)
-	if err != nil {
-		return fmt.Errorf("unable to perform ReadBucket on all levels")
-	}
-
 	randomShardNode := o.shardNodeRPCClients.getRandomShardNodeClient()
-	receivedBlocks, err := o.readBlocksFromShardNode(paths, storageID, randomShardNode)
-	log.Debug().Msgf("Received blocks from shardnode %v", receivedBlocks)
-	if err != nil {
-		return err
-	}
+	var receivedBlocksIsWritten map[string]bool
+	if o.parameters.BucketLocking {
+		receivedBlocks, err := o.readBlocksFromShardNode(paths, storageID, randomShardNode)
+		log.Debug().Msgf("Received blocks from shardnode %v", receivedBlocks)
+		if err != nil {
+			return err
+		}
+		receivedBlocksIsWritten, err = o.evictLevelByLevel(buckets, storageID, receivedBlocks)
+		if err != nil {
+			return fmt.Errorf("unable to rewrite the buckets level by level; %s", err)
+		}
+	} else {
+		blocksFromReadBucket, err := o.readAllBuckets(buckets, storageID)
+		if err != nil {
+			return fmt.Errorf("unable to perform ReadBucket on all levels")
+		}
+
+		receivedBlocks, err := o.readBlocksFromShardNode(paths, storageID, randomShardNode)
+		log.Debug().Msgf("Received blocks from shardnode %v", receivedBlocks)
+		if err != nil {
+			return err
+		}
 
-	receivedBlocksIsWritten, err := o.writeBackBlocksToAllBuckets(buckets, storageID, blocksFromReadBucket, receivedBlocks)
+		receivedBlocksIsWritten, err = o.writeBackBlocksToAllBuckets(buckets, storageID, blocksFromReadBucket, receivedBlocks)
+		if err != nil {
+			return fmt.Errorf("unable to perform WriteBucket on all levels; %s", err)
+		}
+		o.accessCounts.clear(storageID, buckets)
+	}
 	log.Debug().Msgf("Received blocks is written %v", receivedBlocksIsWritten)
+
+	err = o.storageHandler.SyncStorage(storageID)
 	if err != nil {
-		return fmt.Errorf("unable to perform WriteBucket on all levels; %s", err)
+		return fmt.Errorf("unable to sync the storage; %s", err)
 	}
 
 	randomShardNode.sendBackAcksNacks(receivedBlocksIsWritten)
@@ -282,6 +430,13 @@ func (o *oramNodeServer) evict(storageID int) error {
 
 	o.readPathCounter.Store(0)
 
+	if o.parameters.TreeTopCacheLevels > 0 {
+		hits, misses := o.storageHandler.TreeTopCacheStats()
+		if hits+misses > 0 {
+			log.Info().Msgf("Tree-top cache hit ratio %.3f (%d of %d bucket accesses)", float64(hits)/float64(hits+misses), hits, hits+misses)
+		}
+	}
+
 	return nil
 }
 
@@ -317,52 +472,56 @@ func (o *oramNodeServer) asyncReadBlock(offsets map[int]int, storageID int, resp
 	responseChan <- readBlockResponse{values: values, err: err}
 }
 
-func (o *oramNodeServer) ReadPath(ctx context.Context, request *pb.ReadPathRequest) (*pb.ReadPathReply, error) {
-	if o.raftNode.State() != raft.Leader {
-		return nil, fmt.Errorf(commonerrs.NotTheLeaderError)
-	}
-	log.Debug().Msgf("Received read path request %v", request)
-	tracer := otel.Tracer("")
-	ctx, span := tracer.Start(ctx, "oramnode read path request")
-	o.storageHandler.LockStorage(int(request.StorageId))
-	defer o.storageHandler.UnlockStorage(int(request.StorageId))
-
-	var blocks []string
-	for _, request := range request.Requests {
-		blocks = append(blocks, request.Block)
-	}
+type readPathResponse struct {
+	values map[string]string
+	err    error
+}
 
-	realBlockBucketMapping := make(map[int]string) // map of bucket id to block
+func (o *oramNodeServer) asyncReadPath(bucketIDs []int, storageID int, blocks []string, responseChan chan readPathResponse) {
+	// The access counts that the script returns are also in o.accessCounts.
+	values, _, err := o.storageHandler.BatchReadPath(bucketIDs, storageID, blocks)
+	responseChan <- readPathResponse{values: values, err: err}
+}
 
-	paths := o.getDistinctPathsInBatch(request.Requests)
-	beginReadPathCommand, err := newReplicateBeginReadPathCommand(paths, int(request.StorageId))
-	if err != nil {
-		return nil, fmt.Errorf("unable to create begin read path replication command; %v", err)
+// readPathWithScript reads the blocks with one BatchReadPath call per batch of buckets
+// and fills returnValues with the found blocks.
+func (o *oramNodeServer) readPathWithScript(buckets []int, storageID int, blocks []string, returnValues map[string]string) (err error) {
+	readPathResponseChan := make(chan readPathResponse)
+	batches := distributeBucketIDs(buckets, o.parameters.RedisPipelineSize)
+	for _, bucketIDs := range batches {
+		go o.asyncReadPath(bucketIDs, storageID, blocks, readPathResponseChan)
 	}
-	_, beginReadPathReplicationSpan := tracer.Start(ctx, "replicate begin read path")
-	err = o.raftNode.Apply(beginReadPathCommand, 0).Error()
-	if err != nil {
-		return nil, fmt.Errorf("could not apply log to the FSM; %s", err)
+	for i := 0; i < len(batches); i++ {
+		response := <-readPathResponseChan
+		if response.err != nil {
+			err = fmt.Errorf("could not read path from storage; %s", response.err)
+			continue
+		}
+		for block, value := range response.values {
+			returnValues[block] = value
+		}
 	}
-	beginReadPathReplicationSpan.End()
+	return err
+}
+
+// readPathWithOffsets gets the block offsets and then reads the blocks in two rounds of batches
+// and fills returnValues with the found blocks.
+func (o *oramNodeServer) readPathWithOffsets(ctx context.Context, buckets []int, storageID int, blocks []string, returnValues map[string]string) error {
+	tracer := otel.Tracer("")
+	realBlockBucketMapping := make(map[int]string) // map of bucket id to block
 
-	buckets, err := o.storageHandler.GetBucketsInPaths(paths)
-	log.Debug().Msgf("Got buckets %v", buckets)
-	if err != nil {
-		return nil, fmt.Errorf("could not get bucket ids in the paths; %v", err)
-	}
 	_, getBlockOffsetsSpan := tracer.Start(ctx, "get block offsets")
 	offsetListResponseChan := make(chan blockOffsetResponse)
 	batches := distributeBucketIDs(buckets, o.parameters.RedisPipelineSize)
 	for _, bucketIDs := range batches {
-		go o.asyncGetBlockOffset(bucketIDs, int(request.StorageId), blocks, offsetListResponseChan)
+		go o.asyncGetBlockOffset(bucketIDs, storageID, blocks, offsetListResponseChan)
 	}
 	getBlockOffsetsSpan.End()
 	var offsetList []map[int]int // list of map of bucket id to offset
 	for i := 0; i < len(batches); i++ {
 		response := <-offsetListResponseChan
 		if response.err != nil {
-			return nil, fmt.Errorf("could not get offset from storage")
+			return fmt.Errorf("could not get offset from storage")
 		}
 		offsetList = append(offsetList, make(map[int]int))
 		for bucketID, offsetStatus := range response.offsets {
@@ -374,21 +533,17 @@ func (o *oramNodeServer) ReadPath(ctx context.Context, request *pb.ReadPathReque
 	}
 	log.Debug().Msgf("Got offsets %v", offsetList)
 
-	returnValues := make(map[string]string) // map of block to value
-	for _, block := range blocks {
-		returnValues[block] = ""
-	}
 	_, readBlocksSpan := tracer.Start(ctx, "read blocks")
 	readBlockResponseChan := make(chan readBlockResponse)
 
 	for _, offsets := range offsetList {
-		go o.asyncReadBlock(offsets, int(request.StorageId), readBlockResponseChan)
+		go o.asyncReadBlock(offsets, storageID, readBlockResponseChan)
 	}
 	for i := 0; i < len(offsetList); i++ {
 		response := <-readBlockResponseChan
 		if response.err != nil {
 			log.Error().Msgf("Could not read block %v; %s", response.values, response.err)
-			return nil, err
+			return response.err
 		}
 		for bucketID, value := range response.values {
 			if _, exists := realBlockBucketMapping[bucketID]; exists {
@@ -397,10 +552,77 @@ func (o *oramNodeServer) ReadPath(ctx context.Context, request *pb.ReadPathReque
 		}
 	}
 	readBlocksSpan.End()
+
+	return nil
+}
+
+// lockReadPath locks the buckets of a ReadPath, or its whole storage without bucket locking,
+// and returns the function that unlocks them.
+func (o *oramNodeServer) lockReadPath(storageID int, buckets []int) (unlock func()) {
+	if o.parameters.BucketLocking {
+		// Evictions only hold the buckets they are rewriting.
+		o.storageHandler.LockBuckets(storageID, buckets)
+		return func() { o.storageHandler.UnlockBuckets(storageID, buckets) }
+	}
+	o.storageHandler.LockStorage(storageID)
+	return func() { o.storageHandler.UnlockStorage(storageID) }
+}
+
+func (o *oramNodeServer) ReadPath(ctx context.Context, request *pb.ReadPathRequest) (*pb.ReadPathReply, error) {
+	if o.raftNode.State() != raft.Leader {
+		return nil, fmt.Errorf(commonerrs.NotTheLeaderError)
+	}
+	log.Debug().Msgf("Received read path request %v", request)
+	tracer := otel.Tracer("")
+	ctx, span := tracer.Start(ctx, "oramnode read path request")
+
+	var blocks []string
+	for _, request := range request.Requests {
+		blocks = append(blocks, request.Block)
+	}
+
+	paths := o.getDistinctPathsInBatch(request.Requests)
+	buckets, err := o.storageHandler.GetBucketsInPaths(paths)
+	log.Debug().Msgf("Got buckets %v", buckets)
+	if err != nil {
+		return nil, fmt.Errorf("could not get bucket ids in the paths; %v", err)
+	}
+	unlock := o.lockReadPath(int(request.StorageId), buckets)
+	defer unlock()
+
+	beginReadPathCommand, err := newReplicateBeginReadPathCommand(paths, int(request.StorageId))
+	if err != nil {
+		return nil, fmt.Errorf("unable to create begin read path replication command; %v", err)
+	}
+	_, beginReadPathReplicationSpan := tracer.Start(ctx, "replicate begin read path")
+	err = o.raftNode.Apply(beginReadPathCommand, 0).Error()
+	if err != nil {
+		return nil, fmt.Errorf("could not apply log to the FSM; %s", err)
+	}
+	beginReadPathReplicationSpan.End()
+
+	returnValues := make(map[string]string) // map of block to value
+	for _, block := range blocks {
+		returnValues[block] = ""
+	}
+	if o.parameters.ReadPathScript {
+		_, readPathScriptSpan := tracer.Start(ctx, "read path script")
+		err = o.readPathWithScript(buckets, int(request.StorageId), blocks, returnValues)
+		readPathScriptSpan.End()
+	} else {
+		err = o.readPathWithOffsets(ctx, buckets, int(request.StorageId), blocks, returnValues)
+	}
+	if err != nil {
+		return nil, err
+	}
 	log.Debug().Msgf("Going to return values %v", returnValues)
 
 	_, earlyReshuffleSpan := tracer.Start(ctx, "early reshuffle")
-	err = o.earlyReshuffle(buckets, int(request.StorageId))
+	// Every bucket of the paths gave up one slot.
+	bucketsToWrite, err := o.accessCounts.add(int(request.StorageId), buckets, o.storageHandler.GetMaxAccessCount())
+	if err == nil {
+		err = o.reshuffleBuckets(bucketsToWrite, int(request.StorageId))
+	}
 	if err != nil {
 		return nil, fmt.Errorf("early reshuffle failed;%s", err)
 	}
@@ -482,6 +704,16 @@ func StartServer(oramNodeServerID int, bindIP string, advIP string, rpcPort int,
 		}
 	}
 	storageHandler := strg.NewStorageHandler(parameters.TreeHeight, parameters.Z, parameters.S, parameters.Shift, storages)
+	valueEncoding, err := strg.ParseValueEncoding(parameters.ValueEncoding)
+	if err != nil {
+		log.Fatal().Msgf("invalid value-encoding parameter; %v", err)
+	}
+	err = storageHandler.SetValueEncoding(valueEncoding)
+	if err != nil {
+		log.Fatal().Msgf("failed to set the value encoding; %v", err)
+	}
+	storageHandler.SetBlockSize(parameters.BlockSize)
+	storageHandler.SetTreeTopCacheLevels(parameters.TreeTopCacheLevels)
 	if isFirst {
 		err = storageHandler.InitDatabase()
 		if err != nil {
@@ -489,6 +721,8 @@ func StartServer(oramNodeServerID int, bindIP string, advIP string, rpcPort int,
 		}
 	}
 	oramNodeServer := newOramNodeServer(oramNodeServerID, replicaID, r, oramNodeFSM, shardNodeRPCClients, storageHandler, parameters)
+	// performFailedOperations loads the access counts when this node becomes the leader.
+	oramNodeServer.emptyStorageIDs = storageHandler.GetEmptiedStorageIDs()
 	go func() {
 		for {
 			time.Sleep(100 * time.Millisecond)
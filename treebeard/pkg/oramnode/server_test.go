@@ -3,8 +3,11 @@ package oramnode
 import (
 	"context"
 	"fmt"
+	"math/rand"
 	"sort"
+	"sync"
 	"testing"
+	"time"
 
 	"github.com/dsg-uwaterloo/treebeard/api/oramnode"
 	shardnodepb "github.com/dsg-uwaterloo/treebeard/api/shardnode"
@@ -102,7 +105,7 @@ func getFailedMockShardNodeClients() map[int]ReplicaRPCClientMap {
 	}
 }
 
-func startLeaderRaftNodeServer(t *testing.T, storageHandler storage) *oramNodeServer {
+func startLeaderRaftNodeServer(t testing.TB, storageHandler storage) *oramNodeServer {
 	fsm := newOramNodeFSM()
 	raftPort, err := freeport.GetFreePort()
 	if err != nil {
@@ -331,6 +334,41 @@ func TestEvictResetsReadPathCounter(t *testing.T) {
 	}
 }
 
+func TestEvictWithBucketLockingRewritesBucketsFromTheLeavesUp(t *testing.T) {
+	var writtenBuckets [][]int
+	m := strg.NewMockStorageHandler(3, 4).WithCustomBatchReadBucketFunc(
+		func(bucketIDs []int, storageID int) (blocks map[int]map[string]string, err error) {
+			blocks = make(map[int]map[string]string)
+			for _, bucketID := range bucketIDs {
+				blocks[bucketID] = make(map[string]string)
+			}
+			return blocks, nil
+		},
+	).WithCustomBatchWriteBucketFunc(
+		func(storageID int, readBucketBlocksList map[int]map[string]string, shardNodeBlocks map[string]strg.BlockInfo) (writtenBlocks map[string]string, err error) {
+			var bucketIDs []int
+			for bucketID := range readBucketBlocksList {
+				bucketIDs = append(bucketIDs, bucketID)
+			}
+			sort.Ints(bucketIDs)
+			writtenBuckets = append(writtenBuckets, bucketIDs)
+			return nil, nil
+		},
+	)
+	o := startLeaderRaftNodeServer(t, m)
+	o.parameters.RedisPipelineSize = 2
+	o.parameters.Shift = 1
+	o.parameters.BucketLocking = true
+	err := o.evict(0)
+	if err != nil {
+		t.Fatalf("expected successful eviction; %s", err)
+	}
+	expected := [][]int{{4}, {2, 3}, {1}}
+	if fmt.Sprint(writtenBuckets) != fmt.Sprint(expected) {
+		t.Errorf("expected buckets to be written in batches %v, but got %v", expected, writtenBuckets)
+	}
+}
+
 func TestGetDistinctPathsInBatchReturnsDistinctPathsInRequests(t *testing.T) {
 	o := newOramNodeServer(0, 0, &raft.Raft{}, &oramNodeFSM{}, make(map[int]ReplicaRPCClientMap), &strg.StorageHandler{}, config.Parameters{})
 	paths := o.getDistinctPathsInBatch(
@@ -378,3 +416,253 @@ func TestReadPathIncrementsReadPathCounter(t *testing.T) {
 		t.Errorf("ReadPath should increment readPathCounter")
 	}
 }
+
+func TestReadPathWithScriptReturnsValuesAndReshufflesFullBuckets(t *testing.T) {
+	var reshuffledBuckets []int
+	var loadedBuckets []int
+	m := strg.NewMockStorageHandler(3, 4).WithCustomBatchReadPathFunc(
+		func(bucketIDs []int, storageID int, blocks []string) (values map[string]string, accessCounts map[int]int, err error) {
+			values = make(map[string]string)
+			for _, bucketID := range bucketIDs {
+				if bucketID == 1 {
+					values["a"] = "valA"
+				}
+			}
+			return values, nil, nil
+		},
+	).WithCustomBatchGetAccessCountFunc(
+		func(bucketIDs []int, storageID int) (counts map[int]int, err error) {
+			loadedBuckets = append(loadedBuckets, bucketIDs...)
+			counts = make(map[int]int)
+			for _, bucketID := range bucketIDs {
+				counts[bucketID] = bucketID
+			}
+			return counts, nil
+		},
+	).WithCusomBatchGetBlockOffsetFunc(
+		func(bucketIDs []int, storageID int, blocks []string) (offsets map[int]strg.BlockOffsetStatus, err error) {
+			t.Errorf("ReadPath should not get block offsets when it uses the read path script")
+			return nil, nil
+		},
+	).WithCustomBatchReadBucketFunc(
+		func(bucketIDs []int, storageID int) (blocks map[int]map[string]string, err error) {
+			reshuffledBuckets = append(reshuffledBuckets, bucketIDs...)
+			return nil, nil
+		},
+	)
+	o := startLeaderRaftNodeServer(t, m)
+	o.parameters.RedisPipelineSize = 2
+	o.parameters.ReadPathScript = true
+	o.parameters.TreeHeight = 3
+	ctx := metadata.NewIncomingContext(context.Background(), metadata.Pairs("requestid", "request1"))
+	reply, err := o.ReadPath(ctx, &oramnode.ReadPathRequest{StorageId: 2, Requests: []*oramnode.BlockRequest{{Block: "a", Path: 1}, {Block: "b", Path: 1}}})
+	if err != nil {
+		t.Fatalf("expected successful execution of ReadPath; %s", err)
+	}
+	for _, response := range reply.Responses {
+		if response.Block == "a" && response.Value != "valA" || response.Block == "b" && response.Value != "" {
+			t.Errorf("unexpected value %s for block %s", response.Value, response.Block)
+		}
+	}
+	sort.Ints(reshuffledBuckets)
+	if len(reshuffledBuckets) != 2 || reshuffledBuckets[0] != 3 || reshuffledBuckets[1] != 4 {
+		t.Errorf("expected buckets 3 and 4 to be reshuffled, but got %v", reshuffledBuckets)
+	}
+	if len(loadedBuckets) != 7 {
+		t.Errorf("expected the access counts of the 7 buckets of the tree to be loaded once, but got %v", loadedBuckets)
+	}
+	if o.readPathCounter.Load() != 1 {
+		t.Errorf("ReadPath should increment readPathCounter")
+	}
+}
+
+func TestLoadAllAccessCountsSkipsEmptyStoragesOnlyOnce(t *testing.T) {
+	var mu sync.Mutex
+	var loadedBuckets []int
+	m := strg.NewMockStorageHandler(3, 4).WithCustomBatchGetAccessCountFunc(
+		func(bucketIDs []int, storageID int) (counts map[int]int, err error) {
+			mu.Lock()
+			defer mu.Unlock()
+			loadedBuckets = append(loadedBuckets, bucketIDs...)
+			return nil, nil
+		},
+	)
+	o := startLeaderRaftNodeServer(t, m)
+	o.parameters.RedisPipelineSize = 2
+	o.parameters.TreeHeight = 3
+	o.emptyStorageIDs = []int{0}
+	o.loadAllAccessCounts()
+	if len(loadedBuckets) != 0 {
+		t.Errorf("expected the access counts of an empty storage not to be loaded, but got %v", loadedBuckets)
+	}
+	if len(o.accessCounts.counts[0]) != 8 {
+		t.Errorf("expected the access counts of all 8 bucket ids of storage 0, but got %v", o.accessCounts.counts[0])
+	}
+	o.accessCounts.reset()
+	o.loadAllAccessCounts()
+	if len(loadedBuckets) != 7 {
+		t.Errorf("expected the access counts of the 7 buckets of the tree to be loaded after a leader change, but got %v", loadedBuckets)
+	}
+}
+
+func TestPerformFailedOperationsKeepsAccessCountsWhenTheNodeStopsLeading(t *testing.T) {
+	var mu sync.Mutex
+	loads := 0
+	m := strg.NewMockStorageHandler(3, 4).WithCustomBatchGetAccessCountFunc(
+		func(bucketIDs []int, storageID int) (counts map[int]int, err error) {
+			mu.Lock()
+			defer mu.Unlock()
+			loads++
+			return nil, nil
+		},
+	)
+	o := startLeaderRaftNodeServer(t, m)
+	o.parameters.RedisPipelineSize = 2
+	o.parameters.TreeHeight = 3
+	o.accessCounts.setEmpty(0, 8)
+	o.accessCounts.add(0, []int{1}, 4)
+	leaderCh := make(chan bool, 1)
+	o.leaderCh = leaderCh
+
+	leaderCh <- false
+	o.performFailedOperations()
+	if loads != 0 || o.accessCounts.counts[0][1] != 1 {
+		t.Errorf("expected the access counts to stay as they were after losing leadership, but got %d loads and count %d", loads, o.accessCounts.counts[0][1])
+	}
+	leaderCh <- true
+	o.performFailedOperations()
+	if loads == 0 || o.accessCounts.counts[0][1] != 0 {
+		t.Errorf("expected the access counts to be loaded again after becoming the leader, but got %d loads and count %d", loads, o.accessCounts.counts[0][1])
+	}
+}
+
+func TestPerformFailedOperationsResetsTheTreeTopCacheOnlyWhenTheNodeBecomesTheLeader(t *testing.T) {
+	resets := 0
+	m := strg.NewMockStorageHandler(3, 4).WithCustomResetTreeTopCacheFunc(func() { resets++ })
+	o := startLeaderRaftNodeServer(t, m)
+	leaderCh := make(chan bool, 1)
+	o.leaderCh = leaderCh
+
+	leaderCh <- false
+	o.performFailedOperations()
+	if resets != 0 {
+		t.Errorf("expected the tree-top cache to be kept after losing leadership, but got %d resets", resets)
+	}
+	leaderCh <- true
+	o.performFailedOperations()
+	if resets != 1 {
+		t.Errorf("expected the tree-top cache to be reset once after becoming the leader, but got %d resets", resets)
+	}
+}
+
+// pathBuckets returns the buckets of the paths like GetBucketsInPaths with a shift of one.
+func pathBuckets(treeHeight int, paths []int) []int {
+	seen := make(map[int]bool)
+	var buckets []int
+	for _, path := range paths {
+		for bucketID := 1<<(treeHeight-1) + path - 1; bucketID > 0 && !seen[bucketID]; bucketID >>= 1 {
+			seen[bucketID] = true
+			buckets = append(buckets, bucketID)
+		}
+	}
+	return buckets
+}
+
+// benchmarkReadPathLatency measures ReadPath while evict rewrites the whole tree over and over.
+// Reading or writing a bucket takes bucketTime and the read path script takes readTime.
+// With BucketLocking a ReadPath only waits for the batch of the eviction that holds one of its buckets;
+// otherwise it waits for the whole eviction.
+func benchmarkReadPathLatency(b *testing.B, bucketLocking bool) {
+	const treeHeight = 10
+	const bucketTime = 10 * time.Microsecond
+	const readTime = 50 * time.Microsecond
+	m := strg.NewMockStorageHandler(treeHeight, 1000).WithLocking().WithCustomGetBucketsInPathsFunc(
+		func(paths []int) (bucketIDs []int, err error) {
+			return pathBuckets(treeHeight, paths), nil
+		},
+	).WithCustomGetMultipleReverseLexicographicPathsFunc(
+		func(evictionCount int, count int) (paths []int) {
+			for i := 0; i < count; i++ {
+				paths = append(paths, strg.GetNextReverseLexicographicPath(evictionCount+i, treeHeight))
+			}
+			return paths
+		},
+	).WithCustomBatchReadBucketFunc(
+		func(bucketIDs []int, storageID int) (blocks map[int]map[string]string, err error) {
+			time.Sleep(time.Duration(len(bucketIDs)) * bucketTime)
+			blocks = make(map[int]map[string]string)
+			for _, bucketID := range bucketIDs {
+				blocks[bucketID] = make(map[string]string)
+			}
+			return blocks, nil
+		},
+	).WithCustomBatchWriteBucketFunc(
+		func(storageID int, readBucketBlocksList map[int]map[string]string, shardNodeBlocks map[string]strg.BlockInfo) (writtenBlocks map[string]string, err error) {
+			time.Sleep(time.Duration(len(readBucketBlocksList)) * bucketTime)
+			writtenBlocks = make(map[string]string)
+			for block, info := range shardNodeBlocks {
+				writtenBlocks[block] = info.Value
+			}
+			return writtenBlocks, nil
+		},
+	).WithCustomBatchReadPathFunc(
+		func(bucketIDs []int, storageID int, blocks []string) (values map[string]string, accessCounts map[int]int, err error) {
+			time.Sleep(readTime)
+			return nil, nil, nil
+		},
+	)
+	o := startLeaderRaftNodeServer(b, m)
+	o.parameters = config.Parameters{
+		MaxBlocksToSend:   5,
+		EvictionRate:      4,
+		EvictPathCount:    1 << (treeHeight - 1),
+		RedisPipelineSize: 64,
+		Shift:             1,
+		TreeHeight:        treeHeight,
+		ReadPathScript:    true,
+		BucketLocking:     bucketLocking,
+	}
+
+	stop := make(chan bool)
+	var wg sync.WaitGroup
+	wg.Add(1)
+	go func() {
+		defer wg.Done()
+		for {
+			select {
+			case <-stop:
+				return
+			default:
+			}
+			if err := o.evict(0); err != nil {
+				b.Errorf("unable to evict; %s", err)
+				return
+			}
+			time.Sleep(time.Millisecond)
+		}
+	}()
+
+	ctx := metadata.NewIncomingContext(context.Background(), metadata.Pairs("requestid", "request1"))
+	latencies := make([]time.Duration, b.N)
+	b.ResetTimer()
+	for i := 0; i < b.N; i++ {
+		request := &oramnode.ReadPathRequest{StorageId: 0, Requests: []*oramnode.BlockRequest{{Block: "a", Path: int32(rand.Intn(1<<(treeHeight-1)) + 1)}}}
+		start := time.Now()
+		if _, err := o.ReadPath(ctx, request); err != nil {
+			b.Fatalf("expected successful execution of ReadPath; %s", err)
+		}
+		latencies[i] = time.Since(start)
+	}
+	b.StopTimer()
+	close(stop)
+	wg.Wait()
+
+	sort.Slice(latencies, func(i, j int) bool { return latencies[i] < latencies[j] })
+	b.ReportMetric(float64(latencies[len(latencies)/2].Microseconds()), "p50-us")
+	b.ReportMetric(float64(latencies[len(latencies)*99/100].Microseconds()), "p99-us")
+}
+
+func BenchmarkReadPathLatencyDuringEviction(b *testing.B) {
+	b.Run("storage-lock", func(b *testing.B) { benchmarkReadPathLatency(b, false) })
+	b.Run("bucket-locking", func(b *testing.B) { benchmarkReadPathLatency(b, true) })
+}
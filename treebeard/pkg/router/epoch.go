@@ -2,8 +2,11 @@ package router
 
 import (
 	"context"
+	"fmt"
 	"math"
+	"runtime"
 	"sync"
+	"sync/atomic"
 	"time"
 
 	shardnodepb "github.com/dsg-uwaterloo/treebeard/api/shardnode"
@@ -13,27 +16,55 @@ import (
 	"google.golang.org/grpc"
 )
 
+// The router keeps one request buffer per CPU, so concurrent requests rarely wait for each other.
+type epochShard struct {
+	mu       sync.Mutex
+	requests []*request
+	_        [64]byte // keeps the shards on different cache lines
+}
+
 type epochManager struct {
 	shardNodeRPCClients map[int]ReplicaRPCClientMap
-	requests            map[int][]*request          // map of epoch round to requests
-	reponseChans        map[int]map[string]chan any // map of epoch round to map of request id to response channel
-	currentEpoch        int
+	shards              []epochShard
+	nextShard           atomic.Uint64
+	currentEpoch        atomic.Int64
+	inFlightEpochs      atomic.Int32 // epochs that are still waiting for the shard nodes
 	epochDuration       time.Duration
+	adaptive            bool
+	minEpochDuration    time.Duration
+	maxEpochDuration    time.Duration
+	requestBuffers      sync.Pool // request slices of answered epochs
+	responseChans       sync.Pool // response channels of answered requests
 	hasher              utils.Hasher
-	mu                  sync.Mutex
 }
 
+// The hashes of the most recent blocks that the router keeps to find their shard nodes.
+const knownHashesLimit = 1 << 16
+
 func newEpochManager(shardNodeRPCClients map[int]ReplicaRPCClientMap, epochDuration time.Duration) *epochManager {
 	return &epochManager{
 		shardNodeRPCClients: shardNodeRPCClients,
-		requests:            make(map[int][]*request),
-		reponseChans:        make(map[int]map[string]chan any),
-		currentEpoch:        0,
+		shards:              make([]epochShard, runtime.GOMAXPROCS(0)),
 		epochDuration:       epochDuration,
-		hasher:              utils.Hasher{KnownHashes: make(map[string]uint32)},
+		requestBuffers:      sync.Pool{New: func() any { return new([]*request) }},
+		// A response channel holds the single response of its request, so an epoch never waits for a handler.
+		responseChans: sync.Pool{New: func() any { return make(chan any, 1) }},
+		hasher:        utils.Hasher{KnownHashes: make(map[string]uint32), MaxKnownHashes: knownHashesLimit},
 	}
 }
 
+// withAdaptiveEpochDuration lets the epoch duration follow the load between minDuration and maxDuration.
+func (e *epochManager) withAdaptiveEpochDuration(minDuration time.Duration, maxDuration time.Duration) *epochManager {
+	e.adaptive = true
+	if minDuration < time.Microsecond {
+		// An epoch of zero would never grow again.
+		minDuration = time.Microsecond
+	}
+	e.minEpochDuration = minDuration
+	e.maxEpochDuration = maxDuration
+	return e
+}
+
 const (
 	Read int = iota
 	Write
@@ -45,24 +76,71 @@ type request struct {
 	operationType int
 	block         string
 	value         string
+	responseChan  chan any
 }
 
+// addRequestToCurrentEpoch returns the channel that receives the response of the request.
+// The caller gives it back with releaseResponseChan after reading the response.
 func (e *epochManager) addRequestToCurrentEpoch(r *request) chan any {
-	log.Debug().Msgf("Aquiring lock for epoch manager in addRequestToCurrentEpoch")
-	e.mu.Lock()
-	log.Debug().Msgf("Aquired lock for epoch manager in addRequestToCurrentEpoch")
-	log.Debug().Msgf("Adding request %v to epoch %d", r, e.currentEpoch)
-	defer func() {
-		log.Debug().Msgf("Releasing lock for epoch manager in addRequestToCurrentEpoch")
-		e.mu.Unlock()
-		log.Debug().Msgf("Released lock for epoch manager in addRequestToCurrentEpoch")
-	}()
-	e.requests[e.currentEpoch] = append(e.requests[e.currentEpoch], r)
-	if _, exists := e.reponseChans[e.currentEpoch]; !exists {
-		e.reponseChans[e.currentEpoch] = make(map[string]chan any)
+	log.Debug().Msgf("Adding request %v to epoch %d", r, e.currentEpoch.Load())
+	r.responseChan = e.responseChans.Get().(chan any)
+	shard := &e.shards[e.nextShard.Add(1)%uint64(len(e.shards))]
+	shard.mu.Lock()
+	shard.requests = append(shard.requests, r)
+	shard.mu.Unlock()
+	return r.responseChan
+}
+
+func (e *epochManager) releaseResponseChan(responseChan chan any) {
+	e.responseChans.Put(responseChan)
+}
+
+// closeEpoch collects the requests of every shard and starts the next epoch.
+// The shards keep their buffers and answered epochs give theirs back, so memory does not grow with the epochs.
+func (e *epochManager) closeEpoch() (epochNumber int, requests *[]*request) {
+	requests = e.requestBuffers.Get().(*[]*request)
+	for i := range e.shards {
+		shard := &e.shards[i]
+		shard.mu.Lock()
+		*requests = append(*requests, shard.requests...)
+		clearRequests(shard.requests)
+		shard.requests = shard.requests[:0]
+		shard.mu.Unlock()
+	}
+	return int(e.currentEpoch.Add(1) - 1), requests
+}
+
+// clearRequests drops the pointers of a reused buffer, so that answered requests can be garbage collected.
+func clearRequests(requests []*request) {
+	for i := range requests {
+		requests[i] = nil
+	}
+}
+
+// releaseRequests gives the buffer of an answered epoch back to the pool.
+func (e *epochManager) releaseRequests(requests *[]*request) {
+	clearRequests(*requests)
+	*requests = (*requests)[:0]
+	e.requestBuffers.Put(requests)
+}
+
+// adaptEpochDuration lengthens the epochs while the shard nodes are still answering earlier epochs,
+// so that they get fewer and larger batches, and shortens them while the shard nodes keep up.
+func (e *epochManager) adaptEpochDuration(requestsCount int) {
+	if !e.adaptive {
+		return
+	}
+	if e.inFlightEpochs.Load() > 0 && requestsCount > 0 {
+		e.epochDuration = e.epochDuration * 5 / 4
+	} else {
+		e.epochDuration = e.epochDuration * 4 / 5
+	}
+	if e.epochDuration > e.maxEpochDuration {
+		e.epochDuration = e.maxEpochDuration
+	}
+	if e.epochDuration < e.minEpochDuration {
+		e.epochDuration = e.minEpochDuration
 	}
-	e.reponseChans[e.currentEpoch][r.requestId] = make(chan any)
-	return e.reponseChans[e.currentEpoch][r.requestId]
 }
 
 func (e *epochManager) whereToForward(block string) (shardNodeID int) {
@@ -131,16 +209,39 @@ func (e *epochManager) getShardnodeBatches(requests []*request) map[int]*shardno
 	return requestBatches
 }
 
+// answer sends the response of a pending request and forgets it.
+// Replies for unknown or already answered requests are dropped, so every response channel gets one response.
+func answer(pending map[string]*request, requestID string, response any) {
+	if r, exists := pending[requestID]; exists {
+		r.responseChan <- response
+		delete(pending, requestID)
+	}
+}
+
 // This function waits for all the responses then answers all of the requests.
-// It can time out since a request may have failed.
-func (e *epochManager) sendEpochRequestsAndAnswerThem(epochNumber int, requests []*request, responseChans map[string]chan any) {
+// It can time out since a request may have failed; the requests that got no reply are answered with an error.
+func (e *epochManager) sendEpochRequestsAndAnswerThem(epochNumber int, requests []*request) {
 	requestsCount := len(requests)
 	if requestsCount == 0 {
 		return
 	}
 	log.Debug().Msgf("Sending epoch requests and answering them for epoch %d with %d requests", epochNumber, requestsCount)
+	pending := make(map[string]*request, requestsCount)
+	for _, r := range requests {
+		pending[r.requestId] = r
+	}
+	defer func() {
+		for _, r := range pending {
+			if r.operationType == Read {
+				r.responseChan <- readResponse{err: fmt.Errorf("no reply for request %s", r.requestId)}
+			} else {
+				r.responseChan <- writeResponse{err: fmt.Errorf("no reply for request %s", r.requestId)}
+			}
+		}
+	}()
 	batchRequests := e.getShardnodeBatches(requests)
-	batchResponseChan := make(chan batchResponse)
+	// Batches that reply after the timeout do not block.
+	batchResponseChan := make(chan batchResponse, len(batchRequests))
 	waitingCount := 0
 	for shardNodeID, shardNodeRequests := range batchRequests {
 		if len(shardNodeRequests.ReadRequests) == 0 && len(shardNodeRequests.WriteRequests) == 0 {
@@ -159,20 +260,20 @@ func (e *epochManager) sendEpochRequestsAndAnswerThem(epochNumber int, requests
 			if reply.err != nil {
 				log.Error().Msgf("Error while sending batch of requests; %s", reply.err)
 				for _, r := range reply.readResponses {
-					responseChans[r.RequestId] <- readResponse{err: reply.err}
+					answer(pending, r.RequestId, readResponse{err: reply.err})
 				}
 				for _, r := range reply.writeResponses {
-					responseChans[r.RequestId] <- writeResponse{err: reply.err}
+					answer(pending, r.RequestId, writeResponse{err: reply.err})
 				}
 				continue
 			}
 			log.Debug().Msgf("Received batch reply %v", reply)
 			log.Debug().Msgf("Answering epoch requests for epoch %d", epochNumber)
 			for _, r := range reply.readResponses {
-				responseChans[r.RequestId] <- readResponse{value: r.Value}
+				answer(pending, r.RequestId, readResponse{value: r.Value})
 			}
 			for _, r := range reply.writeResponses {
-				responseChans[r.RequestId] <- writeResponse{success: r.Success}
+				answer(pending, r.RequestId, writeResponse{success: r.Success})
 			}
 		}
 	}
@@ -181,12 +282,14 @@ func (e *epochManager) sendEpochRequestsAndAnswerThem(epochNumber int, requests
 // This function runs the epochManger forever.
 func (e *epochManager) run() {
 	for {
-		epochTimeOut := time.After(e.epochDuration)
-		<-epochTimeOut
-		e.mu.Lock()
-		e.currentEpoch++
-		epochNumber := e.currentEpoch - 1
-		go e.sendEpochRequestsAndAnswerThem(epochNumber, e.requests[epochNumber], e.reponseChans[epochNumber])
-		e.mu.Unlock()
+		time.Sleep(e.epochDuration)
+		epochNumber, requests := e.closeEpoch()
+		e.adaptEpochDuration(len(*requests))
+		e.inFlightEpochs.Add(1)
+		go func() {
+			e.sendEpochRequestsAndAnswerThem(epochNumber, *requests)
+			e.releaseRequests(requests)
+			e.inFlightEpochs.Add(-1)
+		}()
 	}
 }
@@ -12,15 +12,55 @@ import (
 
 func TestAddRequestToCurrentEpochAddsRequestAndChannel(t *testing.T) {
 	e := newEpochManager(make(map[int]ReplicaRPCClientMap), time.Second)
-	e.currentEpoch = 12
+	e.currentEpoch.Store(12)
 	req := &request{ctx: context.Background(), requestId: "test_request_id", operationType: Read, block: "a", value: "value"}
-	e.addRequestToCurrentEpoch(req)
-	if len(e.requests[12]) != 1 || e.requests[12][0].requestId != "test_request_id" || e.requests[12][0].block != "a" || e.requests[12][0].value != "value" || e.requests[12][0].operationType != Read {
+	responseChan := e.addRequestToCurrentEpoch(req)
+	epochNumber, requests := e.closeEpoch()
+	if epochNumber != 12 || e.currentEpoch.Load() != 13 {
+		t.Errorf("Expected epoch 12 to be closed and epoch 13 to start, but got %d and %d", epochNumber, e.currentEpoch.Load())
+	}
+	if len(*requests) != 1 || (*requests)[0].requestId != "test_request_id" || (*requests)[0].block != "a" || (*requests)[0].value != "value" || (*requests)[0].operationType != Read {
 		t.Errorf("Expected request to be added to current epoch requests")
 	}
-	_, exists := e.reponseChans[12]["test_request_id"]
-	if len(e.reponseChans[12]) != 1 || !exists {
-		t.Errorf("Expected request to be added to the channel map")
+	if responseChan == nil || (*requests)[0].responseChan != responseChan {
+		t.Errorf("Expected request to get its response channel")
+	}
+}
+
+func TestCloseEpochCollectsRequestsOfAllShards(t *testing.T) {
+	e := newEpochManager(make(map[int]ReplicaRPCClientMap), time.Second)
+	e.shards = make([]epochShard, 4)
+	for i := 0; i < 10; i++ {
+		e.addRequestToCurrentEpoch(&request{requestId: fmt.Sprint(i)})
+	}
+	_, requests := e.closeEpoch()
+	if len(*requests) != 10 {
+		t.Errorf("Expected 10 requests in the epoch, but got %d", len(*requests))
+	}
+	e.releaseRequests(requests)
+	_, requests = e.closeEpoch()
+	if len(*requests) != 0 {
+		t.Errorf("Expected the next epoch to be empty, but got %d requests", len(*requests))
+	}
+}
+
+func TestAdaptEpochDurationStaysWithinBounds(t *testing.T) {
+	e := newEpochManager(make(map[int]ReplicaRPCClientMap), 4*time.Millisecond).withAdaptiveEpochDuration(2*time.Millisecond, 5*time.Millisecond)
+	e.inFlightEpochs.Store(1)
+	e.adaptEpochDuration(10)
+	if e.epochDuration != 5*time.Millisecond {
+		t.Errorf("Expected a busy epoch to lengthen to 5ms, but got %s", e.epochDuration)
+	}
+	e.adaptEpochDuration(10)
+	if e.epochDuration != 5*time.Millisecond {
+		t.Errorf("Expected the epoch to stay at the maximum, but got %s", e.epochDuration)
+	}
+	e.inFlightEpochs.Store(0)
+	for i := 0; i < 10; i++ {
+		e.adaptEpochDuration(10)
+	}
+	if e.epochDuration != 2*time.Millisecond {
+		t.Errorf("Expected the epoch to shorten to the minimum, but got %s", e.epochDuration)
 	}
 }
 
@@ -174,25 +214,17 @@ func getMockShardNodeClients() map[int]ReplicaRPCClientMap {
 
 func TestSendEpochRequestsAndAnswerThemReturnsAllResponses(t *testing.T) {
 	e := newEpochManager(getMockShardNodeClients(), time.Second)
-	e.currentEpoch = 2
 	request1 := &request{ctx: context.Background(), requestId: "a", operationType: Read, block: "a"}
 	request2 := &request{ctx: context.Background(), requestId: "c", operationType: Write, block: "b", value: "123"}
 	request3 := &request{ctx: context.Background(), requestId: "b", operationType: Read, block: "c"}
 	request4 := &request{ctx: context.Background(), requestId: "d", operationType: Write, block: "d", value: "123"}
-	e.requests[1] = []*request{
-		request1, request2, request3, request4,
-	}
-	e.reponseChans[1] = make(map[string]chan any)
-	chan1 := make(chan any)
-	chan2 := make(chan any)
-	chan3 := make(chan any)
-	chan4 := make(chan any)
-	e.reponseChans[1]["a"] = chan1
-	e.reponseChans[1]["c"] = chan2
-	e.reponseChans[1]["b"] = chan3
-	e.reponseChans[1]["d"] = chan4
+	chan1 := e.addRequestToCurrentEpoch(request1)
+	chan2 := e.addRequestToCurrentEpoch(request2)
+	chan3 := e.addRequestToCurrentEpoch(request3)
+	chan4 := e.addRequestToCurrentEpoch(request4)
+	epochNumber, requests := e.closeEpoch()
 
-	go e.sendEpochRequestsAndAnswerThem(1, e.requests[1], e.reponseChans[1])
+	go e.sendEpochRequestsAndAnswerThem(epochNumber, *requests)
 	timeout := time.After(5 * time.Second)
 	responseCount := 0
 	for {
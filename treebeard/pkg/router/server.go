@@ -35,6 +35,7 @@ func (r *routerServer) Read(ctx context.Context, readRequest *pb.ReadRequest) (*
 	ctx, span := tracer.Start(ctx, "router read request")
 	responseChannel := r.epochManager.addRequestToCurrentEpoch(&request{ctx: ctx, requestId: uuid.New().String(), operationType: Read, block: readRequest.Block})
 	response := <-responseChannel
+	r.epochManager.releaseResponseChan(responseChannel)
 	readResponse := response.(readResponse)
 	if readResponse.err != nil {
 		return nil, fmt.Errorf("could not read value from the shardnode; %s", readResponse.err)
@@ -50,6 +51,7 @@ func (r *routerServer) Write(ctx context.Context, writeRequest *pb.WriteRequest)
 	ctx, span := tracer.Start(ctx, "router write request")
 	responseChannel := r.epochManager.addRequestToCurrentEpoch(&request{ctx: ctx, requestId: uuid.New().String(), operationType: Write, block: writeRequest.Block, value: writeRequest.Value})
 	response := <-responseChannel
+	r.epochManager.releaseResponseChan(responseChannel)
 	writeResponse := response.(writeResponse)
 	if writeResponse.err != nil {
 		return nil, fmt.Errorf("could not write value to the shardnode; %s", writeResponse.err)
@@ -59,6 +61,11 @@ func (r *routerServer) Write(ctx context.Context, writeRequest *pb.WriteRequest)
 	return &pb.WriteReply{Success: writeResponse.success}, nil
 }
 
+// milliseconds converts a duration from the parameters, which may be a fraction of a millisecond.
+func milliseconds(duration float64) time.Duration {
+	return time.Duration(duration * float64(time.Millisecond))
+}
+
 func StartRPCServer(ip string, shardNodeRPCClients map[int]ReplicaRPCClientMap, routerID int, port int, parameters config.Parameters) {
 	lis, err := net.Listen("tcp", fmt.Sprintf("%s:%d", ip, port))
 	if err != nil {
@@ -66,7 +73,10 @@ func StartRPCServer(ip string, shardNodeRPCClients map[int]ReplicaRPCClientMap,
 	}
 	grpcServer := grpc.NewServer(grpc.UnaryInterceptor(rpc.ContextPropagationUnaryServerInterceptor()))
 
-	epochManager := newEpochManager(shardNodeRPCClients, time.Duration(parameters.EpochTime)*time.Millisecond)
+	epochManager := newEpochManager(shardNodeRPCClients, milliseconds(parameters.EpochTime))
+	if parameters.AdaptiveEpochTime {
+		epochManager.withAdaptiveEpochDuration(milliseconds(parameters.MinEpochTime), milliseconds(parameters.MaxEpochTime))
+	}
 	go epochManager.run()
 	routerServer := newRouterServer(routerID, epochManager)
 	pb.RegisterRouterServer(grpcServer, &routerServer)
@@ -2,61 +2,186 @@ package shardnode
 
 import (
 	"context"
+	"sync"
+	"sync/atomic"
 	"time"
 
-	"github.com/dsg-uwaterloo/treebeard/api/oramnode"
-	"github.com/dsg-uwaterloo/treebeard/pkg/utils"
 	"github.com/rs/zerolog/log"
 )
 
 type blockRequest struct {
-	ctx   context.Context
-	block string
-	path  int
+	ctx          context.Context
+	block        string
+	path         int
+	responseChan chan oramReply
+}
+
+// oramReply answers one request of a batch with the value of its block or
+// the error of the ReadPath call that should have returned it.
+type oramReply struct {
+	value string
+	err   error
+}
+
+type flushReason int
+
+const (
+	flushFull    flushReason = iota // the queue reached the batch size
+	flushTimeout                    // the oldest request of the queue reached the batch timeout
+)
+
+type readyBatch struct {
+	storageID int
+	requests  *[]blockRequest
+	reason    flushReason
+}
+
+type storageQueue struct {
+	requests   []blockRequest
+	generation int         // counts the batches taken from the queue, so that a stale timer does nothing
+	timer      *time.Timer // fires when the oldest request reaches the batch timeout
+	expired    bool        // the oldest request reached the batch timeout while the queue could not be sent
+	inFlight   int         // ReadPath calls of the storage that did not return yet
 }
 
 type batchManager struct {
-	batchTimeout    time.Duration
-	storageQueues   map[int][]blockRequest // map of storage id to its requests
-	responseChannel map[string]chan string // map of block to its response channel
-	mu              utils.PriorityLock
+	batchTimeout  time.Duration
+	batchSize     int                   // a queue of this many requests is sent without waiting for the batch timeout; zero disables it
+	maxInFlight   int                   // the most ReadPath calls per storage at a time; zero means no limit
+	storageQueues map[int]*storageQueue // map of storage id to its requests
+	readyBatches  chan readyBatch
+	// Buffers of answered batches and response channels of answered requests are reused.
+	requestBuffers sync.Pool
+	responseChans  sync.Pool
+	mu             sync.Mutex
+
+	queuedRequests atomic.Int64
+	fullFlushes    atomic.Uint64
+	timeoutFlushes atomic.Uint64
 }
 
-func newBatchManager(batchTimeout time.Duration) *batchManager {
-	log.Debug().Msgf("Creating new batch manager with batch timout %v", batchTimeout)
-	batchManager := batchManager{}
-	batchManager.batchTimeout = batchTimeout
-	batchManager.storageQueues = make(map[int][]blockRequest)
-	batchManager.responseChannel = make(map[string]chan string)
-	batchManager.mu = utils.NewPriorityPreferenceLock()
-	return &batchManager
+func newBatchManager(batchTimeout time.Duration, batchSize int, maxInFlight int) *batchManager {
+	log.Debug().Msgf("Creating new batch manager with batch timout %v, batch size %d and %d batches in flight", batchTimeout, batchSize, maxInFlight)
+	return &batchManager{
+		batchTimeout:   batchTimeout,
+		batchSize:      batchSize,
+		maxInFlight:    maxInFlight,
+		storageQueues:  make(map[int]*storageQueue),
+		readyBatches:   make(chan readyBatch),
+		requestBuffers: sync.Pool{New: func() any { return new([]blockRequest) }},
+		// A response channel holds the single reply of its request, so answering a batch never waits for a query.
+		responseChans: sync.Pool{New: func() any { return make(chan oramReply, 1) }},
+	}
 }
 
 // It add the request to the correct queue and return a response channel.
-// The client uses the response channel to get the result of this request.
-func (b *batchManager) addRequestToStorageQueueAndWait(req blockRequest, storageID int) chan string {
-	log.Debug().Msgf("Aquiring lock for batch manager in addRequestToStorageQueueAndWait")
+// The client uses the response channel to get the result of this request and gives it back with releaseResponseChan.
+func (b *batchManager) addRequestToStorageQueueAndWait(req blockRequest, storageID int) chan oramReply {
+	req.responseChan = b.responseChans.Get().(chan oramReply)
 	b.mu.Lock()
-	log.Debug().Msgf("Aquired lock for batch manager in addRequestToStorageQueueAndWait")
-	defer func() {
-		log.Debug().Msgf("Releasing lock for batch manager in addRequestToStorageQueueAndWait")
+	q, exists := b.storageQueues[storageID]
+	if !exists {
+		q = &storageQueue{}
+		b.storageQueues[storageID] = q
+	}
+	q.requests = append(q.requests, req)
+	b.queuedRequests.Add(1)
+	if len(q.requests) == 1 && !q.expired {
+		generation := q.generation
+		q.timer = time.AfterFunc(b.batchTimeout, func() { b.expire(storageID, generation) })
+	}
+	batch, ready := b.takeBatch(storageID, q)
+	b.mu.Unlock()
+	if ready {
+		b.readyBatches <- batch
+	}
+	return req.responseChan
+}
+
+func (b *batchManager) releaseResponseChan(responseChan chan oramReply) {
+	b.responseChans.Put(responseChan)
+}
+
+// takeBatch empties the queue if it is full or timed out and the storage has room for another ReadPath call.
+// The caller holds b.mu and sends the batch to readyBatches after unlocking it.
+func (b *batchManager) takeBatch(storageID int, q *storageQueue) (batch readyBatch, ready bool) {
+	if len(q.requests) == 0 || (b.maxInFlight > 0 && q.inFlight >= b.maxInFlight) {
+		return readyBatch{}, false
+	}
+	var reason flushReason
+	if q.expired {
+		reason = flushTimeout
+		b.timeoutFlushes.Add(1)
+	} else if b.batchSize > 0 && len(q.requests) >= b.batchSize {
+		reason = flushFull
+		b.fullFlushes.Add(1)
+	} else {
+		return readyBatch{}, false
+	}
+	requests := b.requestBuffers.Get().(*[]blockRequest)
+	*requests = append(*requests, q.requests...)
+	clearRequests(q.requests)
+	q.requests = q.requests[:0]
+	q.generation++
+	if q.timer != nil {
+		q.timer.Stop()
+	}
+	q.expired = false
+	q.inFlight++
+	b.queuedRequests.Add(-int64(len(*requests)))
+	return readyBatch{storageID: storageID, requests: requests, reason: reason}, true
+}
+
+// expire runs when the oldest request of a queue reaches the batch timeout.
+func (b *batchManager) expire(storageID int, generation int) {
+	b.mu.Lock()
+	q := b.storageQueues[storageID]
+	if q.generation != generation {
 		b.mu.Unlock()
-		log.Debug().Msgf("Released lock for batch manager in addRequestToStorageQueueAndWait")
-	}()
+		return
+	}
+	q.expired = true
+	batch, ready := b.takeBatch(storageID, q)
+	b.mu.Unlock()
+	if ready {
+		b.readyBatches <- batch
+	}
+}
+
+// batchDone frees the room of an answered batch and sends the queue if it filled up or timed out in the meantime.
+func (b *batchManager) batchDone(batch readyBatch) {
+	clearRequests(*batch.requests)
+	*batch.requests = (*batch.requests)[:0]
+	b.requestBuffers.Put(batch.requests)
 
-	b.storageQueues[storageID] = append(b.storageQueues[storageID], req)
-	b.responseChannel[req.block] = make(chan string)
+	b.mu.Lock()
+	q := b.storageQueues[batch.storageID]
+	q.inFlight--
+	next, ready := b.takeBatch(batch.storageID, q)
+	b.mu.Unlock()
+	if ready {
+		b.readyBatches <- next
+	}
+}
 
-	return b.responseChannel[req.block]
+// clearRequests drops the contexts and channels of a reused buffer.
+func clearRequests(requests []blockRequest) {
+	for i := range requests {
+		requests[i] = blockRequest{}
+	}
 }
 
-type batchResponse struct {
-	*oramnode.ReadPathReply
-	err error
+type batchStats struct {
+	queuedRequests int64
+	fullFlushes    uint64
+	timeoutFlushes uint64
 }
 
-func (b *batchManager) asyncBatchRequests(ctx context.Context, storageID int, requests []blockRequest, oramNodeReplicaMap ReplicaRPCClientMap, responseChan chan batchResponse) {
-	log.Debug().Msgf("Sending batch of requests to storageID %d with size %d", storageID, len(requests))
-	reply, err := oramNodeReplicaMap.readPathFromAllOramNodeReplicas(ctx, requests, storageID)
-	responseChan <- batchResponse{reply, err}
+// stats returns the requests that wait in the storage queues and how many batches were sent because they were full or timed out.
+func (b *batchManager) stats() batchStats {
+	return batchStats{
+		queuedRequests: b.queuedRequests.Load(),
+		fullFlushes:    b.fullFlushes.Load(),
+		timeoutFlushes: b.timeoutFlushes.Load(),
+	}
 }
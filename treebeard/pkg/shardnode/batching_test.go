@@ -1,18 +1,78 @@
 package shardnode
 
-import "testing"
+import (
+	"testing"
+	"time"
+)
 
 func TestAddRequestToStorageQueueAndWaitAddsRequestAndChannel(t *testing.T) {
-	b := newBatchManager(4)
-	b.storageQueues[1] = []blockRequest{{block: "b", path: 2}}
-	b.addRequestToStorageQueueAndWait(blockRequest{block: "a", path: 2}, 1)
-	if len(b.storageQueues[1]) != 2 {
+	b := newBatchManager(time.Hour, 0, 0)
+	b.addRequestToStorageQueueAndWait(blockRequest{block: "b", path: 2}, 1)
+	responseChan := b.addRequestToStorageQueueAndWait(blockRequest{block: "a", path: 2}, 1)
+	if len(b.storageQueues[1].requests) != 2 {
 		t.Errorf("request should be added to the correct storage queue")
 	}
-	if b.storageQueues[1][1].block != "a" || b.storageQueues[1][1].path != 2 {
+	if b.storageQueues[1].requests[1].block != "a" || b.storageQueues[1].requests[1].path != 2 {
 		t.Errorf("request should be added to the correct storage queue")
 	}
-	if _, exists := b.responseChannel["a"]; !exists {
-		t.Errorf("batchManager should add channel for block a to the responseChannel")
+	if responseChan == nil || b.storageQueues[1].requests[1].responseChan != responseChan {
+		t.Errorf("batchManager should return the response channel of the request")
+	}
+	if b.stats().queuedRequests != 2 {
+		t.Errorf("expected 2 queued requests, but got %d", b.stats().queuedRequests)
+	}
+}
+
+func TestAddRequestToStorageQueueAndWaitFlushesFullQueue(t *testing.T) {
+	b := newBatchManager(time.Hour, 2, 0)
+	b.addRequestToStorageQueueAndWait(blockRequest{block: "a", path: 1}, 1)
+	go b.addRequestToStorageQueueAndWait(blockRequest{block: "b", path: 1}, 1)
+	select {
+	case batch := <-b.readyBatches:
+		if batch.storageID != 1 || len(*batch.requests) != 2 || batch.reason != flushFull {
+			t.Errorf("expected a full batch of 2 requests for storage 1, but got %v", batch)
+		}
+	case <-time.After(time.Second):
+		t.Fatalf("a full queue should be flushed before the batch timeout")
+	}
+	stats := b.stats()
+	if stats.queuedRequests != 0 || stats.fullFlushes != 1 || stats.timeoutFlushes != 0 {
+		t.Errorf("expected one full flush and no queued requests, but got %+v", stats)
+	}
+}
+
+func TestBatchManagerFlushesQueueAfterBatchTimeout(t *testing.T) {
+	b := newBatchManager(time.Millisecond, 10, 0)
+	b.addRequestToStorageQueueAndWait(blockRequest{block: "a", path: 1}, 1)
+	select {
+	case batch := <-b.readyBatches:
+		if len(*batch.requests) != 1 || batch.reason != flushTimeout {
+			t.Errorf("expected a timed out batch of 1 request, but got %v", batch)
+		}
+	case <-time.After(time.Second):
+		t.Fatalf("the queue should be flushed after the batch timeout")
+	}
+	if b.stats().timeoutFlushes != 1 {
+		t.Errorf("expected one timed out flush, but got %d", b.stats().timeoutFlushes)
+	}
+}
+
+func TestBatchManagerKeepsAtMostMaxInFlightBatches(t *testing.T) {
+	b := newBatchManager(time.Hour, 1, 1)
+	go b.addRequestToStorageQueueAndWait(blockRequest{block: "a", path: 1}, 1)
+	first := <-b.readyBatches
+	b.addRequestToStorageQueueAndWait(blockRequest{block: "b", path: 1}, 1)
+	b.addRequestToStorageQueueAndWait(blockRequest{block: "c", path: 1}, 1)
+	if len(b.storageQueues[1].requests) != 2 {
+		t.Errorf("requests should wait while the storage has a batch in flight")
+	}
+	go b.batchDone(first)
+	select {
+	case second := <-b.readyBatches:
+		if len(*second.requests) != 2 {
+			t.Errorf("expected the waiting requests to be sent in one batch, but got %d requests", len(*second.requests))
+		}
+	case <-time.After(time.Second):
+		t.Fatalf("the waiting requests should be sent when the batch in flight is answered")
 	}
 }
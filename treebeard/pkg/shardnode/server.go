@@ -86,68 +86,43 @@ func (s *shardNodeServer) createResponseChannelForBatch(readRequests []*pb.ReadR
 	return channelMap
 }
 
-// It periodically sends batches.
+// It sends every batch that the batch manager flushes.
 func (s *shardNodeServer) sendBatchesForever() {
-	for {
-		<-time.After(s.batchManager.batchTimeout)
-		s.sendCurrentBatches()
+	for batch := range s.batchManager.readyBatches {
+		go s.sendBatch(batch)
 	}
 }
 
-// For queues that have equal or more than batchSize requests, it sends a batch of size=BatchSize and waits for the responses.
-// The logic here assumes that there are no duplicate blocks in the requests (which is fine since we only send a real request for the first one).
-// It will not work otherwise because it will delete the response channel for a block after getting the first response.
-func (s *shardNodeServer) sendCurrentBatches() {
-	storageQueues := make(map[int][]blockRequest)
-	responseChannels := make(map[string]chan string)
-	// TODO: I have another idea instead of the high priority lock.
-	// I can have a seperate go routine that has a for loop that manages the lock
-	// It has two channels one for low priority and one for high priority
-	// It will always start by trying to read from the high priority channel,
-	// if it is empty, it will read from the low priority channel.
-	s.batchManager.mu.HighPriorityLock()
-	for storageID, requests := range s.batchManager.storageQueues {
-		storageQueues[storageID] = append(storageQueues[storageID], requests...)
-		delete(s.batchManager.storageQueues, storageID)
+// It sends a batch to the oram node of its storage and answers each of its requests exactly once.
+// Requests that the oram node did not return a value for get an error, so that no query waits forever.
+// The logic here assumes that there are no duplicate blocks in the batch (which is fine since we only send a real request for the first one).
+func (s *shardNodeServer) sendBatch(batch readyBatch) {
+	defer s.batchManager.batchDone(batch)
+	log.Debug().Msgf("Sending batch of requests to storageID %d with size %d and flush reason %d", batch.storageID, len(*batch.requests), batch.reason)
+	responseChannels := make(map[string]chan oramReply, len(*batch.requests))
+	for _, request := range *batch.requests {
+		responseChannels[request.block] = request.responseChan
 	}
-	for block, responseChannel := range s.batchManager.responseChannel {
-		responseChannels[block] = responseChannel
-		delete(s.batchManager.responseChannel, block)
-	}
-	s.batchManager.mu.HighPriorityUnlock()
-
-	batchRequestResponseChan := make(chan batchResponse)
-	waitingBatchCount := 0
-	for storageID, requests := range storageQueues {
-		if len(requests) == 0 {
-			continue
+	oramNodeReplicaMap := s.oramNodeClients[s.storageORAMNodeMap[batch.storageID]]
+	reply, err := oramNodeReplicaMap.readPathFromAllOramNodeReplicas(context.Background(), *batch.requests, batch.storageID)
+	if err != nil {
+		log.Error().Msgf("Could not get value from the oramnode; %s", err)
+	} else {
+		log.Debug().Msgf("Got batch response from oram node replica: %v", reply)
+		for _, readPathReply := range reply.Responses {
+			log.Debug().Msgf("Got reply from oram node replica: %v", readPathReply)
+			if responseChannel, exists := responseChannels[readPathReply.Block]; exists {
+				responseChannel <- oramReply{value: readPathReply.Value}
+				delete(responseChannels, readPathReply.Block)
+			}
 		}
-		waitingBatchCount++
-		oramNodeReplicaMap := s.oramNodeClients[s.storageORAMNodeMap[storageID]]
-		go s.batchManager.asyncBatchRequests(context.Background(), storageID, requests, oramNodeReplicaMap, batchRequestResponseChan)
 	}
-
-	for i := 0; i < waitingBatchCount; i++ {
-		response := <-batchRequestResponseChan
-		if response.err != nil {
-			log.Error().Msgf("Could not get value from the oramnode; %s", response.err)
-			continue
+	for block, responseChannel := range responseChannels {
+		if err != nil {
+			responseChannel <- oramReply{err: err}
+		} else {
+			responseChannel <- oramReply{err: fmt.Errorf("the oramnode did not return block %s", block)}
 		}
-		log.Debug().Msgf("Got batch response from oram node replica: %v", response)
-		go func(response batchResponse) {
-			for _, readPathReply := range response.Responses {
-				log.Debug().Msgf("Got reply from oram node replica: %v", readPathReply)
-				if _, exists := responseChannels[readPathReply.Block]; exists {
-					timeout := time.After(1 * time.Second)
-					select {
-					case <-timeout:
-						log.Error().Msgf("Timeout while waiting for batch response channel for block %s", readPathReply.Block)
-						continue
-					case responseChannels[readPathReply.Block] <- readPathReply.Value:
-					}
-				}
-			}
-		}(response)
 	}
 }
 
@@ -184,13 +159,18 @@ func (s *shardNodeServer) query(ctx context.Context, block string, requestID str
 	tracer := otel.Tracer("")
 
 	blockToRequest, path, storageID := s.getWhatToSendBasedOnRequest(ctx, block, requestID, isFirst)
-	var replyValue string
 	_, waitOnReplySpan := tracer.Start(ctx, "wait on reply")
 	log.Debug().Msgf("Adding request to storage queue and waiting for block %s", blockToRequest)
 	oramReplyChan := s.batchManager.addRequestToStorageQueueAndWait(blockRequest{ctx: ctx, block: blockToRequest, path: path}, storageID)
-	replyValue = <-oramReplyChan
-	log.Debug().Msgf("Got reply from oram node channel for block %s; value: %s", blockToRequest, replyValue)
+	reply := <-oramReplyChan
+	s.batchManager.releaseResponseChan(oramReplyChan)
 	waitOnReplySpan.End()
+	if reply.err != nil {
+		finalResponseChannel <- finalResponse{requestId: requestID, value: "", opType: opType, err: reply.err}
+		return
+	}
+	replyValue := reply.value
+	log.Debug().Msgf("Got reply from oram node channel for block %s; value: %s", blockToRequest, replyValue)
 
 	if isFirst {
 		log.Debug().Msgf("Adding response to response channel for block %s", blockToRequest)
@@ -239,7 +219,8 @@ func (s *shardNodeServer) queryBatch(ctx context.Context, request *pb.RequestBat
 	}
 	isFirstMap := requestApplyFuture.Response().(map[string]bool)
 
-	finalResponseChan := make(chan finalResponse)
+	// queryBatch returns on the first error, so the other queries must not wait for it to read their responses.
+	finalResponseChan := make(chan finalResponse, len(request.ReadRequests)+len(request.WriteRequests))
 	for _, readRequest := range request.ReadRequests {
 		go s.query(ctx, readRequest.Block, readRequest.RequestId, isFirstMap[readRequest.RequestId], "", Read, responseChannel[readRequest.RequestId], finalResponseChan)
 	}
@@ -397,13 +378,15 @@ func StartServer(shardNodeServerID int, bindIp string, advertiseIp string, rpcPo
 	for _, storage := range storages {
 		storageORAMNodeMap[storage.ID] = storage.ORAMNodeID
 	}
-	shardnodeServer := newShardNodeServer(shardNodeServerID, replicaID, r, shardNodeFSM, oramNodeRPCClients, storageORAMNodeMap, parameters.TreeHeight, newBatchManager(time.Duration(parameters.BatchTimout)*time.Millisecond))
+	shardnodeServer := newShardNodeServer(shardNodeServerID, replicaID, r, shardNodeFSM, oramNodeRPCClients, storageORAMNodeMap, parameters.TreeHeight, newBatchManager(time.Duration(parameters.BatchTimout*float64(time.Millisecond)), parameters.BatchSize, parameters.MaxInFlightReadPaths))
 	go shardnodeServer.sendBatchesForever()
 
 	go func() {
 		for {
 			time.Sleep(1 * time.Second)
 			shardnodeServer.shardNodeFSM.printStashSize()
+			stats := shardnodeServer.batchManager.stats()
+			log.Info().Msgf("Batches: %d queued requests, %d full and %d timed out flushes", stats.queuedRequests, stats.fullFlushes, stats.timeoutFlushes)
 		}
 	}()
 
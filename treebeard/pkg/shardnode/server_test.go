@@ -13,7 +13,7 @@ import (
 )
 
 func TestGetPathAndStorageBasedOnRequestWhenInitialRequestReturnsRealBlockAndPathAndStorage(t *testing.T) {
-	s := newShardNodeServer(0, 0, &raft.Raft{}, newShardNodeFSM(0), nil, map[int]int{0: 0, 1: 1, 2: 2, 3: 3}, 5, newBatchManager(1))
+	s := newShardNodeServer(0, 0, &raft.Raft{}, newShardNodeFSM(0), nil, map[int]int{0: 0, 1: 1, 2: 2, 3: 3}, 5, newBatchManager(1, 0, 0))
 	s.shardNodeFSM.requestLog["block1"] = []string{"request1", "request2"}
 	s.shardNodeFSM.positionMap["block1"] = positionState{path: 23, storageID: 3}
 
@@ -30,7 +30,7 @@ func TestGetPathAndStorageBasedOnRequestWhenInitialRequestReturnsRealBlockAndPat
 }
 
 func TestCreateResponseChannelForBatchAddsChannelToResponseChannel(t *testing.T) {
-	s := newShardNodeServer(0, 0, &raft.Raft{}, newShardNodeFSM(0), nil, map[int]int{0: 0, 1: 1, 2: 2, 3: 3}, 5, newBatchManager(1))
+	s := newShardNodeServer(0, 0, &raft.Raft{}, newShardNodeFSM(0), nil, map[int]int{0: 0, 1: 1, 2: 2, 3: 3}, 5, newBatchManager(1, 0, 0))
 	readRequests := []*shardnodepb.ReadRequest{
 		{Block: "a", RequestId: "req1"},
 		{Block: "b", RequestId: "req2"},
@@ -55,7 +55,7 @@ func TestCreateResponseChannelForBatchAddsChannelToResponseChannel(t *testing.T)
 }
 
 func TestQueryBatchReturnsErrorForNonLeaderRaftPeer(t *testing.T) {
-	s := newShardNodeServer(0, 0, &raft.Raft{}, newShardNodeFSM(0), nil, map[int]int{0: 0, 1: 1, 2: 2, 3: 3}, 5, newBatchManager(1))
+	s := newShardNodeServer(0, 0, &raft.Raft{}, newShardNodeFSM(0), nil, map[int]int{0: 0, 1: 1, 2: 2, 3: 3}, 5, newBatchManager(1, 0, 0))
 	_, err := s.queryBatch(context.Background(), nil)
 	if err == nil {
 		t.Errorf("A non-leader raft peer should return error after call to query.")
@@ -127,23 +127,17 @@ func startLeaderRaftNodeServer(t *testing.T, batchSize int, withBatchReponses bo
 	if withBatchReponses {
 		oramNodeClients = getMockOramNodeClientsWithBatchResponses()
 	}
-	s := newShardNodeServer(0, 0, r, fsm, oramNodeClients, map[int]int{0: 0}, 5, newBatchManager(2*time.Millisecond))
+	s := newShardNodeServer(0, 0, r, fsm, oramNodeClients, map[int]int{0: 0}, 5, newBatchManager(2*time.Millisecond, 0, 0))
 	go s.sendBatchesForever()
 	return s
 }
 
-func TestSendCurrentBatchesSendsQueuesAfterBatchTimeout(t *testing.T) {
-	s := newShardNodeServer(0, 0, &raft.Raft{}, &shardNodeFSM{}, getMockOramNodeClientsWithBatchResponses(), map[int]int{0: 0}, 5, newBatchManager(1*time.Millisecond))
-	chA := make(chan string)
-	s.batchManager.responseChannel["a"] = chA
-	s.batchManager.storageQueues[1] = []blockRequest{{block: "a", path: 1}}
-	chB := make(chan string)
-	s.batchManager.responseChannel["b"] = chB
-	s.batchManager.storageQueues[1] = append(s.batchManager.storageQueues[1], blockRequest{block: "b", path: 1})
-	chC := make(chan string)
-	s.batchManager.responseChannel["c"] = chC
-	s.batchManager.storageQueues[1] = append(s.batchManager.storageQueues[1], blockRequest{block: "c", path: 1})
-	go s.sendCurrentBatches()
+func TestSendBatchesForeverSendsQueuesAfterBatchTimeout(t *testing.T) {
+	s := newShardNodeServer(0, 0, &raft.Raft{}, &shardNodeFSM{}, getMockOramNodeClientsWithBatchResponses(), map[int]int{0: 0}, 5, newBatchManager(1*time.Millisecond, 0, 0))
+	go s.sendBatchesForever()
+	chA := s.batchManager.addRequestToStorageQueueAndWait(blockRequest{block: "a", path: 1}, 1)
+	chB := s.batchManager.addRequestToStorageQueueAndWait(blockRequest{block: "b", path: 1}, 1)
+	chC := s.batchManager.addRequestToStorageQueueAndWait(blockRequest{block: "c", path: 1}, 1)
 	timout := time.After(3 * time.Second)
 	receivedResponsesCount := 0
 	for {
@@ -164,31 +158,81 @@ func TestSendCurrentBatchesSendsQueuesAfterBatchTimeout(t *testing.T) {
 	}
 }
 
-func TestSendCurrentBatchesRemovesSentQueueAndResponseChannel(t *testing.T) {
-	s := newShardNodeServer(0, 0, &raft.Raft{}, &shardNodeFSM{}, getMockOramNodeClients(), map[int]int{0: 0}, 5, newBatchManager(1))
-	s.batchManager.responseChannel["a"] = make(chan string)
-	s.batchManager.storageQueues[1] = []blockRequest{{block: "a", path: 1}}
-	go s.sendCurrentBatches()
-	<-s.batchManager.responseChannel["a"]
-	if len(s.batchManager.storageQueues[1]) != 0 {
-		t.Errorf("SendCurrentBatches should remove queue after sending it")
+func TestSendBatchesForeverSendsFullQueuesBeforeBatchTimeout(t *testing.T) {
+	s := newShardNodeServer(0, 0, &raft.Raft{}, &shardNodeFSM{}, getMockOramNodeClients(), map[int]int{0: 0}, 5, newBatchManager(time.Hour, 2, 0))
+	go s.sendBatchesForever()
+	chA := s.batchManager.addRequestToStorageQueueAndWait(blockRequest{block: "a", path: 1}, 1)
+	chB := s.batchManager.addRequestToStorageQueueAndWait(blockRequest{block: "b", path: 1}, 1)
+	for _, ch := range []chan oramReply{chA, chB} {
+		select {
+		case reply := <-ch:
+			if reply.value != "response_from_leader" {
+				t.Errorf("expected the value from the oram node leader, but got %s", reply.value)
+			}
+		case <-time.After(1 * time.Second):
+			t.Fatalf("a full queue should be sent before the batch timeout")
+		}
+	}
+}
+
+func TestSendBatchRemovesSentRequestsFromQueue(t *testing.T) {
+	s := newShardNodeServer(0, 0, &raft.Raft{}, &shardNodeFSM{}, getMockOramNodeClients(), map[int]int{0: 0}, 5, newBatchManager(1, 0, 0))
+	go s.sendBatchesForever()
+	<-s.batchManager.addRequestToStorageQueueAndWait(blockRequest{block: "a", path: 1}, 1)
+	s.batchManager.mu.Lock()
+	defer s.batchManager.mu.Unlock()
+	if len(s.batchManager.storageQueues[1].requests) != 0 {
+		t.Errorf("sendBatch should remove queue after sending it")
+	}
+}
+
+func TestSendBatchAnswersEveryRequestWhenTheOramNodeFails(t *testing.T) {
+	failingClients := map[int]ReplicaRPCClientMap{
+		0: map[int]oramNodeRPCClient{
+			0: {
+				ClientAPI: &mockOramNodeClient{
+					replyFunc: func([]*oramnodepb.BlockRequest) (*oramnodepb.ReadPathReply, error) {
+						return nil, fmt.Errorf("not the leader")
+					},
+				},
+			},
+		},
 	}
-	if _, exists := s.batchManager.responseChannel["a"]; exists {
-		t.Errorf("SendCurrentBatches should remove block from response channel after sending it")
+	s := newShardNodeServer(0, 0, &raft.Raft{}, &shardNodeFSM{}, failingClients, map[int]int{0: 0}, 5, newBatchManager(time.Hour, 2, 0))
+	go s.sendBatchesForever()
+	chA := s.batchManager.addRequestToStorageQueueAndWait(blockRequest{block: "a", path: 1}, 1)
+	chB := s.batchManager.addRequestToStorageQueueAndWait(blockRequest{block: "b", path: 1}, 1)
+	for _, ch := range []chan oramReply{chA, chB} {
+		select {
+		case reply := <-ch:
+			if reply.err == nil {
+				t.Errorf("expected an error reply when the oram node fails, but got %s", reply.value)
+			}
+		// CallAllReplicas retries for about five seconds before it gives up.
+		case <-time.After(10 * time.Second):
+			t.Fatalf("every request of a failed batch should be answered")
+		}
 	}
 }
 
-func TestSendCurrentBatchesIgnoresEmptyQueues(t *testing.T) {
-	s := newShardNodeServer(0, 0, &raft.Raft{}, &shardNodeFSM{}, getMockOramNodeClients(), map[int]int{0: 0}, 5, newBatchManager(1))
-	chA := make(chan string)
-	s.batchManager.responseChannel["a"] = chA
-	s.batchManager.storageQueues[1] = []blockRequest{{block: "a", path: 1}}
-	s.batchManager.storageQueues[2] = []blockRequest{}
-	go s.sendCurrentBatches()
-	select {
-	case <-chA:
-	case <-time.After(1 * time.Second):
-		t.Errorf("SendCurrentBatches should ignore empty queues")
+func TestSendBatchAnswersBlocksMissingFromTheReply(t *testing.T) {
+	// The oram node only returns blocks a, b and c.
+	s := newShardNodeServer(0, 0, &raft.Raft{}, &shardNodeFSM{}, getMockOramNodeClientsWithBatchResponses(), map[int]int{0: 0}, 5, newBatchManager(time.Hour, 2, 0))
+	go s.sendBatchesForever()
+	chA := s.batchManager.addRequestToStorageQueueAndWait(blockRequest{block: "a", path: 1}, 1)
+	chD := s.batchManager.addRequestToStorageQueueAndWait(blockRequest{block: "d", path: 1}, 1)
+	for block, ch := range map[string]chan oramReply{"a": chA, "d": chD} {
+		select {
+		case reply := <-ch:
+			if block == "a" && (reply.err != nil || reply.value != "response_from_leader") {
+				t.Errorf("expected the value of block a, but got %q; %v", reply.value, reply.err)
+			}
+			if block == "d" && reply.err == nil {
+				t.Errorf("expected an error reply for the missing block d, but got %q", reply.value)
+			}
+		case <-time.After(1 * time.Second):
+			t.Fatalf("block %s should be answered", block)
+		}
 	}
 }
 
@@ -367,7 +411,7 @@ func TestQueryBatchUpdatesPositionMap(t *testing.T) {
 }
 
 func TestGetBlocksForSendReturnsAtMostMaxBlocksFromTheStash(t *testing.T) {
-	s := newShardNodeServer(0, 0, &raft.Raft{}, newShardNodeFSM(0), make(RPCClientMap), map[int]int{0: 0, 1: 1, 2: 2, 3: 3}, 5, newBatchManager(1))
+	s := newShardNodeServer(0, 0, &raft.Raft{}, newShardNodeFSM(0), make(RPCClientMap), map[int]int{0: 0, 1: 1, 2: 2, 3: 3}, 5, newBatchManager(1, 0, 0))
 	s.shardNodeFSM.stash = map[string]stashState{
 		"block1": {value: "block1", logicalTime: 0, waitingStatus: false},
 		"block2": {value: "block2", logicalTime: 0, waitingStatus: false},
@@ -390,7 +434,7 @@ func TestGetBlocksForSendReturnsAtMostMaxBlocksFromTheStash(t *testing.T) {
 }
 
 // func TestGetBlocksForSendReturnsOnlyBlocksForPathAndStorageID(t *testing.T) {
-// 	s := newShardNodeServer(0, 0, &raft.Raft{}, newShardNodeFSM(0), make(RPCClientMap), map[int]int{0: 0, 1: 1, 2: 2, 3: 3}, 5, newBatchManager(1))
+// 	s := newShardNodeServer(0, 0, &raft.Raft{}, newShardNodeFSM(0), make(RPCClientMap), map[int]int{0: 0, 1: 1, 2: 2, 3: 3}, 5, newBatchManager(1, 0, 0))
 // 	s.shardNodeFSM.stash = map[string]stashState{
 // 		"block1": {value: "block1", logicalTime: 0, waitingStatus: false},
 // 		"block2": {value: "block2", logicalTime: 0, waitingStatus: false},
@@ -409,7 +453,7 @@ func TestGetBlocksForSendReturnsAtMostMaxBlocksFromTheStash(t *testing.T) {
 // }
 
 // func TestGetBlocksForSendDoesNotReturnsWaitingBlocks(t *testing.T) {
-// 	s := newShardNodeServer(0, 0, &raft.Raft{}, newShardNodeFSM(0), make(RPCClientMap), map[int]int{0: 0, 1: 1, 2: 2, 3: 3}, 5, newBatchManager(1))
+// 	s := newShardNodeServer(0, 0, &raft.Raft{}, newShardNodeFSM(0), make(RPCClientMap), map[int]int{0: 0, 1: 1, 2: 2, 3: 3}, 5, newBatchManager(1, 0, 0))
 // 	s.shardNodeFSM.stash = map[string]stashState{
 // 		"block1": {value: "block1", logicalTime: 0, waitingStatus: true},
 // 		"block2": {value: "block2", logicalTime: 0, waitingStatus: false},
@@ -0,0 +1,43 @@
+package storage
+
+import (
+	"sort"
+	"sync"
+)
+
+// The buckets of a storage are striped over a fixed number of mutexes,
+// so the lock table stays small for any tree height.
+const bucketLockStripes = 4096
+
+// bucketLocks lets operations on disjoint buckets of one storage run concurrently.
+type bucketLocks struct {
+	stripes [bucketLockStripes]sync.Mutex
+}
+
+// stripesOf returns the distinct stripes of the buckets in increasing order.
+// Every caller locks stripes in this order, so two overlapping sets of buckets cannot deadlock.
+func stripesOf(bucketIDs []int) []int {
+	seen := make(map[int]bool, len(bucketIDs))
+	stripes := make([]int, 0, len(bucketIDs))
+	for _, bucketID := range bucketIDs {
+		stripe := bucketID % bucketLockStripes
+		if !seen[stripe] {
+			seen[stripe] = true
+			stripes = append(stripes, stripe)
+		}
+	}
+	sort.Ints(stripes)
+	return stripes
+}
+
+func (l *bucketLocks) lock(bucketIDs []int) {
+	for _, stripe := range stripesOf(bucketIDs) {
+		l.stripes[stripe].Lock()
+	}
+}
+
+func (l *bucketLocks) unlock(bucketIDs []int) {
+	for _, stripe := range stripesOf(bucketIDs) {
+		l.stripes[stripe].Unlock()
+	}
+}
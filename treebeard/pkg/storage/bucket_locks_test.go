@@ -0,0 +1,47 @@
+package storage
+
+import (
+	"testing"
+	"time"
+)
+
+func TestStripesOfAreDistinctAndSorted(t *testing.T) {
+	stripes := stripesOf([]int{5, 3, bucketLockStripes + 3, 5, 1})
+	expected := []int{1, 3, 5}
+	if len(stripes) != len(expected) {
+		t.Fatalf("expected stripes %v, but got %v", expected, stripes)
+	}
+	for i := range expected {
+		if stripes[i] != expected[i] {
+			t.Errorf("expected stripes %v, but got %v", expected, stripes)
+		}
+	}
+}
+
+func TestBucketLocksLetDisjointBucketsProceed(t *testing.T) {
+	locks := &bucketLocks{}
+	locks.lock([]int{1, 2, 4})
+	done := make(chan bool)
+	go func() {
+		locks.lock([]int{3, 6})
+		locks.unlock([]int{3, 6})
+		done <- true
+	}()
+	select {
+	case <-done:
+	case <-time.After(time.Second):
+		t.Errorf("expected disjoint buckets not to wait")
+	}
+	go func() {
+		locks.lock([]int{2, 5})
+		locks.unlock([]int{2, 5})
+		done <- true
+	}()
+	select {
+	case <-done:
+		t.Errorf("expected overlapping buckets to wait")
+	case <-time.After(10 * time.Millisecond):
+	}
+	locks.unlock([]int{1, 2, 4})
+	<-done
+}
@@ -7,6 +7,7 @@ import (
 	"encoding/hex"
 	"fmt"
 	"io"
+	"sync"
 )
 
 func Encrypt(s string, key []byte) (string, error) {
@@ -60,3 +61,127 @@ func Decrypt(s string, key []byte) (string, error) {
 	}
 	return string(plaintext), nil
 }
+
+// ValueEncoding is how sealed values are stored in redis.
+type ValueEncoding string
+
+const (
+	// RawValues stores the nonce and the ciphertext as they are.
+	RawValues ValueEncoding = "raw"
+	// HexValues stores hex(nonce) + hex(ciphertext), the format of Encrypt.
+	HexValues ValueEncoding = "hex"
+	// CompatValues reads both formats and writes raw values,
+	// so a hex encoded tree turns raw as its buckets are rewritten.
+	CompatValues ValueEncoding = "compat"
+)
+
+const nonceSize = 12
+
+func ParseValueEncoding(encoding string) (ValueEncoding, error) {
+	switch ValueEncoding(encoding) {
+	case "", RawValues:
+		return RawValues, nil
+	case HexValues, CompatValues:
+		return ValueEncoding(encoding), nil
+	}
+	return "", fmt.Errorf("unknown value encoding %q", encoding)
+}
+
+// Cipher seals and opens values with one AES-GCM instance for its key.
+// It is safe for concurrent use.
+type Cipher struct {
+	aead     cipher.AEAD
+	encoding ValueEncoding
+	buffers  sync.Pool
+}
+
+func NewCipher(key []byte, encoding ValueEncoding) (*Cipher, error) {
+	block, err := aes.NewCipher(key)
+	if err != nil {
+		return nil, err
+	}
+	aead, err := cipher.NewGCM(block)
+	if err != nil {
+		return nil, err
+	}
+	return &Cipher{aead: aead, encoding: encoding}, nil
+}
+
+func (c *Cipher) getBuffer(size int) *[]byte {
+	buffer, ok := c.buffers.Get().(*[]byte)
+	if !ok || cap(*buffer) < size {
+		b := make([]byte, size)
+		return &b
+	}
+	*buffer = (*buffer)[:size]
+	return buffer
+}
+
+// Seal encrypts s with a random nonce into a value to store.
+func (c *Cipher) Seal(s string) (string, error) {
+	buffer := c.getBuffer(nonceSize + len(s) + c.aead.Overhead())
+	defer c.buffers.Put(buffer)
+	nonce := (*buffer)[:nonceSize]
+	if _, err := io.ReadFull(rand.Reader, nonce); err != nil {
+		return "", err
+	}
+	plaintext := (*buffer)[nonceSize : nonceSize+len(s)]
+	copy(plaintext, s)
+	// Seals in place, after the nonce.
+	sealed := (*buffer)[:nonceSize+len(c.aead.Seal(plaintext[:0], nonce, plaintext, nil))]
+	if c.encoding == HexValues {
+		return hex.EncodeToString(sealed), nil
+	}
+	return string(sealed), nil
+}
+
+// sealedSize is the length of the value Seal returns for a plaintext of plaintextSize bytes.
+func (c *Cipher) sealedSize(plaintextSize int) int {
+	size := nonceSize + plaintextSize + c.aead.Overhead()
+	if c.encoding == HexValues {
+		return 2 * size
+	}
+	return size
+}
+
+// isHex tells whether a value was written hex encoded. A raw value is
+// taken for hex only if all of its bytes, random nonce included, are hex digits.
+func (c *Cipher) isHex(value string) bool {
+	if c.encoding == HexValues {
+		return true
+	}
+	if c.encoding != CompatValues || len(value)%2 != 0 {
+		return false
+	}
+	for i := 0; i < len(value); i++ {
+		char := value[i]
+		if (char < '0' || char > '9') && (char < 'a' || char > 'f') {
+			return false
+		}
+	}
+	return true
+}
+
+// Open decrypts a value written by Seal, or by Encrypt for hex and compat encodings.
+func (c *Cipher) Open(value string) (string, error) {
+	var buffer *[]byte
+	if c.isHex(value) {
+		buffer = c.getBuffer(len(value) / 2)
+		if _, err := hex.Decode(*buffer, []byte(value)); err != nil {
+			return "", err
+		}
+	} else {
+		buffer = c.getBuffer(len(value))
+		copy(*buffer, value)
+	}
+	defer c.buffers.Put(buffer)
+	sealed := *buffer
+	if len(sealed) < nonceSize {
+		return "", fmt.Errorf("invalid ciphertext length")
+	}
+	plaintext, err := c.aead.Open(sealed[nonceSize:nonceSize], sealed[:nonceSize], sealed[nonceSize:], nil)
+	if err != nil {
+		return "", err
+	}
+	return string(plaintext), nil
+}
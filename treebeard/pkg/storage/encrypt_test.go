@@ -0,0 +1,50 @@
+package storage
+
+import (
+	"testing"
+)
+
+var testKey = []byte("passphrasewhichneedstobe32bytes!")
+
+func TestCipherRawValuesAreNonceAndTaggedCiphertext(t *testing.T) {
+	c, _ := NewCipher(testKey, RawValues)
+	value, err := c.Seal("value1")
+	if err != nil {
+		t.Fatal(err)
+	}
+	if len(value) != 12+len("value1")+16 {
+		t.Errorf("expected a raw value of %d bytes, got %d", 12+len("value1")+16, len(value))
+	}
+	plaintext, err := c.Open(value)
+	if err != nil || plaintext != "value1" {
+		t.Errorf("expected value1, got %s; %v", plaintext, err)
+	}
+}
+
+func TestCipherHexValuesAreCompatibleWithDecrypt(t *testing.T) {
+	c, _ := NewCipher(testKey, HexValues)
+	value, _ := c.Seal("value1")
+	if plaintext, err := Decrypt(value, testKey); err != nil || plaintext != "value1" {
+		t.Errorf("expected Decrypt to open a hex value, got %s; %v", plaintext, err)
+	}
+	encrypted, _ := Encrypt("value2", testKey)
+	if plaintext, err := c.Open(encrypted); err != nil || plaintext != "value2" {
+		t.Errorf("expected to open an Encrypt value, got %s; %v", plaintext, err)
+	}
+}
+
+func TestCipherCompatReadsHexAndRawValues(t *testing.T) {
+	compat, _ := NewCipher(testKey, CompatValues)
+	raw, _ := NewCipher(testKey, RawValues)
+	encrypted, _ := Encrypt("old", testKey)
+	if plaintext, err := compat.Open(encrypted); err != nil || plaintext != "old" {
+		t.Errorf("expected to open a hex value, got %s; %v", plaintext, err)
+	}
+	value, _ := compat.Seal("new")
+	if plaintext, err := raw.Open(value); err != nil || plaintext != "new" {
+		t.Errorf("expected compat to write raw values, got %s; %v", plaintext, err)
+	}
+	if _, err := raw.Open(encrypted); err == nil {
+		t.Errorf("expected raw values not to open hex values")
+	}
+}
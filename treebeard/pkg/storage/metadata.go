@@ -0,0 +1,136 @@
+package storage
+
+import (
+	"encoding/binary"
+	"fmt"
+	"strconv"
+	"strings"
+)
+
+// The metadata of a bucket is one binary string stored under "-bucketID":
+//
+//	access count (uint32, big endian) | validity bitmap, one bit per slot | per slot: key length (uint16, big endian), key
+//
+// The access count and the bitmap follow the bit order of BITFIELD and SETBIT,
+// so a read increments the count and invalidates its slot in place.
+const (
+	metadataAccessCountSize = 4
+	metadataKeyLengthSize   = 2
+)
+
+type bucketMetadata struct {
+	accessCount int
+	valid       []byte
+	keys        []string // index is the slot offset
+}
+
+func metadataKey(bucketID int) string {
+	return strconv.Itoa(-1 * bucketID)
+}
+
+func bitmapSize(slots int) int {
+	return (slots + 7) / 8
+}
+
+// validityBit is the bit offset of a slot's validity bit for SETBIT.
+func validityBit(offset int) int64 {
+	return int64(8*metadataAccessCountSize + offset)
+}
+
+// encodeMetadata returns the metadata of a bucket with an access count of zero.
+// Slots with an empty key are invalid.
+func encodeMetadata(slotKeys []string) string {
+	size := metadataAccessCountSize + bitmapSize(len(slotKeys))
+	for _, key := range slotKeys {
+		size += metadataKeyLengthSize + len(key)
+	}
+	var record strings.Builder
+	record.Grow(size)
+	record.Write(make([]byte, metadataAccessCountSize))
+	bitmap := make([]byte, bitmapSize(len(slotKeys)))
+	for offset, key := range slotKeys {
+		if key != "" {
+			bitmap[offset/8] |= 0x80 >> (offset % 8)
+		}
+	}
+	record.Write(bitmap)
+	length := make([]byte, metadataKeyLengthSize)
+	for _, key := range slotKeys {
+		binary.BigEndian.PutUint16(length, uint16(len(key)))
+		record.Write(length)
+		record.WriteString(key)
+	}
+	return record.String()
+}
+
+// parseMetadata decodes the metadata of a bucket with the given number of slots.
+// The keys share the memory of the record.
+func parseMetadata(record string, slots int) (metadata bucketMetadata, err error) {
+	headerSize := metadataAccessCountSize + bitmapSize(slots)
+	if len(record) < headerSize {
+		return metadata, fmt.Errorf("metadata of %d bytes is too short for %d slots", len(record), slots)
+	}
+	metadata.accessCount = int(binary.BigEndian.Uint32([]byte(record[:metadataAccessCountSize])))
+	metadata.valid = []byte(record[metadataAccessCountSize:headerSize])
+	metadata.keys = make([]string, slots)
+	position := headerSize
+	for offset := 0; offset < slots; offset++ {
+		if position+metadataKeyLengthSize > len(record) {
+			return metadata, fmt.Errorf("metadata ends before slot %d", offset)
+		}
+		length := int(record[position])<<8 | int(record[position+1])
+		position += metadataKeyLengthSize
+		if position+length > len(record) {
+			return metadata, fmt.Errorf("metadata ends inside the key of slot %d", offset)
+		}
+		metadata.keys[offset] = record[position : position+length]
+		position += length
+	}
+	if position != len(record) {
+		return metadata, fmt.Errorf("metadata has %d bytes after its last slot", len(record)-position)
+	}
+	return metadata, nil
+}
+
+func (m bucketMetadata) isValid(offset int) bool {
+	return m.valid[offset/8]&(0x80>>(offset%8)) != 0
+}
+
+// offset returns the slot of a valid block.
+func (m bucketMetadata) offset(key string) (int, bool) {
+	for offset, slotKey := range m.keys {
+		if slotKey == key && m.isValid(offset) {
+			return offset, true
+		}
+	}
+	return -1, false
+}
+
+// dummyOffset returns the slot of the valid dummy with the lowest number.
+func (m bucketMetadata) dummyOffset() (offset int, key string, exists bool) {
+	lowest := -1
+	for pos, slotKey := range m.keys {
+		if !strings.HasPrefix(slotKey, "dummy") || !m.isValid(pos) {
+			continue
+		}
+		number, err := strconv.Atoi(slotKey[len("dummy"):])
+		if err != nil {
+			continue
+		}
+		if lowest == -1 || number < lowest {
+			lowest, offset, key = number, pos, slotKey
+		}
+	}
+	return offset, key, lowest != -1
+}
+
+// offsets returns the slots of all valid blocks.
+func (m bucketMetadata) offsets() map[string]int {
+	offsets := make(map[string]int, len(m.keys))
+	for offset, key := range m.keys {
+		if m.isValid(offset) {
+			offsets[key] = offset
+		}
+	}
+	return offsets
+}
@@ -0,0 +1,89 @@
+package storage
+
+import (
+	"fmt"
+	"testing"
+)
+
+func TestParseMetadataReturnsEncodedSlots(t *testing.T) {
+	record := encodeMetadata([]string{"dummy2", "", "user5", "dummy1"})
+	metadata, err := parseMetadata(record, 4)
+	if err != nil {
+		t.Fatal(err)
+	}
+	if metadata.accessCount != 0 {
+		t.Errorf("expected an access count of 0, but found %d", metadata.accessCount)
+	}
+	expectedOffsets := map[string]int{"dummy2": 0, "user5": 2, "dummy1": 3}
+	offsets := metadata.offsets()
+	if len(offsets) != len(expectedOffsets) {
+		t.Errorf("expected %d valid blocks, but found %d", len(expectedOffsets), len(offsets))
+	}
+	for key, expected := range expectedOffsets {
+		if offset, exists := metadata.offset(key); !exists || offset != expected {
+			t.Errorf("expected %s at %d, but found %d", key, expected, offset)
+		}
+	}
+}
+
+func TestParseMetadataFollowsBitfieldAndSetbitOffsets(t *testing.T) {
+	record := []byte(encodeMetadata([]string{"user1", "dummy1", "dummy2", "dummy3", "dummy4", "dummy5", "dummy6", "dummy7", "dummy8"}))
+	// BITFIELD INCRBY u32 0 by 258, then SETBIT of the validity bit of slot 8.
+	record[2], record[3] = 1, 2
+	bit := validityBit(8)
+	record[bit/8] &^= 0x80 >> (bit % 8)
+	metadata, err := parseMetadata(string(record), 9)
+	if err != nil {
+		t.Fatal(err)
+	}
+	if metadata.accessCount != 258 {
+		t.Errorf("expected an access count of 258, but found %d", metadata.accessCount)
+	}
+	if _, exists := metadata.offset("dummy8"); exists {
+		t.Errorf("expected dummy8 to be invalidated")
+	}
+	if _, exists := metadata.offset("dummy7"); !exists {
+		t.Errorf("expected dummy7 to stay valid")
+	}
+}
+
+func TestParseMetadataRejectsOtherSlotCounts(t *testing.T) {
+	record := encodeMetadata([]string{"user1", "dummy1"})
+	if _, err := parseMetadata(record, 3); err == nil {
+		t.Errorf("expected an error for more slots than encoded")
+	}
+	if _, err := parseMetadata(record, 1); err == nil {
+		t.Errorf("expected an error for fewer slots than encoded")
+	}
+}
+
+func TestDummyOffsetSkipsInvalidatedDummies(t *testing.T) {
+	record := []byte(encodeMetadata([]string{"dummy3", "dummy1", "user1", "dummy2"}))
+	bit := validityBit(1)
+	record[bit/8] &^= 0x80 >> (bit % 8)
+	metadata, err := parseMetadata(string(record), 4)
+	if err != nil {
+		t.Fatal(err)
+	}
+	offset, key, exists := metadata.dummyOffset()
+	if !exists || offset != 3 || key != "dummy2" {
+		t.Errorf("expected dummy2 at 3, but found %s at %d", key, offset)
+	}
+	if _, _, exists := (bucketMetadata{keys: []string{"user1"}, valid: []byte{0x80}}).dummyOffset(); exists {
+		t.Errorf("expected no dummy in a bucket without dummies")
+	}
+}
+
+// scripts/bulk_load_tree.py writes the same record; its metadata_record test checks the same bytes.
+func TestEncodeMetadataMatchesTheBulkLoader(t *testing.T) {
+	var slotKeys []string
+	expected := "\x00\x00\x00\x00" + "\xff\x80"
+	for i := 1; i <= 9; i++ {
+		key := fmt.Sprintf("dummy%d", i)
+		slotKeys = append(slotKeys, key)
+		expected += "\x00\x06" + key
+	}
+	if record := encodeMetadata(slotKeys); record != expected {
+		t.Errorf("expected the record %q, but got %q", expected, record)
+	}
+}
@@ -0,0 +1,285 @@
+package storage
+
+import (
+	"encoding/binary"
+	"fmt"
+	"os"
+	"sync"
+	"syscall"
+	"unsafe"
+)
+
+// An mmap storage keeps the tree of one storage shard in a preallocated file instead of redis:
+//
+//	header | metadata of buckets 0..N-1 | values of buckets 0..N-1
+//
+// Both arrays are indexed by bucket ID and have fixed-size entries.
+// The metadata entry of a bucket is its encodeMetadata record prefixed by a uint16 length,
+// so reads invalidate slots and count accesses in place like they do in redis.
+// Every value slot is a uint32 length followed by the stored value.
+const (
+	mmapMagic        = "TBMMAP01"
+	mmapHeaderSize   = 4096 // keeps the arrays page aligned
+	mmapMaxKeySize   = 64
+	mmapLengthSize   = 4
+	mmapRecordPrefix = 2
+)
+
+type mmapStore struct {
+	path string
+	// mu guards the mapping; mutations of a bucket take it exclusively.
+	mu            sync.RWMutex
+	file          *os.File
+	mapping       []byte
+	buckets       int
+	slots         int
+	metadataSize  int
+	valueSize     int
+	valuesStart   int
+	isInitialized bool
+}
+
+func newMmapStore(path string) *mmapStore {
+	return &mmapStore{path: path}
+}
+
+// mmapMetadataSize is the metadata entry size that fits slots keys of up to mmapMaxKeySize bytes.
+func mmapMetadataSize(slots int) int {
+	return mmapRecordPrefix + metadataAccessCountSize + bitmapSize(slots) + slots*(metadataKeyLengthSize+mmapMaxKeySize)
+}
+
+// open maps the file, creating or resizing it if it does not hold a tree with these dimensions.
+// valueSize is the largest value a slot holds.
+func (m *mmapStore) open(buckets int, slots int, valueSize int) error {
+	m.mu.Lock()
+	defer m.mu.Unlock()
+	if m.mapping != nil {
+		if err := m.unmap(); err != nil {
+			return err
+		}
+	}
+	file, err := os.OpenFile(m.path, os.O_RDWR|os.O_CREATE, 0o644)
+	if err != nil {
+		return err
+	}
+	m.file = file
+	m.buckets = buckets
+	m.slots = slots
+	m.metadataSize = mmapMetadataSize(slots)
+	m.valueSize = mmapLengthSize + valueSize
+	m.valuesStart = mmapHeaderSize + buckets*m.metadataSize
+	size := m.valuesStart + buckets*slots*m.valueSize
+
+	header := make([]byte, mmapHeaderSize)
+	n, err := file.ReadAt(header, 0)
+	if n < len(header) || !m.headerMatches(header) {
+		// Truncating to zero first drops the contents of a tree with other dimensions.
+		if err = file.Truncate(0); err != nil {
+			return err
+		}
+	}
+	if err = file.Truncate(int64(size)); err != nil {
+		return err
+	}
+	m.mapping, err = syscall.Mmap(int(file.Fd()), 0, size, syscall.PROT_READ|syscall.PROT_WRITE, syscall.MAP_SHARED)
+	if err != nil {
+		return err
+	}
+	m.isInitialized = m.headerMatches(m.mapping[:mmapHeaderSize]) && m.mapping[len(mmapMagic)+16] == 1
+	return nil
+}
+
+func (m *mmapStore) headerMatches(header []byte) bool {
+	if string(header[:len(mmapMagic)]) != mmapMagic {
+		return false
+	}
+	dimensions := header[len(mmapMagic):]
+	return int(binary.BigEndian.Uint32(dimensions[0:])) == m.buckets &&
+		int(binary.BigEndian.Uint32(dimensions[4:])) == m.slots &&
+		int(binary.BigEndian.Uint32(dimensions[8:])) == m.metadataSize &&
+		int(binary.BigEndian.Uint32(dimensions[12:])) == m.valueSize
+}
+
+// setInitialized writes the header; a tree counts as loaded only once it was fully written.
+func (m *mmapStore) setInitialized(isInitialized bool) {
+	m.mu.Lock()
+	defer m.mu.Unlock()
+	copy(m.mapping, mmapMagic)
+	dimensions := m.mapping[len(mmapMagic):]
+	binary.BigEndian.PutUint32(dimensions[0:], uint32(m.buckets))
+	binary.BigEndian.PutUint32(dimensions[4:], uint32(m.slots))
+	binary.BigEndian.PutUint32(dimensions[8:], uint32(m.metadataSize))
+	binary.BigEndian.PutUint32(dimensions[12:], uint32(m.valueSize))
+	if isInitialized {
+		dimensions[16] = 1
+	} else {
+		dimensions[16] = 0
+	}
+	m.isInitialized = isInitialized
+}
+
+func (m *mmapStore) checkBucket(bucketID int) error {
+	if m.mapping == nil {
+		return fmt.Errorf("mmap storage %s is not open", m.path)
+	}
+	if bucketID < 0 || bucketID >= m.buckets {
+		return fmt.Errorf("bucket %d is outside of mmap storage %s", bucketID, m.path)
+	}
+	return nil
+}
+
+// record returns the metadata record of a bucket inside the mapping.
+func (m *mmapStore) record(bucketID int) []byte {
+	entry := m.mapping[mmapHeaderSize+bucketID*m.metadataSize:]
+	length := int(binary.BigEndian.Uint16(entry))
+	return entry[mmapRecordPrefix : mmapRecordPrefix+length]
+}
+
+func (m *mmapStore) value(bucketID int, offset int) []byte {
+	slot := m.mapping[m.valuesStart+(bucketID*m.slots+offset)*m.valueSize:]
+	return slot[mmapLengthSize : mmapLengthSize+int(binary.BigEndian.Uint32(slot))]
+}
+
+// getMetadata parses the metadata of multiple buckets.
+func (m *mmapStore) getMetadata(bucketIDs []int) (map[int]bucketMetadata, error) {
+	m.mu.RLock()
+	defer m.mu.RUnlock()
+	metadatas := make(map[int]bucketMetadata, len(bucketIDs))
+	for _, bucketID := range bucketIDs {
+		if err := m.checkBucket(bucketID); err != nil {
+			return nil, err
+		}
+		metadata, err := parseMetadata(string(m.record(bucketID)), m.slots)
+		if err != nil {
+			return nil, fmt.Errorf("invalid metadata of bucket %d; %v", bucketID, err)
+		}
+		metadatas[bucketID] = metadata
+	}
+	return metadatas, nil
+}
+
+// getAccessCounts returns the access counts of multiple buckets.
+func (m *mmapStore) getAccessCounts(bucketIDs []int) (map[int]int, error) {
+	m.mu.RLock()
+	defer m.mu.RUnlock()
+	counts := make(map[int]int, len(bucketIDs))
+	for _, bucketID := range bucketIDs {
+		if err := m.checkBucket(bucketID); err != nil {
+			return nil, err
+		}
+		record := m.record(bucketID)
+		if len(record) < metadataAccessCountSize {
+			// Like a missing key in redis, a bucket that was never written has a count of zero.
+			counts[bucketID] = 0
+			continue
+		}
+		counts[bucketID] = int(binary.BigEndian.Uint32(record))
+	}
+	return counts, nil
+}
+
+// getValues returns copies of the values in the given slots of every bucket.
+func (m *mmapStore) getValues(bucketOffsets map[int][]int) (map[int][]string, error) {
+	m.mu.RLock()
+	defer m.mu.RUnlock()
+	values := make(map[int][]string, len(bucketOffsets))
+	for bucketID, offsets := range bucketOffsets {
+		if err := m.checkBucket(bucketID); err != nil {
+			return nil, err
+		}
+		values[bucketID] = make([]string, len(offsets))
+		for i, offset := range offsets {
+			values[bucketID][i] = string(m.value(bucketID, offset))
+		}
+	}
+	return values, nil
+}
+
+// readAndInvalidate returns the value in the given slot of every bucket,
+// invalidates the slot and increments the access count of the bucket.
+func (m *mmapStore) readAndInvalidate(bucketOffsets map[int]int) (values map[int]string, accessCounts map[int]int, err error) {
+	m.mu.Lock()
+	defer m.mu.Unlock()
+	values = make(map[int]string, len(bucketOffsets))
+	accessCounts = make(map[int]int, len(bucketOffsets))
+	// Every bucket is checked before the first write, so that an error leaves the storage untouched.
+	for bucketID := range bucketOffsets {
+		if err := m.checkBucket(bucketID); err != nil {
+			return nil, nil, err
+		}
+		if len(m.record(bucketID)) < metadataAccessCountSize+bitmapSize(m.slots) {
+			return nil, nil, fmt.Errorf("bucket %d of mmap storage %s has no metadata", bucketID, m.path)
+		}
+	}
+	for bucketID, offset := range bucketOffsets {
+		record := m.record(bucketID)
+		values[bucketID] = string(m.value(bucketID, offset))
+		record[metadataAccessCountSize+offset/8] &^= 0x80 >> (offset % 8)
+		count := binary.BigEndian.Uint32(record) + 1
+		binary.BigEndian.PutUint32(record, count)
+		accessCounts[bucketID] = int(count)
+	}
+	return values, accessCounts, nil
+}
+
+// writeBucket replaces the values and the metadata of a bucket, which resets its access count.
+func (m *mmapStore) writeBucket(bucketID int, values []string, slotKeys []string) error {
+	record := encodeMetadata(slotKeys)
+	if mmapRecordPrefix+len(record) > m.metadataSize {
+		return fmt.Errorf("metadata of bucket %d has keys longer than %d bytes", bucketID, mmapMaxKeySize)
+	}
+	m.mu.Lock()
+	defer m.mu.Unlock()
+	if err := m.checkBucket(bucketID); err != nil {
+		return err
+	}
+	for _, value := range values {
+		if mmapLengthSize+len(value) > m.valueSize {
+			return fmt.Errorf("value of %d bytes does not fit in a slot of mmap storage %s", len(value), m.path)
+		}
+	}
+	for offset, value := range values {
+		slot := m.mapping[m.valuesStart+(bucketID*m.slots+offset)*m.valueSize:]
+		binary.BigEndian.PutUint32(slot, uint32(len(value)))
+		copy(slot[mmapLengthSize:], value)
+	}
+	entry := m.mapping[mmapHeaderSize+bucketID*m.metadataSize:]
+	binary.BigEndian.PutUint16(entry, uint16(len(record)))
+	copy(entry[mmapRecordPrefix:], record)
+	return nil
+}
+
+// sync flushes the dirty pages of the mapping to the file.
+func (m *mmapStore) sync() error {
+	m.mu.RLock()
+	defer m.mu.RUnlock()
+	if m.mapping == nil {
+		return nil
+	}
+	_, _, errno := syscall.Syscall(syscall.SYS_MSYNC, uintptr(unsafe.Pointer(&m.mapping[0])), uintptr(len(m.mapping)), syscall.MS_SYNC)
+	if errno != 0 {
+		return errno
+	}
+	return nil
+}
+
+func (m *mmapStore) unmap() error {
+	err := syscall.Munmap(m.mapping)
+	m.mapping = nil
+	if err != nil {
+		return err
+	}
+	return m.file.Close()
+}
+
+func (m *mmapStore) close() error {
+	if err := m.sync(); err != nil {
+		return err
+	}
+	m.mu.Lock()
+	defer m.mu.Unlock()
+	if m.mapping == nil {
+		return nil
+	}
+	return m.unmap()
+}
@@ -0,0 +1,84 @@
+package storage
+
+import (
+	"path/filepath"
+	"strings"
+	"testing"
+
+	"github.com/dsg-uwaterloo/treebeard/pkg/config"
+)
+
+func TestInitDatabaseReusesTheTreeOfAnMmapFile(t *testing.T) {
+	endpoints := []config.RedisEndpoint{{ID: 0, Backend: config.MmapBackend, Path: filepath.Join(t.TempDir(), "storage")}}
+	s := NewStorageHandler(3, 1, 9, 1, endpoints)
+	if err := s.InitDatabase(); err != nil {
+		t.Fatalf("error initializing the mmap storage; %s", err)
+	}
+	if emptied := s.GetEmptiedStorageIDs(); len(emptied) != 1 || emptied[0] != 0 {
+		t.Errorf("expected storage 0 to be emptied, but got %v", emptied)
+	}
+	s.BatchWriteBucket(0, map[int]map[string]string{1: {"usr1": "value1"}}, map[string]BlockInfo{})
+	if err := s.SyncStorage(0); err != nil {
+		t.Errorf("error syncing the mmap storage; %s", err)
+	}
+	s.files[0].close()
+
+	reopened := NewStorageHandler(3, 1, 9, 1, endpoints)
+	if err := reopened.InitDatabase(); err != nil {
+		t.Fatalf("error reopening the mmap storage; %s", err)
+	}
+	if emptied := reopened.GetEmptiedStorageIDs(); len(emptied) != 0 {
+		t.Errorf("expected a reused tree not to count as emptied, but got %v", emptied)
+	}
+	blocks, err := reopened.BatchReadBucket([]int{1}, 0)
+	if err != nil || blocks[1]["usr1"] != "value1" {
+		t.Errorf("expected usr1 to survive reopening the file, but got %v; %v", blocks, err)
+	}
+	reopened.files[0].close()
+
+	other := NewStorageHandler(3, 2, 9, 1, endpoints)
+	if err := other.InitDatabase(); err != nil {
+		t.Fatalf("error reinitializing the mmap storage; %s", err)
+	}
+	blocks, err = other.BatchReadBucket([]int{1}, 0)
+	if err != nil || len(blocks[1]) != 0 {
+		t.Errorf("expected a tree with other Z and S to be reinitialized, but got %v; %v", blocks, err)
+	}
+}
+
+func TestBatchWriteBucketRejectsValuesLargerThanTheMmapSlots(t *testing.T) {
+	s := NewStorageHandler(3, 1, 9, 1, []config.RedisEndpoint{{ID: 0, Backend: config.MmapBackend, Path: filepath.Join(t.TempDir(), "storage")}})
+	s.SetBlockSize(16)
+	if err := s.InitDatabase(); err != nil {
+		t.Fatalf("error initializing the mmap storage; %s", err)
+	}
+	_, err := s.BatchWriteBucket(0, map[int]map[string]string{1: {"usr1": strings.Repeat("v", 17)}}, map[string]BlockInfo{})
+	if err == nil {
+		t.Errorf("expected a value larger than the block size not to fit")
+	}
+	_, err = s.BatchWriteBucket(0, map[int]map[string]string{1: {"usr1": strings.Repeat("v", 16)}}, map[string]BlockInfo{})
+	if err != nil {
+		t.Errorf("expected a value of the block size to fit; %s", err)
+	}
+}
+
+func TestMmapStoreInvalidatesSlotsAndCountsAccessesInPlace(t *testing.T) {
+	store := newMmapStore(filepath.Join(t.TempDir(), "storage"))
+	if err := store.open(4, 3, 8); err != nil {
+		t.Fatalf("error opening the mmap storage; %s", err)
+	}
+	defer store.close()
+	store.writeBucket(2, []string{"a", "b", "c"}, []string{"usr1", "dummy1", "dummy2"})
+	values, counts, err := store.readAndInvalidate(map[int]int{2: 1})
+	if err != nil || values[2] != "b" || counts[2] != 1 {
+		t.Errorf("expected b with an access count of 1, but got %v and %v; %v", values, counts, err)
+	}
+	metadatas, _ := store.getMetadata([]int{2})
+	if metadatas[2].isValid(1) || !metadatas[2].isValid(0) || !metadatas[2].isValid(2) {
+		t.Errorf("expected only slot 1 to be invalidated")
+	}
+	accessCounts, _ := store.getAccessCounts([]int{2, 3})
+	if accessCounts[2] != 1 || accessCounts[3] != 0 {
+		t.Errorf("expected access counts 1 and 0, but got %v", accessCounts)
+	}
+}
@@ -1,13 +1,23 @@
 package storage
 
+import "sync"
+
 type MockStorageHandler struct {
-	levelCount                int
-	maxAccessCount            int
+	levelCount     int
+	maxAccessCount int
+	// The locks of the mock only lock after WithLocking.
+	locking                   bool
+	storageMu                 sync.Mutex
+	bucketMus                 bucketLocks
 	customBatchGetBlockOffset func(bucketIDs []int, storageID int, blocks []string) (offsets map[int]BlockOffsetStatus, err error)
 	customBatchGetAccessCount func(bucketIDs []int, storageID int) (counts map[int]int, err error)
 	customBatchReadBucket     func(bucketIDs []int, storageID int) (blocks map[int]map[string]string, err error)
 	customBatchWriteBucket    func(storageID int, readBucketBlocksList map[int]map[string]string, shardNodeBlocks map[string]BlockInfo) (writtenBlocks map[string]string, err error)
 	customBatchReadBlock      func(offsets map[int]int, storageID int) (values map[int]string, err error)
+	customBatchReadPath       func(bucketIDs []int, storageID int, blocks []string) (values map[string]string, accessCounts map[int]int, err error)
+	customGetBucketsInPaths   func(paths []int) (bucketIDs []int, err error)
+	customGetEvictionPaths    func(evictionCount int, count int) (paths []int)
+	customResetTreeTopCache   func()
 }
 
 func NewMockStorageHandler(levelCount int, maxAccessCount int) *MockStorageHandler {
@@ -29,17 +39,58 @@ func NewMockStorageHandler(levelCount int, maxAccessCount int) *MockStorageHandl
 		customBatchReadBlock: func(offsets map[int]int, storageID int) (values map[int]string, err error) {
 			return nil, nil
 		},
+		customBatchReadPath: func(bucketIDs []int, storageID int, blocks []string) (values map[string]string, accessCounts map[int]int, err error) {
+			return nil, nil, nil
+		},
+		customGetBucketsInPaths: func(paths []int) (bucketIDs []int, err error) {
+			return []int{1, 2, 3, 4}, nil
+		},
+		customGetEvictionPaths: func(evictionCount int, count int) (paths []int) {
+			for i := 0; i < count; i++ {
+				paths = append(paths, 1)
+			}
+			return paths
+		},
+		customResetTreeTopCache: func() {},
 	}
 }
 
+// WithLocking makes the storage and bucket locks of the mock lock like the ones of StorageHandler.
+func (m *MockStorageHandler) WithLocking() *MockStorageHandler {
+	m.locking = true
+	return m
+}
+
 func (m *MockStorageHandler) GetMaxAccessCount() int {
 	return m.maxAccessCount
 }
 
 func (m *MockStorageHandler) LockStorage(storageID int) {
+	if m.locking {
+		m.storageMu.Lock()
+	}
 }
 
 func (m *MockStorageHandler) UnlockStorage(storageID int) {
+	if m.locking {
+		m.storageMu.Unlock()
+	}
+}
+
+func (m *MockStorageHandler) LockBuckets(storageID int, bucketIDs []int) {
+	if m.locking {
+		m.bucketMus.lock(bucketIDs)
+	}
+}
+
+func (m *MockStorageHandler) UnlockBuckets(storageID int, bucketIDs []int) {
+	if m.locking {
+		m.bucketMus.unlock(bucketIDs)
+	}
+}
+
+func (m *MockStorageHandler) SyncStorage(storageID int) error {
+	return nil
 }
 
 func (m *MockStorageHandler) BatchGetBlockOffset(bucketIDs []int, storageID int, blocks []string) (offsets map[int]BlockOffsetStatus, err error) {
@@ -87,17 +138,50 @@ func (m *MockStorageHandler) WithCustomBatchReadBlockFunc(f func(offsets map[int
 	return m
 }
 
+func (m *MockStorageHandler) BatchReadPath(bucketIDs []int, storageID int, blocks []string) (values map[string]string, accessCounts map[int]int, err error) {
+	return m.customBatchReadPath(bucketIDs, storageID, blocks)
+}
+
+func (m *MockStorageHandler) WithCustomBatchReadPathFunc(f func(bucketIDs []int, storageID int, blocks []string) (values map[string]string, accessCounts map[int]int, err error)) *MockStorageHandler {
+	m.customBatchReadPath = f
+	return m
+}
+
 func (m *MockStorageHandler) GetBucketsInPaths(paths []int) (bucketIDs []int, err error) {
-	return []int{1, 2, 3, 4}, nil
+	return m.customGetBucketsInPaths(paths)
+}
+
+func (m *MockStorageHandler) WithCustomGetBucketsInPathsFunc(f func(paths []int) (bucketIDs []int, err error)) *MockStorageHandler {
+	m.customGetBucketsInPaths = f
+	return m
 }
 
 func (m *MockStorageHandler) GetMultipleReverseLexicographicPaths(evictionCount int, count int) (paths []int) {
-	for i := 0; i < count; i++ {
-		paths = append(paths, 1)
-	}
-	return paths
+	return m.customGetEvictionPaths(evictionCount, count)
+}
+
+func (m *MockStorageHandler) WithCustomGetMultipleReverseLexicographicPathsFunc(f func(evictionCount int, count int) (paths []int)) *MockStorageHandler {
+	m.customGetEvictionPaths = f
+	return m
+}
+
+func (m *MockStorageHandler) GetStorageIDs() []int {
+	return []int{0}
 }
 
 func (m *MockStorageHandler) GetRandomStorageID() int {
 	return 0
 }
+
+func (m *MockStorageHandler) ResetTreeTopCache() {
+	m.customResetTreeTopCache()
+}
+
+func (m *MockStorageHandler) WithCustomResetTreeTopCacheFunc(f func()) *MockStorageHandler {
+	m.customResetTreeTopCache = f
+	return m
+}
+
+func (m *MockStorageHandler) TreeTopCacheStats() (hits uint64, misses uint64) {
+	return 0, 0
+}
@@ -0,0 +1,177 @@
+package storage
+
+import (
+	"context"
+	"fmt"
+	"strconv"
+
+	"github.com/redis/go-redis/v9"
+)
+
+// readPathScript does what BatchGetBlockOffset and BatchReadBlock do for a batch of buckets in one call.
+// For every bucket it picks the slot of a requested block, or of its valid dummy with the lowest number if it holds none,
+// reads the slot, invalidates it and increments the access count of the bucket.
+// The slots of all buckets are picked before the first write, since redis does not undo the writes of a failed script.
+//
+// KEYS are the data and metadata keys of the buckets in pairs,
+// followed by the metadata keys of the buckets that were read from the tree-top cache.
+// ARGV are the number of slots per bucket, the number of cached buckets and the slots read from them,
+// followed by the requested blocks.
+// It returns the found block ("" for a dummy), the slot value and the new access count of every uncached bucket.
+var readPathScript = redis.NewScript(`
+local slots = tonumber(ARGV[1])
+local cached = tonumber(ARGV[2])
+local requested = {}
+for i = 3 + cached, #ARGV do
+	requested[ARGV[i]] = i
+end
+local offsets, foundIndexes = {}, {}
+for k = 1, #KEYS - cached, 2 do
+	local record = redis.call('GET', KEYS[k + 1])
+	if not record then
+		return redis.error_reply('no metadata for bucket ' .. KEYS[k])
+	end
+	local position = 5 + math.floor((slots + 7) / 8)
+	local found, foundIndex, dummy, dummyNumber = nil, 0, nil, nil
+	for offset = 0, slots - 1 do
+		local length = string.byte(record, position) * 256 + string.byte(record, position + 1)
+		local key = string.sub(record, position + 2, position + 1 + length)
+		position = position + 2 + length
+		if bit.band(string.byte(record, 5 + math.floor(offset / 8)), bit.rshift(128, offset % 8)) ~= 0 then
+			local index = requested[key]
+			-- Like BatchGetBlockOffset, the block requested last wins.
+			if index and index > foundIndex then
+				found, foundIndex = offset, index
+			elseif string.sub(key, 1, 5) == 'dummy' then
+				local number = tonumber(string.sub(key, 6))
+				if number and (not dummyNumber or number < dummyNumber) then
+					dummy, dummyNumber = offset, number
+				end
+			end
+		end
+	end
+	offsets[k] = found or dummy
+	if not offsets[k] then
+		return redis.error_reply('no valid dummy block in bucket ' .. KEYS[k])
+	end
+	if found then
+		foundIndexes[k] = foundIndex
+	end
+end
+local result = {}
+for k = 1, #KEYS - cached, 2 do
+	local offset = offsets[k]
+	local value = redis.call('HGET', KEYS[k], tostring(offset))
+	redis.call('SETBIT', KEYS[k + 1], 32 + offset, 0)
+	local count = redis.call('BITFIELD', KEYS[k + 1], 'INCRBY', 'u32', 0, 1)[1]
+	result[#result + 1] = foundIndexes[k] and ARGV[foundIndexes[k]] or ''
+	result[#result + 1] = value
+	result[#result + 1] = count
+end
+-- The cached buckets were read in memory; only their invalidations are written.
+for i = 1, cached do
+	local key = KEYS[#KEYS - cached + i]
+	redis.call('SETBIT', key, 32 + tonumber(ARGV[2 + i]), 0)
+	redis.call('BITFIELD', key, 'INCRBY', 'u32', 0, 1)
+end
+return result
+`)
+
+// BatchReadPath reads the requested blocks from multiple buckets of a single storage shard in one round trip.
+// Every bucket gives up one slot, a requested block or a dummy, exactly as
+// BatchGetBlockOffset followed by BatchReadBlock would.
+// It returns the values of the found blocks and the access count of every bucket after the read.
+func (s *StorageHandler) BatchReadPath(bucketIDs []int, storageID int, blocks []string) (values map[string]string, accessCounts map[int]int, err error) {
+	if store, isFile := s.files[storageID]; isFile {
+		return s.readFilePath(store, bucketIDs, blocks)
+	}
+	cached, bucketIDs := s.cache.split(bucketIDs)
+	values = make(map[string]string)
+	accessCounts = make(map[int]int, len(bucketIDs)+len(cached))
+	var cachedOffsets map[int]int
+	if len(cached) > 0 {
+		cachedOffsets, err = s.readCachedPath(storageID, cached, blocks, values, accessCounts)
+		if err != nil {
+			return nil, nil, err
+		}
+	}
+	ctx := context.Background()
+	keys := make([]string, 0, 2*len(bucketIDs)+len(cached))
+	for _, bucketID := range bucketIDs {
+		keys = append(keys, strconv.Itoa(bucketID), metadataKey(bucketID))
+	}
+	args := make([]interface{}, 0, len(blocks)+len(cached)+2)
+	args = append(args, s.Z+s.S, len(cached))
+	for _, bucketID := range cached {
+		keys = append(keys, metadataKey(bucketID))
+		args = append(args, cachedOffsets[bucketID])
+	}
+	for _, block := range blocks {
+		args = append(args, block)
+	}
+	reply, err := readPathScript.Run(ctx, s.storages[storageID], keys, args...).Slice()
+	if err != nil {
+		s.cache.drop(storageID)
+		return nil, nil, err
+	}
+	if len(reply) != 3*len(bucketIDs) {
+		return nil, nil, fmt.Errorf("read path script returned %d elements for %d buckets", len(reply), len(bucketIDs))
+	}
+	for i, bucketID := range bucketIDs {
+		block, _ := reply[3*i].(string)
+		count, _ := reply[3*i+2].(int64)
+		accessCounts[bucketID] = int(count)
+		if block == "" {
+			continue
+		}
+		value, _ := reply[3*i+1].(string)
+		value, err = s.cipher.Open(value)
+		if err != nil {
+			return nil, nil, err
+		}
+		values[block] = value
+	}
+	return values, accessCounts, nil
+}
+
+// findPathOffsets picks the slot that every bucket gives up for a read of the blocks
+// and returns the real blocks among them.
+func findPathOffsets(metadatas map[int]bucketMetadata, bucketIDs []int, blocks []string) (offsets map[int]int, realBlocks map[int]string, err error) {
+	offsets = make(map[int]int, len(bucketIDs))
+	realBlocks = make(map[int]string)
+	for _, bucketID := range bucketIDs {
+		status, exists := findBlockOffset(metadatas[bucketID], blocks)
+		if !exists {
+			return nil, nil, fmt.Errorf("no valid dummy block in bucket %d", bucketID)
+		}
+		offsets[bucketID] = status.Offset
+		if status.IsReal {
+			realBlocks[bucketID] = status.BlockFound
+		}
+	}
+	return offsets, realBlocks, nil
+}
+
+// readFilePath does what the read path script does on an mmap storage.
+func (s *StorageHandler) readFilePath(store *mmapStore, bucketIDs []int, blocks []string) (values map[string]string, accessCounts map[int]int, err error) {
+	metadatas, err := store.getMetadata(bucketIDs)
+	if err != nil {
+		return nil, nil, err
+	}
+	offsets, realBlocks, err := findPathOffsets(metadatas, bucketIDs, blocks)
+	if err != nil {
+		return nil, nil, err
+	}
+	sealedValues, accessCounts, err := store.readAndInvalidate(offsets)
+	if err != nil {
+		return nil, nil, err
+	}
+	values = make(map[string]string, len(realBlocks))
+	for bucketID, block := range realBlocks {
+		values[block], err = s.cipher.Open(sealedValues[bucketID])
+		if err != nil {
+			return nil, nil, err
+		}
+	}
+	return values, accessCounts, nil
+}
@@ -0,0 +1,114 @@
+package storage
+
+import (
+	"context"
+	"testing"
+
+	"github.com/dsg-uwaterloo/treebeard/pkg/config"
+)
+
+func TestBatchReadPathReturnsRequestedBlocksAndInvalidatesTheirSlots(t *testing.T) {
+	forEachBackend(t, func(t *testing.T, endpoints []config.RedisEndpoint) {
+		bucketIDs := []int{1, 2, 3}
+		s := NewStorageHandler(4, 1, 9, 1, endpoints)
+		s.InitDatabase()
+		toWriteBlocks := map[int]map[string]string{1: {"usr1": "value1"}, 2: {"usr2": "value2"}, 3: {"usr3": "value3"}, 4: {"usr4": "value4"}, 5: {"usr5": "value5"}}
+		s.BatchWriteBucket(0, toWriteBlocks, map[string]BlockInfo{})
+
+		values, accessCounts, err := s.BatchReadPath(bucketIDs, 0, []string{"usr1", "usr3"})
+		if err != nil {
+			t.Fatalf("error reading path; %s", err)
+		}
+		if len(values) != 2 || values["usr1"] != "value1" || values["usr3"] != "value3" {
+			t.Errorf("expected usr1 and usr3 with their values, but got %v", values)
+		}
+		for _, bucketID := range bucketIDs {
+			if accessCounts[bucketID] != 1 {
+				t.Errorf("expected access count 1 for bucket %d, but got %d", bucketID, accessCounts[bucketID])
+			}
+		}
+
+		metadatas, err := s.BatchGetAllMetaData(bucketIDs, 0)
+		if err != nil {
+			t.Errorf("error getting metadata")
+		}
+		if _, exists := metadatas[1]["usr1"]; exists {
+			t.Errorf("expected usr1 to be invalidated in bucket 1")
+		}
+		if _, exists := metadatas[2]["dummy1"]; exists {
+			t.Errorf("expected dummy1 to be invalidated in bucket 2")
+		}
+		if _, exists := metadatas[2]["usr2"]; !exists {
+			t.Errorf("expected usr2 to stay valid in bucket 2")
+		}
+	})
+}
+
+func TestBatchReadPathReadsABucketRepeatedly(t *testing.T) {
+	forEachBackend(t, func(t *testing.T, endpoints []config.RedisEndpoint) {
+		bucketIDs := []int{1, 2, 3}
+		s := NewStorageHandler(4, 1, 9, 1, endpoints)
+		s.InitDatabase()
+		s.BatchWriteBucket(0, map[int]map[string]string{1: {}, 2: {}, 3: {"usr3": "value3"}}, map[string]BlockInfo{})
+
+		for read := 1; read <= 3; read++ {
+			values, accessCounts, err := s.BatchReadPath(bucketIDs, 0, []string{"usr1"})
+			if err != nil {
+				t.Fatalf("error in read %d of the path; %s", read, err)
+			}
+			if len(values) != 0 {
+				t.Errorf("expected no values in read %d, but got %v", read, values)
+			}
+			for _, bucketID := range bucketIDs {
+				if accessCounts[bucketID] != read {
+					t.Errorf("expected access count %d for bucket %d, but got %d", read, bucketID, accessCounts[bucketID])
+				}
+			}
+		}
+		metadatas, err := s.BatchGetAllMetaData(bucketIDs, 0)
+		if err != nil {
+			t.Fatalf("error getting metadata; %s", err)
+		}
+		for _, bucketID := range bucketIDs {
+			for _, dummy := range []string{"dummy1", "dummy2", "dummy3"} {
+				if _, exists := metadatas[bucketID][dummy]; exists {
+					t.Errorf("expected %s to be invalidated in bucket %d", dummy, bucketID)
+				}
+			}
+		}
+		if _, exists := metadatas[3]["usr3"]; !exists {
+			t.Errorf("expected usr3 to stay valid in bucket 3")
+		}
+	})
+}
+
+func TestBatchReadPathWritesNothingWhenABucketHasNoValidDummy(t *testing.T) {
+	bucketIDs := []int{1, 2, 3}
+	s := NewStorageHandler(4, 1, 9, 1, []config.RedisEndpoint{{ID: 0, IP: "localhost", Port: 6379}})
+	s.InitDatabase()
+	s.BatchWriteBucket(0, map[int]map[string]string{1: {}, 2: {}, 3: {}}, map[string]BlockInfo{})
+	// Bucket 3 only keeps a real block in its first slot.
+	slotKeys := make([]string, 10)
+	slotKeys[0] = "usr3"
+	s.storages[0].Set(context.Background(), metadataKey(3), encodeMetadata(slotKeys), 0)
+
+	if _, _, err := s.BatchReadPath(bucketIDs, 0, []string{"usr1"}); err == nil {
+		t.Fatalf("expected an error for a bucket without a valid dummy")
+	}
+	accessCounts, err := s.BatchGetAccessCount([]int{1, 2}, 0)
+	if err != nil {
+		t.Fatalf("error getting access counts; %s", err)
+	}
+	metadatas, err := s.BatchGetAllMetaData([]int{1, 2}, 0)
+	if err != nil {
+		t.Fatalf("error getting metadata; %s", err)
+	}
+	for _, bucketID := range []int{1, 2} {
+		if accessCounts[bucketID] != 0 {
+			t.Errorf("expected access count 0 for bucket %d, but got %d", bucketID, accessCounts[bucketID])
+		}
+		if _, exists := metadatas[bucketID]["dummy1"]; !exists {
+			t.Errorf("expected dummy1 to stay valid in bucket %d", bucketID)
+		}
+	}
+}
@@ -4,8 +4,10 @@ package storage
 
 import (
 	"context"
+	"fmt"
 	"math"
 	"math/rand"
+	"sort"
 	"strconv"
 	"strings"
 	"sync"
@@ -18,6 +20,9 @@ import (
 
 // Path and bucket id start from one.
 
+// The block size of configs/default/parameters.yaml, used for mmap storages until SetBlockSize is called.
+const defaultBlockSize = 1024
+
 // StorageHandler is responsible for handling one or multiple storage shards.
 type StorageHandler struct {
 	treeHeight int
@@ -25,8 +30,14 @@ type StorageHandler struct {
 	S          int // the number of dummy blocks in each bucket
 	shift      int
 	storages   map[int]*redis.Client // map of storage id to redis client
+	files      map[int]*mmapStore    // map of storage id to mmap storage
 	storageMus map[int]*sync.Mutex   // map of storage id to mutex
+	bucketMus  map[int]*bucketLocks  // map of storage id to the locks of its buckets
+	emptied    map[int]bool          // map of storage id to whether InitDatabase wrote an empty tree to it
 	key        []byte
+	cipher     *Cipher
+	blockSize  int
+	cache      *treeTopCache
 }
 
 type BlockInfo struct {
@@ -37,29 +48,57 @@ type BlockInfo struct {
 func NewStorageHandler(treeHeight int, Z int, S int, shift int, redisEndpoints []config.RedisEndpoint) *StorageHandler { // map of storage id to storage info
 	log.Debug().Msgf("Creating a new storage handler")
 	storages := make(map[int]*redis.Client)
-	for _, endpoint := range redisEndpoints {
-		storages[endpoint.ID] = getClient(endpoint.IP, endpoint.Port)
-	}
+	files := make(map[int]*mmapStore)
 	storageMus := make(map[int]*sync.Mutex)
-	for storageID := range storages {
-		storageMus[storageID] = &sync.Mutex{}
+	bucketMus := make(map[int]*bucketLocks)
+	for _, endpoint := range redisEndpoints {
+		if endpoint.Backend == config.MmapBackend {
+			files[endpoint.ID] = newMmapStore(endpoint.Path)
+		} else {
+			storages[endpoint.ID] = getClient(endpoint.IP, endpoint.Port)
+		}
+		storageMus[endpoint.ID] = &sync.Mutex{}
+		bucketMus[endpoint.ID] = &bucketLocks{}
 	}
 	storageLatestEviction := make(map[int]int)
 	for _, endpoint := range redisEndpoints {
 		storageLatestEviction[endpoint.ID] = 0
 	}
+	key := []byte("passphrasewhichneedstobe32bytes!")
+	valueCipher, err := NewCipher(key, RawValues)
+	if err != nil {
+		log.Fatal().Msgf("failed to create the cipher; %v", err)
+	}
 	s := &StorageHandler{
 		treeHeight: treeHeight,
 		Z:          Z,
 		S:          S,
 		shift:      shift,
 		storages:   storages,
+		files:      files,
 		storageMus: storageMus,
-		key:        []byte("passphrasewhichneedstobe32bytes!"),
+		bucketMus:  bucketMus,
+		emptied:    make(map[int]bool),
+		key:        key,
+		cipher:     valueCipher,
+		blockSize:  defaultBlockSize,
+		cache:      newTreeTopCache(),
 	}
 	return s
 }
 
+// SetValueEncoding changes how values are stored in redis; it has to be called before the storages are used.
+func (s *StorageHandler) SetValueEncoding(encoding ValueEncoding) (err error) {
+	s.cipher, err = NewCipher(s.key, encoding)
+	return err
+}
+
+// SetBlockSize sets the size of the values that the slots of mmap storages hold;
+// it has to be called before InitDatabase.
+func (s *StorageHandler) SetBlockSize(blockSize int) {
+	s.blockSize = blockSize
+}
+
 func (s *StorageHandler) GetMaxAccessCount() int {
 	return s.S
 }
@@ -76,15 +115,31 @@ func (s *StorageHandler) UnlockStorage(storageID int) {
 	log.Debug().Msgf("Released lock for storage %d", storageID)
 }
 
+// LockBuckets waits until no other operation holds any of the buckets of a storage.
+// It is independent of LockStorage, which then only keeps evictions of the same storage apart.
+func (s *StorageHandler) LockBuckets(storageID int, bucketIDs []int) {
+	log.Debug().Msgf("Aquiring lock for %d buckets of storage %d", len(bucketIDs), storageID)
+	s.bucketMus[storageID].lock(bucketIDs)
+	log.Debug().Msgf("Aquired lock for %d buckets of storage %d", len(bucketIDs), storageID)
+}
+
+func (s *StorageHandler) UnlockBuckets(storageID int, bucketIDs []int) {
+	log.Debug().Msgf("Releasing lock for %d buckets of storage %d", len(bucketIDs), storageID)
+	s.bucketMus[storageID].unlock(bucketIDs)
+	log.Debug().Msgf("Released lock for %d buckets of storage %d", len(bucketIDs), storageID)
+}
+
 func (s *StorageHandler) InitDatabase() error {
 	log.Debug().Msgf("Initializing the redis database")
-	for _, client := range s.storages {
-		// Do not reinitialize the database if it is already initialized
-		dbsize, err := client.DBSize(context.Background()).Result()
+	for storageID, client := range s.storages {
+		// Do not reinitialize the database if it is already initialized,
+		// e.g. bulk loaded with scripts/bulk_load_tree.py.
+		loaded, err := s.isTreeLoaded(client)
 		if err != nil {
 			return err
 		}
-		if dbsize == (int64((math.Pow(float64(s.shift+1), float64(s.treeHeight))))-1)*2 {
+		if loaded {
+			log.Info().Msgf("Storage already holds a tree; skipping initialization")
 			continue
 		}
 		err = client.FlushAll(context.Background()).Err()
@@ -95,6 +150,35 @@ func (s *StorageHandler) InitDatabase() error {
 		if err != nil {
 			return err
 		}
+		s.emptied[storageID] = true
+	}
+	// An mmap storage is opened here, so only the oram node that initializes it can use it.
+	for storageID, store := range s.files {
+		emptied, err := s.initFileStorage(store)
+		if err != nil {
+			return err
+		}
+		s.emptied[storageID] = emptied
+	}
+	return nil
+}
+
+// GetEmptiedStorageIDs returns the storages that InitDatabase wrote an empty tree to,
+// so every access count of their buckets is zero.
+func (s *StorageHandler) GetEmptiedStorageIDs() (storageIDs []int) {
+	for storageID, emptied := range s.emptied {
+		if emptied {
+			storageIDs = append(storageIDs, storageID)
+		}
+	}
+	sort.Ints(storageIDs)
+	return storageIDs
+}
+
+// SyncStorage makes the writes to an mmap storage durable; redis storages persist on their own.
+func (s *StorageHandler) SyncStorage(storageID int) error {
+	if store, isFile := s.files[storageID]; isFile {
+		return store.sync()
 	}
 	return nil
 }
@@ -106,58 +190,78 @@ type BlockOffsetStatus struct {
 }
 
 func (s *StorageHandler) BatchGetBlockOffset(bucketIDs []int, storageID int, blocks []string) (blockoffsetStatuses map[int]BlockOffsetStatus, err error) {
-	allBlockMap, err := s.BatchGetAllMetaData(bucketIDs, storageID)
+	metadatas, err := s.batchGetMetadata(bucketIDs, storageID)
 	if err != nil {
 		log.Debug().Msgf("Error getting meta data")
 		return nil, err
 	}
 	blockoffsetStatuses = make(map[int]BlockOffsetStatus)
 	for _, bucketID := range bucketIDs {
-		blockoffsetStatuses[bucketID] = BlockOffsetStatus{
-			Offset:     -1,
-			IsReal:     false,
-			BlockFound: "",
-		}
-		blockMap := allBlockMap[bucketID]
-		for _, block := range blocks {
-			pos, exist := blockMap[block]
-			if exist {
-				log.Debug().Msgf("Found block %s in bucket %d", block, bucketID)
-				blockoffsetStatuses[bucketID] = BlockOffsetStatus{
-					Offset:     pos,
-					IsReal:     true,
-					BlockFound: block,
-				}
-			}
+		status, exists := findBlockOffset(metadatas[bucketID], blocks)
+		if !exists {
+			log.Error().Msgf("Did not find valid dummy block in bucket %d", bucketID)
+			return nil, fmt.Errorf("no valid dummy block in bucket %d", bucketID)
 		}
-		if blockoffsetStatuses[bucketID].Offset == -1 {
-			log.Debug().Msgf("Did not find any block in bucket %d, returning dummy block", bucketID)
-			if pos, exist := blockMap["dummy1"]; exist {
-				blockoffsetStatuses[bucketID] = BlockOffsetStatus{
-					Offset:     pos,
-					IsReal:     false,
-					BlockFound: "dummy1",
-				}
-			} else {
-				log.Error().Msgf("Did not find valid dummy block in bucket %d", bucketID)
-				return nil, err
+		blockoffsetStatuses[bucketID] = status
+	}
+	return blockoffsetStatuses, nil
+}
+
+// findBlockOffset returns the slot of the last of the blocks in a bucket,
+// or the slot of its valid dummy with the lowest number if it holds none of them.
+func findBlockOffset(metadata bucketMetadata, blocks []string) (status BlockOffsetStatus, exists bool) {
+	status = BlockOffsetStatus{
+		Offset:     -1,
+		IsReal:     false,
+		BlockFound: "",
+	}
+	for _, block := range blocks {
+		pos, exist := metadata.offset(block)
+		if exist {
+			status = BlockOffsetStatus{
+				Offset:     pos,
+				IsReal:     true,
+				BlockFound: block,
 			}
 		}
 	}
-	return blockoffsetStatuses, nil
+	if status.Offset != -1 {
+		return status, true
+	}
+	if pos, dummy, exist := metadata.dummyOffset(); exist {
+		return BlockOffsetStatus{
+			Offset:     pos,
+			IsReal:     false,
+			BlockFound: dummy,
+		}, true
+	}
+	return status, false
 }
 
 // It returns the number of times a bucket was accessed for multiple buckets.
 // This is helpful to know when to do an early reshuffle.
 func (s *StorageHandler) BatchGetAccessCount(bucketIDs []int, storageID int) (counts map[int]int, err error) {
+	if store, isFile := s.files[storageID]; isFile {
+		return store.getAccessCounts(bucketIDs)
+	}
+	counts = make(map[int]int)
+	// The oram node only reads the access counts to load them, which is not a bucket access.
+	cached, bucketIDs := s.cache.partition(bucketIDs)
+	if len(cached) > 0 {
+		if err := s.getCachedAccessCounts(storageID, cached, counts); err != nil {
+			return nil, err
+		}
+	}
+	if len(bucketIDs) == 0 {
+		return counts, nil
+	}
 	ctx := context.Background()
 	pipe := s.storages[storageID].Pipeline()
-	resultsMap := make(map[int]*redis.StringCmd)
-	counts = make(map[int]int)
+	resultsMap := make(map[int]*redis.IntSliceCmd)
 	// Iterate over each bucketID
 	for _, bucketID := range bucketIDs {
-		// Issue HGET command for the access count of the current bucketID within the pipeline
-		cmd := pipe.HGet(ctx, strconv.Itoa(-1*bucketID), "accessCount")
+		// Issue BITFIELD GET for the access count at the start of the metadata of the current bucketID
+		cmd := pipe.BitField(ctx, metadataKey(bucketID), "GET", "u32", 0)
 		resultsMap[bucketID] = cmd
 	}
 
@@ -168,21 +272,10 @@ func (s *StorageHandler) BatchGetAccessCount(bucketIDs []int, storageID int) (co
 	}
 	// Process the results for each bucketID
 	for bucketID, cmd := range resultsMap {
-		accessCountS, err := cmd.Result()
-		if err != nil {
-			if err != redis.Nil {
-				return nil, err
-			}
-			counts[bucketID] = 0
-			log.Debug().Msgf("Access count for bucket %d and storage %d is %d", bucketID, storageID, 0)
-		} else {
-			accessCount, err := strconv.Atoi(accessCountS)
-			if err != nil {
-				return nil, err
-			}
-			counts[bucketID] = accessCount
-			log.Debug().Msgf("Access count for bucket %d and storage %d is %d", bucketID, storageID, accessCount)
-		}
+		// A missing key reads as a count of zero.
+		accessCount := int(cmd.Val()[0])
+		counts[bucketID] = accessCount
+		log.Debug().Msgf("Access count for bucket %d and storage %d is %d", bucketID, storageID, accessCount)
 	}
 
 	return counts, nil
@@ -190,36 +283,57 @@ func (s *StorageHandler) BatchGetAccessCount(bucketIDs []int, storageID int) (co
 
 // It reads multiple buckets from a single storage shard.
 func (s *StorageHandler) BatchReadBucket(bucketIDs []int, storageID int) (blocks map[int]map[string]string, err error) {
-	metadataMap, err := s.BatchGetAllMetaData(bucketIDs, storageID)
+	metadataMap, err := s.batchGetMetadata(bucketIDs, storageID)
+	if err != nil {
+		return nil, err
+	}
+	if store, isFile := s.files[storageID]; isFile {
+		return s.readStoredBuckets(metadataMap, store.getValues)
+	}
+	cachedMetadata := make(map[int]bucketMetadata)
+	for bucketID, metadata := range metadataMap {
+		if s.cache.holds(bucketID) {
+			cachedMetadata[bucketID] = metadata
+			delete(metadataMap, bucketID)
+		}
+	}
+	blocks, err = s.readStoredBuckets(cachedMetadata, func(offsets map[int][]int) (map[int][]string, error) {
+		return s.getCachedValues(storageID, offsets)
+	})
+	if err != nil {
+		return nil, err
+	}
+	if len(metadataMap) == 0 {
+		return blocks, nil
+	}
 	results := make(map[int]map[string]*redis.StringCmd)
 	pipe := s.storages[storageID].Pipeline()
 	ctx := context.Background()
 	for bucketID, metadata := range metadataMap {
 		i := 0
 		results[bucketID] = make(map[string]*redis.StringCmd)
-		for key, pos := range metadata {
-			if !strings.HasPrefix(key, "dummy") {
+		for pos, key := range metadata.keys {
+			if metadata.isValid(pos) && !strings.HasPrefix(key, "dummy") {
 				results[bucketID][key] = pipe.HGet(ctx, strconv.Itoa(bucketID), strconv.Itoa(pos))
 				i++
 			}
 		}
-		dummyCount := 1
-		for ; i < s.Z; i++ {
-			dummyID := "dummy" + strconv.Itoa(dummyCount)
-			pos, exists := metadata[dummyID]
-			if !exists {
-				return nil, err
+		// Earlier reads may have invalidated any of the dummies.
+		for pos, key := range metadata.keys {
+			if i >= s.Z {
+				break
+			}
+			if metadata.isValid(pos) && strings.HasPrefix(key, "dummy") {
+				// We should do this data acess for not leaking access pattern
+				pipe.HGet(ctx, strconv.Itoa(bucketID), strconv.Itoa(pos))
+				i++
 			}
-			// We should do this data acess for not leaking access pattern
-			pipe.HGet(ctx, strconv.Itoa(bucketID), strconv.Itoa(pos))
-			dummyCount++
 		}
 	}
 	_, err = pipe.Exec(ctx)
 	if err != nil {
 		return nil, err
 	}
-	blocks = make(map[int]map[string]string)
 	for bucketID, result := range results {
 		blocks[bucketID] = make(map[string]string)
 		for key, cmd := range result {
@@ -227,7 +341,7 @@ func (s *StorageHandler) BatchReadBucket(bucketIDs []int, storageID int) (blocks
 			if err != nil {
 				return nil, err
 			}
-			value, err = Decrypt(value, s.key)
+			value, err = s.cipher.Open(value)
 			if err != nil {
 				return nil, err
 			}
@@ -251,11 +365,16 @@ func (s *StorageHandler) getBucketToValidBlocksMap(shardNodeBlocks map[string]Bl
 
 // It writes blocks to multiple buckets in a single storage shard.
 func (s *StorageHandler) BatchWriteBucket(storageID int, readBucketBlocksList map[int]map[string]string, shardNodeBlocks map[string]BlockInfo) (writtenBlocks map[string]string, err error) {
-	pipe := s.storages[storageID].Pipeline()
+	store, isFile := s.files[storageID]
+	var pipe redis.Pipeliner
+	if !isFile {
+		pipe = s.storages[storageID].Pipeline()
+	}
 	ctx := context.Background()
 	dataResults := make(map[int]*redis.BoolCmd)
-	metadataResults := make(map[int]*redis.BoolCmd)
+	metadataResults := make(map[int]*redis.StatusCmd)
 	writtenBlocks = make(map[string]string)
+	cachedBuckets := make(map[int]*cachedBucket)
 
 	log.Debug().Msgf("buckets from readBucketBlocksList: %v", readBucketBlocksList)
 	log.Debug().Msgf("shardNodeBlocks: %v", shardNodeBlocks)
@@ -264,7 +383,7 @@ func (s *StorageHandler) BatchWriteBucket(storageID int, readBucketBlocksList ma
 
 	for bucketID, readBucketBlocks := range readBucketBlocksList {
 		values := make([]string, s.Z+s.S)
-		metadatas := make([]string, s.Z+s.S)
+		slotKeys := make([]string, s.Z+s.S)
 		realIndex := make([]int, s.Z+s.S)
 		for k := 0; k < s.Z+s.S; k++ {
 			// Generate a random number between 0 and 9
@@ -278,11 +397,11 @@ func (s *StorageHandler) BatchWriteBucket(storageID int, readBucketBlocksList ma
 			}
 			if i < s.Z {
 				writtenBlocks[key] = value
-				values[realIndex[i]], err = Encrypt(value, s.key)
+				values[realIndex[i]], err = s.cipher.Seal(value)
 				if err != nil {
 					return nil, err
 				}
-				metadatas[i] = strconv.Itoa(realIndex[i]) + key
+				slotKeys[realIndex[i]] = key
 				i++
 				// pos_map is updated in server?
 			} else {
@@ -295,11 +414,11 @@ func (s *StorageHandler) BatchWriteBucket(storageID int, readBucketBlocksList ma
 			}
 			if i < s.Z {
 				writtenBlocks[key] = shardNodeBlocks[key].Value
-				values[realIndex[i]], err = Encrypt(shardNodeBlocks[key].Value, s.key)
+				values[realIndex[i]], err = s.cipher.Seal(shardNodeBlocks[key].Value)
 				if err != nil {
 					return nil, err
 				}
-				metadatas[i] = strconv.Itoa(realIndex[i]) + key
+				slotKeys[realIndex[i]] = key
 				i++
 			} else {
 				break
@@ -309,7 +428,7 @@ func (s *StorageHandler) BatchWriteBucket(storageID int, readBucketBlocksList ma
 		for ; i < s.Z+s.S; i++ {
 			dummyID := "dummy" + strconv.Itoa(dummyCount)
 			dummyString := "b" + strconv.Itoa(bucketID) + "d" + strconv.Itoa(i)
-			dummyString, err = Encrypt(dummyString, s.key)
+			dummyString, err = s.cipher.Seal(dummyString)
 			if err != nil {
 				log.Error().Msgf("Error encrypting data")
 				return nil, err
@@ -317,30 +436,43 @@ func (s *StorageHandler) BatchWriteBucket(storageID int, readBucketBlocksList ma
 			// push dummy to array
 			values[realIndex[i]] = dummyString
 			// push meta data of dummies to array
-			metadatas[i] = strconv.Itoa(realIndex[i]) + dummyID
+			slotKeys[realIndex[i]] = dummyID
 			dummyCount++
 		}
-		dataResults[i], metadataResults[i] = s.BatchPushDataAndMetadata(bucketID, values, metadatas, pipe)
+		if isFile {
+			err = store.writeBucket(bucketID, values, slotKeys)
+			if err != nil {
+				return nil, err
+			}
+			continue
+		}
+		if s.cache.holds(bucketID) {
+			metadata, err := parseMetadata(encodeMetadata(slotKeys), s.Z+s.S)
+			if err != nil {
+				return nil, err
+			}
+			cachedBuckets[bucketID] = &cachedBucket{metadata: metadata, values: values}
+		}
+		dataResults[bucketID], metadataResults[bucketID] = s.BatchPushDataAndMetadata(bucketID, values, slotKeys, pipe)
+	}
+	if isFile {
+		return writtenBlocks, nil
 	}
 	_, err = pipe.Exec(ctx)
 	if err != nil {
+		s.cache.drop(storageID)
 		return nil, err
 	}
+	s.writeCachedBuckets(storageID, cachedBuckets)
 	for _, dataCmd := range dataResults {
 		_, err := dataCmd.Result()
 		if err != nil {
-			if err != redis.Nil {
-				return nil, err
-			}
 			return nil, err
 		}
 	}
-	for _, metadataCmd := range dataResults {
+	for _, metadataCmd := range metadataResults {
 		_, err := metadataCmd.Result()
 		if err != nil {
-			if err != redis.Nil {
-				return nil, err
-			}
 			return nil, err
 		}
 	}
@@ -349,57 +481,80 @@ func (s *StorageHandler) BatchWriteBucket(storageID int, readBucketBlocksList ma
 
 // It reads multiple blocks from multiple buckets and returns the values.
 func (s *StorageHandler) BatchReadBlock(bucketOffsets map[int]int, storageID int) (values map[int]string, err error) {
+	if store, isFile := s.files[storageID]; isFile {
+		sealedValues, _, err := store.readAndInvalidate(bucketOffsets)
+		if err != nil {
+			return nil, err
+		}
+		values = make(map[int]string, len(sealedValues))
+		for bucketID, sealed := range sealedValues {
+			values[bucketID], err = s.cipher.Open(sealed)
+			if err != nil {
+				return nil, err
+			}
+		}
+		return values, nil
+	}
+	values = make(map[int]string)
+	cachedOffsets := make(map[int]int)
+	for bucketID, offset := range bucketOffsets {
+		if s.cache.holds(bucketID) {
+			cachedOffsets[bucketID] = offset
+		}
+	}
+	// BatchGetBlockOffset already counted these buckets as hits or misses.
+	if len(cachedOffsets) > 0 {
+		sealedValues, _, err := s.readAndInvalidateCached(storageID, cachedOffsets)
+		if err != nil {
+			return nil, err
+		}
+		for bucketID, sealed := range sealedValues {
+			values[bucketID], err = s.cipher.Open(sealed)
+			if err != nil {
+				return nil, err
+			}
+		}
+	}
 	ctx := context.Background()
 	pipe := s.storages[storageID].Pipeline()
 	resultsMap := make(map[int]*redis.StringCmd)
 	for bucketID, offset := range bucketOffsets {
+		if s.cache.holds(bucketID) {
+			continue
+		}
 		// Issue HGET commands for the value stored in the current bucketID
 		cmd := pipe.HGet(ctx, strconv.Itoa(bucketID), strconv.Itoa(offset))
 
 		// Store the map of results for the current bucketID in the resultsMap
 		resultsMap[bucketID] = cmd
 	}
-	_, err = pipe.Exec(ctx)
-	if err != nil {
-		log.Debug().Msgf("error executing batch read block pipe: %v", err)
-		return nil, err
+	if len(resultsMap) > 0 {
+		_, err = pipe.Exec(ctx)
+		if err != nil {
+			log.Debug().Msgf("error executing batch read block pipe: %v", err)
+			return nil, err
+		}
 	}
-	values = make(map[int]string)
 	for bucketID, cmd := range resultsMap {
 		block, err := cmd.Result()
 		if err != nil && err != redis.Nil {
 			return nil, err
 		}
 
-		value, err := Decrypt(block, s.key)
+		value, err := s.cipher.Open(block)
 		if err != nil {
 			return nil, err
 		}
 		values[bucketID] = value
 	}
-	invalidateMap := make(map[int]*redis.IntCmd)
-	bucketIDs := make([]int, len(bucketOffsets))
-	for bucketID := range bucketOffsets {
-		bucketIDs = append(bucketIDs, bucketID)
-	}
-	metadataMap, err := s.BatchGetAllMetaData(bucketIDs, storageID)
-	if err != nil {
-		return nil, err
-	}
 	for bucketID, offset := range bucketOffsets {
-		// Issue HGET commands to invalidate value for current bucketID
-		metadata := metadataMap[bucketID]
-		for _, pos := range metadata {
-			if pos == offset {
-				cmd := pipe.HSet(ctx, strconv.Itoa(-1*bucketID), strconv.Itoa(pos), "__null__")
-				invalidateMap[bucketID] = cmd
-			}
-		}
-		cmd := pipe.HIncrBy(ctx, strconv.Itoa(-1*bucketID), "accessCount", 1)
-		invalidateMap[bucketID] = cmd
+		// Invalidate the read slot and count the access in place, also for cached buckets
+		pipe.SetBit(ctx, metadataKey(bucketID), validityBit(offset), 0)
+		pipe.BitField(ctx, metadataKey(bucketID), "INCRBY", "u32", 0, 1)
 	}
 	_, err = pipe.Exec(ctx)
 	if err != nil {
+		s.cache.drop(storageID)
 		log.Debug().Msgf("error executing batch read block pipe: %v", err)
 		return nil, err
 	}
@@ -438,10 +593,18 @@ func GetRandomPathAndStorageID(treeHeight int, storageCount int) (path int, stor
 	return randomPath, randomStorage
 }
 
+func (s *StorageHandler) GetStorageIDs() (storageIDs []int) {
+	for storageID := range s.storageMus {
+		storageIDs = append(storageIDs, storageID)
+	}
+	sort.Ints(storageIDs)
+	return storageIDs
+}
+
 func (s *StorageHandler) GetRandomStorageID() int {
 	log.Debug().Msgf("Getting random storage id")
-	index := rand.Intn(len(s.storages))
-	for storageID := range s.storages {
+	index := rand.Intn(len(s.storageMus))
+	for storageID := range s.storageMus {
 		if index == 0 {
 			return storageID
 		}
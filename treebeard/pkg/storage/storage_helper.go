@@ -2,9 +2,11 @@ package storage
 
 import (
 	"context"
+	"fmt"
 	"math"
 	"math/rand"
 	"strconv"
+	"strings"
 	"time"
 
 	"github.com/redis/go-redis/v9"
@@ -34,37 +36,78 @@ func shuffleArray(arr []int) {
 	}
 }
 
+// isTreeLoaded tells whether the storage holds every bucket of a tree with this handler's Z, S and value encoding.
+func (s *StorageHandler) isTreeLoaded(redisClient *redis.Client) (bool, error) {
+	ctx := context.Background()
+	dbsize, err := redisClient.DBSize(ctx).Result()
+	if err != nil {
+		return false, err
+	}
+	if dbsize != (int64((math.Pow(float64(s.shift+1), float64(s.treeHeight))))-1)*2 {
+		return false, nil
+	}
+	// A tree generated with other Z and S values has the same number of keys but not the same slots.
+	lastBucketID := int(math.Pow(2, float64(s.treeHeight))) - 1
+	pipe := redisClient.Pipeline()
+	dataCmd := pipe.HLen(ctx, strconv.Itoa(lastBucketID))
+	metadataCmd := pipe.Get(ctx, metadataKey(lastBucketID))
+	valueCmd := pipe.HGet(ctx, strconv.Itoa(lastBucketID), "0")
+	// The metadata of an older tree is a hash, which GET fails on.
+	pipe.Exec(ctx)
+	if dataCmd.Err() != nil {
+		return false, dataCmd.Err()
+	}
+	if dataCmd.Val() != int64(s.Z+s.S) || metadataCmd.Err() != nil {
+		return false, nil
+	}
+	if _, err := parseMetadata(metadataCmd.Val(), s.Z+s.S); err != nil {
+		return false, nil
+	}
+	// Nor can a tree whose values were written with another encoding be read.
+	_, err = s.cipher.Open(valueCmd.Val())
+	return err == nil, nil
+}
+
+// dummyBucket returns the values and slot keys of a bucket that only holds dummies.
+func (s *StorageHandler) dummyBucket(bucketID int) (values []string, slotKeys []string, err error) {
+	values = make([]string, s.Z+s.S)
+	slotKeys = make([]string, s.Z+s.S)
+	realIndex := make([]int, s.Z+s.S)
+	for k := 0; k < s.Z+s.S; k++ {
+		// Generate a random number between 0 and 9
+		realIndex[k] = k
+	}
+	// userID of dummies
+	dummyCount := 1
+	// initialize value array
+	shuffleArray(realIndex)
+	for i := 0; i < s.Z+s.S; i++ {
+		dummyID := "dummy" + strconv.Itoa(dummyCount)
+		dummyString := "b" + strconv.Itoa(bucketID) + "d" + strconv.Itoa(realIndex[i])
+		dummyString, err = s.cipher.Seal(dummyString)
+		if err != nil {
+			log.Error().Msgf("Error encrypting data")
+			return nil, nil, err
+		}
+		// push dummy to array
+		values[realIndex[i]] = dummyString
+		// push meta data of dummies to array
+		slotKeys[realIndex[i]] = dummyID
+		dummyCount++
+	}
+	return values, slotKeys, nil
+}
+
 func (s *StorageHandler) databaseInit(redisClient *redis.Client) (err error) {
 	pipe := redisClient.Pipeline()
 	pipeCount := 0
 	for bucketID := 1; bucketID < int(math.Pow(2, float64(s.treeHeight))); bucketID++ {
-		values := make([]string, s.Z+s.S)
-		metadatas := make([]string, s.Z+s.S)
-		realIndex := make([]int, s.Z+s.S)
-		for k := 0; k < s.Z+s.S; k++ {
-			// Generate a random number between 0 and 9
-			realIndex[k] = k
-		}
-		// userID of dummies
-		dummyCount := 1
-		// initialize value array
-		shuffleArray(realIndex)
-		for i := 0; i < s.Z+s.S; i++ {
-			dummyID := "dummy" + strconv.Itoa(dummyCount)
-			dummyString := "b" + strconv.Itoa(bucketID) + "d" + strconv.Itoa(realIndex[i])
-			dummyString, err = Encrypt(dummyString, s.key)
-			if err != nil {
-				log.Error().Msgf("Error encrypting data")
-				return err
-			}
-			// push dummy to array
-			values[realIndex[i]] = dummyString
-			// push meta data of dummies to array
-			metadatas[i] = strconv.Itoa(realIndex[i]) + dummyID
-			dummyCount++
+		values, slotKeys, err := s.dummyBucket(bucketID)
+		if err != nil {
+			return err
 		}
 		// push content of value array and meta data array
-		s.BatchPushDataAndMetadata(bucketID, values, metadatas, pipe)
+		s.BatchPushDataAndMetadata(bucketID, values, slotKeys, pipe)
 		pipeCount++
 		if pipeCount == 10000 || bucketID == int(math.Pow(2, float64(s.treeHeight)))-1 {
 			_, err = pipe.Exec(context.Background())
@@ -79,91 +122,134 @@ func (s *StorageHandler) databaseInit(redisClient *redis.Client) (err error) {
 	return nil
 }
 
-func (s *StorageHandler) BatchPushDataAndMetadata(bucketId int, valueData []string, valueMetadata []string, pipe redis.Pipeliner) (dataCmd *redis.BoolCmd, metadataCmd *redis.BoolCmd) {
-	ctx := context.Background()
-	kvpMapData := make(map[string]interface{})
-	for i := 0; i < len(valueData); i++ {
-		kvpMapData[strconv.Itoa(i)] = valueData[i]
+// initFileStorage opens an mmap storage and writes the initial tree unless the file already holds one.
+// It reports whether it wrote the tree.
+func (s *StorageHandler) initFileStorage(store *mmapStore) (emptied bool, err error) {
+	buckets := int(math.Pow(2, float64(s.treeHeight)))
+	err = store.open(buckets, s.Z+s.S, s.cipher.sealedSize(s.blockSize))
+	if err != nil {
+		return false, err
 	}
-
-	kvpMapMetadata := make(map[string]interface{})
-	for i := 0; i < len(valueMetadata); i++ {
-		kvpMapMetadata[strconv.Itoa(i)] = valueMetadata[i]
+	if store.isInitialized {
+		// Nor can a tree whose values were written with another encoding be read.
+		values, err := store.getValues(map[int][]int{buckets - 1: {0}})
+		if err != nil {
+			return false, err
+		}
+		if _, err := s.cipher.Open(values[buckets-1][0]); err == nil {
+			log.Info().Msgf("Storage %s already holds a tree; skipping initialization", store.path)
+			return false, nil
+		}
 	}
-	kvpMapMetadata["accessCount"] = 0
-
-	dataCmd = pipe.HMSet(ctx, strconv.Itoa(bucketId), kvpMapData)
-	metadataCmd = pipe.HMSet(ctx, strconv.Itoa(-1*bucketId), kvpMapMetadata)
-
-	return dataCmd, metadataCmd
+	store.setInitialized(false)
+	for bucketID := 1; bucketID < buckets; bucketID++ {
+		values, slotKeys, err := s.dummyBucket(bucketID)
+		if err != nil {
+			return false, err
+		}
+		err = store.writeBucket(bucketID, values, slotKeys)
+		if err != nil {
+			return false, err
+		}
+	}
+	store.setInitialized(true)
+	return true, store.sync()
 }
 
-func parseMetadataBlock(block string) (pos int, key string, err error) {
-	if block == "__null__" {
-		return -1, "", nil
-	}
-	index := 0
-	//log.Debug().Msgf("block: %s", block)
-	for j, char := range block {
-		if char < '0' || char > '9' {
-			index = j
-			break
+// readStoredBuckets reads the valid real blocks of multiple buckets whose sealed values getValues returns,
+// e.g. from an mmap storage or the tree-top cache.
+func (s *StorageHandler) readStoredBuckets(metadataMap map[int]bucketMetadata, getValues func(map[int][]int) (map[int][]string, error)) (blocks map[int]map[string]string, err error) {
+	offsets := make(map[int][]int, len(metadataMap))
+	keys := make(map[int][]string, len(metadataMap))
+	for bucketID, metadata := range metadataMap {
+		for pos, key := range metadata.keys {
+			if metadata.isValid(pos) && !strings.HasPrefix(key, "dummy") {
+				offsets[bucketID] = append(offsets[bucketID], pos)
+				keys[bucketID] = append(keys[bucketID], key)
+			}
 		}
 	}
-	pos, err = strconv.Atoi(block[:index])
+	sealedValues, err := getValues(offsets)
 	if err != nil {
-		return -1, "", err
+		return nil, err
 	}
-	key = block[index:]
-	return pos, key, nil
-}
-
-func parseMetadataBlocks(bucketMetadata map[int]*redis.MapStringStringCmd) (blockOffsets map[int]map[string]int, err error) {
-	allBlockOffsets := make(map[int]map[string]int)
-	for bucketID, metadata := range bucketMetadata {
-		result, err := metadata.Result()
-		if err != nil {
-			return nil, err
-		}
-		allBlockOffsets[bucketID] = make(map[string]int)
-		for redisKey, block := range result {
-			if redisKey == "accessCount" {
-				continue
-			}
-			pos, blockKey, err := parseMetadataBlock(block)
+	blocks = make(map[int]map[string]string, len(metadataMap))
+	for bucketID := range metadataMap {
+		blocks[bucketID] = make(map[string]string)
+		for i, sealed := range sealedValues[bucketID] {
+			blocks[bucketID][keys[bucketID][i]], err = s.cipher.Open(sealed)
 			if err != nil {
 				return nil, err
 			}
-			if pos == -1 {
-				continue
-			}
-			allBlockOffsets[bucketID][blockKey] = pos
 		}
 	}
-	return allBlockOffsets, nil
+	return blocks, nil
 }
 
-// Returns a map of bucketID to a map of block to position. It returns all the valid real and dummy blocks in the bucket.
-// The invalidated blocks are not returned.
-func (s *StorageHandler) BatchGetAllMetaData(bucketIDs []int, storageID int) (map[int]map[string]int, error) {
+// BatchPushDataAndMetadata writes the values of a bucket and its metadata, where slotKeys[offset] is the block in that slot.
+func (s *StorageHandler) BatchPushDataAndMetadata(bucketId int, valueData []string, slotKeys []string, pipe redis.Pipeliner) (dataCmd *redis.BoolCmd, metadataCmd *redis.StatusCmd) {
+	ctx := context.Background()
+	kvpMapData := make(map[string]interface{})
+	for i := 0; i < len(valueData); i++ {
+		kvpMapData[strconv.Itoa(i)] = valueData[i]
+	}
+
+	dataCmd = pipe.HMSet(ctx, strconv.Itoa(bucketId), kvpMapData)
+	metadataCmd = pipe.Set(ctx, metadataKey(bucketId), encodeMetadata(slotKeys), 0)
+
+	return dataCmd, metadataCmd
+}
+
+// batchGetMetadata reads the metadata of multiple buckets with one GET per bucket.
+func (s *StorageHandler) batchGetMetadata(bucketIDs []int, storageID int) (map[int]bucketMetadata, error) {
+	if store, isFile := s.files[storageID]; isFile {
+		return store.getMetadata(bucketIDs)
+	}
+	metadatas := make(map[int]bucketMetadata, len(bucketIDs))
+	cached, bucketIDs := s.cache.split(bucketIDs)
+	if len(cached) > 0 {
+		if err := s.getCachedMetadata(storageID, cached, metadatas); err != nil {
+			return nil, err
+		}
+	}
+	if len(bucketIDs) == 0 {
+		return metadatas, nil
+	}
 	ctx := context.Background()
 	// TODO: write a function to check for duplicate blocks here
 	startTime := time.Now()
 	pipe := s.storages[storageID].Pipeline()
-	results := make(map[int]*redis.MapStringStringCmd)
+	results := make(map[int]*redis.StringCmd)
 	for _, bucketID := range bucketIDs {
-		results[bucketID] = pipe.HGetAll(ctx, strconv.Itoa(-1*bucketID))
+		results[bucketID] = pipe.Get(ctx, metadataKey(bucketID))
 	}
 	_, err := pipe.Exec(ctx)
-	if err != nil {
+	if err != nil && err != redis.Nil {
 		return nil, err
 	}
 	endTime := time.Now()
-	log.Debug().Msgf("BatchGetAllMetaData took %v ms for %d buckets", endTime.Sub(startTime).Milliseconds(), len(bucketIDs))
-	allBlockOffsets, err := parseMetadataBlocks(results)
+	log.Debug().Msgf("batchGetMetadata took %v ms for %d buckets", endTime.Sub(startTime).Milliseconds(), len(bucketIDs))
+	for bucketID, cmd := range results {
+		metadata, err := parseMetadata(cmd.Val(), s.Z+s.S)
+		if err != nil {
+			return nil, fmt.Errorf("invalid metadata of bucket %d; %v", bucketID, err)
+		}
+		metadatas[bucketID] = metadata
+	}
+	return metadatas, nil
+}
+
+// Returns a map of bucketID to a map of block to position. It returns all the valid real and dummy blocks in the bucket.
+// The invalidated blocks are not returned.
+func (s *StorageHandler) BatchGetAllMetaData(bucketIDs []int, storageID int) (map[int]map[string]int, error) {
+	metadatas, err := s.batchGetMetadata(bucketIDs, storageID)
 	if err != nil {
 		return nil, err
 	}
+	allBlockOffsets := make(map[int]map[string]int, len(metadatas))
+	for bucketID, metadata := range metadatas {
+		allBlockOffsets[bucketID] = metadata.offsets()
+	}
 	return allBlockOffsets, nil
 }
 
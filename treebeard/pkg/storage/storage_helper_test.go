@@ -6,86 +6,14 @@ import (
 	"testing"
 
 	"github.com/dsg-uwaterloo/treebeard/pkg/config"
-	"github.com/redis/go-redis/v9"
 )
 
-func TestParseMetadataBlockParsesKeyAndPos(t *testing.T) {
-	metadata := "2dummy1"
-	pos, key, _ := parseMetadataBlock(metadata)
-	if key != "dummy1" {
-		t.Errorf("expected user1, but found %s", key)
-	}
-	if pos != 2 {
-		t.Errorf("expected 2, but found %d", pos)
-	}
-}
-
-func TestParseMetadataBlockReturnsNegativePosOnInvalidMetadata(t *testing.T) {
-	metadata := "__nul__"
-	pos, _, _ := parseMetadataBlock(metadata)
-	if pos != -1 {
-		t.Errorf("expected -1, but found %d", pos)
-	}
-}
-
-func TestParseMetadataBlocksReturnsAllValidRealAndDummyBlocks(t *testing.T) {
-	metadataMap := make(map[int]*redis.MapStringStringCmd)
-	metadataMap[1] = redis.NewMapStringStringCmd(context.Background())
-	metadataMap[1].SetVal(map[string]string{
-		"accessCount": "4",
-		"1":           "2user1",
-		"2":           "2dummy1",
-		"3":           "3dummy2",
-		"4":           "__null__",
-	})
-	expectedOffsetMap1 := map[string]int{
-		"user1":  2,
-		"dummy1": 2,
-		"dummy2": 3,
-	}
-	metadataMap[2] = redis.NewMapStringStringCmd(context.Background())
-	metadataMap[2].SetVal(map[string]string{
-		"accessCount": "4",
-		"1":           "2user5",
-		"2":           "2dummy3",
-		"3":           "__null__",
-		"4":           "__null__",
-	})
-	expectedOffsetMap2 := map[string]int{
-		"user5":  2,
-		"dummy3": 2,
-	}
-	blockOffsets, err := parseMetadataBlocks(metadataMap)
-	if err != nil {
-		t.Errorf("error parsing metadata blocks")
-	}
-	if len(blockOffsets) != 2 {
-		t.Errorf("expected 2 buckets, but found %d", len(blockOffsets))
-	}
-	if len(blockOffsets[1]) != len(expectedOffsetMap1) {
-		t.Errorf("expected %d blocks, but found %d", len(expectedOffsetMap1), len(blockOffsets[1]))
-	}
-	if len(blockOffsets[2]) != len(expectedOffsetMap2) {
-		t.Errorf("expected %d blocks, but found %d", len(expectedOffsetMap2), len(blockOffsets[2]))
-	}
-	for key, val := range expectedOffsetMap1 {
-		if blockOffsets[1][key] != val {
-			t.Errorf("expected %d, but found %d", val, blockOffsets[1][key])
-		}
-	}
-	for key, val := range expectedOffsetMap2 {
-		if blockOffsets[2][key] != val {
-			t.Errorf("expected %d, but found %d", val, blockOffsets[2][key])
-		}
-	}
-}
-
 // Expects redis to be running on port 6379
 func TestBatchGetAllMetaDataReturnsAllBucketOffsets(t *testing.T) {
 	storageHandler := NewStorageHandler(3, 1, 9, 1, []config.RedisEndpoint{{ID: 0, IP: "localhost", Port: 6379}})
 	storageHandler.InitDatabase()
 	pipe := storageHandler.storages[0].Pipeline()
-	storageHandler.BatchPushDataAndMetadata(1, []string{"user1", "user2", "user3"}, []string{"2user5", "3user2"}, pipe)
+	storageHandler.BatchPushDataAndMetadata(1, []string{"user1", "user2", "user3"}, []string{"", "", "user5", "user2", "", "", "", "", "", ""}, pipe)
 	_, err := pipe.Exec(context.Background())
 	if err != nil {
 		t.Errorf("error pushing data and metadata")
@@ -111,7 +39,7 @@ func TestBatchPushDataAndMetadataResetsAccessCount(t *testing.T) {
 	storageHandler := NewStorageHandler(3, 1, 9, 1, []config.RedisEndpoint{{ID: 0, IP: "localhost", Port: 6379}})
 	storageHandler.InitDatabase()
 	pipe := storageHandler.storages[0].Pipeline()
-	storageHandler.BatchPushDataAndMetadata(1, []string{"user1", "user2", "user3"}, []string{"2user5", "3user2"}, pipe)
+	storageHandler.BatchPushDataAndMetadata(1, []string{"user1", "user2", "user3"}, []string{"", "", "user5", "user2", "", "", "", "", "", ""}, pipe)
 	_, err := pipe.Exec(context.Background())
 	if err != nil {
 		t.Errorf("error pushing data and metadata")
@@ -124,3 +52,19 @@ func TestBatchPushDataAndMetadataResetsAccessCount(t *testing.T) {
 		t.Errorf("expected 0, but found %d", counts[1])
 	}
 }
+
+func TestIsTreeLoadedDetectsATreeWithTheSameParameters(t *testing.T) {
+	s := NewStorageHandler(3, 1, 9, 1, []config.RedisEndpoint{{ID: 0, IP: "localhost", Port: 6379}})
+	s.storages[0].FlushAll(context.Background())
+	if loaded, _ := s.isTreeLoaded(s.storages[0]); loaded {
+		t.Errorf("expected an empty storage not to hold a tree")
+	}
+	s.InitDatabase()
+	if loaded, _ := s.isTreeLoaded(s.storages[0]); !loaded {
+		t.Errorf("expected an initialized storage to hold a tree")
+	}
+	other := NewStorageHandler(3, 2, 9, 1, []config.RedisEndpoint{{ID: 0, IP: "localhost", Port: 6379}})
+	if loaded, _ := other.isTreeLoaded(other.storages[0]); loaded {
+		t.Errorf("expected a tree with other Z and S not to be reused")
+	}
+}
@@ -2,6 +2,7 @@ package storage
 
 import (
 	"context"
+	"path/filepath"
 	"strconv"
 	"strings"
 	"testing"
@@ -10,6 +11,25 @@ import (
 	"github.com/rs/zerolog/log"
 )
 
+// forEachBackend runs a test against redis on port 6379 and against an mmap file.
+func forEachBackend(t *testing.T, test func(t *testing.T, endpoints []config.RedisEndpoint)) {
+	t.Run("redis", func(t *testing.T) {
+		test(t, []config.RedisEndpoint{{ID: 0, IP: "localhost", Port: 6379}})
+	})
+	t.Run("mmap", func(t *testing.T) {
+		test(t, []config.RedisEndpoint{{ID: 0, Backend: config.MmapBackend, Path: filepath.Join(t.TempDir(), "storage")}})
+	})
+}
+
+// readSlot returns the stored value in a slot of a bucket.
+func readSlot(s *StorageHandler, storageID int, bucketID int, offset int) string {
+	if store, isFile := s.files[storageID]; isFile {
+		values, _ := store.getValues(map[int][]int{bucketID: {offset}})
+		return values[bucketID][0]
+	}
+	return s.storages[storageID].HGet(context.Background(), strconv.Itoa(bucketID), strconv.Itoa(offset)).Val()
+}
+
 func TestGetBucketsInPathsReturnsAllBucketIDsInPath(t *testing.T) {
 	s := NewStorageHandler(3, 9, 1, 1, []config.RedisEndpoint{})
 	buckets, err := s.GetBucketsInPaths([]int{1})
@@ -56,121 +76,166 @@ func TestGetMultipleReverseLexicographicPaths(t *testing.T) {
 }
 
 func TestBatchWriteBucket(t *testing.T) {
-	log.Debug().Msgf("TestBatchWriteBucket")
-	bucketIds := []int{0, 1, 2, 3, 4, 5}
-	storageId := 0
-	s := NewStorageHandler(3, 1, 9, 1, []config.RedisEndpoint{{ID: 0, IP: "localhost", Port: 6379}})
-	s.InitDatabase()
-	expectedWrittenBlocks := map[string]string{"usr0": "value0", "usr1": "value1", "usr2": "value2", "usr3": "value3", "usr4": "value4", "usr5": "value5"}
-	toWriteBlocks := map[int]map[string]string{0: {"usr0": "value0"}, 1: {"usr1": "value1"}, 2: {"usr2": "value2"}, 3: {"usr3": "value3"}, 4: {"usr4": "value4"}, 5: {"usr5": "value5"}}
-	writtenBlocks, _ := s.BatchWriteBucket(storageId, toWriteBlocks, map[string]BlockInfo{})
-	for block := range writtenBlocks {
-		if _, exist := expectedWrittenBlocks[block]; !exist {
-			t.Errorf("%s was written", block)
+	forEachBackend(t, func(t *testing.T, endpoints []config.RedisEndpoint) {
+		log.Debug().Msgf("TestBatchWriteBucket")
+		bucketIds := []int{0, 1, 2, 3, 4, 5}
+		storageId := 0
+		s := NewStorageHandler(3, 1, 9, 1, endpoints)
+		s.InitDatabase()
+		expectedWrittenBlocks := map[string]string{"usr0": "value0", "usr1": "value1", "usr2": "value2", "usr3": "value3", "usr4": "value4", "usr5": "value5"}
+		toWriteBlocks := map[int]map[string]string{0: {"usr0": "value0"}, 1: {"usr1": "value1"}, 2: {"usr2": "value2"}, 3: {"usr3": "value3"}, 4: {"usr4": "value4"}, 5: {"usr5": "value5"}}
+		writtenBlocks, _ := s.BatchWriteBucket(storageId, toWriteBlocks, map[string]BlockInfo{})
+		for block := range writtenBlocks {
+			if _, exist := expectedWrittenBlocks[block]; !exist {
+				t.Errorf("%s was written", block)
+			}
 		}
-	}
-	metadatas, err := s.BatchGetAllMetaData(bucketIds, storageId)
-	if err != nil {
-		t.Errorf("error getting metadata")
-	}
-	for _, bucketID := range bucketIds {
-		metadata := metadatas[bucketID]
-		for key, _ := range toWriteBlocks[bucketID] {
-			if _, exist := metadata[key]; !exist {
-				t.Errorf("%s was not written", key)
+		metadatas, err := s.BatchGetAllMetaData(bucketIds, storageId)
+		if err != nil {
+			t.Errorf("error getting metadata")
+		}
+		for _, bucketID := range bucketIds {
+			metadata := metadatas[bucketID]
+			for key, _ := range toWriteBlocks[bucketID] {
+				if _, exist := metadata[key]; !exist {
+					t.Errorf("%s was not written", key)
+				}
 			}
 		}
-	}
+	})
 }
 
 func TestBatchReadBlock(t *testing.T) {
-	log.Debug().Msgf("TestBatchReadBlock")
-	bucketIds := []int{1, 2, 3, 4, 5}
-	storageId := 0
-	s := NewStorageHandler(3, 1, 9, 1, []config.RedisEndpoint{{ID: 0, IP: "localhost", Port: 6379}})
-	s.InitDatabase()
-	toWriteBlocks := map[int]map[string]string{1: {"usr1": "value1"}, 2: {"usr2": "value2"}, 3: {"usr3": "value3"}, 4: {"usr4": "value4"}, 5: {"usr5": "value5"}}
-	s.BatchWriteBucket(storageId, toWriteBlocks, map[string]BlockInfo{})
-	metadatas, err := s.BatchGetAllMetaData(bucketIds, storageId)
-	if err != nil {
-		t.Errorf("error getting metadata")
-	}
-	for _, bucketID := range bucketIds {
-		metadata := metadatas[bucketID]
-		for key, pos := range metadata {
-			if strings.HasPrefix(key, "dummy") {
-				continue
-			}
-			res := s.storages[0].HGet(context.Background(), strconv.Itoa(bucketID), strconv.Itoa(pos))
-			decrypted, _ := Decrypt(res.Val(), s.key)
-			if decrypted != toWriteBlocks[bucketID][key] {
-				t.Errorf("expected %s, but got %s", toWriteBlocks[bucketID][key], decrypted)
+	forEachBackend(t, func(t *testing.T, endpoints []config.RedisEndpoint) {
+		log.Debug().Msgf("TestBatchReadBlock")
+		bucketIds := []int{1, 2, 3, 4, 5}
+		storageId := 0
+		s := NewStorageHandler(3, 1, 9, 1, endpoints)
+		s.InitDatabase()
+		toWriteBlocks := map[int]map[string]string{1: {"usr1": "value1"}, 2: {"usr2": "value2"}, 3: {"usr3": "value3"}, 4: {"usr4": "value4"}, 5: {"usr5": "value5"}}
+		s.BatchWriteBucket(storageId, toWriteBlocks, map[string]BlockInfo{})
+		metadatas, err := s.BatchGetAllMetaData(bucketIds, storageId)
+		if err != nil {
+			t.Errorf("error getting metadata")
+		}
+		for _, bucketID := range bucketIds {
+			metadata := metadatas[bucketID]
+			for key, pos := range metadata {
+				if strings.HasPrefix(key, "dummy") {
+					continue
+				}
+				res := readSlot(s, 0, bucketID, pos)
+				decrypted, _ := s.cipher.Open(res)
+				if decrypted != toWriteBlocks[bucketID][key] {
+					t.Errorf("expected %s, but got %s", toWriteBlocks[bucketID][key], decrypted)
+				}
 			}
 		}
-	}
+	})
 }
 
 func TestBatchGetBlockOffset(t *testing.T) {
-	bucketIDs := []int{1, 2, 3, 4, 5}
-	s := NewStorageHandler(4, 1, 9, 1, []config.RedisEndpoint{{ID: 0, IP: "localhost", Port: 6379}})
-	s.InitDatabase()
-	toWriteBlocks := map[int]map[string]string{1: {"usr1": "value1"}, 2: {"usr2": "value2"}, 3: {"usr3": "value3"}, 4: {"usr4": "value4"}, 5: {"usr5": "value5"}}
-	s.BatchWriteBucket(0, toWriteBlocks, map[string]BlockInfo{})
-	metadatas, err := s.BatchGetAllMetaData(bucketIDs, 0)
-	if err != nil {
-		t.Errorf("error getting metadata")
-	}
-	blockoffsetStatuses, err := s.BatchGetBlockOffset(bucketIDs, 0, []string{"usr1", "usr3"})
-	if err != nil {
-		t.Errorf("error getting block offset")
-	}
-	usr1Offset := 0
-	usr3Offset := 0
-	for _, bucketID := range bucketIDs {
-		metadata := metadatas[bucketID]
-		for key, pos := range metadata {
-			if strings.HasPrefix(key, "dummy") {
-				continue
+	forEachBackend(t, func(t *testing.T, endpoints []config.RedisEndpoint) {
+		bucketIDs := []int{1, 2, 3, 4, 5}
+		s := NewStorageHandler(4, 1, 9, 1, endpoints)
+		s.InitDatabase()
+		toWriteBlocks := map[int]map[string]string{1: {"usr1": "value1"}, 2: {"usr2": "value2"}, 3: {"usr3": "value3"}, 4: {"usr4": "value4"}, 5: {"usr5": "value5"}}
+		s.BatchWriteBucket(0, toWriteBlocks, map[string]BlockInfo{})
+		metadatas, err := s.BatchGetAllMetaData(bucketIDs, 0)
+		if err != nil {
+			t.Errorf("error getting metadata")
+		}
+		blockoffsetStatuses, err := s.BatchGetBlockOffset(bucketIDs, 0, []string{"usr1", "usr3"})
+		if err != nil {
+			t.Errorf("error getting block offset")
+		}
+		usr1Offset := 0
+		usr3Offset := 0
+		for _, bucketID := range bucketIDs {
+			metadata := metadatas[bucketID]
+			for key, pos := range metadata {
+				if strings.HasPrefix(key, "dummy") {
+					continue
+				}
+				if key == "usr1" {
+					usr1Offset = pos
+				}
+				if key == "usr3" {
+					usr3Offset = pos
+				}
 			}
-			if key == "usr1" {
-				usr1Offset = pos
+		}
+		if blockoffsetStatuses[1].Offset != usr1Offset || blockoffsetStatuses[1].IsReal != true || blockoffsetStatuses[1].BlockFound != "usr1" {
+			t.Errorf("expected offset %d, but got %d", usr1Offset, blockoffsetStatuses[1].Offset)
+		}
+		if blockoffsetStatuses[3].Offset != usr3Offset || blockoffsetStatuses[3].IsReal != true || blockoffsetStatuses[3].BlockFound != "usr3" {
+			t.Errorf("expected offset %d, but got %d", usr3Offset, blockoffsetStatuses[3].Offset)
+		}
+	})
+}
+
+func TestBatchGetBlockOffsetFallsBackToAnotherDummyAfterAnInvalidation(t *testing.T) {
+	forEachBackend(t, func(t *testing.T, endpoints []config.RedisEndpoint) {
+		bucketIDs := []int{1, 2, 3}
+		s := NewStorageHandler(4, 1, 9, 1, endpoints)
+		s.InitDatabase()
+		s.BatchWriteBucket(0, map[int]map[string]string{1: {}, 2: {}, 3: {}}, map[string]BlockInfo{})
+
+		readOffsets := make(map[int]map[int]bool)
+		for read := 0; read < 2; read++ {
+			blockoffsetStatuses, err := s.BatchGetBlockOffset(bucketIDs, 0, []string{"usr1"})
+			if err != nil {
+				t.Fatalf("error getting block offset in read %d; %s", read, err)
+			}
+			offsets := make(map[int]int)
+			for _, bucketID := range bucketIDs {
+				status := blockoffsetStatuses[bucketID]
+				if status.IsReal || !strings.HasPrefix(status.BlockFound, "dummy") {
+					t.Errorf("expected a dummy in bucket %d, but got %+v", bucketID, status)
+				}
+				if readOffsets[bucketID][status.Offset] {
+					t.Errorf("expected read %d of bucket %d to pick another slot than %d", read, bucketID, status.Offset)
+				}
+				if readOffsets[bucketID] == nil {
+					readOffsets[bucketID] = make(map[int]bool)
+				}
+				readOffsets[bucketID][status.Offset] = true
+				offsets[bucketID] = status.Offset
 			}
-			if key == "usr3" {
-				usr3Offset = pos
+			if _, err := s.BatchReadBlock(offsets, 0); err != nil {
+				t.Fatalf("error reading blocks in read %d; %s", read, err)
 			}
 		}
-	}
-	if blockoffsetStatuses[1].Offset != usr1Offset || blockoffsetStatuses[1].IsReal != true || blockoffsetStatuses[1].BlockFound != "usr1" {
-		t.Errorf("expected offset %d, but got %d", usr1Offset, blockoffsetStatuses[1].Offset)
-	}
-	if blockoffsetStatuses[3].Offset != usr3Offset || blockoffsetStatuses[3].IsReal != true || blockoffsetStatuses[3].BlockFound != "usr3" {
-		t.Errorf("expected offset %d, but got %d", usr3Offset, blockoffsetStatuses[3].Offset)
-	}
+	})
 }
 
 func TestBatchReadBucketReturnsBlocksInAllBuckets(t *testing.T) {
-	s := NewStorageHandler(4, 1, 9, 1, []config.RedisEndpoint{{ID: 0, IP: "localhost", Port: 6379}})
-	s.InitDatabase()
-	toWriteBlocks := map[int]map[string]string{1: {"usr1": "value1"}, 2: {"usr2": "value2"}, 3: {"usr3": "value3"}, 4: {"usr4": "value4"}, 5: {"usr5": "value5"}}
-	s.BatchWriteBucket(0, toWriteBlocks, map[string]BlockInfo{})
-	blocks, err := s.BatchReadBucket([]int{1, 2, 3, 4, 5}, 0)
-	if err != nil {
-		t.Errorf("error reading bucket")
-	}
-	expectedReadBuckets := toWriteBlocks
-	log.Debug().Msgf("blocks: %v", expectedReadBuckets)
-	for bucketID, blockToVal := range expectedReadBuckets {
-		for block, val := range blockToVal {
-			if blocks[bucketID][block] != val {
-				t.Errorf("expected %s, but got %s", val, blocks[bucketID][block])
+	forEachBackend(t, func(t *testing.T, endpoints []config.RedisEndpoint) {
+		s := NewStorageHandler(4, 1, 9, 1, endpoints)
+		s.InitDatabase()
+		toWriteBlocks := map[int]map[string]string{1: {"usr1": "value1"}, 2: {"usr2": "value2"}, 3: {"usr3": "value3"}, 4: {"usr4": "value4"}, 5: {"usr5": "value5"}}
+		s.BatchWriteBucket(0, toWriteBlocks, map[string]BlockInfo{})
+		blocks, err := s.BatchReadBucket([]int{1, 2, 3, 4, 5}, 0)
+		if err != nil {
+			t.Errorf("error reading bucket")
+		}
+		expectedReadBuckets := toWriteBlocks
+		log.Debug().Msgf("blocks: %v", expectedReadBuckets)
+		for bucketID, blockToVal := range expectedReadBuckets {
+			for block, val := range blockToVal {
+				if blocks[bucketID][block] != val {
+					t.Errorf("expected %s, but got %s", val, blocks[bucketID][block])
+				}
 			}
 		}
-	}
+	})
 }
 
 func TestRandom(t *testing.T) {
-	s := NewStorageHandler(4, 1, 9, 1, []config.RedisEndpoint{{ID: 0, IP: "localhost", Port: 6379}})
-	s.InitDatabase()
-	toWriteBlocks := map[int]map[string]string{1: {"usr1": "value1"}, 2: {"usr2": "value2"}, 3: {"usr3": "value3"}, 4: {"usr4": "value4"}, 5: {"usr5": "value5"}}
-	s.BatchWriteBucket(0, toWriteBlocks, map[string]BlockInfo{})
+	forEachBackend(t, func(t *testing.T, endpoints []config.RedisEndpoint) {
+		s := NewStorageHandler(4, 1, 9, 1, endpoints)
+		s.InitDatabase()
+		toWriteBlocks := map[int]map[string]string{1: {"usr1": "value1"}, 2: {"usr2": "value2"}, 3: {"usr3": "value3"}, 4: {"usr4": "value4"}, 5: {"usr5": "value5"}}
+		s.BatchWriteBucket(0, toWriteBlocks, map[string]BlockInfo{})
+	})
 }
@@ -0,0 +1,249 @@
+package storage
+
+import (
+	"context"
+	"fmt"
+	"math"
+	"strconv"
+	"sync"
+	"sync/atomic"
+
+	"github.com/redis/go-redis/v9"
+	"github.com/rs/zerolog/log"
+)
+
+// A tree-top cache keeps the buckets of the top levels of every redis storage in memory.
+// Every path goes through them, so their metadata, access counts and values are read from memory
+// instead of redis. Writes and invalidations still go to redis, so that a new raft leader,
+// whose cache starts empty, finds the same tree in redis.
+// mmap storages are already in memory and are not cached.
+type treeTopCache struct {
+	limit int // buckets with a smaller ID are cached
+	// mu guards buckets; a storage is loaded from redis on its first access.
+	mu      sync.Mutex
+	buckets map[int]map[int]*cachedBucket // map of storage id to the cached buckets
+	hits    atomic.Uint64
+	misses  atomic.Uint64
+}
+
+type cachedBucket struct {
+	metadata bucketMetadata
+	values   []string // sealed values by slot, as stored in redis
+}
+
+func newTreeTopCache() *treeTopCache {
+	return &treeTopCache{limit: 1, buckets: make(map[int]map[int]*cachedBucket)}
+}
+
+// SetTreeTopCacheLevels caches the top levels of the tree of every redis storage; zero disables the cache.
+func (s *StorageHandler) SetTreeTopCacheLevels(levels int) {
+	s.cache.mu.Lock()
+	defer s.cache.mu.Unlock()
+	// Level l holds the buckets with IDs below 2^(shift*(l+1)), like GetBucketsInPaths walks them.
+	s.cache.limit = int(math.Min(math.Pow(2, float64(s.shift*levels)), math.Pow(2, float64(s.treeHeight))))
+	s.cache.buckets = make(map[int]map[int]*cachedBucket)
+}
+
+// ResetTreeTopCache drops the cached buckets, which are loaded from redis again on their next access.
+// It has to be called whenever redis may have been written by another oram node, e.g. on a leader change.
+func (s *StorageHandler) ResetTreeTopCache() {
+	s.cache.mu.Lock()
+	defer s.cache.mu.Unlock()
+	s.cache.buckets = make(map[int]map[int]*cachedBucket)
+}
+
+// TreeTopCacheStats returns how many bucket accesses of redis storages were served by the tree-top cache and by redis.
+func (s *StorageHandler) TreeTopCacheStats() (hits uint64, misses uint64) {
+	return s.cache.hits.Load(), s.cache.misses.Load()
+}
+
+func (c *treeTopCache) holds(bucketID int) bool {
+	return bucketID < c.limit
+}
+
+// split separates the cached buckets from the ones read from redis and counts them.
+// It is the only place that counts hits and misses, so that every bucket access is counted once.
+func (c *treeTopCache) split(bucketIDs []int) (cached []int, uncached []int) {
+	cached, uncached = c.partition(bucketIDs)
+	c.hits.Add(uint64(len(cached)))
+	c.misses.Add(uint64(len(uncached)))
+	return cached, uncached
+}
+
+// partition separates the cached buckets from the ones read from redis without counting them,
+// e.g. for bulk loads that are not bucket accesses of a ReadPath or an eviction.
+func (c *treeTopCache) partition(bucketIDs []int) (cached []int, uncached []int) {
+	for _, bucketID := range bucketIDs {
+		if c.holds(bucketID) {
+			cached = append(cached, bucketID)
+		} else {
+			uncached = append(uncached, bucketID)
+		}
+	}
+	return cached, uncached
+}
+
+// drop forgets the cached buckets of a storage after a write that may not have reached redis.
+func (c *treeTopCache) drop(storageID int) {
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	delete(c.buckets, storageID)
+}
+
+// treeTopBuckets returns the cached buckets of a redis storage and loads them on the first access.
+// The caller holds s.cache.mu.
+func (s *StorageHandler) treeTopBuckets(storageID int) (map[int]*cachedBucket, error) {
+	if buckets, loaded := s.cache.buckets[storageID]; loaded {
+		return buckets, nil
+	}
+	ctx := context.Background()
+	pipe := s.storages[storageID].Pipeline()
+	metadataCmds := make(map[int]*redis.StringCmd)
+	dataCmds := make(map[int]*redis.MapStringStringCmd)
+	for bucketID := 1; bucketID < s.cache.limit; bucketID++ {
+		metadataCmds[bucketID] = pipe.Get(ctx, metadataKey(bucketID))
+		dataCmds[bucketID] = pipe.HGetAll(ctx, strconv.Itoa(bucketID))
+	}
+	_, err := pipe.Exec(ctx)
+	if err != nil {
+		return nil, err
+	}
+	buckets := make(map[int]*cachedBucket, len(metadataCmds))
+	for bucketID, cmd := range metadataCmds {
+		metadata, err := parseMetadata(cmd.Val(), s.Z+s.S)
+		if err != nil {
+			return nil, fmt.Errorf("invalid metadata of bucket %d; %v", bucketID, err)
+		}
+		data := dataCmds[bucketID].Val()
+		values := make([]string, s.Z+s.S)
+		for offset := range values {
+			values[offset] = data[strconv.Itoa(offset)]
+		}
+		buckets[bucketID] = &cachedBucket{metadata: metadata, values: values}
+	}
+	s.cache.buckets[storageID] = buckets
+	log.Info().Msgf("Loaded %d buckets of storage %d into the tree-top cache", len(buckets), storageID)
+	return buckets, nil
+}
+
+// getCachedMetadata returns copies of the metadata of cached buckets.
+func (s *StorageHandler) getCachedMetadata(storageID int, bucketIDs []int, metadatas map[int]bucketMetadata) error {
+	s.cache.mu.Lock()
+	defer s.cache.mu.Unlock()
+	buckets, err := s.treeTopBuckets(storageID)
+	if err != nil {
+		return err
+	}
+	for _, bucketID := range bucketIDs {
+		metadata := buckets[bucketID].metadata
+		metadata.valid = append([]byte(nil), metadata.valid...)
+		metadatas[bucketID] = metadata
+	}
+	return nil
+}
+
+// getCachedAccessCounts returns the access counts of cached buckets.
+func (s *StorageHandler) getCachedAccessCounts(storageID int, bucketIDs []int, counts map[int]int) error {
+	s.cache.mu.Lock()
+	defer s.cache.mu.Unlock()
+	buckets, err := s.treeTopBuckets(storageID)
+	if err != nil {
+		return err
+	}
+	for _, bucketID := range bucketIDs {
+		counts[bucketID] = buckets[bucketID].metadata.accessCount
+	}
+	return nil
+}
+
+// getCachedValues returns the sealed values in the given slots of cached buckets.
+func (s *StorageHandler) getCachedValues(storageID int, bucketOffsets map[int][]int) (map[int][]string, error) {
+	s.cache.mu.Lock()
+	defer s.cache.mu.Unlock()
+	buckets, err := s.treeTopBuckets(storageID)
+	if err != nil {
+		return nil, err
+	}
+	values := make(map[int][]string, len(bucketOffsets))
+	for bucketID, offsets := range bucketOffsets {
+		values[bucketID] = make([]string, len(offsets))
+		for i, offset := range offsets {
+			values[bucketID][i] = buckets[bucketID].values[offset]
+		}
+	}
+	return values, nil
+}
+
+// readAndInvalidateCached does what readAndInvalidate does for an mmap storage on cached buckets.
+// The caller has to write the invalidations to redis as well.
+func (s *StorageHandler) readAndInvalidateCached(storageID int, bucketOffsets map[int]int) (values map[int]string, accessCounts map[int]int, err error) {
+	s.cache.mu.Lock()
+	defer s.cache.mu.Unlock()
+	buckets, err := s.treeTopBuckets(storageID)
+	if err != nil {
+		return nil, nil, err
+	}
+	values, accessCounts = invalidateCached(buckets, bucketOffsets)
+	return values, accessCounts, nil
+}
+
+func invalidateCached(buckets map[int]*cachedBucket, bucketOffsets map[int]int) (values map[int]string, accessCounts map[int]int) {
+	values = make(map[int]string, len(bucketOffsets))
+	accessCounts = make(map[int]int, len(bucketOffsets))
+	for bucketID, offset := range bucketOffsets {
+		bucket := buckets[bucketID]
+		values[bucketID] = bucket.values[offset]
+		bucket.metadata.valid[offset/8] &^= 0x80 >> (offset % 8)
+		bucket.metadata.accessCount++
+		accessCounts[bucketID] = bucket.metadata.accessCount
+	}
+	return values, accessCounts
+}
+
+// readCachedPath does what the read path script does on cached buckets
+// and adds the found blocks and the access counts to values and accessCounts.
+// It returns the slot read from every bucket, which still has to be invalidated in redis.
+func (s *StorageHandler) readCachedPath(storageID int, bucketIDs []int, blocks []string, values map[string]string, accessCounts map[int]int) (offsets map[int]int, err error) {
+	s.cache.mu.Lock()
+	buckets, err := s.treeTopBuckets(storageID)
+	if err != nil {
+		s.cache.mu.Unlock()
+		return nil, err
+	}
+	metadatas := make(map[int]bucketMetadata, len(bucketIDs))
+	for _, bucketID := range bucketIDs {
+		metadatas[bucketID] = buckets[bucketID].metadata
+	}
+	offsets, realBlocks, err := findPathOffsets(metadatas, bucketIDs, blocks)
+	if err != nil {
+		s.cache.mu.Unlock()
+		return nil, err
+	}
+	sealedValues, counts := invalidateCached(buckets, offsets)
+	s.cache.mu.Unlock()
+
+	for bucketID, count := range counts {
+		accessCounts[bucketID] = count
+	}
+	for bucketID, block := range realBlocks {
+		values[block], err = s.cipher.Open(sealedValues[bucketID])
+		if err != nil {
+			return nil, err
+		}
+	}
+	return offsets, nil
+}
+
+// writeCachedBuckets replaces cached buckets after they were written to redis.
+func (s *StorageHandler) writeCachedBuckets(storageID int, written map[int]*cachedBucket) {
+	s.cache.mu.Lock()
+	defer s.cache.mu.Unlock()
+	buckets, loaded := s.cache.buckets[storageID]
+	if !loaded {
+		// They are read from redis when the storage is loaded.
+		return
+	}
+	for bucketID, bucket := range written {
+		buckets[bucketID] = bucket
+	}
+}
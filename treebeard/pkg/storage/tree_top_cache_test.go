@@ -0,0 +1,156 @@
+package storage
+
+import (
+	"testing"
+
+	"github.com/dsg-uwaterloo/treebeard/pkg/config"
+)
+
+func newCachedStorageHandler(levels int) *StorageHandler {
+	s := NewStorageHandler(4, 1, 9, 1, []config.RedisEndpoint{{ID: 0, IP: "localhost", Port: 6379}})
+	s.SetTreeTopCacheLevels(levels)
+	return s
+}
+
+func TestTreeTopCacheServesTopBucketsAndWritesThroughToRedis(t *testing.T) {
+	s := newCachedStorageHandler(2)
+	s.InitDatabase()
+	toWriteBlocks := map[int]map[string]string{1: {"usr1": "value1"}, 2: {"usr2": "value2"}, 4: {"usr4": "value4"}}
+	s.BatchWriteBucket(0, toWriteBlocks, map[string]BlockInfo{})
+
+	values, accessCounts, err := s.BatchReadPath([]int{1, 2, 4}, 0, []string{"usr1", "usr4"})
+	if err != nil {
+		t.Fatalf("error reading path; %s", err)
+	}
+	if len(values) != 2 || values["usr1"] != "value1" || values["usr4"] != "value4" {
+		t.Errorf("expected usr1 and usr4 with their values, but got %v", values)
+	}
+	for _, bucketID := range []int{1, 2, 4} {
+		if accessCounts[bucketID] != 1 {
+			t.Errorf("expected access count 1 for bucket %d, but got %d", bucketID, accessCounts[bucketID])
+		}
+	}
+	hits, misses := s.TreeTopCacheStats()
+	if hits != 2 || misses != 1 {
+		t.Errorf("expected 2 hits and 1 miss, but got %d and %d", hits, misses)
+	}
+
+	// A handler without the cache only sees redis.
+	uncached := newCachedStorageHandler(0)
+	metadatas, err := uncached.BatchGetAllMetaData([]int{1, 2}, 0)
+	if err != nil {
+		t.Fatalf("error getting metadata; %s", err)
+	}
+	if _, exists := metadatas[1]["usr1"]; exists {
+		t.Errorf("expected usr1 to be invalidated in redis")
+	}
+	if _, exists := metadatas[2]["dummy1"]; exists {
+		t.Errorf("expected dummy1 of bucket 2 to be invalidated in redis")
+	}
+	counts, err := uncached.BatchGetAccessCount([]int{1, 2}, 0)
+	if err != nil {
+		t.Fatalf("error getting access counts; %s", err)
+	}
+	if counts[1] != 1 || counts[2] != 1 {
+		t.Errorf("expected access count 1 for buckets 1 and 2 in redis, but got %v", counts)
+	}
+}
+
+func TestTreeTopCacheReadsABucketRepeatedly(t *testing.T) {
+	s := newCachedStorageHandler(2)
+	s.InitDatabase()
+	s.BatchWriteBucket(0, map[int]map[string]string{1: {}, 2: {}, 4: {}}, map[string]BlockInfo{})
+
+	for read := 1; read <= 3; read++ {
+		_, accessCounts, err := s.BatchReadPath([]int{1, 2, 4}, 0, []string{"usr1"})
+		if err != nil {
+			t.Fatalf("error in read %d of the path; %s", read, err)
+		}
+		for _, bucketID := range []int{1, 2, 4} {
+			if accessCounts[bucketID] != read {
+				t.Errorf("expected access count %d for bucket %d, but got %d", read, bucketID, accessCounts[bucketID])
+			}
+		}
+	}
+	// Redis invalidated the same slots as the cache.
+	uncached := newCachedStorageHandler(0)
+	metadatas, err := uncached.BatchGetAllMetaData([]int{1, 2}, 0)
+	if err != nil {
+		t.Fatalf("error getting metadata; %s", err)
+	}
+	for _, bucketID := range []int{1, 2} {
+		if len(metadatas[bucketID]) != 7 {
+			t.Errorf("expected 7 valid slots in bucket %d, but got %v", bucketID, metadatas[bucketID])
+		}
+		if _, exists := metadatas[bucketID]["dummy4"]; !exists {
+			t.Errorf("expected dummy4 to stay valid in bucket %d", bucketID)
+		}
+	}
+}
+
+func TestTreeTopCacheCountsEveryBucketAccessOnce(t *testing.T) {
+	s := newCachedStorageHandler(2)
+	s.InitDatabase()
+	s.BatchWriteBucket(0, map[int]map[string]string{1: {}, 2: {}, 4: {}}, map[string]BlockInfo{})
+
+	// Loading the access counts is not a bucket access.
+	if _, err := s.BatchGetAccessCount([]int{1, 2, 4}, 0); err != nil {
+		t.Fatalf("error getting access counts; %s", err)
+	}
+	if hits, misses := s.TreeTopCacheStats(); hits != 0 || misses != 0 {
+		t.Errorf("expected no hits and misses after loading the access counts, but got %d and %d", hits, misses)
+	}
+	blockoffsetStatuses, err := s.BatchGetBlockOffset([]int{1, 2, 4}, 0, []string{"usr1"})
+	if err != nil {
+		t.Fatalf("error getting block offsets; %s", err)
+	}
+	offsets := make(map[int]int)
+	for bucketID, status := range blockoffsetStatuses {
+		offsets[bucketID] = status.Offset
+	}
+	if _, err := s.BatchReadBlock(offsets, 0); err != nil {
+		t.Fatalf("error reading blocks; %s", err)
+	}
+	if hits, misses := s.TreeTopCacheStats(); hits != 2 || misses != 1 {
+		t.Errorf("expected 2 hits and 1 miss, but got %d and %d", hits, misses)
+	}
+}
+
+func TestTreeTopCacheReadBucketReturnsCachedAndUncachedBlocks(t *testing.T) {
+	s := newCachedStorageHandler(1)
+	s.InitDatabase()
+	toWriteBlocks := map[int]map[string]string{1: {"usr1": "value1"}, 3: {"usr3": "value3"}}
+	s.BatchWriteBucket(0, toWriteBlocks, map[string]BlockInfo{})
+
+	blocks, err := s.BatchReadBucket([]int{1, 3}, 0)
+	if err != nil {
+		t.Fatalf("error reading buckets; %s", err)
+	}
+	if blocks[1]["usr1"] != "value1" || blocks[3]["usr3"] != "value3" {
+		t.Errorf("expected usr1 in bucket 1 and usr3 in bucket 3, but got %v", blocks)
+	}
+}
+
+func TestTreeTopCacheIsReloadedFromRedisAfterReset(t *testing.T) {
+	s := newCachedStorageHandler(1)
+	s.InitDatabase()
+	s.BatchWriteBucket(0, map[int]map[string]string{1: {"usr1": "value1"}}, map[string]BlockInfo{})
+	s.BatchReadBucket([]int{1}, 0)
+
+	// Another leader rewrites the bucket behind the cache.
+	other := newCachedStorageHandler(0)
+	other.BatchWriteBucket(0, map[int]map[string]string{1: {"usr9": "value9"}}, map[string]BlockInfo{})
+
+	blocks, _ := s.BatchReadBucket([]int{1}, 0)
+	if _, exists := blocks[1]["usr1"]; !exists {
+		t.Errorf("expected the cache to still hold usr1, but got %v", blocks[1])
+	}
+	s.ResetTreeTopCache()
+	blocks, err := s.BatchReadBucket([]int{1}, 0)
+	if err != nil {
+		t.Fatalf("error reading buckets; %s", err)
+	}
+	if blocks[1]["usr9"] != "value9" || len(blocks[1]) != 1 {
+		t.Errorf("expected usr9 after reloading the cache, but got %v", blocks[1])
+	}
+}
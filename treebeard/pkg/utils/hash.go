@@ -12,7 +12,9 @@ import (
 // and read from it many times, it might make sense.
 type Hasher struct {
 	KnownHashes map[string]uint32
-	mu          sync.Mutex
+	// KnownHashes is emptied when it holds MaxKnownHashes hashes; zero keeps every hash.
+	MaxKnownHashes int
+	mu             sync.Mutex
 }
 
 // It calculates hash of a string.
@@ -23,6 +25,12 @@ func (h *Hasher) Hash(s string) uint32 {
 	if hash, exists := h.KnownHashes[s]; exists {
 		return hash
 	}
+	if h.MaxKnownHashes > 0 && len(h.KnownHashes) >= h.MaxKnownHashes {
+		// The strings that are still in use are hashed again on their next access.
+		for known := range h.KnownHashes {
+			delete(h.KnownHashes, known)
+		}
+	}
 	hash := fnv.New32a()
 	hash.Write([]byte(s))
 	val := hash.Sum32()
@@ -33,3 +33,17 @@ func TestHash(t *testing.T) {
 		}
 	}
 }
+
+func TestHashKeepsAtMostMaxKnownHashes(t *testing.T) {
+	hasher := utils.Hasher{KnownHashes: make(map[string]uint32), MaxKnownHashes: 3}
+	for _, test := range hashTestCases {
+		output := hasher.Hash(test.input)
+		if output != test.expectedHash {
+			t.Errorf("Hash output %d is not equal to the expected hash output %d",
+				output, test.expectedHash)
+		}
+		if len(hasher.KnownHashes) > 3 {
+			t.Errorf("Expected at most 3 known hashes, but got %d", len(hasher.KnownHashes))
+		}
+	}
+}
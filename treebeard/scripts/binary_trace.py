@@ -0,0 +1,172 @@
+import argparse
+import os
+import shutil
+import struct
+import tempfile
+from collections import Counter
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+# Layout shared with pkg/client/binarytrace.go; all integers are little endian.
+MAGIC = b"TBTRACE\x00"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQQQQQ8x")  # magic, version, record size, records, key table offset, keys, pool offset, pool length
+RECORD = struct.Struct("<B3xII4xQ")     # op, key index, value length, pool offset or seed
+assert HEADER.size == 64 and RECORD.size == 24
+
+GET, SET_POOLED, SET_SEEDED = 0, 1, 2
+
+LETTERS = np.frombuffer(b"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ", dtype=np.uint8)
+COPY_BUFFER_BYTES = 16 * 1024 * 1024
+
+
+def value_from_seed(seed: int, length: int) -> bytes:
+    """Same splitmix64 expansion as valueFromSeed in the Go client."""
+    steps = np.arange(1, length + 1, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    z = steps + np.uint64(seed)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z ^= z >> np.uint64(31)
+    return LETTERS[z % np.uint64(len(LETTERS))].tobytes()
+
+
+def read_text_trace(filepath: str) -> Iterator[Tuple[str, str, Optional[bytes]]]:
+    """Streams (operation, block, value) from a trace.txt in the format of client.ReadTraceFile."""
+    with open(filepath, 'rb') as f:
+        for line_number, line in enumerate(f, start=1):
+            tokens = line.rstrip(b"\r\n").split(b" ")
+            if tokens[0] == b"GET" and len(tokens) == 2:
+                yield "GET", tokens[1].decode(), None
+            elif tokens[0] == b"SET" and len(tokens) == 3:
+                yield "SET", tokens[1].decode(), tokens[2]
+            else:
+                raise ValueError(f"line {line_number}: expected 'GET <block>' or 'SET <block> <value>'")
+
+
+def convert(text_path: str, binary_path: str, seed_values: bool = False, seed: Optional[int] = None) -> Dict[str, int]:
+    """Converts trace.txt to the binary format.
+
+    SET values are copied into the value pool, or with seed_values replaced by
+    a random seed of the same length that the client expands on send.
+    """
+    rng = np.random.default_rng(seed)
+    keys: Dict[str, int] = {}
+    ops = Counter()
+    records = 0
+    with open(binary_path, 'wb') as out, tempfile.TemporaryFile() as pool:
+        out.write(bytes(HEADER.size))
+        pool_length = 0
+        for op, block, value in read_text_trace(text_path):
+            key = keys.setdefault(block, len(keys))
+            if op == "GET":
+                out.write(RECORD.pack(GET, key, 0, 0))
+            elif seed_values:
+                out.write(RECORD.pack(SET_SEEDED, key, len(value), int(rng.integers(0, 2**63))))
+            else:
+                out.write(RECORD.pack(SET_POOLED, key, len(value), pool_length))
+                pool.write(value)
+                pool_length += len(value)
+            ops[op] += 1
+            records += 1
+
+        key_table_offset = out.tell()
+        encoded = [block.encode() for block in keys]
+        offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+        offsets[1:] = np.cumsum([len(block) for block in encoded])
+        out.write(offsets.tobytes())
+        out.write(b"".join(encoded))
+        pool_offset = out.tell()
+        pool.seek(0)
+        shutil.copyfileobj(pool, out, COPY_BUFFER_BYTES)
+
+        out.seek(0)
+        out.write(HEADER.pack(MAGIC, VERSION, RECORD.size, records, key_table_offset, len(keys), pool_offset, pool_length))
+    return {"records": records, "keys": len(keys), "pool_bytes": pool_length, "GET": ops["GET"], "SET": ops["SET"]}
+
+
+class BinaryTrace:
+    """Memory maps a binary trace and decodes records on demand."""
+
+    def __init__(self, filepath: str):
+        self.data = np.memmap(filepath, dtype=np.uint8, mode='r')
+        (magic, version, record_size, self.records, key_table_offset, self.key_count,
+         self.pool_offset, self.pool_length) = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            raise ValueError(f"{filepath} is not a version {VERSION} binary trace")
+        self.record_array = np.ndarray((self.records,), dtype=np.dtype([
+            ("op", "u1"), ("reserved", "V3"), ("key", "<u4"), ("length", "<u4"), ("reserved2", "V4"), ("value", "<u8"),
+        ]), buffer=self.data, offset=HEADER.size)
+        self.key_offsets = np.ndarray((self.key_count + 1,), dtype="<u8", buffer=self.data, offset=key_table_offset)
+        self.keys_start = key_table_offset + 8 * (self.key_count + 1)
+
+    def key(self, index: int) -> str:
+        start, end = int(self.key_offsets[index]), int(self.key_offsets[index + 1])
+        return self.data[self.keys_start + start:self.keys_start + end].tobytes().decode()
+
+    def value(self, op: int, length: int, value: int) -> bytes:
+        if op == SET_SEEDED:
+            return value_from_seed(value, length)
+        start = self.pool_offset + value
+        return self.data[start:start + length].tobytes()
+
+    def __iter__(self) -> Iterator[Tuple[str, str, Optional[bytes]]]:
+        for record in self.record_array:
+            op = int(record["op"])
+            block = self.key(int(record["key"]))
+            if op == GET:
+                yield "GET", block, None
+            else:
+                yield "SET", block, self.value(op, int(record["length"]), int(record["value"]))
+
+    def stats(self) -> Dict[str, int]:
+        ops = np.bincount(self.record_array["op"], minlength=3)
+        return {
+            "records": self.records,
+            "keys": self.key_count,
+            "GET": int(ops[GET]),
+            "SET pooled": int(ops[SET_POOLED]),
+            "SET seeded": int(ops[SET_SEEDED]),
+            "distinct keys accessed": int(np.unique(self.record_array["key"]).size),
+            "pool bytes": self.pool_length,
+            "file bytes": self.data.size,
+        }
+
+
+def dump(binary_path: str, text_path: str):
+    """Writes a binary trace back out as trace.txt."""
+    with open(text_path, 'wb', buffering=COPY_BUFFER_BYTES) as out:
+        for op, block, value in BinaryTrace(binary_path):
+            if op == "GET":
+                out.write(b"GET " + block.encode() + b"\n")
+            else:
+                out.writelines([b"SET " + block.encode() + b" ", value, b"\n"])
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Converts and inspects binary traces for the treebeard client.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert_parser = subparsers.add_parser("convert", help="convert trace.txt to trace.bin")
+    convert_parser.add_argument("input", help="trace.txt")
+    convert_parser.add_argument("output", help="trace.bin")
+    convert_parser.add_argument("--seed-values", action="store_true", help="replace SET values by seeds the client expands")
+    convert_parser.add_argument("--seed", type=int, default=None, help="random seed for --seed-values")
+    inspect_parser = subparsers.add_parser("inspect", help="print statistics of a trace.bin")
+    inspect_parser.add_argument("input", help="trace.bin")
+    dump_parser = subparsers.add_parser("dump", help="convert trace.bin back to trace.txt")
+    dump_parser.add_argument("input", help="trace.bin")
+    dump_parser.add_argument("output", help="trace.txt")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "convert":
+        stats = convert(args.input, args.output, args.seed_values, args.seed)
+        print(f"Generated: {os.path.basename(args.output)} {stats}")
+    elif args.command == "inspect":
+        for key, value in BinaryTrace(args.input).stats().items():
+            print(f"{key}: {value}")
+    else:
+        dump(args.input, args.output)
+        print(f"Generated: {os.path.basename(args.output)}")
@@ -0,0 +1,169 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from parameters import BLOCK_SIZES_BYTES, format_block_size, oram_config, render_config
+
+# workloads.py and tracegen.py live next to go-ycsb.
+GO_YCSB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "go-ycsb")
+sys.path.insert(0, GO_YCSB_DIR)
+from tracegen import write_chunk  # noqa: E402
+from workloads import OP_MIXES, render_properties, workload_properties  # noqa: E402
+
+# Bump this whenever tracegen output changes so stored traces are regenerated.
+TRACE_GENERATOR_VERSION = 1
+
+DEST_BASE = "../experiments/"
+MACHINES: List[int] = [1, 2, 3]
+# go-ycsb op mix name -> experiment group
+OP_GROUPS: Dict[str, str] = {"read": "read_ops", "update": "write_ops"}
+
+# Traces are stored once per content hash and linked into every experiment using them.
+TRACE_STORE_DIR = ".traces"
+MANIFEST_FILE = ".matrix.json"
+
+
+def content_hash(*parts: Any) -> str:
+    return hashlib.sha1(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+def build_matrix(block_sizes: List[int], machines: List[int], seed: int) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    """Returns the traces keyed by content hash and the experiments keyed by directory.
+
+    A trace only depends on the block size and op mix, so the machine counts of
+    one block size share it.
+    """
+    traces, experiments = {}, {}
+    for block_size in block_sizes:
+        block_size_label = format_block_size(block_size)
+        parameters = render_config(oram_config(block_size))
+        for op_name, read_prop, update_prop in OP_MIXES:
+            props = workload_properties(block_size, op_name, read_prop, update_prop)
+            trace_hash = content_hash(TRACE_GENERATOR_VERSION, render_properties(props), seed)
+            traces[trace_hash] = {"properties": props, "seed": seed}
+            for machine_count in machines:
+                directory = os.path.join(OP_GROUPS[op_name], f"mac_{machine_count}_{block_size_label}")
+                experiments[directory] = {
+                    "trace": trace_hash,
+                    "parameters": parameters,
+                    "hash": content_hash(trace_hash, parameters),
+                }
+    return traces, experiments
+
+
+def generate_trace(props: Dict[str, Any], seed: int, filepath: str) -> str:
+    """Writes one trace in a single process; the matrix parallelizes across traces."""
+    props = {key: str(value) for key, value in props.items() if not key.startswith('#')}
+    tmp_path = filepath + ".tmp"
+    write_chunk(props, int(props["operationcount"]), np.random.SeedSequence(seed), tmp_path)
+    os.replace(tmp_path, filepath)
+    return filepath
+
+
+def link_trace(source: str, dest: str):
+    """Places source at dest with a hardlink, falling back to a reflink (or copy) across filesystems."""
+    tmp_path = dest + ".tmp"
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        if shutil.which("cp") is None or subprocess.run(["cp", "--reflink=auto", source, tmp_path]).returncode != 0:
+            shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, dest)
+
+
+def load_manifest(filepath: str) -> Dict[str, str]:
+    if not os.path.exists(filepath):
+        return {}
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(filepath: str, manifest: Dict[str, str]):
+    tmp_path = filepath + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+    os.replace(tmp_path, filepath)
+
+
+def is_current(experiment_dir: str, trace_path: str, manifest_hash: str, cell_hash: str) -> bool:
+    dest = os.path.join(experiment_dir, "trace.txt")
+    return (manifest_hash == cell_hash and os.path.exists(dest) and os.path.exists(trace_path)
+            and os.path.getsize(dest) == os.path.getsize(trace_path))
+
+
+def build(dest_base: str, block_sizes: List[int], machines: List[int], seed: int, workers: int, dry_run: bool = False, prune: bool = False):
+    """Brings every experiment directory of the matrix up to date."""
+    traces, experiments = build_matrix(block_sizes, machines, seed)
+    store_dir = os.path.join(dest_base, TRACE_STORE_DIR)
+    manifest_path = os.path.join(dest_base, MANIFEST_FILE)
+    manifest = load_manifest(manifest_path)
+
+    stale = {
+        directory: cell for directory, cell in experiments.items()
+        if not is_current(os.path.join(dest_base, directory), os.path.join(store_dir, cell["trace"] + ".txt"),
+                          manifest.get(directory), cell["hash"])
+    }
+    missing_traces = sorted({cell["trace"] for cell in stale.values()
+                             if not os.path.exists(os.path.join(store_dir, cell["trace"] + ".txt"))})
+    print(f"{len(experiments) - len(stale)} experiments up to date, {len(stale)} stale, {len(missing_traces)} traces to generate")
+    if dry_run:
+        for directory in sorted(stale):
+            print(f"stale: {directory}")
+        return
+
+    os.makedirs(store_dir, exist_ok=True)
+    if missing_traces:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = []
+            for trace_hash in missing_traces:
+                trace = traces[trace_hash]
+                with open(os.path.join(store_dir, trace_hash + ".properties"), 'w') as f:
+                    f.write(render_properties(trace["properties"]))
+                futures.append(executor.submit(generate_trace, trace["properties"], trace["seed"],
+                                               os.path.join(store_dir, trace_hash + ".txt")))
+            for future in futures:
+                print(f"Generated: {os.path.basename(future.result())}")
+
+    for directory, cell in sorted(stale.items()):
+        experiment_dir = os.path.join(dest_base, directory)
+        os.makedirs(experiment_dir, exist_ok=True)
+        with open(os.path.join(experiment_dir, "parameters.yaml"), 'w') as f:
+            f.write(cell["parameters"])
+        link_trace(os.path.join(store_dir, cell["trace"] + ".txt"), os.path.join(experiment_dir, "trace.txt"))
+        manifest[directory] = cell["hash"]
+        print(f"✅ Updated: {directory}")
+    save_manifest(manifest_path, manifest)
+
+    if prune:
+        referenced = {cell["trace"] for cell in experiments.values()}
+        for filename in os.listdir(store_dir):
+            if filename.split(".")[0] not in referenced:
+                os.remove(os.path.join(store_dir, filename))
+                print(f"Removed unreferenced: {filename}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Builds the read_ops/write_ops experiment matrix, regenerating only what changed.")
+    parser.add_argument("--dest-base", default=DEST_BASE, help="experiments directory")
+    parser.add_argument("--block-sizes", type=int, nargs="+", default=BLOCK_SIZES_BYTES, help="block sizes in bytes")
+    parser.add_argument("--machines", type=int, nargs="+", default=MACHINES, help="machine counts")
+    parser.add_argument("--seed", type=int, default=0, help="trace seed; changing it regenerates every trace")
+    parser.add_argument("--workers", type=int, default=None, help="number of traces generated in parallel")
+    parser.add_argument("--dry-run", action="store_true", help="only list the stale experiments")
+    parser.add_argument("--prune", action="store_true", help="delete stored traces no experiment of this matrix uses")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    build(args.dest_base, args.block_sizes, args.machines, args.seed, args.workers, args.dry_run, args.prune)
@@ -0,0 +1,134 @@
+import argparse
+import os
+import random
+import shutil
+import struct
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from ruamel.yaml import YAML
+
+if TYPE_CHECKING:
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+# This file writes the initial tree of storage.databaseInit as a redis mass-insertion stream.
+# Loading it with 'redis-cli --pipe' replaces the initialization by the oramnode,
+# which skips initializing a storage that already holds a tree with the same parameters.
+# Generating a tree needs the cryptography package (pip install cryptography);
+# it is only imported then, so local_cluster.py runs without it unless --bulk-load is set.
+
+DEFAULT_PARAMETERS = "../configs/default/parameters.yaml"
+DEFAULT_TREES_DIR = "../experiments/.trees/"
+# The key of storage.NewStorageHandler.
+KEY = b"passphrasewhichneedstobe32bytes!"
+NONCE_SIZE = 12
+BUCKETS_PER_CHUNK = 1 << 14
+
+
+def resp_command(*args: bytes) -> bytes:
+    return b"*%d\r\n" % len(args) + b"".join(b"$%d\r\n%s\r\n" % (len(arg), arg) for arg in args)
+
+
+def metadata_record(slot_keys: List[bytes]) -> bytes:
+    """storage.encodeMetadata: access count, validity bitmap and length-prefixed slot keys."""
+    bitmap = bytearray((len(slot_keys) + 7) // 8)
+    for offset in range(len(slot_keys)):
+        bitmap[offset // 8] |= 0x80 >> (offset % 8)
+    return struct.pack(">I", 0) + bytes(bitmap) + b"".join(struct.pack(">H", len(key)) + key for key in slot_keys)
+
+
+def bucket_commands(bucket_id: int, slots: int, aesgcm: "AESGCM", rng: random.Random, hex_values: bool) -> bytes:
+    """The HMSET commands of one bucket of dummies, laid out like databaseInit and BatchPushDataAndMetadata do."""
+    real_index = list(range(slots))
+    rng.shuffle(real_index)
+    nonces = os.urandom(NONCE_SIZE * slots)
+    values: List[bytes] = [b""] * slots
+    slot_keys: List[bytes] = [b""] * slots
+    for i, offset in enumerate(real_index):
+        nonce = nonces[i * NONCE_SIZE:(i + 1) * NONCE_SIZE]
+        sealed = nonce + aesgcm.encrypt(nonce, b"b%dd%d" % (bucket_id, offset), None)
+        values[offset] = sealed.hex().encode() if hex_values else sealed
+        slot_keys[offset] = b"dummy%d" % (i + 1)
+    data = [arg for offset, value in enumerate(values) for arg in (b"%d" % offset, value)]
+    return (resp_command(b"HMSET", b"%d" % bucket_id, *data)
+            + resp_command(b"SET", b"%d" % -bucket_id, metadata_record(slot_keys)))
+
+
+def write_chunk(first_bucket: int, last_bucket: int, slots: int, hex_values: bool, filepath: str):
+    """Writes the buckets in [first_bucket, last_bucket) to filepath."""
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    aesgcm = AESGCM(KEY)
+    rng = random.Random()
+    with open(filepath, 'wb') as f:
+        for bucket_id in range(first_bucket, last_bucket):
+            f.write(bucket_commands(bucket_id, slots, aesgcm, rng, hex_values))
+
+
+def tree_parameters(parameters: Dict[str, Any]) -> Tuple[int, int, int, bool]:
+    """Tree height, Z, S and whether values are hex encoded; the compat encoding writes raw values."""
+    hex_values = parameters.get("value-encoding", "raw") == "hex"
+    return int(parameters["tree-height"]), int(parameters["Z"]), int(parameters["S"]), hex_values
+
+
+def tree_filename(parameters: Dict[str, Any]) -> str:
+    tree_height, z, s, hex_values = tree_parameters(parameters)
+    return f"tree_h{tree_height}_z{z}_s{s}_{'hex' if hex_values else 'raw'}.resp"
+
+
+def generate_tree(parameters: Dict[str, Any], trees_dir: str, workers: Optional[int] = None, force: bool = False) -> str:
+    """Writes the tree of the parameters into trees_dir, unless it is already there, and returns its path.
+
+    Every storage starts from the same tree, so one file serves every redis of every run with these parameters.
+    """
+    tree_height, z, s, hex_values = tree_parameters(parameters)
+    filepath = os.path.join(trees_dir, tree_filename(parameters))
+    if os.path.exists(filepath) and not force:
+        return filepath
+    os.makedirs(trees_dir, exist_ok=True)
+    buckets = 2 ** tree_height
+    ranges = [(first, min(first + BUCKETS_PER_CHUNK, buckets)) for first in range(1, buckets, BUCKETS_PER_CHUNK)]
+    parts = [f"{filepath}.part{i}" for i in range(len(ranges))]
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(write_chunk, [first for first, _ in ranges], [last for _, last in ranges],
+                              [z + s] * len(ranges), [hex_values] * len(ranges), parts))
+        with open(filepath + ".tmp", 'wb') as out:
+            for part in parts:
+                with open(part, 'rb') as f:
+                    shutil.copyfileobj(f, out, 1 << 20)
+        os.replace(filepath + ".tmp", filepath)
+    finally:
+        for part in parts:
+            if os.path.exists(part):
+                os.remove(part)
+    return filepath
+
+
+def load_tree(filepath: str, host: str, port: int):
+    """Flushes a redis and pipes the tree into it."""
+    subprocess.run(["redis-cli", "-h", host, "-p", str(port), "FLUSHALL"], check=True, stdout=subprocess.DEVNULL)
+    with open(filepath, 'rb') as f:
+        subprocess.run(["redis-cli", "-h", host, "-p", str(port), "--pipe"], stdin=f, check=True)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generates the initial ORAM tree as a redis mass-insertion file and optionally loads it.")
+    parser.add_argument("--parameters", default=DEFAULT_PARAMETERS, help="parameters.yaml with the tree-height, Z, S and value-encoding of the tree")
+    parser.add_argument("--trees-dir", default=DEFAULT_TREES_DIR, help="directory of the generated trees")
+    parser.add_argument("--workers", type=int, default=None, help="number of generator processes")
+    parser.add_argument("--force", action="store_true", help="regenerate the tree even if it exists")
+    parser.add_argument("--load", nargs="*", default=[], metavar="HOST:PORT", help="redis endpoints to load the tree into")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    with open(args.parameters, 'r') as f:
+        parameters = YAML(typ='safe').load(f)
+    filepath = generate_tree(parameters, args.trees_dir, args.workers, args.force)
+    print(f"Generated: {filepath}")
+    for endpoint in args.load:
+        host, _, port = endpoint.rpartition(":")
+        load_tree(filepath, host, int(port))
+        print(f"✅ Loaded {filepath} into {endpoint}")
@@ -0,0 +1,73 @@
+import random
+import struct
+import unittest
+from typing import List
+
+from bulk_load_tree import bucket_commands, metadata_record
+
+# The record of storage.encodeMetadata for the slot keys dummy1 to dummy9;
+# TestEncodeMetadataMatchesTheBulkLoader in pkg/storage checks the same bytes.
+NINE_DUMMIES = [b"dummy%d" % i for i in range(1, 10)]
+NINE_DUMMIES_RECORD = b"\x00\x00\x00\x00" + b"\xff\x80" + b"".join(b"\x00\x06" + key for key in NINE_DUMMIES)
+
+
+class PlainCipher:
+    """Stands in for AESGCM, so that the layout of a bucket can be read back."""
+
+    def encrypt(self, nonce: bytes, data: bytes, associated_data: bytes) -> bytes:
+        return data
+
+
+def parse_commands(stream: bytes) -> List[List[bytes]]:
+    commands = []
+    position = 0
+    while position < len(stream):
+        end = stream.index(b"\r\n", position)
+        count = int(stream[position + 1:end])
+        position = end + 2
+        args = []
+        for _ in range(count):
+            end = stream.index(b"\r\n", position)
+            length = int(stream[position + 1:end])
+            args.append(stream[end + 2:end + 2 + length])
+            position = end + 2 + length + 2
+        commands.append(args)
+    return commands
+
+
+def parse_metadata(record: bytes, slots: int):
+    """The access count, the valid offsets and the slot keys of storage.parseMetadata."""
+    count = struct.unpack(">I", record[:4])[0]
+    bitmap_end = 4 + (slots + 7) // 8
+    valid = [offset for offset in range(slots) if record[4 + offset // 8] & (0x80 >> (offset % 8))]
+    keys = []
+    position = bitmap_end
+    for _ in range(slots):
+        length = struct.unpack(">H", record[position:position + 2])[0]
+        keys.append(record[position + 2:position + 2 + length])
+        position += 2 + length
+    assert position == len(record)
+    return count, valid, keys
+
+
+class TestMetadataRecord(unittest.TestCase):
+    def test_matches_encode_metadata(self):
+        self.assertEqual(metadata_record(NINE_DUMMIES), NINE_DUMMIES_RECORD)
+
+
+class TestBucketCommands(unittest.TestCase):
+    def test_bucket_of_dummies(self):
+        commands = parse_commands(bucket_commands(5, 3, PlainCipher(), random.Random(0), hex_values=False))
+        self.assertEqual([command[:2] for command in commands], [[b"HMSET", b"5"], [b"SET", b"-5"]])
+        count, valid, keys = parse_metadata(commands[1][2], 3)
+        self.assertEqual(count, 0)
+        self.assertEqual(valid, [0, 1, 2])
+        self.assertEqual(sorted(keys), [b"dummy1", b"dummy2", b"dummy3"])
+        values = dict(zip(commands[0][2::2], commands[0][3::2]))
+        for offset in range(3):
+            # A nonce, then the plaintext of the dummy at that offset.
+            self.assertEqual(values[b"%d" % offset][12:], b"b5d%d" % offset)
+
+
+if __name__ == '__main__':
+    unittest.main()
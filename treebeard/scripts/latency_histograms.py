@@ -0,0 +1,123 @@
+import argparse
+import glob
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Percentiles written by client.WriteOutputToFile.
+PERCENTILES: List[Tuple[str, float]] = [("p50", 50), ("p90", 90), ("p99", 99), ("p99.9", 99.9)]
+NANOSECONDS_PER_MILLISECOND = 1e6
+
+
+class Histogram:
+    """Python side of client.Histogram; merging only adds bucket counts, so it is lossless."""
+
+    def __init__(self, sub_bucket_bits: int = 10):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.sub_bucket_half = 1 << (sub_bucket_bits - 1)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+
+    @classmethod
+    def from_json(cls, serialized: Dict) -> "Histogram":
+        if serialized.get("unit", "ns") != "ns":
+            raise ValueError(f"unsupported histogram unit {serialized['unit']}")
+        histogram = cls(serialized["sub_bucket_bits"])
+        pairs = np.array(serialized["counts"], dtype=np.int64).reshape(-1, 2)
+        if len(pairs):
+            histogram.counts = np.zeros(int(pairs[:, 0].max()) + 1, dtype=np.int64)
+            np.add.at(histogram.counts, pairs[:, 0], pairs[:, 1])
+        histogram.total, histogram.sum, histogram.max = serialized["total"], serialized["sum"], serialized["max"]
+        return histogram
+
+    def to_json(self, interval: int = 0, operation: str = "all") -> Dict:
+        indexes = np.flatnonzero(self.counts)
+        return {
+            "interval": interval,
+            "operation": operation,
+            "sub_bucket_bits": self.sub_bucket_bits,
+            "unit": "ns",
+            "total": self.total,
+            "sum": self.sum,
+            "max": self.max,
+            "counts": [[int(index), int(self.counts[index])] for index in indexes],
+        }
+
+    def merge(self, other: "Histogram"):
+        if other.sub_bucket_bits != self.sub_bucket_bits:
+            raise ValueError("cannot merge histograms with different sub bucket bits")
+        if other.counts.size > self.counts.size:
+            self.counts = np.concatenate([self.counts, np.zeros(other.counts.size - self.counts.size, dtype=np.int64)])
+        self.counts[:other.counts.size] += other.counts
+        self.total += other.total
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def highest_equivalent_values(self, indexes: np.ndarray) -> np.ndarray:
+        shift = np.maximum(indexes // self.sub_bucket_half - 1, 0)
+        sub_bucket = indexes - shift * self.sub_bucket_half
+        return ((sub_bucket + 1) << shift) - 1
+
+    def value_at_percentile(self, percentile: float) -> int:
+        """Highest latency in nanoseconds equivalent to the percentile, like Histogram.ValueAtPercentile."""
+        if self.total == 0:
+            return 0
+        target = max(1, int(np.ceil(percentile / 100 * self.total)))
+        index = int(np.searchsorted(np.cumsum(self.counts), target))
+        return int(min(self.highest_equivalent_values(np.array([index]))[0], self.max))
+
+    def summary(self) -> Dict[str, float]:
+        summary = {"count": self.total, "mean": self.sum / self.total / NANOSECONDS_PER_MILLISECOND if self.total else float("nan")}
+        for name, percentile in PERCENTILES:
+            summary[name] = self.value_at_percentile(percentile) / NANOSECONDS_PER_MILLISECOND
+        summary["max"] = self.max / NANOSECONDS_PER_MILLISECOND
+        return summary
+
+
+def read_histograms(filepath: str) -> Iterable[Dict]:
+    with open(filepath, 'r') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def merge_files(filepaths: List[str], operation: Optional[str] = None, skip_intervals: int = 0) -> Histogram:
+    """Merges the histograms of every interval of every file, e.g. all runs of all client machines.
+
+    skip_intervals drops the first intervals of each run as warmup.
+    """
+    merged = None
+    for filepath in filepaths:
+        for serialized in read_histograms(filepath):
+            if serialized["interval"] < skip_intervals or (operation and serialized["operation"] != operation):
+                continue
+            histogram = Histogram.from_json(serialized)
+            if merged is None:
+                merged = Histogram(histogram.sub_bucket_bits)
+            merged.merge(histogram)
+    return merged or Histogram()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Merges client latency histograms across runs and machines and prints tail percentiles.")
+    parser.add_argument("histograms", nargs="+", help="*.hist files or glob patterns")
+    parser.add_argument("--operation", choices=["read", "write"], default=None, help="only merge one operation type")
+    parser.add_argument("--skip-intervals", type=int, default=0, help="warmup intervals to drop from every run")
+    parser.add_argument("--output", default=None, help="write the merged histogram as a .hist line")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    filepaths = sorted({filepath for pattern in args.histograms for filepath in glob.glob(pattern)})
+    merged = merge_files(filepaths, args.operation, args.skip_intervals)
+    print(f"Merged {len(filepaths)} files")
+    for key, value in merged.summary().items():
+        print(f"{key}: {value:.6f}" if key != "count" else f"{key}: {value}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(json.dumps(merged.to_json(operation=args.operation or "all")) + "\n")
+        print(f"Generated: {args.output}")
@@ -0,0 +1,314 @@
+import argparse
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from ruamel.yaml import YAML
+
+from bulk_load_tree import generate_tree, load_tree
+from results_store import parse_experiment_output
+
+TREEBEARD_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+GO_YCSB_DIR = os.path.join(TREEBEARD_DIR, "..", "go-ycsb")
+DEFAULT_PARAMETERS = os.path.join(TREEBEARD_DIR, "configs", "default", "parameters.yaml")
+COMPONENTS = ["oramnode", "shardnode", "router", "client"]
+LOCALHOST = "127.0.0.1"
+
+# Seconds to wait for a process to open its port, and for the client on top of the experiment duration.
+STARTUP_TIMEOUT = 60
+CLIENT_TIMEOUT_SLACK = 600
+# Throughput drops larger than this fraction of the baseline are reported as regressions.
+DEFAULT_TOLERANCE = 0.1
+
+
+@dataclass
+class ClusterSpec:
+    name: str
+    parameters: Dict[str, Any] = field(default_factory=dict)  # overrides of the base parameters.yaml
+    shard_nodes: int = 1
+    oram_nodes: int = 1
+    replicas: int = 1
+    routers: int = 1
+    storages_per_oram_node: int = 1
+    duration: int = 10
+    operations: int = 100000
+    read_proportion: float = 0.5
+
+
+# Small trees keep storage initialization in the order of seconds.
+SMALL_TREE = {"tree-height": 12, "log": False, "trace": False, "profile": False}
+
+SUITES: Dict[str, List[ClusterSpec]] = {
+    "smoke": [ClusterSpec("smoke", dict(SMALL_TREE), duration=5)],
+    "block-sizes": [ClusterSpec(f"block_{size}B", dict(SMALL_TREE, **{"block-size": size})) for size in (128, 1024, 4096)],
+    "replicas": [ClusterSpec(f"replicas_{replicas}", dict(SMALL_TREE), replicas=replicas) for replicas in (1, 3)],
+    "shards": [ClusterSpec(f"shards_{shards}", dict(SMALL_TREE), shard_nodes=shards) for shards in (1, 2, 3)],
+    "oram-nodes": [ClusterSpec(f"oramnodes_{nodes}", dict(SMALL_TREE), oram_nodes=nodes) for nodes in (1, 2)],
+    # The base parameters.yaml leaves these modes off, so that the first spec runs the baseline storage path.
+    "storage-modes": [ClusterSpec(name, dict(SMALL_TREE, **modes)) for name, modes in (
+        ("storage_baseline", {}),
+        ("read_path_script", {"read-path-script": True}),
+        ("tree_top_cache", {"tree-top-cache-levels": 8}),
+        ("bucket_locking", {"bucket-locking": True}),
+    )],
+}
+
+
+def allocate_ports(count: int) -> List[int]:
+    """Lets the kernel pick free ports; the sockets stay open until all ports are chosen so none repeats."""
+    sockets = []
+    try:
+        for _ in range(count):
+            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            s.bind((LOCALHOST, 0))
+            sockets.append(s)
+        return [s.getsockname()[1] for s in sockets]
+    finally:
+        for s in sockets:
+            s.close()
+
+
+def load_parameters(filepath: str, overrides: Dict[str, Any]) -> Dict[str, Any]:
+    with open(filepath, 'r') as f:
+        parameters = YAML(typ='safe').load(f)
+    parameters.update(overrides)
+    # Written back as "key: value" lines, where Python's True would not be a lower case yaml boolean.
+    return {key: str(value).lower() if isinstance(value, bool) else value for key, value in parameters.items()}
+
+
+def cluster_endpoints(spec: ClusterSpec) -> Dict[str, List[Dict[str, Any]]]:
+    """Endpoints of every process of the spec on localhost with freshly allocated ports."""
+    storages = spec.oram_nodes * spec.storages_per_oram_node
+    raft_nodes = (spec.shard_nodes + spec.oram_nodes) * spec.replicas
+    ports = iter(allocate_ports(spec.routers + 2 * raft_nodes + storages))
+
+    def endpoint(**fields):
+        return dict(exposed_ip=LOCALHOST, local_bind_ip=LOCALHOST, port=next(ports), **fields)
+
+    return {
+        "router": [endpoint(id=i) for i in range(spec.routers)],
+        "shardnode": [endpoint(id=i, replicaid=r, raftport=next(ports)) for i in range(spec.shard_nodes) for r in range(spec.replicas)],
+        "oramnode": [endpoint(id=i, replicaid=r, raftport=next(ports)) for i in range(spec.oram_nodes) for r in range(spec.replicas)],
+        "redis": [endpoint(id=i, oramnode_id=i // spec.storages_per_oram_node) for i in range(storages)],
+    }
+
+
+def write_configs(configs_dir: str, spec: ClusterSpec, endpoints: Dict[str, List[Dict[str, Any]]], base_parameters: str, trace_path: str):
+    os.makedirs(configs_dir, exist_ok=True)
+    yaml = YAML()
+    yaml.default_flow_style = False
+    for component, component_endpoints in endpoints.items():
+        with open(os.path.join(configs_dir, f"{component}_endpoints.yaml"), 'w') as f:
+            yaml.dump({"endpoints": component_endpoints}, f)
+    with open(os.path.join(configs_dir, "parameters.yaml"), 'w') as f:
+        f.writelines(f"{key}: {value}\n" for key, value in load_parameters(base_parameters, spec.parameters).items())
+    # OpenTrace looks for trace.bin or trace.txt in the configs directory.
+    trace_dest = os.path.join(configs_dir, "trace.bin" if trace_path.endswith(".bin") else "trace.txt")
+    if not os.path.exists(trace_dest):
+        os.symlink(os.path.abspath(trace_path), trace_dest)
+
+
+def generate_trace(spec: ClusterSpec, parameters: Dict[str, Any], filepath: str, seed: int = 0):
+    """Writes a uniform GET/SET trace over the blocks that fit in the tree of the spec."""
+    sys.path.insert(0, GO_YCSB_DIR)
+    from tracegen import write_chunk
+    props = {
+        "recordcount": str(2 ** (int(parameters["tree-height"]) - 1)),
+        "readproportion": str(spec.read_proportion),
+        "updateproportion": str(1 - spec.read_proportion),
+        "fieldlength": str(parameters["block-size"]),
+        "requestdistribution": "uniform",
+    }
+    write_chunk(props, spec.operations, np.random.SeedSequence(seed), filepath)
+
+
+def build_binaries(bin_dir: str):
+    os.makedirs(bin_dir, exist_ok=True)
+    for component in COMPONENTS:
+        print(f"Building {component}")
+        subprocess.run(["go", "build", "-o", os.path.join(bin_dir, component), f"./cmd/{component}"], cwd=TREEBEARD_DIR, check=True)
+
+
+def wait_for_port(port: int, process: subprocess.Popen, timeout: float = STARTUP_TIMEOUT):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{process.args[0]} exited with code {process.returncode} before opening port {port}")
+        try:
+            with socket.create_connection((LOCALHOST, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"{process.args[0]} did not open port {port} in {timeout} seconds")
+
+
+class LocalCluster:
+    """Starts redis, oram nodes, shard nodes and routers of one spec and stops them on exit."""
+
+    def __init__(self, spec: ClusterSpec, bin_dir: str, run_dir: str, endpoints: Dict[str, List[Dict[str, Any]]],
+                 tree_file: Optional[str] = None):
+        self.spec = spec
+        self.bin_dir = bin_dir
+        self.run_dir = run_dir
+        self.configs_dir = os.path.join(run_dir, "configs")
+        self.endpoints = endpoints
+        self.tree_file = tree_file
+        self.processes: List[subprocess.Popen] = []
+
+    def start(self, name: str, args: List[str]) -> subprocess.Popen:
+        log_path = os.path.join(self.run_dir, "logs", f"{name}.log")
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        with open(log_path, 'wb') as log_file:
+            process = subprocess.Popen(args, stdout=log_file, stderr=subprocess.STDOUT, start_new_session=True)
+        self.processes.append(process)
+        return process
+
+    def start_raft_nodes(self, component: str, id_flag: str):
+        endpoints = self.endpoints[component]
+        for endpoint in endpoints:
+            args = [os.path.join(self.bin_dir, component), f"-{id_flag}", str(endpoint["id"]),
+                    "-bindip", LOCALHOST, "-advip", LOCALHOST, "-rpcport", str(endpoint["port"]),
+                    "-replicaid", str(endpoint["replicaid"]), "-raftport", str(endpoint["raftport"]),
+                    "-conf", self.configs_dir, "-logpath", os.path.join(self.run_dir, "logs", f"{component}-{endpoint['id']}-{endpoint['replicaid']}.all.log")]
+            if endpoint["replicaid"] != 0:
+                leader = next(e for e in endpoints if e["id"] == endpoint["id"] and e["replicaid"] == 0)
+                args.append(f"-joinaddr={LOCALHOST}:{leader['port']}")
+            process = self.start(f"{component}-{endpoint['id']}-{endpoint['replicaid']}", args)
+            # Replicas join through the first replica, which has to be the raft leader by then.
+            wait_for_port(endpoint["port"], process)
+
+    def __enter__(self):
+        try:
+            for endpoint in self.endpoints["redis"]:
+                process = self.start(f"redis-{endpoint['id']}", ["redis-server", "--bind", LOCALHOST, "--port", str(endpoint["port"]),
+                                                                  "--save", "", "--appendonly", "no", "--protected-mode", "no"])
+                wait_for_port(endpoint["port"], process)
+                if self.tree_file:
+                    # The oram nodes find the tree loaded and skip initializing it.
+                    load_tree(self.tree_file, LOCALHOST, endpoint["port"])
+            self.start_raft_nodes("oramnode", "oramnodeid")
+            self.start_raft_nodes("shardnode", "shardnodeid")
+            for endpoint in self.endpoints["router"]:
+                process = self.start(f"router-{endpoint['id']}", [
+                    os.path.join(self.bin_dir, "router"), "-routerid", str(endpoint["id"]), "-ip", LOCALHOST,
+                    "-port", str(endpoint["port"]), "-conf", self.configs_dir,
+                    "-logpath", os.path.join(self.run_dir, "logs", f"router-{endpoint['id']}.all.log")])
+                wait_for_port(endpoint["port"], process)
+        except BaseException:
+            self.stop()
+            raise
+        return self
+
+    def run_client(self, output_path: str) -> str:
+        """Runs the client, which waits for the storages to be initialized before its duration starts."""
+        process = self.start("client", [os.path.join(self.bin_dir, "client"), "-conf", self.configs_dir,
+                                        "-duration", str(self.spec.duration), "-output", output_path,
+                                        "-logpath", os.path.join(self.run_dir, "logs", "client.all.log")])
+        if process.wait(timeout=self.spec.duration + CLIENT_TIMEOUT_SLACK) != 0:
+            raise RuntimeError(f"client exited with code {process.returncode}; see {self.run_dir}/logs/client.log")
+        return output_path
+
+    def stop(self):
+        for process in reversed(self.processes):
+            if process.poll() is None:
+                os.killpg(process.pid, signal.SIGTERM)
+        deadline = time.time() + 10
+        for process in reversed(self.processes):
+            try:
+                process.wait(timeout=max(deadline - time.time(), 0.1))
+            except subprocess.TimeoutExpired:
+                os.killpg(process.pid, signal.SIGKILL)
+                process.wait()
+        self.processes = []
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def run_spec(spec: ClusterSpec, bin_dir: str, work_dir: str, base_parameters: str, trace: Optional[str],
+             bulk_load: bool = False) -> Dict[str, Any]:
+    run_dir = os.path.join(work_dir, spec.name)
+    shutil.rmtree(run_dir, ignore_errors=True)
+    os.makedirs(run_dir)
+    parameters = load_parameters(base_parameters, spec.parameters)
+    trace_path = trace or os.path.join(run_dir, "trace.txt")
+    if trace is None:
+        generate_trace(spec, parameters, trace_path)
+    endpoints = cluster_endpoints(spec)
+    write_configs(os.path.join(run_dir, "configs"), spec, endpoints, base_parameters, trace_path)
+    # Trees are shared by the specs and kept across runs of the suite.
+    tree_file = generate_tree(parameters, os.path.join(work_dir, "trees")) if bulk_load else None
+    print(f"--- Running {spec.name} ---")
+    with LocalCluster(spec, bin_dir, run_dir, endpoints, tree_file) as cluster:
+        output = cluster.run_client(os.path.join(run_dir, "experiment_1.txt"))
+    result = parse_experiment_output(output)
+    return {
+        "name": spec.name,
+        "spec": asdict(spec),
+        "throughput": result["average_throughput"],
+        "average_latency_ms": result["average_latency_ms"],
+        **{column: value for column, value in result["percentiles"].items()},
+    }
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], tolerance: float) -> Tuple[List[str], bool]:
+    """Formats a table of results against the baseline and tells whether any throughput regressed."""
+    rows = [f"{'config':<20} {'ops/s':>10} {'baseline':>10} {'change':>8} {'p99 ms':>8} {'base p99':>8}"]
+    regressed = False
+    for result in results:
+        base = baseline.get(result["name"], {})
+        base_throughput = base.get("throughput")
+        change = ""
+        flag = ""
+        if base_throughput:
+            ratio = result["throughput"] / base_throughput - 1
+            change = f"{ratio:+.1%}"
+            if ratio < -tolerance:
+                flag = "  REGRESSION"
+                regressed = True
+        p99 = result.get("p99_latency_ms")
+        base_p99 = base.get("p99_latency_ms")
+        rows.append(f"{result['name']:<20} {result['throughput']:>10.1f} {base_throughput or float('nan'):>10.1f} {change:>8} "
+                    f"{p99 if p99 is not None else float('nan'):>8.2f} {base_p99 if base_p99 is not None else float('nan'):>8.2f}{flag}")
+    return rows, regressed
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Runs treebeard on this machine for a suite of configurations and compares against a baseline.")
+    parser.add_argument("--suite", choices=sorted(SUITES), default="smoke", help="configurations to run")
+    parser.add_argument("--work-dir", default="/tmp/treebeard-local", help="directory for binaries, configs, logs and outputs")
+    parser.add_argument("--parameters", default=DEFAULT_PARAMETERS, help="base parameters.yaml the suite overrides")
+    parser.add_argument("--trace", default=None, help="trace.txt to use instead of a generated uniform trace")
+    parser.add_argument("--bulk-load", action="store_true", help="load pregenerated trees into redis instead of letting the oram nodes initialize them; needs the cryptography package")
+    parser.add_argument("--skip-build", action="store_true", help="reuse the binaries in the work directory")
+    parser.add_argument("--baseline", default=None, help="baseline json to compare against")
+    parser.add_argument("--save-baseline", default=None, help="write the results as a baseline json")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed relative throughput drop")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    bin_dir = os.path.join(args.work_dir, "bin")
+    if not args.skip_build:
+        build_binaries(bin_dir)
+    results = [run_spec(spec, bin_dir, args.work_dir, args.parameters, args.trace, args.bulk_load) for spec in SUITES[args.suite]]
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = {result["name"]: result for result in json.load(f)}
+    rows, regressed = compare(results, baseline, args.tolerance)
+    print("\n".join(rows))
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=4)
+        print(f"Generated: {args.save_baseline}")
+    sys.exit(1 if regressed else 0)
@@ -0,0 +1,170 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Tuple
+
+from parameters import BASE_CONFIG, BLOCK_SIZES_BYTES, calculate_tree_height, format_block_size
+
+# The Redis cost model lives with the simulations.
+SIMULATION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "simulation")
+sys.path.insert(0, SIMULATION_DIR)
+from oram_sim import reverse_lexicographic_paths  # noqa: E402
+from redis_cost import StorageCostModel, project_throughput  # noqa: E402
+
+# Bump this whenever the cost model changes so stale cache entries are ignored.
+COST_MODEL_VERSION = 5
+
+# Values tried for every tuned parameter. The rest of the config comes from BASE_CONFIG.
+SEARCH_SPACE: Dict[str, List[int]] = {
+    "eviction-rate": [10, 25, 50, 100, 200, 400],
+    "evict-path-count": [50, 100, 200, 400, 1000, 4000],
+    "S": [2, 4, 6, 9, 12],
+    "batch-timeout": [1, 2, 5, 10],
+    "redis-pipeline-size": [1000, 10000, 100000, 3000000],
+}
+
+# ReadPaths sampled per config by the cost model; the seed keeps cached costs reproducible.
+COST_SAMPLES = 20
+COST_SEED = 0
+
+
+def estimate_cost(config: Dict[str, Any], request_rate: float, storages: int) -> Dict[str, Any]:
+    """Predicts the Redis commands, bytes and round trips per logical request of one config.
+
+    The traffic of ReadPaths, early reshuffles and evictions comes from the
+    StorageCostModel of simulation/redis_cost.py, which follows the pipelines
+    that storage.go and oramnode/server.go issue.
+    """
+    # Requests that reach one storage queue during one batch timeout.
+    storage_rate = request_rate / storages
+    batch_size = max(1.0, storage_rate * config["batch-timeout"] / 1000)
+    model = StorageCostModel.from_parameters(config)
+    projection = project_throughput(model, storage_rate, max(1, round(batch_size)), config["eviction-rate"],
+                                    config["evict-path-count"], samples=COST_SAMPLES, seed=COST_SEED)
+
+    # Blocks leave the tree on every ReadPath and only come back during evictions.
+    evict_paths = reverse_lexicographic_paths(0, config["evict-path-count"], config["tree-height"])
+    evict_buckets = len(model.buckets_in_paths(evict_paths.tolist()))
+    blocks_in = batch_size * config["eviction-rate"]
+    blocks_out = min(config["max-blocks-to-send"], config["Z"] * evict_buckets)
+    return {
+        "batch-size": batch_size,
+        "commands-per-request": sum(projection["commands"].values()) / storage_rate,
+        "bytes-per-request": (projection["request_bytes"] + projection["response_bytes"]) / storage_rate,
+        "round-trips-per-request": projection["round_trips"] / storage_rate,
+        "stash-drain-ratio": blocks_out / blocks_in,
+    }
+
+
+def predicted_time_us(cost: Dict[str, Any], rtt_us: float, bandwidth_gbps: float) -> float:
+    transfer_us = cost["bytes-per-request"] * 8 / (bandwidth_gbps * 1000)
+    return cost["round-trips-per-request"] * rtt_us + transfer_us
+
+
+def cache_key(config: Dict[str, Any], request_rate: float, storages: int) -> str:
+    payload = json.dumps([COST_MODEL_VERSION, config, request_rate, storages], sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def load_cache(cache_path: str) -> Dict[str, Any]:
+    if not os.path.isfile(cache_path):
+        return {}
+    with open(cache_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_cache(cache_path: str, cache: Dict[str, Any]):
+    os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, cache_path)
+
+
+def candidate_configs(block_size: int) -> List[Dict[str, Any]]:
+    configs = []
+    keys = list(SEARCH_SPACE)
+    for values in itertools.product(*(SEARCH_SPACE[key] for key in keys)):
+        config = BASE_CONFIG.copy()
+        config["block-size"] = block_size
+        config["tree-height"] = calculate_tree_height(block_size)
+        config.update(zip(keys, values))
+        configs.append(config)
+    return configs
+
+
+def _evaluate(args: Tuple[Dict[str, Any], float, int]) -> Dict[str, Any]:
+    config, request_rate, storages = args
+    return estimate_cost(config, request_rate, storages)
+
+
+def evaluate_all(configs: List[Dict[str, Any]], request_rate: float, storages: int, cache: Dict[str, Any], workers: int) -> List[Dict[str, Any]]:
+    """Returns the cost of every config, evaluating only the ones missing from cache."""
+    keys = [cache_key(config, request_rate, storages) for config in configs]
+    missing = [(key, config) for key, config in zip(keys, configs) if key not in cache]
+    if missing:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            jobs = [(config, request_rate, storages) for _, config in missing]
+            for (key, _), cost in zip(missing, executor.map(_evaluate, jobs, chunksize=256)):
+                cache[key] = cost
+    print(f"Evaluated {len(missing)} new points, {len(configs) - len(missing)} from cache")
+    return [cache[key] for key in keys]
+
+
+def write_ranked_config(filepath: str, config: Dict[str, Any], cost: Dict[str, Any], rank: int, score: float):
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    with open(filepath, 'w') as f:
+        f.write(f"# ORAM Configuration for Block Size: {config['block-size']} bytes, rank {rank}\n")
+        f.write(f"# Predicted time per request: {score:.2f} us\n")
+        for key, value in cost.items():
+            f.write(f"# Predicted {key}: {value:.4f}\n")
+        for key in BASE_CONFIG:
+            f.write(f"{key}: {config[key]}\n")
+    print(f"Generated: {os.path.basename(filepath)}")
+
+
+def optimize(block_sizes: List[int], request_rate: float, storages: int, top: int, output_dir: str,
+             cache_path: str, rtt_us: float, bandwidth_gbps: float, workers: int):
+    cache = load_cache(cache_path)
+    for block_size in block_sizes:
+        block_size_label = format_block_size(block_size)
+        print(f"\n--- Optimizing {block_size_label} blocks ---")
+        configs = candidate_configs(block_size)
+        costs = evaluate_all(configs, request_rate, storages, cache, workers)
+        save_cache(cache_path, cache)
+        # Configs that cannot drain the stash as fast as ReadPaths fill it are not sustainable.
+        ranked = sorted(
+            (predicted_time_us(cost, rtt_us, bandwidth_gbps), i)
+            for i, cost in enumerate(costs) if cost["stash-drain-ratio"] >= 1
+        )
+        if not ranked:
+            print(f"⚠️ Warning: no sustainable config for {block_size_label}. Skipping.")
+            continue
+        for rank, (score, i) in enumerate(ranked[:top], start=1):
+            filepath = os.path.join(output_dir, f"oram_config_{block_size_label}_{rank}.yaml")
+            write_ranked_config(filepath, configs[i], costs[i], rank, score)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Searches ORAM parameters against a Redis cost model and writes the best configs.")
+    parser.add_argument("--block-sizes", type=int, nargs="+", default=BLOCK_SIZES_BYTES, help="block sizes in bytes")
+    parser.add_argument("--request-rate", type=float, default=10000, help="logical requests per second reaching the oram nodes")
+    parser.add_argument("--storages", type=int, default=1, help="number of storages")
+    parser.add_argument("--top", type=int, default=3, help="number of configs to write per block size")
+    parser.add_argument("--output-dir", default="oram_configs/optimized", help="directory for the ranked configs")
+    parser.add_argument("--cache", default="oram_configs/optimized/.cost_cache.json", help="cache of evaluated points")
+    parser.add_argument("--rtt-us", type=float, default=100, help="redis round trip time in microseconds")
+    parser.add_argument("--bandwidth-gbps", type=float, default=10, help="network bandwidth to redis")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    optimize(args.block_sizes, args.request_rate, args.storages, args.top, args.output_dir,
+             args.cache, args.rtt_us, args.bandwidth_gbps, args.workers)
+    print("\nAll ranked ORAM configuration files have been generated.")
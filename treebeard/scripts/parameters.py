@@ -25,6 +25,8 @@ BASE_CONFIG: Dict[str, Any] = {
     "eviction-rate": 100,
     "evict-path-count": 200,
     "batch-timeout": 1,
+    "batch-size": 1000,
+    "max-in-flight-read-paths": 4,
     "epoch-time": 1,
     "trace": "true",
     "Z": 1,
@@ -35,7 +37,13 @@ BASE_CONFIG: Dict[str, Any] = {
     "max-requests": 15000,
     "block-size": 0,     # Calculated value
     "log": "false",
-    "profile": "false"
+    "profile": "false",
+    "read-path-script": "false",
+    "tree-top-cache-levels": 0,
+    "bucket-locking": "false",
+    "adaptive-epoch-time": "false",
+    "min-epoch-time": 1,
+    "max-epoch-time": 20
 }
 
 def format_block_size(size_bytes: int) -> str:
@@ -47,19 +55,25 @@ def format_block_size(size_bytes: int) -> str:
     else:
         return f"{size_bytes}B"
 
+def render_config(config: Dict[str, Any]) -> str:
+    """Returns the configuration values as the text of a simple key: value file."""
+    lines = [
+        f"# ORAM Configuration for Block Size: {config['block-size']} bytes\n",
+        f"# Tree Height calculated as ceil(log2(16GB / block-size)) = {config['tree-height']}\n",
+    ]
+    # Write properties in the specified order
+    for key, value in BASE_CONFIG.items():
+        # Use the actual calculated value from the config dictionary
+        actual_value = config.get(key, value)
+        lines.append(f"{key}: {actual_value}\n")
+    return "".join(lines)
+
 def generate_config_file(filepath: str, config: Dict[str, Any]):
     """Writes the dictionary of configuration values to a simple key: value file."""
     os.makedirs(os.path.dirname(filepath), exist_ok=True)
     
     with open(filepath, 'w') as f:
-        f.write(f"# ORAM Configuration for Block Size: {config['block-size']} bytes\n")
-        f.write(f"# Tree Height calculated as ceil(log2(16GB / block-size)) = {config['tree-height']}\n")
-        
-        # Write properties in the specified order
-        for key, value in BASE_CONFIG.items():
-            # Use the actual calculated value from the config dictionary
-            actual_value = config.get(key, value)
-            f.write(f"{key}: {actual_value}\n")
+        f.write(render_config(config))
             
     print(f"Generated: {os.path.basename(filepath)}")
 
@@ -78,6 +92,13 @@ def calculate_tree_height(block_size_bytes: int) -> int:
     # The result must be an integer
     return int(height)
 
+def oram_config(block_size: int) -> Dict[str, Any]:
+    """BASE_CONFIG with the block size and its calculated tree height."""
+    config = BASE_CONFIG.copy()
+    config["block-size"] = block_size
+    config["tree-height"] = calculate_tree_height(block_size)
+    return config
+
 def generate_oram_workloads(output_dir: str):
     """
     Generates ORAM parameter files varying block-size and calculating tree-height.
@@ -86,20 +107,15 @@ def generate_oram_workloads(output_dir: str):
     
     for block_size in BLOCK_SIZES_BYTES:
         
-        # 1. Calculate Tree Height
-        tree_height = calculate_tree_height(block_size)
-        
-        # 2. Set file naming
+        # 1. Set file naming
         block_size_label = format_block_size(block_size)
         filename = f"oram_config_{block_size_label}.yaml"
         filepath = os.path.join(output_dir, filename)
         
-        # 3. Create the configuration dictionary
-        config = BASE_CONFIG.copy()
-        config["block-size"] = block_size
-        config["tree-height"] = tree_height
+        # 2. Create the configuration dictionary
+        config = oram_config(block_size)
         
-        # 4. Generate the file
+        # 3. Generate the file
         generate_config_file(filepath, config)
 
 
@@ -0,0 +1,286 @@
+import argparse
+import os
+import re
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from ruamel.yaml import YAML
+
+DEFAULT_ROOT = "../experiments/"
+DEFAULT_DB = "../experiments/results.sqlite"
+
+# parameters.yaml key -> (column, SQLite type)
+PARAMETER_COLUMNS: Dict[str, Tuple[str, str]] = {
+    "max-blocks-to-send": ("max_blocks_to_send", "INTEGER"),
+    "eviction-rate": ("eviction_rate", "INTEGER"),
+    "evict-path-count": ("evict_path_count", "INTEGER"),
+    "batch-timeout": ("batch_timeout", "REAL"),
+    "batch-size": ("batch_size", "INTEGER"),
+    "max-in-flight-read-paths": ("max_in_flight_read_paths", "INTEGER"),
+    "epoch-time": ("epoch_time", "REAL"),
+    "trace": ("trace", "INTEGER"),
+    "Z": ("z", "INTEGER"),
+    "S": ("s", "INTEGER"),
+    "shift": ("shift", "INTEGER"),
+    "tree-height": ("tree_height", "INTEGER"),
+    "redis-pipeline-size": ("redis_pipeline_size", "INTEGER"),
+    "max-requests": ("max_requests", "INTEGER"),
+    "block-size": ("block_size", "INTEGER"),
+    "log": ("log", "INTEGER"),
+    "profile": ("profile", "INTEGER"),
+    "value-encoding": ("value_encoding", "TEXT"),
+    "read-path-script": ("read_path_script", "INTEGER"),
+    "tree-top-cache-levels": ("tree_top_cache_levels", "INTEGER"),
+    "bucket-locking": ("bucket_locking", "INTEGER"),
+    "adaptive-epoch-time": ("adaptive_epoch_time", "INTEGER"),
+    "min-epoch-time": ("min_epoch_time", "REAL"),
+    "max-epoch-time": ("max_epoch_time", "REAL"),
+}
+
+# "Experiment <name> Latency" lines -> runs column
+LATENCY_COLUMNS: Dict[str, str] = {
+    "P50": "p50_latency_ms",
+    "P90": "p90_latency_ms",
+    "P99": "p99_latency_ms",
+    "P99.9": "p999_latency_ms",
+    "Max": "max_latency_ms",
+}
+# Bump this whenever the tables change; an outdated store is rebuilt from scratch.
+SCHEMA_VERSION = 4
+
+EXPERIMENT_FILE = re.compile(r"experiment_(\d+)\.txt$")
+# read_ops/mac_2_4KB style directories encode the machine count.
+MACHINES_DIR = re.compile(r"mac_(\d+)_")
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    experiment_mtime_ns INTEGER NOT NULL,
+    experiment_size INTEGER NOT NULL,
+    parameters_mtime_ns INTEGER NOT NULL,
+    parameters_size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    path TEXT PRIMARY KEY,
+    experiment_group TEXT NOT NULL,
+    experiment TEXT NOT NULL,
+    run INTEGER NOT NULL,
+    machines INTEGER,
+    average_throughput REAL,
+    average_latency_ms REAL,
+    {", ".join(f"{column} REAL" for column in LATENCY_COLUMNS.values())},
+    intervals INTEGER NOT NULL,
+    {", ".join(f"{column} {column_type}" for column, column_type in PARAMETER_COLUMNS.values())}
+);
+CREATE TABLE IF NOT EXISTS intervals (
+    path TEXT NOT NULL,
+    interval INTEGER NOT NULL,
+    throughput REAL NOT NULL,
+    latency_ms REAL,
+    p99_latency_ms REAL,
+    PRIMARY KEY (path, interval)
+);
+CREATE INDEX IF NOT EXISTS runs_by_group ON runs (experiment_group, experiment);
+"""
+
+
+def parse_experiment_output(filepath: str) -> Dict[str, Any]:
+    """Parses the per-interval and average lines written by client.WriteOutputToFile.
+
+    Older outputs used "Average latency in ms:" instead of "Average Latency:"
+    and have no percentile lines.
+    """
+    throughputs: List[float] = []
+    latencies: List[Optional[float]] = []
+    p99_latencies: List[Optional[float]] = []
+    percentiles: Dict[str, Optional[float]] = {column: None for column in LATENCY_COLUMNS.values()}
+    average_throughput = average_latency = None
+    with open(filepath, 'r') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            try:
+                value = float(value)
+            except ValueError:
+                continue
+            if key == "Throughput":
+                throughputs.append(value)
+                latencies.append(None)
+                p99_latencies.append(None)
+            elif key in ("Average Latency", "Average latency in ms") and throughputs:
+                latencies[-1] = value
+            elif key == "P99 Latency" and throughputs:
+                p99_latencies[-1] = value
+            elif key.startswith("Experiment ") and key.endswith(" Latency") and key[11:-8] in LATENCY_COLUMNS:
+                percentiles[LATENCY_COLUMNS[key[11:-8]]] = value
+            elif key == "Average Throughput":
+                average_throughput = value
+            elif key == "Experiment Average Latency":
+                average_latency = value
+    measured = [latency for latency in latencies if latency is not None]
+    if average_throughput is None and throughputs:
+        average_throughput = sum(throughputs) / len(throughputs)
+    if average_latency is None and measured:
+        average_latency = sum(measured) / len(measured)
+    return {
+        "throughputs": throughputs,
+        "latencies": latencies,
+        "p99_latencies": p99_latencies,
+        "percentiles": percentiles,
+        "average_throughput": average_throughput,
+        "average_latency_ms": average_latency,
+    }
+
+
+def read_parameters(filepath: str) -> Dict[str, Any]:
+    if not os.path.exists(filepath):
+        return {}
+    with open(filepath, 'r') as f:
+        return YAML(typ='safe').load(f) or {}
+
+
+def parse_run(root: str, filepath: str) -> Dict[str, Any]:
+    """Parses one experiment_N.txt together with the parameters.yaml next to it."""
+    experiment_dir = os.path.dirname(filepath)
+    relative = os.path.relpath(experiment_dir, root)
+    group, _, experiment = relative.partition(os.sep)
+    machines = MACHINES_DIR.match(os.path.basename(experiment_dir))
+    run = parse_experiment_output(filepath)
+    run.update({
+        "path": os.path.relpath(filepath, root),
+        "experiment_group": group,
+        "experiment": experiment or group,
+        "run": int(EXPERIMENT_FILE.search(filepath).group(1)),
+        "machines": int(machines.group(1)) if machines else None,
+        "parameters": read_parameters(os.path.join(experiment_dir, "parameters.yaml")),
+    })
+    return run
+
+
+def file_signature(filepath: str) -> Tuple[int, int, int, int]:
+    stat = os.stat(filepath)
+    parameters_path = os.path.join(os.path.dirname(filepath), "parameters.yaml")
+    parameters = os.stat(parameters_path) if os.path.exists(parameters_path) else None
+    return (stat.st_mtime_ns, stat.st_size,
+            parameters.st_mtime_ns if parameters else 0, parameters.st_size if parameters else 0)
+
+
+def find_experiment_files(root: str) -> List[str]:
+    found = []
+    for dirpath, _, filenames in os.walk(root):
+        found += [os.path.join(dirpath, filename) for filename in filenames if EXPERIMENT_FILE.match(filename)]
+    return sorted(found)
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    connection = sqlite3.connect(db_path)
+    if connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        connection.executescript("DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS runs; DROP TABLE IF EXISTS intervals;")
+        connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def _parameter_value(value: Any) -> Any:
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, str) and value.lower() in ("true", "false"):
+        return int(value.lower() == "true")
+    return value
+
+
+def ingest(root: str, db_path: str, workers: Optional[int] = None) -> Tuple[int, int]:
+    """Parses new or changed experiment outputs in parallel and drops rows of deleted ones.
+
+    Returns the number of ingested and removed runs.
+    """
+    connection = connect(db_path)
+    known = {row[0]: tuple(row[1:]) for row in connection.execute("SELECT * FROM files")}
+    current = {os.path.relpath(filepath, root): filepath for filepath in find_experiment_files(root)}
+    signatures = {path: file_signature(filepath) for path, filepath in current.items()}
+    changed = [path for path in current if known.get(path) != signatures[path]]
+    removed = [path for path in known if path not in current]
+
+    runs = []
+    if changed:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            runs = list(executor.map(parse_run, [root] * len(changed), [current[path] for path in changed], chunksize=16))
+
+    parameter_columns = [column for column, _ in PARAMETER_COLUMNS.values()]
+    columns = ["path", "experiment_group", "experiment", "run", "machines", "average_throughput",
+               "average_latency_ms", "intervals"] + list(LATENCY_COLUMNS.values()) + parameter_columns
+    with connection:
+        for table in ("files", "runs", "intervals"):
+            connection.executemany(f"DELETE FROM {table} WHERE path = ?", [(path,) for path in changed + removed])
+        connection.executemany(
+            f"INSERT INTO runs ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            [[run["path"], run["experiment_group"], run["experiment"], run["run"], run["machines"],
+              run["average_throughput"], run["average_latency_ms"], len(run["throughputs"])]
+             + [run["percentiles"][column] for column in LATENCY_COLUMNS.values()]
+             + [_parameter_value(run["parameters"].get(key)) for key in PARAMETER_COLUMNS] for run in runs])
+        connection.executemany(
+            "INSERT INTO intervals (path, interval, throughput, latency_ms, p99_latency_ms) VALUES (?, ?, ?, ?, ?)",
+            [(run["path"], i, throughput, latency, p99)
+             for run in runs for i, (throughput, latency, p99) in enumerate(zip(run["throughputs"], run["latencies"], run["p99_latencies"]))])
+        connection.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?)", [(path, *signatures[path]) for path in changed])
+    connection.close()
+    return len(changed), len(removed)
+
+
+def load_columns(db_path: str, query: str = "SELECT * FROM runs", params: Tuple = ()) -> Dict[str, np.ndarray]:
+    """Runs a query and returns its result as one numpy array per column."""
+    connection = connect(db_path)
+    cursor = connection.execute(query, params)
+    names = [description[0] for description in cursor.description]
+    rows = cursor.fetchall()
+    connection.close()
+    columns = list(zip(*rows)) if rows else [() for _ in names]
+    result = {}
+    for name, values in zip(names, columns):
+        array = np.array(values, dtype=object)
+        if all(isinstance(value, (int, float)) or value is None for value in values):
+            array = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+        result[name] = array
+    return result
+
+
+def group_stats(columns: Dict[str, np.ndarray], by: str, values: List[str]) -> Dict[str, np.ndarray]:
+    """Mean and population standard deviation of values per distinct key of by, sorted by key.
+
+    NaN values are left out of their group.
+    """
+    keys, inverse = np.unique(columns[by], return_inverse=True)
+    result = {by: keys, "runs": np.bincount(inverse, minlength=len(keys))}
+    for name in values:
+        value = columns[name].astype(np.float64)
+        present = ~np.isnan(value)
+        count = np.bincount(inverse[present], minlength=len(keys))
+        total = np.bincount(inverse[present], weights=value[present], minlength=len(keys))
+        squares = np.bincount(inverse[present], weights=value[present] ** 2, minlength=len(keys))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / count
+            result[f"{name}_mean"] = mean
+            result[f"{name}_std"] = np.sqrt(np.maximum(squares / count - mean ** 2, 0))
+    return result
+
+
+def experiment_group_stats(db_path: str, experiment_group: str, x_column: str,
+                           values: Tuple[str, ...] = ("average_throughput", "average_latency_ms")) -> Dict[str, np.ndarray]:
+    """Per x_column statistics of one experiment group, e.g. read_ops by block_size."""
+    columns = load_columns(db_path, "SELECT * FROM runs WHERE experiment_group = ?", (experiment_group,))
+    return group_stats(columns, x_column, list(values))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Ingests experiment outputs and their parameters into a SQLite results store.")
+    parser.add_argument("--root", default=DEFAULT_ROOT, help="experiments directory")
+    parser.add_argument("--db", default=DEFAULT_DB, help="results database")
+    parser.add_argument("--workers", type=int, default=None, help="number of parser processes")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    ingested, removed = ingest(args.root, args.db, args.workers)
+    print(f"Ingested {ingested} runs, removed {removed} into {args.db}")
@@ -0,0 +1,261 @@
+import argparse
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Set
+
+from ruamel.yaml import YAML
+
+# This file runs the experiment directories under 'treebeard/experiments/' concurrently.
+# Every experiment names logical hosts (host0 for the client, deploy_host in its yaml files);
+# they are mapped onto free hosts of a pool so that concurrent experiments never share a machine.
+
+EXPERIMENTS_DIR = "../experiments/"
+CLIENT_HOST = "host0"
+STAGING_DIR = ".staged"
+JOURNAL_FILE = ".schedule_journal.jsonl"
+
+DEPLOY_COMMAND = "ansible-playbook -i {inventory} ../ansible/deploy.yaml -e experiment_path={experiment_path} -vv"
+RUN_COMMAND = "ansible-playbook -i {inventory} ../ansible/experiment.yaml -e experiment_output_path={output} -vv"
+
+
+@dataclass
+class PoolHost:
+    ip: str
+    local_bind_ip: str
+    ansible_user: str = "cc"
+
+
+@dataclass
+class Experiment:
+    path: str
+    hosts: List[str]  # logical host names
+    pending_runs: List[int]
+    attempts: int = 0
+    placement: Dict[str, PoolHost] = field(default_factory=dict)
+
+
+def load_pool(filepath: str) -> List[PoolHost]:
+    """Reads a json list of hosts, each an ip string or an object with ip, local_bind_ip and ansible_user."""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+    pool = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"ip": entry}
+        pool.append(PoolHost(entry["ip"], entry.get("local_bind_ip", entry["ip"]), entry.get("ansible_user", "cc")))
+    return pool
+
+
+def experiment_hosts(experiment_dir: str) -> List[str]:
+    """Logical hosts used by the yaml files of an experiment, plus the client host."""
+    yaml = YAML(typ='safe')
+    hosts = {CLIENT_HOST}
+    for filename in os.listdir(experiment_dir):
+        if not filename.endswith(('.yaml', '.yml')):
+            continue
+        with open(os.path.join(experiment_dir, filename), 'r', encoding='utf-8') as f:
+            data = yaml.load(f)
+        if not isinstance(data, dict):
+            continue
+        for endpoint in data.get('endpoints') or [data]:
+            if isinstance(endpoint, dict) and endpoint.get('deploy_host'):
+                hosts.add(endpoint['deploy_host'])
+    return sorted(hosts)
+
+
+class Journal:
+    """Append-only json lines of run events, replayed to resume an interrupted schedule."""
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.lock = threading.Lock()
+
+    def record(self, experiment: str, event: str, **fields: Any):
+        line = json.dumps({"time": time.time(), "experiment": experiment, "event": event, **fields})
+        with self.lock, open(self.filepath, 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def replay(self) -> Dict[str, Dict[str, Any]]:
+        """Returns, per experiment, the succeeded runs and the number of failed attempts."""
+        state: Dict[str, Dict[str, Any]] = {}
+        if not os.path.exists(self.filepath):
+            return state
+        with open(self.filepath, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A line cut short by a crash.
+                    continue
+                experiment = state.setdefault(entry["experiment"], {"succeeded": set(), "failures": 0})
+                if entry["event"] == "run_succeeded":
+                    experiment["succeeded"].add(entry["run"])
+                elif entry["event"] == "attempt_failed":
+                    experiment["failures"] += 1
+        return state
+
+
+def find_experiments(root: str, runs: int, journal: Journal, retries: int) -> List[Experiment]:
+    state = journal.replay()
+    experiments = []
+    for group in sorted(os.listdir(root)):
+        group_dir = os.path.join(root, group)
+        if not os.path.isdir(group_dir) or group.startswith('.'):
+            continue
+        for name in sorted(os.listdir(group_dir)):
+            experiment_dir = os.path.join(group_dir, name)
+            if not os.path.isdir(experiment_dir) or not os.path.exists(os.path.join(experiment_dir, "parameters.yaml")):
+                continue
+            done = state.get(experiment_dir, {}).get("succeeded", set())
+            pending = [i for i in range(1, runs + 1)
+                       if i not in done or not os.path.exists(os.path.join(experiment_dir, f"experiment_{i}.txt"))]
+            failures = state.get(experiment_dir, {}).get("failures", 0)
+            if not pending:
+                continue
+            if failures > retries:
+                print(f"⚠️ Warning: {experiment_dir} failed {failures} times. Skipping.")
+                continue
+            experiments.append(Experiment(experiment_dir, experiment_hosts(experiment_dir), pending, failures))
+    return experiments
+
+
+def stage_experiment(experiment: Experiment) -> str:
+    """Copies an experiment's configs with its logical hosts replaced by the placed pool hosts, and writes its inventory."""
+    staged = os.path.join(experiment.path, STAGING_DIR)
+    shutil.rmtree(staged, ignore_errors=True)
+    os.makedirs(staged)
+    yaml = YAML()
+    for filename in os.listdir(experiment.path):
+        source = os.path.join(experiment.path, filename)
+        dest = os.path.join(staged, filename)
+        if filename.endswith(('.yaml', '.yml')):
+            with open(source, 'r', encoding='utf-8') as f:
+                data = yaml.load(f)
+            if isinstance(data, dict):
+                for endpoint in data.get('endpoints') or [data]:
+                    host = experiment.placement.get(endpoint.get('deploy_host'))
+                    if host:
+                        endpoint['exposed_ip'] = host.ip
+                        endpoint['local_bind_ip'] = host.local_bind_ip
+            with open(dest, 'w', encoding='utf-8') as f:
+                yaml.dump(data, f)
+        elif filename == "trace.txt" or filename == "trace.bin":
+            # Traces are large; link rather than copy.
+            try:
+                os.link(source, dest)
+            except OSError:
+                os.symlink(os.path.abspath(source), dest)
+    with open(os.path.join(staged, "hosts"), 'w', encoding='utf-8') as f:
+        for name, host in sorted(experiment.placement.items()):
+            f.write(f"{name} ansible_host={host.ip} ansible_user={host.ansible_user}\n")
+    return staged
+
+
+def run_command(template: str, log_path: str, **values: str) -> bool:
+    command = template.format(**{key: shlex.quote(value) for key, value in values.items()})
+    with open(log_path, 'a', encoding='utf-8') as log:
+        log.write(f"$ {command}\n")
+        log.flush()
+        return subprocess.run(command, shell=True, stdout=log, stderr=subprocess.STDOUT).returncode == 0
+
+
+def execute(experiment: Experiment, journal: Journal, deploy_command: str, experiment_command: str) -> bool:
+    """Deploys an experiment on its placed hosts and runs its pending runs; returns whether all succeeded."""
+    staged = stage_experiment(experiment)
+    inventory = os.path.join(staged, "hosts")
+    log_path = os.path.join(experiment.path, "schedule.log")
+    hosts = {name: host.ip for name, host in experiment.placement.items()}
+    journal.record(experiment.path, "deploy_started", hosts=hosts)
+    if not run_command(deploy_command, log_path, inventory=inventory, experiment_path=os.path.abspath(staged)):
+        journal.record(experiment.path, "deploy_failed", hosts=hosts)
+        return False
+    succeeded = True
+    for run in list(experiment.pending_runs):
+        output = os.path.abspath(os.path.join(experiment.path, f"experiment_{run}.txt"))
+        journal.record(experiment.path, "run_started", run=run, hosts=hosts)
+        if run_command(experiment_command, log_path, inventory=inventory, output=output) and os.path.exists(output):
+            journal.record(experiment.path, "run_succeeded", run=run)
+            experiment.pending_runs.remove(run)
+        else:
+            journal.record(experiment.path, "run_failed", run=run)
+            succeeded = False
+    return succeeded
+
+
+def schedule(experiments: List[Experiment], pool: List[PoolHost], journal: Journal, deploy_command: str,
+             experiment_command: str, retries: int) -> List[Experiment]:
+    """Runs experiments concurrently on disjoint hosts of the pool and returns the ones that kept failing.
+
+    Pending experiments are started largest first whenever enough hosts are free,
+    so small experiments fill the hosts a large one leaves over.
+    """
+    too_large = [e for e in experiments if len(e.hosts) > len(pool)]
+    for experiment in too_large:
+        print(f"⚠️ Warning: {experiment.path} needs {len(experiment.hosts)} hosts but the pool has {len(pool)}. Skipping.")
+    pending = sorted((e for e in experiments if len(e.hosts) <= len(pool)), key=lambda e: (-len(e.hosts), e.path))
+    free: Set[int] = set(range(len(pool)))
+    failed: List[Experiment] = []
+    running: Dict[Future, Experiment] = {}
+    with ThreadPoolExecutor(max_workers=len(pool)) as executor:
+        while pending or running:
+            for experiment in list(pending):
+                if len(experiment.hosts) <= len(free):
+                    chosen = sorted(free)[:len(experiment.hosts)]
+                    free.difference_update(chosen)
+                    experiment.placement = {name: pool[i] for name, i in zip(experiment.hosts, chosen)}
+                    pending.remove(experiment)
+                    print(f"Starting {experiment.path} on {', '.join(pool[i].ip for i in chosen)}")
+                    running[executor.submit(execute, experiment, journal, deploy_command, experiment_command)] = experiment
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                experiment = running.pop(future)
+                free.update(i for i, host in enumerate(pool) if host in experiment.placement.values())
+                try:
+                    succeeded = future.result()
+                except Exception as e:
+                    print(f"❌ Error running {experiment.path}: {e}")
+                    succeeded = False
+                if succeeded:
+                    print(f"✅ Finished: {experiment.path}")
+                    continue
+                experiment.attempts += 1
+                journal.record(experiment.path, "attempt_failed", attempt=experiment.attempts)
+                if experiment.attempts <= retries:
+                    print(f"Retrying {experiment.path} (attempt {experiment.attempts + 1})")
+                    pending.append(experiment)
+                    pending.sort(key=lambda e: (-len(e.hosts), e.path))
+                else:
+                    print(f"❌ Giving up on {experiment.path} after {experiment.attempts} attempts")
+                    failed.append(experiment)
+    return failed + too_large
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Runs experiment directories concurrently on disjoint subsets of a host pool.")
+    parser.add_argument("--root", default=EXPERIMENTS_DIR, help="experiments directory with group/experiment subdirectories")
+    parser.add_argument("--pool", required=True, help="json list of available hosts")
+    parser.add_argument("--runs", type=int, default=1, help="number of runs of every experiment")
+    parser.add_argument("--retries", type=int, default=2, help="retries of a failed experiment")
+    parser.add_argument("--journal", default=None, help="state journal (defaults to <root>/.schedule_journal.jsonl)")
+    parser.add_argument("--deploy-command", default=DEPLOY_COMMAND, help="deploy command with {inventory} and {experiment_path}")
+    parser.add_argument("--run-command", default=RUN_COMMAND, help="experiment command with {inventory} and {output}")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    journal = Journal(args.journal or os.path.join(args.root, JOURNAL_FILE))
+    experiments = find_experiments(args.root, args.runs, journal, args.retries)
+    print(f"{len(experiments)} experiments with pending runs")
+    failed = schedule(experiments, load_pool(args.pool), journal, args.deploy_command, args.run_command, args.retries)
+    if failed:
+        print(f"{len(failed)} experiments did not complete: {', '.join(e.path for e in failed)}")
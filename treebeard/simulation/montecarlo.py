@@ -0,0 +1,174 @@
+import argparse
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from statistics import NormalDist
+
+import numpy as np
+
+from simulate import EXPERIMETNS, BucketEngine
+
+# Number of experiments each worker runs before the runner checks the confidence interval.
+DEFAULT_ROUND_SIZE = 100
+
+
+@dataclass
+class MonteCarloResult:
+    experiments: int
+    mean: float
+    stddev: float
+    ci_low: float
+    ci_high: float
+    confidence: float
+
+    @property
+    def ci_width(self):
+        return self.ci_high - self.ci_low
+
+    def __str__(self):
+        return (f"buckets per request: mean {self.mean:.4f}, stddev {self.stddev:.4f}, "
+                f"{self.confidence:.0%} CI [{self.ci_low:.4f}, {self.ci_high:.4f}] over {self.experiments} experiments")
+
+
+def run_experiments(tree_path_count, shift, num_requests, batch_size, experiments, seed_sequence):
+    """Runs experiments independent experiments and returns the buckets per request of each one."""
+    engine = BucketEngine(tree_path_count, shift, seed_sequence)
+    batches = len(range(0, num_requests, batch_size))
+    counts = engine.buckets_per_batch(batch_size, batches * experiments)
+    return counts.reshape(experiments, batches).sum(axis=1) / num_requests
+
+
+def summarize(samples, confidence):
+    samples = np.asarray(samples, dtype=np.float64)
+    mean = float(samples.mean())
+    stddev = float(samples.std(ddof=1)) if samples.size > 1 else math.inf
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    half_width = z * stddev / math.sqrt(samples.size)
+    return MonteCarloResult(samples.size, mean, stddev, mean - half_width, mean + half_width, confidence)
+
+
+class MonteCarloRunner:
+    """Splits bucket simulation experiments across a process pool.
+
+    Every worker task gets its own child of one SeedSequence, so the streams are
+    independent and a fixed seed reproduces the same result regardless of timing.
+    The runner stops as soon as the confidence interval is narrower than
+    target_ci_width or max_experiments have been run.
+    """
+
+    def __init__(self, tree_path_count, shift=1, workers=None, round_size=DEFAULT_ROUND_SIZE, seed=None):
+        self.tree_path_count = tree_path_count
+        self.shift = shift
+        self.workers = workers or os.cpu_count() or 1
+        self.round_size = round_size
+        self.seed_sequence = np.random.SeedSequence(seed)
+
+    def run(self, num_requests, batch_size, max_experiments=EXPERIMETNS, target_ci_width=None, confidence=0.95):
+        if batch_size > self.tree_path_count:
+            raise ValueError("Batch size cannot be greater than the number of paths in the tree")
+        samples = []
+        done = 0
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            while done < max_experiments:
+                sizes = []
+                for _ in range(self.workers):
+                    size = min(self.round_size, max_experiments - done - sum(sizes))
+                    if size <= 0:
+                        break
+                    sizes.append(size)
+                futures = [
+                    executor.submit(run_experiments, self.tree_path_count, self.shift, num_requests, batch_size, size, child)
+                    for size, child in zip(sizes, self.seed_sequence.spawn(len(sizes)))
+                ]
+                for future in futures:
+                    samples.append(future.result())
+                done += sum(sizes)
+                result = summarize(np.concatenate(samples), confidence)
+                if target_ci_width is not None and result.ci_width <= target_ci_width:
+                    return result
+        return summarize(np.concatenate(samples), confidence)
+
+
+def expected_unique_buckets(batch_size, tree_path_count, shift=1):
+    """Exact expected number of distinct buckets touched by batch_size uniform random paths.
+
+    On every level a bucket covering c of the tree_path_count leaves is touched
+    with probability 1 - (1 - c / tree_path_count)^batch_size. The buckets of one
+    level are a contiguous id range, so only the two edge buckets can cover fewer
+    leaves than the rest.
+    """
+    first_leaf, last_leaf = tree_path_count, 2 * tree_path_count - 1
+    expected = 0.0
+    level = 0
+    while (last_leaf >> (shift * level)) > 0:
+        width = 1 << (shift * level)
+        low, high = max(first_leaf >> (shift * level), 1), last_leaf >> (shift * level)
+        coverages = {}
+        for bucket in {low, high}:
+            coverage = min((bucket + 1) * width, last_leaf + 1) - max(bucket * width, first_leaf)
+            coverages[coverage] = coverages.get(coverage, 0) + 1
+        if high - low > 1:
+            coverages[width] = coverages.get(width, 0) + high - low - 1
+        for coverage, buckets in coverages.items():
+            if coverage > 0:
+                miss = math.exp(batch_size * math.log1p(-coverage / tree_path_count)) if coverage < tree_path_count else 0.0
+                expected += buckets * (1 - miss)
+        level += 1
+    return expected
+
+
+def expected_buckets_per_request(num_requests, batch_size, tree_path_count, shift=1):
+    batches = len(range(0, num_requests, batch_size))
+    return batches * expected_unique_buckets(batch_size, tree_path_count, shift) / num_requests
+
+
+def batch_size_for_read_ratio(ratio, tree_height, shift=1):
+    """Returns the smallest batch size whose bucket reads per request are at most ratio times those of batch size one."""
+    tree_path_count = 2**(tree_height - 1)
+    baseline = expected_unique_buckets(1, tree_path_count, shift)
+
+    def reads(batch_size):
+        return expected_unique_buckets(batch_size, tree_path_count, shift) / batch_size
+
+    low, high = 1, 1
+    while reads(high) > ratio * baseline:
+        if high >= tree_path_count:
+            return None
+        low, high = high, min(high * 2, tree_path_count)
+    while low < high:
+        middle = (low + high) // 2
+        if reads(middle) <= ratio * baseline:
+            high = middle
+        else:
+            low = middle + 1
+    return high
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Parallel Monte Carlo estimate of buckets read per request with a closed-form cross-check.")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[2], help="batch sizes to evaluate")
+    parser.add_argument("--num-requests", type=int, default=1000, help="number of requests per experiment")
+    parser.add_argument("--tree-height", type=int, default=21, help="tree height as in parameters.yaml")
+    parser.add_argument("--shift", type=int, default=1, help="2^shift is the tree branching factor")
+    parser.add_argument("--max-experiments", type=int, default=EXPERIMETNS, help="maximum number of experiments per batch size")
+    parser.add_argument("--target-ci-width", type=float, default=None, help="stop once the confidence interval is this narrow")
+    parser.add_argument("--confidence", type=float, default=0.95, help="confidence level of the interval")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--seed", type=int, default=None, help="random seed")
+    parser.add_argument("--read-ratio", type=float, default=None, help="only print the batch size that reduces reads per request to this ratio")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.read_ratio is not None:
+        batch_size = batch_size_for_read_ratio(args.read_ratio, args.tree_height, args.shift)
+        print(f"batch size for {args.read_ratio} of the reads at height {args.tree_height}: {batch_size}")
+    else:
+        tree_path_count = 2**(args.tree_height - 1)
+        runner = MonteCarloRunner(tree_path_count, args.shift, args.workers, seed=args.seed)
+        for batch_size in args.batch_sizes:
+            result = runner.run(args.num_requests, batch_size, args.max_experiments, args.target_ci_width, args.confidence)
+            exact = expected_buckets_per_request(args.num_requests, batch_size, tree_path_count, args.shift)
+            print(f"batch size {batch_size}: {result}; exact {exact:.4f}")
@@ -0,0 +1,52 @@
+import unittest
+import numpy as np
+from montecarlo import MonteCarloRunner, batch_size_for_read_ratio, expected_unique_buckets, run_experiments
+
+
+class TestExpectedUniqueBuckets(unittest.TestCase):
+    def test_single_path_touches_every_level(self):
+        self.assertAlmostEqual(expected_unique_buckets(1, tree_path_count=2**10), 11)
+        self.assertAlmostEqual(expected_unique_buckets(1, tree_path_count=2**10, shift=2), 6)
+
+    def test_two_paths_in_small_tree(self):
+        #                 1
+        #                / \
+        #               2   3
+        # Two paths share the root and hit the other leaf with probability 1/2.
+        self.assertAlmostEqual(expected_unique_buckets(2, tree_path_count=2), 2.5)
+
+    def test_matches_monte_carlo_estimate(self):
+        samples = run_experiments(64, 2, 1000, 10, 200, np.random.SeedSequence(1))
+        exact = expected_unique_buckets(10, 64, 2) / 10
+        self.assertAlmostEqual(samples.mean(), exact, places=1)
+
+
+class TestMonteCarloRunner(unittest.TestCase):
+    def test_stops_early_when_target_width_is_reached(self):
+        runner = MonteCarloRunner(tree_path_count=2**10, workers=2, round_size=20, seed=1)
+        result = runner.run(num_requests=100, batch_size=10, max_experiments=1000, target_ci_width=1.0)
+        self.assertLess(result.experiments, 1000)
+        self.assertLessEqual(result.ci_width, 1.0)
+        self.assertLessEqual(result.ci_low, result.mean)
+        self.assertLessEqual(result.mean, result.ci_high)
+
+    def test_same_seed_gives_same_result(self):
+        first = MonteCarloRunner(tree_path_count=2**10, workers=2, round_size=10, seed=5).run(100, 10, max_experiments=40)
+        second = MonteCarloRunner(tree_path_count=2**10, workers=2, round_size=10, seed=5).run(100, 10, max_experiments=40)
+        self.assertEqual(first.mean, second.mean)
+        self.assertEqual(first.experiments, 40)
+
+
+class TestBatchSizeForReadRatio(unittest.TestCase):
+    def test_ratio_one_needs_no_batching(self):
+        self.assertEqual(batch_size_for_read_ratio(1.0, tree_height=10), 1)
+
+    def test_found_batch_size_is_the_smallest(self):
+        batch_size = batch_size_for_read_ratio(0.5, tree_height=12)
+        tree_path_count = 2**11
+        baseline = expected_unique_buckets(1, tree_path_count)
+        self.assertLessEqual(expected_unique_buckets(batch_size, tree_path_count) / batch_size, 0.5 * baseline)
+        self.assertGreater(expected_unique_buckets(batch_size - 1, tree_path_count) / (batch_size - 1), 0.5 * baseline)
+
+if __name__ == '__main__':
+    unittest.main()
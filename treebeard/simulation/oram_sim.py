@@ -0,0 +1,337 @@
+import argparse
+import json
+import math
+from collections import Counter, defaultdict
+
+import numpy as np
+from ruamel.yaml import YAML
+
+EMPTY = -1
+
+
+def load_parameters(path):
+    """Reads a parameters.yaml file into a dict keyed by the yaml names (e.g. "eviction-rate")."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return dict(YAML(typ='safe').load(f))
+
+
+def reverse_lexicographic_paths(eviction_count, count, tree_height):
+    """Mirrors StorageHandler.GetMultipleReverseLexicographicPaths.
+
+    The sequence repeats every 2^(tree_height-1) evictions, so at most one full
+    round of distinct paths is returned.
+    """
+    bits = tree_height - 1
+    counts = (eviction_count + np.arange(min(count, 2**bits), dtype=np.int64)) % (2**bits)
+    reverse = np.zeros_like(counts)
+    for _ in range(bits):
+        reverse = (reverse << 1) + (counts & 1)
+        counts >>= 1
+    return reverse + 1
+
+
+class RedisOpCounter:
+    """Counts the Redis commands and pipeline round trips issued by StorageHandler."""
+
+    def __init__(self, pipeline_size, read_path_script=False):
+        self.pipeline_size = pipeline_size
+        self.read_path_script = read_path_script
+        self.commands = Counter()
+        self.round_trips = 0
+
+    def _pipelines(self, buckets):
+        return math.ceil(buckets / self.pipeline_size) if buckets > 0 else 0
+
+    def read_path(self, buckets):
+        pipelines = self._pipelines(buckets)
+        if self.read_path_script:
+            # BatchReadPath does all of the below in one script call per batch.
+            self.commands["EVALSHA"] += pipelines
+            self.round_trips += pipelines
+            return
+        # BatchGetBlockOffset
+        self.commands["GET"] += buckets
+        # BatchReadBlock reads the slot, then invalidates it and bumps the access count in place.
+        self.commands["HGET"] += buckets
+        self.commands["SETBIT"] += buckets
+        self.commands["BITFIELD"] += buckets
+        self.round_trips += 3 * pipelines
+
+    def read_buckets(self, buckets, z):
+        self.commands["GET"] += buckets
+        self.commands["HGET"] += buckets * z
+        self.round_trips += 2 * self._pipelines(buckets)
+
+    def write_buckets(self, buckets):
+        self.commands["HMSET"] += buckets
+        self.commands["SET"] += buckets
+        self.round_trips += self._pipelines(buckets)
+
+
+class PathORAMSimulator:
+    """Array-backed model of ReadPath, early reshuffle and eviction on the oramnode.
+
+    Every storage is a tree of Z real slots per bucket, numbered like
+    StorageHandler.GetBucketsInPaths. A read removes the block from the tree and
+    puts it in the shard node stash with a new random path and storage. Each
+    ReadPath bumps the access count of every bucket on its paths and buckets that
+    reach S accesses are reshuffled. Every eviction-rate ReadPaths one storage
+    evicts evict-path-count reverse-lexicographic paths and the shard node sends
+    up to max-blocks-to-send stash blocks of that storage to be written back.
+
+    placement="random" writes buckets in arbitrary order like BatchWriteBucket,
+    which iterates over Go maps; placement="deepest" fills leaves first as in
+    textbook Path ORAM.
+    """
+
+    def __init__(self, parameters, num_blocks=None, storages=1, batch_size=1, placement="random", seed=None):
+        if placement not in ("random", "deepest"):
+            raise ValueError(f"unknown placement {placement}")
+        self.tree_height = int(parameters["tree-height"])
+        self.z = int(parameters["Z"])
+        self.s = int(parameters["S"])
+        self.shift = int(parameters.get("shift", 1))
+        self.eviction_rate = int(parameters["eviction-rate"])
+        self.evict_path_count = int(parameters["evict-path-count"])
+        self.max_blocks_to_send = int(parameters["max-blocks-to-send"])
+        self.redis = RedisOpCounter(int(parameters.get("redis-pipeline-size", 1)), bool(parameters.get("read-path-script", False)))
+        self.path_count = 2**(self.tree_height - 1)
+        self.num_blocks = num_blocks or self.path_count
+        self.storages = storages
+        self.batch_size = batch_size
+        self.placement = placement
+        self.rng = np.random.default_rng(seed)
+
+        bucket_count = 2 * self.path_count
+        self.slots = np.full((storages, bucket_count, self.z), EMPTY, dtype=np.int32)
+        self.occupancy = np.zeros((storages, bucket_count), dtype=np.int32)
+        self.access_counts = np.zeros((storages, bucket_count), dtype=np.int32)
+        self.dummies_consumed = np.zeros((storages, bucket_count), dtype=np.int32)
+        self.block_path = np.zeros(self.num_blocks, dtype=np.int64)  # zero means not in the position map
+        self.block_storage = np.zeros(self.num_blocks, dtype=np.int32)
+        self.block_bucket = np.full(self.num_blocks, EMPTY, dtype=np.int64)
+        self.block_slot = np.full(self.num_blocks, EMPTY, dtype=np.int32)
+        self.stash = [[] for _ in range(storages)]  # per storage list of blocks
+        self.stash_index = {}  # block to its index in the stash list of its storage
+        self.eviction_counts = [0] * storages
+        self.read_path_counter = 0
+
+        self.read_paths = 0
+        self.evictions = 0
+        self.reshuffles = 0
+        self.max_dummies_consumed = 0
+        self.blocks_sent = 0
+        self.blocks_written = 0
+        self.stash_sizes = []
+
+    def ancestors(self, paths):
+        """Returns a (len(paths), levels) matrix of bucket ids; zero marks levels above the root."""
+        buckets = np.asarray(paths, dtype=np.int64) + (self.path_count - 1)
+        levels = []
+        while buckets.any():
+            levels.append(buckets)
+            buckets = buckets >> self.shift
+        return np.stack(levels, axis=1)
+
+    def stash_size(self):
+        return len(self.stash_index)
+
+    def _add_to_stash(self, block):
+        if block in self.stash_index:
+            self._remove_from_stash(block)
+        storage = self.block_storage[block]
+        self.stash_index[block] = (storage, len(self.stash[storage]))
+        self.stash[storage].append(block)
+
+    def _remove_from_stash(self, block):
+        storage, index = self.stash_index.pop(block)
+        blocks = self.stash[storage]
+        last = blocks.pop()
+        if last != block:
+            blocks[index] = last
+            self.stash_index[last] = (storage, index)
+
+    def _remap(self, block):
+        self.block_path[block] = self.rng.integers(1, self.path_count + 1)
+        self.block_storage[block] = self.rng.integers(self.storages)
+
+    def read_path(self, storage, blocks, paths):
+        buckets = np.unique(self.ancestors(paths))
+        buckets = buckets[buckets > 0]
+        real_hits = set()
+        for block in blocks:
+            bucket = self.block_bucket[block]
+            if bucket != EMPTY and self.block_storage[block] == storage:
+                self.slots[storage, bucket, self.block_slot[block]] = EMPTY
+                self.occupancy[storage, bucket] -= 1
+                self.block_bucket[block] = EMPTY
+                self.block_slot[block] = EMPTY
+                real_hits.add(bucket)
+        dummy_buckets = buckets[~np.isin(buckets, list(real_hits))] if real_hits else buckets
+        self.dummies_consumed[storage, dummy_buckets] += 1
+        self.access_counts[storage, buckets] += 1
+        self.redis.read_path(len(buckets))
+
+        reshuffled = buckets[self.access_counts[storage, buckets] >= self.s]
+        if reshuffled.size > 0:
+            self.max_dummies_consumed = max(self.max_dummies_consumed, int(self.dummies_consumed[storage, reshuffled].max()))
+            self.access_counts[storage, reshuffled] = 0
+            self.dummies_consumed[storage, reshuffled] = 0
+            self.reshuffles += reshuffled.size
+            self.redis.read_buckets(reshuffled.size, self.z)
+            self.redis.write_buckets(reshuffled.size)
+        self.read_paths += 1
+        self.read_path_counter += 1
+
+    def evict(self, storage):
+        evicted = np.zeros(self.slots.shape[1], dtype=bool)
+        if self.evict_path_count >= self.path_count:
+            buckets = slice(1, 2 * self.path_count)
+            evicted[buckets] = True
+            bucket_count = 2 * self.path_count - 1
+        else:
+            paths = reverse_lexicographic_paths(self.eviction_counts[storage], self.evict_path_count, self.tree_height)
+            evicted[self.ancestors(paths).ravel()] = True
+            evicted[0] = False
+            buckets = np.flatnonzero(evicted)
+            bucket_count = buckets.size
+        self.eviction_counts[storage] += self.evict_path_count
+        self.redis.read_buckets(bucket_count, self.z)
+        self.redis.write_buckets(bucket_count)
+        self.max_dummies_consumed = max(self.max_dummies_consumed, int(self.dummies_consumed[storage, buckets].max()))
+        self.access_counts[storage, buckets] = 0
+        self.dummies_consumed[storage, buckets] = 0
+
+        stash = self.stash[storage]
+        count = min(self.max_blocks_to_send, len(stash))
+        sent = [stash[i] for i in self.rng.choice(len(stash), size=count, replace=False)] if count > 0 else []
+        self.blocks_sent += len(sent)
+        self.evictions += 1
+        self.read_path_counter = 0
+        if not sent:
+            return
+
+        occupancy = self.occupancy[storage]
+        sent = np.asarray(sent, dtype=np.int64)
+        sent_ancestors = self.ancestors(self.block_path[sent])
+        sent_blocks = np.repeat(sent, sent_ancestors.shape[1])
+        sent_ancestors = sent_ancestors.ravel()
+        valid = evicted[sent_ancestors] & (occupancy[sent_ancestors] < self.z)
+        pair_buckets, pair_blocks = sent_ancestors[valid], sent_blocks[valid]
+        if self.placement == "random":
+            candidate_buckets, bucket_index = np.unique(pair_buckets, return_inverse=True)
+            rank = self.rng.permutation(candidate_buckets.size)[bucket_index]
+        else:
+            rank = -pair_buckets
+        order = np.argsort(rank, kind="stable")
+        room = {}
+        placed = set()
+        for bucket, block in zip(pair_buckets[order].tolist(), pair_blocks[order].tolist()):
+            if block in placed:
+                continue
+            if bucket not in room:
+                room[bucket] = self.z - int(occupancy[bucket])
+            if room[bucket] == 0:
+                continue
+            slot = int(np.flatnonzero(self.slots[storage, bucket] == EMPTY)[0])
+            self.slots[storage, bucket, slot] = block
+            self.block_bucket[block] = bucket
+            self.block_slot[block] = slot
+            occupancy[bucket] += 1
+            room[bucket] -= 1
+            placed.add(block)
+        for block in placed:
+            self._remove_from_stash(block)
+        self.blocks_written += len(placed)
+
+    def step(self, requested_blocks):
+        """Runs one batch of requests through the shard node and the oramnode."""
+        requests = defaultdict(lambda: ([], []))
+        seen = set()
+        for block in requested_blocks:
+            block = int(block)
+            if block in seen:
+                # Only the first request for a block reads its path; the rest are fake requests.
+                path, storage = int(self.rng.integers(1, self.path_count + 1)), int(self.rng.integers(self.storages))
+                requests[storage][1].append(path)
+                continue
+            seen.add(block)
+            if self.block_path[block] == 0:
+                self._remap(block)
+            storage = int(self.block_storage[block])
+            requests[storage][0].append(block)
+            requests[storage][1].append(int(self.block_path[block]))
+        for storage, (blocks, paths) in requests.items():
+            self.read_path(storage, blocks, paths)
+        for block in seen:
+            self._remap(block)
+            self._add_to_stash(block)
+        self.stash_sizes.append(self.stash_size())
+        if self.read_path_counter >= self.eviction_rate:
+            self.evict(int(self.rng.integers(self.storages)))
+
+    def run(self, accesses, distribution="uniform", zipf_constant=0.99):
+        steps = math.ceil(accesses / self.batch_size)
+        for _ in range(steps):
+            self.step(self.sample_blocks(self.batch_size, distribution, zipf_constant))
+        return self.summary()
+
+    def sample_blocks(self, count, distribution, zipf_constant):
+        if distribution == "uniform":
+            return self.rng.integers(self.num_blocks, size=count)
+        if distribution == "zipfian":
+            if not hasattr(self, "_zipf_cdf"):
+                weights = 1.0 / np.arange(1, self.num_blocks + 1) ** zipf_constant
+                self._zipf_cdf = np.cumsum(weights) / weights.sum()
+            return np.minimum(np.searchsorted(self._zipf_cdf, self.rng.random(count)), self.num_blocks - 1)
+        raise ValueError(f"unknown distribution {distribution}")
+
+    def summary(self):
+        sizes = np.asarray(self.stash_sizes, dtype=np.int64)
+        histogram = np.bincount(sizes) if sizes.size else np.zeros(0, dtype=np.int64)
+        percentiles = {f"p{p}": float(np.percentile(sizes, p)) for p in (50, 90, 99, 99.9)} if sizes.size else {}
+        return {
+            "read_paths": self.read_paths,
+            "evictions": self.evictions,
+            "reshuffles": self.reshuffles,
+            "blocks_sent": self.blocks_sent,
+            "blocks_written": self.blocks_written,
+            "max_dummies_consumed": self.max_dummies_consumed,
+            "stash": {
+                "final": self.stash_size(),
+                "max": int(sizes.max()) if sizes.size else 0,
+                "mean": float(sizes.mean()) if sizes.size else 0.0,
+                **percentiles,
+                "histogram": {int(size): int(count) for size, count in enumerate(histogram) if count > 0},
+            },
+            "redis": {
+                "commands": dict(self.redis.commands),
+                "round_trips": self.redis.round_trips,
+            },
+        }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Simulates stash growth, early reshuffles and Redis operations of the ORAM protocol.")
+    parser.add_argument("--conf", default="../configs/default/parameters.yaml", help="path to parameters.yaml")
+    parser.add_argument("--accesses", type=int, default=100000, help="number of logical requests to simulate")
+    parser.add_argument("--blocks", type=int, default=None, help="number of distinct blocks (defaults to the number of paths)")
+    parser.add_argument("--storages", type=int, default=1, help="number of storages")
+    parser.add_argument("--batch-size", type=int, default=1, help="requests per ReadPath batch")
+    parser.add_argument("--placement", choices=["random", "deepest"], default="random", help="bucket order during eviction write back")
+    parser.add_argument("--distribution", choices=["uniform", "zipfian"], default="uniform", help="request distribution")
+    parser.add_argument("--zipf-constant", type=float, default=0.99, help="zipfian constant")
+    parser.add_argument("--seed", type=int, default=None, help="random seed")
+    parser.add_argument("--output", default=None, help="write the summary as json to this file")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    sim = PathORAMSimulator(load_parameters(args.conf), args.blocks, args.storages, args.batch_size, args.placement, args.seed)
+    summary = sim.run(args.accesses, args.distribution, args.zipf_constant)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=4)
+    print(json.dumps({k: v for k, v in summary.items() if k != "stash"}, indent=4))
+    print(json.dumps({k: v for k, v in summary["stash"].items() if k != "histogram"}, indent=4))
@@ -0,0 +1,95 @@
+import unittest
+import numpy as np
+from oram_sim import EMPTY, PathORAMSimulator, RedisOpCounter, reverse_lexicographic_paths
+
+
+def parameters(**overrides):
+    params = {
+        "max-blocks-to-send": 400,
+        "eviction-rate": 10,
+        "evict-path-count": 1000,
+        "Z": 1,
+        "S": 9,
+        "shift": 1,
+        "tree-height": 5,
+        "redis-pipeline-size": 1000,
+    }
+    params.update(overrides)
+    return params
+
+
+class TestReverseLexicographicPaths(unittest.TestCase):
+    def test_matches_storage_handler(self):
+        self.assertEqual(reverse_lexicographic_paths(0, 4, 3).tolist(), [1, 3, 2, 4])
+        self.assertEqual(reverse_lexicographic_paths(4, 1, 3).tolist(), [1])
+        self.assertEqual(reverse_lexicographic_paths(1, 3, 3).tolist(), [3, 2, 4])
+
+    def test_caps_at_one_round(self):
+        self.assertEqual(sorted(reverse_lexicographic_paths(1, 100, 3).tolist()), [1, 2, 3, 4])
+
+
+class TestRedisOpCounter(unittest.TestCase):
+    def test_round_trips_per_pipeline(self):
+        redis = RedisOpCounter(pipeline_size=4)
+        redis.read_path(5)
+        self.assertEqual(redis.round_trips, 6)
+        self.assertEqual(redis.commands["GET"], 5)
+        self.assertEqual(redis.commands["BITFIELD"], 5)
+        redis.write_buckets(0)
+        self.assertEqual(redis.round_trips, 6)
+
+    def test_read_path_script_is_one_round_trip_per_pipeline(self):
+        redis = RedisOpCounter(pipeline_size=4, read_path_script=True)
+        redis.read_path(5)
+        self.assertEqual(redis.round_trips, 2)
+        self.assertEqual(redis.commands, {"EVALSHA": 2})
+
+
+class TestPathORAMSimulator(unittest.TestCase):
+    def test_ancestors(self):
+        sim = PathORAMSimulator(parameters(**{"tree-height": 3}))
+        #                 1
+        #               /   \
+        #              2     3
+        #             / \   / \
+        #            4   5 6   7
+        self.assertEqual(sim.ancestors([1, 4]).tolist(), [[4, 2, 1], [7, 3, 1]])
+
+    def test_reshuffle_at_s(self):
+        sim = PathORAMSimulator(parameters(S=3, **{"tree-height": 3}))
+        for _ in range(2):
+            sim.read_path(0, [], [1])
+        self.assertEqual(sim.reshuffles, 0)
+        sim.read_path(0, [], [1])
+        self.assertEqual(sim.reshuffles, 3)
+        self.assertEqual(sim.max_dummies_consumed, 3)
+        self.assertEqual(sim.access_counts[0, [1, 2, 4]].tolist(), [0, 0, 0])
+
+    def test_evicted_blocks_stay_on_their_path(self):
+        sim = PathORAMSimulator(parameters(**{"eviction-rate": 1}), num_blocks=64, storages=2, seed=3)
+        sim.run(500)
+        for block in range(sim.num_blocks):
+            bucket = sim.block_bucket[block]
+            if bucket == EMPTY:
+                continue
+            storage = sim.block_storage[block]
+            self.assertIn(bucket, sim.ancestors([sim.block_path[block]])[0])
+            self.assertEqual(sim.slots[storage, bucket, sim.block_slot[block]], block)
+            self.assertNotIn(block, sim.stash_index)
+
+    def test_every_block_is_in_the_tree_or_the_stash(self):
+        sim = PathORAMSimulator(parameters(**{"evict-path-count": 4}), num_blocks=32, batch_size=4, placement="deepest", seed=5)
+        sim.run(400, distribution="zipfian")
+        in_tree = int((sim.slots != EMPTY).sum())
+        mapped = int(np.count_nonzero(sim.block_path))
+        self.assertEqual(in_tree + sim.stash_size(), mapped)
+        self.assertEqual(sim.occupancy.sum(), in_tree)
+        self.assertLessEqual(sim.blocks_written, sim.blocks_sent)
+
+    def test_unknown_placement(self):
+        with self.assertRaises(ValueError):
+            PathORAMSimulator(parameters(), placement="middle")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,385 @@
+import argparse
+import json
+import socket
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from oram_sim import load_parameters, reverse_lexicographic_paths
+
+# AES-GCM nonce and tag sizes of storage.Cipher; the value-encoding parameter stores
+# nonce and ciphertext as raw bytes or hex encoded.
+NONCE_BYTES = 12
+TAG_BYTES = 16
+# Length of a YCSB key such as "user6284781860667377211".
+BLOCK_ID_BYTES = 23
+# storage/metadata.go: a uint32 access count, then a validity bitmap and length-prefixed slot keys.
+ACCESS_COUNT_BYTES = 4
+KEY_LENGTH_BYTES = 2
+# Scripts are called by their SHA1 once loaded.
+SCRIPT_SHA_BYTES = 40
+
+
+def ciphertext_bytes(plaintext_bytes, value_encoding="raw"):
+    sealed = NONCE_BYTES + plaintext_bytes + TAG_BYTES
+    return 2 * sealed if value_encoding == "hex" else sealed
+
+
+def resp_command_bytes(*args):
+    """Size of a command sent as a RESP array of bulk strings; int arguments are lengths."""
+    size = len(f"*{len(args)}\r\n")
+    for arg in args:
+        length = arg if isinstance(arg, int) else len(str(arg))
+        size += len(f"${length}\r\n") + length + 2
+    return size
+
+
+def resp_bulk_bytes(length):
+    return len(f"${length}\r\n") + length + 2
+
+
+def resp_integer_bytes(value):
+    return len(f":{value}\r\n")
+
+
+RESP_OK_BYTES = len("+OK\r\n")
+
+
+@dataclass
+class Pipeline:
+    """One pipe.Exec of StorageHandler: the commands it carries and the bytes on the wire."""
+    operation: str
+    commands: Counter = field(default_factory=Counter)
+    request_bytes: int = 0
+    response_bytes: int = 0
+
+    def add(self, command, request_bytes, response_bytes, count=1):
+        self.commands[command] += count
+        self.request_bytes += request_bytes * count
+        self.response_bytes += response_bytes * count
+
+
+class StorageCostModel:
+    """Reproduces the Redis pipelines that storage.StorageHandler issues.
+
+    Bucket ids, keys and field layouts follow storage.go: the data of bucket b
+    is the hash "b" with fields "0".."Z+S-1", its metadata is the binary
+    string "-b" holding the access count, a validity bitmap and the block of
+    every slot. Every value is nonce + AES-GCM ciphertext, hex encoded if value_encoding is
+    "hex" ("compat" writes raw values). occupancy is the fraction
+    of real slots that hold a real block rather than a dummy. read_path_script
+    models ReadPath with one BatchReadPath script call per batch. The buckets of
+    the top tree_top_cache_levels levels are read from the oram node's memory;
+    only their writes and invalidations reach Redis.
+    """
+
+    def __init__(self, tree_height, z, s, shift=1, block_size=1024, pipeline_size=1000,
+                 block_id_bytes=BLOCK_ID_BYTES, occupancy=1.0, value_encoding="raw", read_path_script=False,
+                 tree_top_cache_levels=0):
+        self.tree_height = tree_height
+        self.z = z
+        self.s = s
+        self.shift = shift
+        self.block_size = block_size
+        self.pipeline_size = pipeline_size
+        self.block_id_bytes = block_id_bytes
+        self.real_blocks = round(z * occupancy)
+        self.value_encoding = value_encoding
+        self.read_path_script = read_path_script
+        self.cache_limit = 2**(shift * tree_top_cache_levels)
+        self.path_count = 2**(tree_height - 1)
+
+    @classmethod
+    def from_parameters(cls, parameters, **kwargs):
+        return cls(int(parameters["tree-height"]), int(parameters["Z"]), int(parameters["S"]),
+                   int(parameters.get("shift", 1)), int(parameters["block-size"]),
+                   int(parameters["redis-pipeline-size"]),
+                   value_encoding=parameters.get("value-encoding", "raw"),
+                   read_path_script=parameters.get("read-path-script", False) in (True, "true"),
+                   tree_top_cache_levels=int(parameters.get("tree-top-cache-levels", 0)), **kwargs)
+
+    def buckets_in_paths(self, paths):
+        buckets = set()
+        for path in paths:
+            bucket = self.path_count + int(path) - 1
+            while bucket > 0 and bucket not in buckets:
+                buckets.add(bucket)
+                bucket >>= self.shift
+        return sorted(buckets)
+
+    def split_cached(self, buckets):
+        """Separates the buckets of the tree-top cache from the ones read from Redis."""
+        return [b for b in buckets if b < self.cache_limit], [b for b in buckets if b >= self.cache_limit]
+
+    def batches(self, buckets):
+        """Same split as oramnode distributeBucketIDs."""
+        return [buckets[i:i + self.pipeline_size] for i in range(0, len(buckets), self.pipeline_size)]
+
+    @staticmethod
+    def digit_groups(buckets):
+        """Returns a map of decimal length to the number of buckets with that length.
+
+        Apart from their count, command sizes only depend on how many digits the
+        bucket id has, so whole trees are costed one digit group at a time.
+        """
+        return Counter(len(str(bucket)) for bucket in buckets)
+
+    def _dummy_bytes(self, digits, index):
+        return ciphertext_bytes(len(f"bd{index}") + digits, self.value_encoding)
+
+    def _metadata_bytes(self):
+        """Length of the metadata record of one bucket."""
+        size = ACCESS_COUNT_BYTES + (self.z + self.s + 7) // 8
+        for i in range(self.z + self.s):
+            key = self.block_id_bytes if i < self.real_blocks else len(f"dummy{i - self.real_blocks + 1}")
+            size += KEY_LENGTH_BYTES + key
+        return size
+
+    def batch_get_all_metadata(self, bucket_ids, operation="BatchGetAllMetaData"):
+        pipe = Pipeline(operation)
+        metadata = resp_bulk_bytes(self._metadata_bytes())
+        for digits, count in self.digit_groups(bucket_ids).items():
+            pipe.add("GET", resp_command_bytes("GET", digits + 1), metadata, count)
+        return pipe
+
+    def batch_read_block(self, buckets, hits, cached=()):
+        """BatchReadBlock: HGET of one slot per bucket, then SETBIT of its validity bit and BITFIELD INCRBY of the access count.
+
+        The cached buckets are only invalidated.
+        """
+        read = Pipeline("BatchReadBlock")
+        real = ciphertext_bytes(self.block_size, self.value_encoding)
+        offset = str(self.z + self.s - 1)
+        for bucket in buckets[:hits]:
+            read.add("HGET", resp_command_bytes("HGET", str(bucket), offset), resp_bulk_bytes(real))
+        for digits, count in self.digit_groups(buckets[hits:]).items():
+            read.add("HGET", resp_command_bytes("HGET", digits, offset), resp_bulk_bytes(self._dummy_bytes(digits, self.z)), count)
+        invalidate = Pipeline("BatchReadBlock invalidate")
+        bit = str(8 * ACCESS_COUNT_BYTES + int(offset))
+        for digits, count in self.digit_groups(list(buckets) + list(cached)).items():
+            invalidate.add("SETBIT", resp_command_bytes("SETBIT", digits + 1, bit, "0"), resp_integer_bytes(1), count)
+            invalidate.add("BITFIELD", resp_command_bytes("BITFIELD", digits + 1, "INCRBY", "u32", "0", "1"),
+                           len("*1\r\n") + resp_integer_bytes(self.s - 1), count)
+        return [read, invalidate] if buckets else [invalidate]
+
+    def batch_read_path(self, buckets, blocks, hits, cached=()):
+        """BatchReadPath: one EVALSHA with the data and metadata key of every bucket and the requested blocks.
+
+        The reply holds the found block, the slot value and the access count of every bucket.
+        The cached buckets only pass their metadata key and the slot to invalidate.
+        """
+        pipe = Pipeline("BatchReadPath")
+        args = ["EVALSHA", SCRIPT_SHA_BYTES, str(2 * len(buckets) + len(cached))]
+        for digits, count in self.digit_groups(buckets).items():
+            args += [digits, digits + 1] * count
+        for digits, count in self.digit_groups(cached).items():
+            args += [digits + 1] * count
+        args += [str(self.z + self.s), str(len(cached))] + [str(self.z + self.s - 1)] * len(cached)
+        args += [self.block_id_bytes] * blocks
+        real = ciphertext_bytes(self.block_size, self.value_encoding)
+        count_bytes = resp_integer_bytes(self.s - 1)
+        reply = len(f"*{3 * len(buckets)}\r\n")
+        reply += hits * (resp_bulk_bytes(self.block_id_bytes) + resp_bulk_bytes(real) + count_bytes)
+        for digits, count in self.digit_groups(buckets[hits:]).items():
+            reply += count * (resp_bulk_bytes(0) + resp_bulk_bytes(self._dummy_bytes(digits, self.z)) + count_bytes)
+        pipe.add("EVALSHA", resp_command_bytes(*args), reply)
+        return pipe
+
+    def batch_get_access_count(self, buckets):
+        """BatchGetAccessCount, which the oram node only runs to load the access counts of a storage."""
+        pipe = Pipeline("BatchGetAccessCount")
+        for digits, count in self.digit_groups(buckets).items():
+            pipe.add("BITFIELD", resp_command_bytes("BITFIELD", digits + 1, "GET", "u32", "0"),
+                     len("*1\r\n") + resp_integer_bytes(self.s), count)
+        return pipe
+
+    def batch_read_bucket(self, buckets):
+        """BatchReadBucket: the metadata of every bucket, then Z slot reads per bucket (real blocks padded with dummies).
+
+        Cached buckets are read from memory.
+        """
+        _, buckets = self.split_cached(buckets)
+        if not buckets:
+            return []
+        read = Pipeline("BatchReadBucket")
+        real = ciphertext_bytes(self.block_size, self.value_encoding)
+        for digits, count in self.digit_groups(buckets).items():
+            for i in range(self.z):
+                value = real if i < self.real_blocks else self._dummy_bytes(digits, i)
+                read.add("HGET", resp_command_bytes("HGET", digits, str(i)), resp_bulk_bytes(value), count)
+        return [self.batch_get_all_metadata(buckets), read]
+
+    def batch_write_bucket(self, buckets):
+        """BatchWriteBucket: one HMSET for the data and one SET for the metadata of every bucket."""
+        pipe = Pipeline("BatchWriteBucket")
+        real = ciphertext_bytes(self.block_size, self.value_encoding)
+        metadata = self._metadata_bytes()
+        for digits, count in self.digit_groups(buckets).items():
+            data_args = ["HMSET", digits]
+            for i in range(self.z + self.s):
+                data_args += [len(str(i)), real if i < self.real_blocks else self._dummy_bytes(digits, i)]
+            pipe.add("HMSET", resp_command_bytes(*data_args), RESP_OK_BYTES, count)
+            pipe.add("SET", resp_command_bytes("SET", digits + 1, metadata), RESP_OK_BYTES, count)
+        return pipe
+
+    def read_path(self, paths, hits=None, reshuffled_buckets=()):
+        """Returns the pipelines of one ReadPath over paths followed by its early reshuffle.
+
+        hits is the number of buckets that hold a requested block (all distinct
+        paths by default). reshuffled_buckets are the buckets whose access count
+        reached S; the model cannot know them without tracking access counts.
+        """
+        buckets = self.buckets_in_paths(paths)
+        hits = len(set(paths)) if hits is None else hits
+        pipelines = []
+        for batch in self.batches(buckets):
+            cached, batch = self.split_cached(batch)
+            batch_hits = min(hits, len(batch))
+            if self.read_path_script:
+                pipelines.append(self.batch_read_path(batch, len(paths), batch_hits, cached))
+            else:
+                if batch:
+                    pipelines.append(self.batch_get_all_metadata(batch, "BatchGetBlockOffset"))
+                pipelines += self.batch_read_block(batch, batch_hits, cached)
+            hits -= batch_hits
+        # The oram node decides on early reshuffles from its in-memory access counts.
+        for batch in self.batches(list(reshuffled_buckets)):
+            pipelines += self.batch_read_bucket(batch)
+        for batch in self.batches(list(reshuffled_buckets)):
+            pipelines.append(self.batch_write_bucket(batch))
+        return pipelines
+
+    def evict(self, eviction_count, evict_path_count):
+        """Returns the pipelines of one eviction of evict_path_count reverse-lexicographic paths."""
+        paths = reverse_lexicographic_paths(eviction_count, evict_path_count, self.tree_height)
+        buckets = self.buckets_in_paths(paths.tolist())
+        pipelines = []
+        for batch in self.batches(buckets):
+            pipelines += self.batch_read_bucket(batch)
+        for batch in self.batches(buckets):
+            pipelines.append(self.batch_write_bucket(batch))
+        return pipelines
+
+
+def summarize_pipelines(pipelines, scale=1.0):
+    commands = Counter()
+    for pipe in pipelines:
+        commands.update(pipe.commands)
+    return {
+        "round_trips": len(pipelines) * scale,
+        "commands": {command: count * scale for command, count in commands.items()},
+        "request_bytes": sum(pipe.request_bytes for pipe in pipelines) * scale,
+        "response_bytes": sum(pipe.response_bytes for pipe in pipelines) * scale,
+    }
+
+
+def project_throughput(model, requests_per_second, batch_size, eviction_rate, evict_path_count,
+                       link_gbps=10.0, samples=100, seed=None):
+    """Projects Redis traffic per second at a target throughput.
+
+    Every ReadPath carries batch_size random paths. In steady state a bucket is
+    reshuffled once every S accesses, so 1/S of the buckets of a ReadPath are
+    reshuffled; evictions are amortized over eviction_rate ReadPaths.
+    """
+    rng = np.random.default_rng(seed)
+    read_paths_per_second = requests_per_second / batch_size
+    pipelines = []
+    for _ in range(samples):
+        paths = rng.integers(1, model.path_count + 1, size=batch_size).tolist()
+        buckets = model.buckets_in_paths(paths)
+        reshuffled = rng.choice(buckets, size=len(buckets) // model.s, replace=False).tolist()
+        pipelines += model.read_path(paths, reshuffled_buckets=reshuffled)
+    per_read_path = summarize_pipelines(pipelines, 1 / samples)
+    per_eviction = summarize_pipelines(model.evict(0, evict_path_count))
+
+    per_second = {}
+    for key in ("round_trips", "request_bytes", "response_bytes"):
+        per_second[key] = read_paths_per_second * (per_read_path[key] + per_eviction[key] / eviction_rate)
+    commands = Counter(per_read_path["commands"])
+    for command, count in per_eviction["commands"].items():
+        commands[command] += count / eviction_rate
+    per_second["commands"] = {command: read_paths_per_second * count for command, count in commands.items()}
+    busiest = max(per_second["request_bytes"], per_second["response_bytes"])
+    per_second["link_utilization"] = busiest * 8 / (link_gbps * 1e9)
+    return per_second
+
+
+def redis_info(host, port, section):
+    """Returns one INFO section of a Redis server as a dict, without a client library."""
+    with socket.create_connection((host, port)) as conn:
+        conn.sendall(f"INFO {section}\r\n".encode())
+        reply = b""
+        while b"\r\n" not in reply:
+            reply += conn.recv(4096)
+        header, reply = reply.split(b"\r\n", 1)
+        length = int(header[1:])
+        while len(reply) < length + 2:
+            reply += conn.recv(65536)
+    info = {}
+    for line in reply[:length].decode().splitlines():
+        if line and not line.startswith("#"):
+            key, value = line.split(":", 1)
+            info[key] = value
+    return info
+
+
+def redis_counters(host, port):
+    """Returns the number of calls per command and the network bytes counted by a Redis server."""
+    counters = Counter()
+    for key, value in redis_info(host, port, "commandstats").items():
+        calls = dict(item.split("=") for item in value.split(","))["calls"]
+        counters[key.removeprefix("cmdstat_").upper()] = int(calls)
+    stats = redis_info(host, port, "stats")
+    counters["net_input_bytes"] = int(stats["total_net_input_bytes"])
+    counters["net_output_bytes"] = int(stats["total_net_output_bytes"])
+    return counters
+
+
+def measure(host, port, duration):
+    """Returns the counter deltas of a Redis server over duration seconds of a running experiment."""
+    before = redis_counters(host, port)
+    time.sleep(duration)
+    after = redis_counters(host, port)
+    after.subtract(before)
+    return +after
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Models the Redis pipelines of StorageHandler and projects network load.")
+    parser.add_argument("--conf", default="../configs/default/parameters.yaml", help="path to parameters.yaml")
+    parser.add_argument("--throughput", type=float, default=10000, help="target requests per second")
+    parser.add_argument("--batch-size", type=int, default=10, help="requests per ReadPath")
+    parser.add_argument("--block-sizes", type=int, nargs="*", default=None, help="block sizes to project (defaults to the config)")
+    parser.add_argument("--link-gbps", type=float, default=10.0, help="link speed used for the utilization")
+    parser.add_argument("--occupancy", type=float, default=1.0, help="fraction of real slots holding real blocks")
+    parser.add_argument("--seed", type=int, default=None, help="random seed")
+    parser.add_argument("--redis", default=None, help="host:port of a redis to measure while an experiment runs")
+    parser.add_argument("--duration", type=float, default=10, help="seconds to measure the redis counters")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    parameters = load_parameters(args.conf)
+    if args.redis:
+        host, port = args.redis.rsplit(":", 1)
+        measured = measure(host, int(port), args.duration)
+        model = StorageCostModel.from_parameters(parameters, occupancy=args.occupancy)
+        paths = np.random.default_rng(args.seed).integers(1, model.path_count + 1, size=args.batch_size).tolist()
+        predicted = summarize_pipelines(model.read_path(paths))
+        # Every ReadPath invalidates one slot of each of its buckets exactly once;
+        # redis counts the SETBIT calls of the read path script as well.
+        read_paths = measured["SETBIT"] / len(model.buckets_in_paths(paths)) if measured["SETBIT"] else 0
+        print(f"measured {read_paths:.1f} ReadPaths over {args.duration}s")
+        print(json.dumps({"measured": dict(measured), "predicted_per_read_path": predicted}, indent=4))
+    else:
+        for block_size in args.block_sizes or [int(parameters["block-size"])]:
+            parameters["block-size"] = block_size
+            model = StorageCostModel.from_parameters(parameters, occupancy=args.occupancy)
+            projection = project_throughput(model, args.throughput, args.batch_size, int(parameters["eviction-rate"]),
+                                            int(parameters["evict-path-count"]), args.link_gbps, seed=args.seed)
+            print(f"block size {block_size}: {projection['round_trips']:.0f} round trips/s, "
+                  f"{projection['request_bytes'] * 8 / 1e9:.3f} Gbit/s out, {projection['response_bytes'] * 8 / 1e9:.3f} Gbit/s in, "
+                  f"{projection['link_utilization']:.1%} of {args.link_gbps} GbE")
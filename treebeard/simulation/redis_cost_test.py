@@ -0,0 +1,102 @@
+import unittest
+from redis_cost import StorageCostModel, ciphertext_bytes, project_throughput, resp_command_bytes, summarize_pipelines
+
+
+class TestResp(unittest.TestCase):
+    def test_command_bytes(self):
+        # *3\r\n $4\r\nHGET\r\n $1\r\n5\r\n $1\r\n0\r\n
+        self.assertEqual(resp_command_bytes("HGET", "5", "0"), 28)
+        self.assertEqual(resp_command_bytes("HGET", 1, 1), 28)
+
+    def test_ciphertext_is_nonce_and_tagged_ciphertext(self):
+        self.assertEqual(ciphertext_bytes(1024), 12 + 1024 + 16)
+        self.assertEqual(ciphertext_bytes(1024, "hex"), 2 * (12 + 1024 + 16))
+
+
+class TestStorageCostModel(unittest.TestCase):
+    def test_read_path_commands(self):
+        model = StorageCostModel(tree_height=3, z=1, s=1)
+        pipelines = model.read_path([1])
+        summary = summarize_pipelines(pipelines)
+        self.assertEqual(summary["round_trips"], 3)
+        self.assertEqual(summary["commands"], {"GET": 3, "HGET": 3, "SETBIT": 3, "BITFIELD": 3})
+
+    def test_pipelines_are_split_like_distribute_bucket_ids(self):
+        model = StorageCostModel(tree_height=3, z=1, s=1, pipeline_size=2)
+        self.assertEqual(summarize_pipelines(model.read_path([1]))["round_trips"], 6)
+
+    def test_read_path_script_is_one_call_per_batch(self):
+        model = StorageCostModel(tree_height=3, z=1, s=1, pipeline_size=2, read_path_script=True)
+        summary = summarize_pipelines(model.read_path([1]))
+        self.assertEqual(summary["round_trips"], 2)
+        self.assertEqual(summary["commands"], {"EVALSHA": 2})
+
+    def test_read_path_script_bytes(self):
+        model = StorageCostModel(tree_height=3, z=1, s=1, block_size=4, read_path_script=True)
+        pipe = model.batch_read_path([4, 5], 1, 1)
+        # EVALSHA <sha> 4 4 -4 5 -5 2 0 <block>
+        self.assertEqual(pipe.request_bytes, resp_command_bytes("EVALSHA", 40, "4", "4", "-4", "5", "-5", "2", "0", 23))
+        # block, value and access count of bucket 4, then an empty block, a dummy and the access count of bucket 5
+        self.assertEqual(pipe.response_bytes, len("*6\r\n") + (5 + 23 + 2) + (5 + 32 + 2) + 4
+                         + len("$0\r\n\r\n") + (5 + ciphertext_bytes(len("bd1") + 1) + 2) + 4)
+
+    def test_tree_top_cache_only_invalidates_cached_buckets(self):
+        model = StorageCostModel(tree_height=3, z=1, s=1, tree_top_cache_levels=1)
+        summary = summarize_pipelines(model.read_path([1]))
+        # Bucket 1 is cached; buckets 2 and 4 are read from Redis.
+        self.assertEqual(summary["commands"], {"GET": 2, "HGET": 2, "SETBIT": 3, "BITFIELD": 3})
+
+    def test_tree_top_cache_passes_cached_invalidations_to_the_script(self):
+        model = StorageCostModel(tree_height=3, z=1, s=1, block_size=4, read_path_script=True, tree_top_cache_levels=1)
+        pipe = model.batch_read_path([4], 1, 1, cached=[1])
+        # EVALSHA <sha> 3 4 -4 -1 2 1 1 <block>
+        self.assertEqual(pipe.request_bytes, resp_command_bytes("EVALSHA", 40, "3", "4", "-4", "-1", "2", "1", "1", 23))
+
+    def test_tree_top_cache_skips_reading_cached_buckets(self):
+        model = StorageCostModel(tree_height=4, z=1, s=2, tree_top_cache_levels=4)
+        summary = summarize_pipelines(model.evict(0, 100))
+        self.assertEqual(summary["commands"], {"HMSET": 15, "SET": 15})
+        self.assertEqual(summary["round_trips"], 1)
+
+    def test_reshuffle_reads_and_writes_buckets(self):
+        model = StorageCostModel(tree_height=3, z=2, s=1)
+        summary = summarize_pipelines(model.read_path([1], reshuffled_buckets=[1, 2]))
+        self.assertEqual(summary["round_trips"], 6)
+        self.assertEqual(summary["commands"]["HMSET"], 2)
+        self.assertEqual(summary["commands"]["SET"], 2)
+        self.assertEqual(summary["commands"]["HGET"], 3 + 4)
+
+    def test_write_bucket_bytes(self):
+        model = StorageCostModel(tree_height=3, z=1, s=1, block_size=4, value_encoding="hex")
+        pipe = model.batch_write_bucket([7])
+        # HMSET 7 0 <64 byte real block> 1 <64 byte encrypted "b7d1">
+        data = resp_command_bytes("HMSET", "7", "0", 64, "1", 64)
+        # SET -7 <access count, bitmap byte, user... and dummy1 with their lengths>
+        metadata = resp_command_bytes("SET", "-7", 4 + 1 + (2 + 23) + (2 + len("dummy1")))
+        self.assertEqual(pipe.request_bytes, data + metadata)
+        self.assertEqual(pipe.response_bytes, 10)
+
+    def test_full_eviction_touches_every_bucket(self):
+        model = StorageCostModel(tree_height=4, z=1, s=2)
+        summary = summarize_pipelines(model.evict(0, 100))
+        self.assertEqual(summary["commands"]["HMSET"], 15)
+        self.assertEqual(summary["commands"]["SET"], 15)
+        self.assertEqual(summary["round_trips"], 3)
+
+    def test_projection_scales_with_throughput(self):
+        model = StorageCostModel(tree_height=10, z=1, s=4)
+        low = project_throughput(model, 1000, 10, 10, 16, seed=1)
+        high = project_throughput(model, 2000, 10, 10, 16, seed=1)
+        self.assertAlmostEqual(high["request_bytes"], 2 * low["request_bytes"])
+        self.assertAlmostEqual(high["link_utilization"], 2 * low["link_utilization"])
+
+    def test_projection_counts_eviction_commands(self):
+        model = StorageCostModel(tree_height=4, z=1, s=2)
+        evicting = project_throughput(model, 100, 10, 10, 100, seed=1)
+        rarely_evicting = project_throughput(model, 100, 10, 10**9, 100, seed=1)
+        # 10 ReadPaths per second run one eviction, which rewrites the 15 buckets of the tree.
+        self.assertAlmostEqual(evicting["commands"]["HMSET"] - rarely_evicting["commands"]["HMSET"], 15, places=3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,50 +1,264 @@
-import random
+import argparse
+import itertools
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# Upper bound on the number of path ids the engine materializes at once.
+# Larger sweeps are processed in row chunks of at most this many elements.
+MAX_CHUNK_ELEMENTS = 2**23
+
+
+class BucketEngine:
+    """Array-backed bucket counter.
+
+    Buckets are numbered like StorageHandler.GetBucketsInPaths: the leaf of
+    path p is tree_path_count + p - 1 and the parent of bucket b is b >> shift.
+    Each row of a path matrix is one batch of paths.
+    """
+
+    def __init__(self, tree_path_count, shift=1, seed=None):
+        self.tree_path_count = tree_path_count
+        self.shift = shift
+        self.rng = np.random.default_rng(seed)
+
+    def random_paths(self, rows, batch_size):
+        return self.rng.integers(1, self.tree_path_count + 1, size=(rows, batch_size), dtype=np.int64)
+
+    def leaves(self, paths):
+        return np.asarray(paths, dtype=np.int64) + (self.tree_path_count - 1)
+
+    def unique_bucket_counts(self, paths):
+        """Returns the number of distinct buckets touched by each row of paths.
+
+        Shifting preserves order, so every row is sorted once at the leaf level
+        and the distinct ancestors on each level are the non-zero steps of the
+        shifted row.
+        """
+        paths = np.atleast_2d(paths)
+        counts = np.zeros(paths.shape[0], dtype=np.int64)
+        if paths.shape[1] == 0:
+            return counts
+        chunk_rows = max(1, MAX_CHUNK_ELEMENTS // paths.shape[1])
+        for start in range(0, paths.shape[0], chunk_rows):
+            buckets = np.sort(self.leaves(paths[start:start + chunk_rows]), axis=1)
+            chunk_counts = counts[start:start + chunk_rows]
+            while buckets[:, -1].any():
+                alive = buckets > 0
+                steps = np.count_nonzero((np.diff(buckets, axis=1) != 0) & alive[:, 1:], axis=1)
+                chunk_counts += steps + alive[:, 0]
+                buckets >>= self.shift
+        return counts
+
+    def unique_buckets(self, paths):
+        buckets = self.leaves(np.ravel(paths))
+        levels = []
+        while buckets.size > 0:
+            buckets = np.unique(buckets)
+            levels.append(buckets)
+            buckets = buckets[buckets > 0] >> self.shift
+            buckets = buckets[buckets > 0]
+        return np.unique(np.concatenate(levels)) if levels else buckets
+
+    def buckets_per_batch(self, batch_size, batches):
+        """Draws batches random batches and returns the buckets touched by each."""
+        counts = np.empty(batches, dtype=np.int64)
+        chunk_rows = max(1, MAX_CHUNK_ELEMENTS // max(batch_size, 1))
+        for start in range(0, batches, chunk_rows):
+            rows = min(chunk_rows, batches - start)
+            counts[start:start + rows] = self.unique_bucket_counts(self.random_paths(rows, batch_size))
+        return counts
+
 
 class Tree:
-    def __init__(self, tree_path_count):
+    def __init__(self, tree_path_count, shift=1, seed=None):
         self.tree_path_count = tree_path_count
+        self.engine = BucketEngine(tree_path_count, shift, seed)
 
     def get_random_paths(self, batch_size):
         if batch_size > self.tree_path_count:
             raise ValueError("Batch size cannot be greater than the number of paths in the tree")
-        return [random.randint(1, self.tree_path_count) for _ in range(batch_size)]
+        return self.engine.random_paths(1, batch_size)[0].tolist()
 
     def get_unique_buckets_for_random_paths(self, random_paths):
-        unique_buckets = set()
-        for path_id in random_paths:
-            leaf_id = self.tree_path_count + path_id - 1
-            bucket_id = leaf_id
-            while bucket_id > 0:
-                unique_buckets.add(bucket_id)
-                bucket_id = bucket_id >> 1
-        return unique_buckets
+        return set(self.engine.unique_buckets(random_paths).tolist())
 
 EXPERIMETNS = 1000
 
 class Simulator:
-    def __init__(self, num_requests, batch_size, tree_path_count):
+    def __init__(self, num_requests, batch_size, tree_path_count, shift=1, experiments=EXPERIMETNS, seed=None):
+        if batch_size > tree_path_count:
+            raise ValueError("Batch size cannot be greater than the number of paths in the tree")
         self.num_requests = num_requests
-        self.tree = Tree(tree_path_count)
+        self.tree = Tree(tree_path_count, shift, seed)
         self.batch_size = batch_size
+        self.experiments = experiments
+
+    def batches_per_experiment(self):
+        return len(range(0, self.num_requests, self.batch_size))
 
     def run_once(self):
-        retrieved_buckets_count = 0
-        for i in range(0, self.num_requests, self.batch_size):
-            random_paths = self.tree.get_random_paths(self.batch_size)
-            unique_buckets = self.tree.get_unique_buckets_for_random_paths(random_paths)
-            retrieved_buckets_count += len(unique_buckets)
-        return retrieved_buckets_count
+        return int(self.tree.engine.buckets_per_batch(self.batch_size, self.batches_per_experiment()).sum())
+
+    def average_buckets_per_request(self):
+        batches = self.batches_per_experiment() * self.experiments
+        total_buckets_count = self.tree.engine.buckets_per_batch(self.batch_size, batches).sum()
+        return float(total_buckets_count / (self.num_requests * self.experiments))
 
     def run(self):
-        total_buckets_count = 0
-        for _ in range(EXPERIMETNS):
-            total_buckets_count += self.run_once()
-        print("Average number of buckets retrieved per request:", total_buckets_count / (self.num_requests * EXPERIMETNS))
+        average = self.average_buckets_per_request()
+        print("Average number of buckets retrieved per request:", average)
+        return average
+
+
+def sweep_batch_sizes(batch_sizes, num_requests, tree_path_count, shift=1, experiments=EXPERIMETNS, seed=None):
+    """Returns a map of batch size to the average number of buckets read per request."""
+    results = {}
+    for batch_size in batch_sizes:
+        sim = Simulator(num_requests, batch_size, tree_path_count, shift, experiments, seed)
+        results[batch_size] = sim.average_buckets_per_request()
+    return results
+
+
+FNV32_OFFSET_BASIS = 2166136261
+FNV32_PRIME = 16777619
+
+
+def fnv1a_32(block):
+    """Same hash as utils.Hasher (fnv.New32a)."""
+    h = FNV32_OFFSET_BASIS
+    for byte in block.encode():
+        h = ((h ^ byte) * FNV32_PRIME) & 0xFFFFFFFF
+    return h
+
+
+def read_trace(trace_path):
+    """Lazily yields (operation, block) pairs of a trace in the format read by client.ReadTraceFile."""
+    with open(trace_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            tokens = line.rstrip("\n").split(" ")
+            if tokens[0] == "GET":
+                if len(tokens) != 2:
+                    raise ValueError("read request should have the operation type and block id")
+            elif tokens[0] == "SET":
+                if len(tokens) != 3:
+                    raise ValueError("read request should have the operation type, block id, and new value")
+            else:
+                raise ValueError("only READ and WRITE are supported in the trace file")
+            yield tokens[0], tokens[1]
+
+
+@dataclass
+class EpochReplay:
+    """Predicted backend load of one router epoch.
+
+    The dicts are keyed by (shard node id, storage id); every key is one
+    ReadPath batch sent to the oramnode that owns the storage.
+    """
+    epoch: int
+    requests: int
+    batch_sizes: dict = field(default_factory=dict)
+    distinct_paths: dict = field(default_factory=dict)
+    bucket_reads: dict = field(default_factory=dict)
+
+    def total_bucket_reads(self):
+        return sum(self.bucket_reads.values())
+
+
+class TraceReplayer:
+    """Streams a trace through a model of the router and the shard nodes.
+
+    Requests are cut into epochs of requests_per_epoch like router.epochManager,
+    forwarded to shard node fnv1a_32(block) % shard_nodes, and only the first
+    request for a block in an epoch reads its real path (shardNodeFSM isFirst);
+    the rest read a random path and storage. Each shard node sends one batch
+    per storage and epoch, as if all requests of the epoch land in the same
+    batchManager.storageQueues round. Only the position map grows with the
+    trace, one entry per distinct block.
+    """
+
+    def __init__(self, tree_path_count, shard_nodes=1, storages=1, shift=1, seed=None):
+        self.shard_nodes = shard_nodes
+        self.storages = storages
+        self.engine = BucketEngine(tree_path_count, shift, seed)
+        self.position_map = {}  # block to (path, storage id)
+
+    def _random_position(self):
+        path = int(self.engine.rng.integers(1, self.engine.tree_path_count + 1))
+        return path, int(self.engine.rng.integers(self.storages))
+
+    def replay_epoch(self, epoch, requests):
+        paths = {}  # (shard node id, storage id) to the paths of its batch
+        first = set()
+        for _, block in requests:
+            shard_node = fnv1a_32(block) % self.shard_nodes
+            if block in first:
+                path, storage = self._random_position()
+            else:
+                first.add(block)
+                if block not in self.position_map:
+                    self.position_map[block] = self._random_position()
+                path, storage = self.position_map[block]
+            paths.setdefault((shard_node, storage), []).append(path)
+        for block in first:
+            self.position_map[block] = self._random_position()
+
+        replay = EpochReplay(epoch, len(requests))
+        for key, batch in paths.items():
+            replay.batch_sizes[key] = len(batch)
+            replay.distinct_paths[key] = len(set(batch))
+            replay.bucket_reads[key] = int(self.engine.unique_bucket_counts(np.asarray([batch]))[0])
+        return replay
+
+    def replay(self, requests, requests_per_epoch):
+        """Yields one EpochReplay per epoch of an iterable of (operation, block) pairs."""
+        requests = iter(requests)
+        for epoch in itertools.count():
+            batch = list(itertools.islice(requests, requests_per_epoch))
+            if not batch:
+                return
+            yield self.replay_epoch(epoch, batch)
+
+
+def requests_per_epoch(request_rate, epoch_time_ms):
+    return max(1, round(request_rate * epoch_time_ms / 1000))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Estimates the number of buckets read per request for batched ReadPaths.")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[2], help="batch sizes to sweep")
+    parser.add_argument("--num-requests", type=int, default=1000, help="number of requests per experiment")
+    parser.add_argument("--tree-height", type=int, default=21, help="tree height as in parameters.yaml")
+    parser.add_argument("--shift", type=int, default=1, help="2^shift is the tree branching factor")
+    parser.add_argument("--experiments", type=int, default=EXPERIMETNS, help="number of experiments per batch size")
+    parser.add_argument("--seed", type=int, default=None, help="random seed")
+    parser.add_argument("--trace", default=None, help="replay this trace file instead of sweeping random batches")
+    parser.add_argument("--conf", default="../configs/default/parameters.yaml", help="parameters.yaml used for trace replay")
+    parser.add_argument("--shard-nodes", type=int, default=1, help="number of shard nodes for trace replay")
+    parser.add_argument("--storages", type=int, default=1, help="number of storages for trace replay")
+    parser.add_argument("--request-rate", type=float, default=10000, help="requests per second reaching the router during trace replay")
+    return parser.parse_args()
+
+
+def print_trace_replay(args):
+    from oram_sim import load_parameters
+
+    parameters = load_parameters(args.conf)
+    tree_path_count = 2**(int(parameters["tree-height"]) - 1)
+    per_epoch = requests_per_epoch(args.request_rate, float(parameters["epoch-time"]))
+    replayer = TraceReplayer(tree_path_count, args.shard_nodes, args.storages, int(parameters.get("shift", 1)), args.seed)
+    print("epoch,requests,batches,max_batch_size,distinct_paths,bucket_reads")
+    for replay in replayer.replay(read_trace(args.trace), per_epoch):
+        print(f"{replay.epoch},{replay.requests},{len(replay.batch_sizes)},{max(replay.batch_sizes.values())},"
+              f"{sum(replay.distinct_paths.values())},{replay.total_bucket_reads()}")
 
 
 if __name__ == '__main__':
-    batch_size = 2
-    num_requests = 1000
-    tree_path_count = 2**20
-    sim = Simulator(num_requests, batch_size, tree_path_count)
-    sim.run()
\ No newline at end of file
+    args = parse_args()
+    if args.trace:
+        print_trace_replay(args)
+    else:
+        tree_path_count = 2**(args.tree_height - 1)
+        results = sweep_batch_sizes(args.batch_sizes, args.num_requests, tree_path_count, args.shift, args.experiments, args.seed)
+        for batch_size, average in results.items():
+            print(f"batch size {batch_size}: average number of buckets retrieved per request: {average}")
@@ -1,5 +1,8 @@
+import os
+import tempfile
 import unittest
-from simulate import Tree
+import numpy as np
+from simulate import BucketEngine, Simulator, TraceReplayer, Tree, fnv1a_32, read_trace
 
 
 class TestTree(unittest.TestCase):
@@ -48,5 +51,77 @@ class TestTree(unittest.TestCase):
         expected_buckets = {1, 2, 4, 5, 3, 6}
         self.assertSetEqual(buckets, expected_buckets)
 
+    def test_get_unique_buckets_for_random_paths_with_shift(self):
+        tree = Tree(tree_path_count=4, shift=2)
+        # leaves 4..7 all have bucket 1 as their parent
+        buckets = tree.get_unique_buckets_for_random_paths(random_paths=[1, 4])
+        expected_buckets = {4, 7, 1}
+        self.assertSetEqual(buckets, expected_buckets)
+
+
+class TestBucketEngine(unittest.TestCase):
+    def test_unique_bucket_counts_matches_each_row(self):
+        engine = BucketEngine(tree_path_count=4)
+        paths = np.array([[1, 2, 3], [1, 1, 1], [4, 3, 4]])
+        counts = engine.unique_bucket_counts(paths)
+        self.assertListEqual(counts.tolist(), [6, 3, 4])
+
+    def test_unique_bucket_counts_matches_tree_for_random_batches(self):
+        for shift in [1, 2, 3]:
+            tree = Tree(tree_path_count=256, shift=shift, seed=7)
+            paths = tree.engine.random_paths(50, 20)
+            counts = tree.engine.unique_bucket_counts(paths)
+            for row, count in zip(paths, counts):
+                self.assertEqual(count, len(tree.get_unique_buckets_for_random_paths(row)))
+
+
+class TestSimulator(unittest.TestCase):
+    def test_single_path_batches_read_every_level(self):
+        sim = Simulator(num_requests=10, batch_size=1, tree_path_count=8, experiments=3, seed=1)
+        self.assertEqual(sim.average_buckets_per_request(), 4)
+
+    def test_batch_size_cannot_exceed_path_count(self):
+        with self.assertRaises(ValueError):
+            Simulator(num_requests=10, batch_size=9, tree_path_count=8)
+
+class TestTraceReplay(unittest.TestCase):
+    def write_trace(self, lines):
+        f = tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False)
+        f.write("\n".join(lines) + "\n")
+        f.close()
+        self.addCleanup(os.remove, f.name)
+        return f.name
+
+    def test_fnv_matches_hasher(self):
+        self.assertEqual(fnv1a_32("a"), 3826002220)
+        self.assertEqual(fnv1a_32("4"), 822911587)
+
+    def test_read_trace(self):
+        path = self.write_trace(["GET user1", "SET user2 value"])
+        self.assertEqual(list(read_trace(path)), [("GET", "user1"), ("SET", "user2")])
+
+    def test_read_trace_rejects_unknown_operation(self):
+        path = self.write_trace(["DELETE user1"])
+        with self.assertRaises(ValueError):
+            list(read_trace(path))
+
+    def test_epochs_and_routing(self):
+        replayer = TraceReplayer(tree_path_count=8, shard_nodes=2, storages=1, seed=1)
+        requests = [("GET", block) for block in ["a", "b", "c", "d", "a"]]
+        replays = list(replayer.replay(requests, requests_per_epoch=2))
+        self.assertEqual([replay.requests for replay in replays], [2, 2, 1])
+        # fnv1a_32 of a and c is even, of b and d is odd.
+        self.assertEqual(replays[0].batch_sizes, {(0, 0): 1, (1, 0): 1})
+        self.assertEqual(replays[2].batch_sizes, {(0, 0): 1})
+        self.assertEqual(replays[2].bucket_reads, {(0, 0): 4})
+
+    def test_repeated_block_reads_a_random_path(self):
+        replayer = TraceReplayer(tree_path_count=2**20, seed=2)
+        replay = replayer.replay_epoch(0, [("GET", "a")] * 3)
+        self.assertEqual(replay.batch_sizes, {(0, 0): 3})
+        self.assertEqual(replay.distinct_paths, {(0, 0): 3})
+        self.assertEqual(len(replayer.position_map), 1)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,314 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Lines parsed before the sketches are updated with one vectorized step.
+LINES_PER_BATCH = 65536
+# Precision of the HyperLogLog sketch; the standard error is 1.04 / sqrt(2^p).
+HLL_PRECISION = 14
+COUNT_MIN_WIDTH = 2**16
+COUNT_MIN_DEPTH = 4
+HEAVY_HITTER_COUNTERS = 1024
+# Keys whose hash falls below this fraction are tracked for reuse distances (SHARDS style).
+REUSE_SAMPLE_RATE = 0.01
+SAMPLE_MODULUS = 2**20
+MASK64 = np.uint64(2**64 - 1)
+
+
+def key_hashes(keys):
+    """Stable 64-bit hashes of byte string keys; the built-in hash differs between processes."""
+    return np.fromiter((int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little') for key in keys),
+                       dtype=np.uint64, count=len(keys))
+
+
+class HyperLogLog:
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(2**precision, dtype=np.uint8)
+
+    def add_hashes(self, hashes):
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        rest = (hashes << np.uint64(self.precision)) & MASK64
+        # Rank of the first set bit of the remaining 64 - precision bits.
+        bits = 64 - self.precision
+        rank = np.full(hashes.shape, bits + 1, dtype=np.uint8)
+        nonzero = rest != 0
+        # The low precision bits of rest are zero, so dropping 11 bits keeps the float conversion exact.
+        top_bit = np.floor(np.log2((rest[nonzero] >> np.uint64(11)).astype(np.float64))) + 11
+        rank[nonzero] = (64 - top_bit).astype(np.uint8)
+        np.maximum.at(self.registers, index, np.minimum(rank, bits + 1))
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self):
+        m = self.registers.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / float(np.sum(np.ldexp(1.0, -self.registers.astype(np.int32))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros > 0:
+            return m * math.log(m / zeros)
+        return raw
+
+
+class CountMinSketch:
+    def __init__(self, width=COUNT_MIN_WIDTH, depth=COUNT_MIN_DEPTH):
+        self.width = width
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        # Odd multipliers give independent-enough rows from one 64-bit hash.
+        self.multipliers = np.array([0x9E3779B97F4A7C15, 0xBF58476D1CE4E5B9, 0x94D049BB133111EB, 0xD6E8FEB86659FD93,
+                                     0xA0761D6478BD642F, 0xE7037ED1A0B428DB][:depth], dtype=np.uint64)
+
+    def _columns(self, hashes):
+        return ((hashes[None, :] * self.multipliers[:, None]) >> np.uint64(32)) % np.uint64(self.width)
+
+    def add_hashes(self, hashes, counts=None):
+        counts = np.ones(hashes.shape, dtype=np.int64) if counts is None else counts
+        for row, columns in enumerate(self._columns(hashes).astype(np.int64)):
+            np.add.at(self.table[row], columns, counts)
+
+    def estimate(self, hashes):
+        columns = self._columns(hashes).astype(np.int64)
+        return np.min(self.table[np.arange(self.table.shape[0])[:, None], columns], axis=0)
+
+    def merge(self, other):
+        self.table += other.table
+
+
+class MisraGries:
+    """Weighted Misra-Gries summary; every key above total / (counters + 1) is kept."""
+
+    def __init__(self, counters=HEAVY_HITTER_COUNTERS):
+        self.counters = counters
+        self.counts = Counter()
+
+    def update(self, counts):
+        self.counts.update(counts)
+        if len(self.counts) > self.counters:
+            cut = sorted(self.counts.values(), reverse=True)[self.counters]
+            self.counts = Counter({key: count - cut for key, count in self.counts.items() if count > cut})
+
+    def merge(self, other):
+        self.update(other.counts)
+
+    def top(self, n):
+        return self.counts.most_common(n)
+
+
+def chunk_ranges(filepath, chunks):
+    size = os.path.getsize(filepath)
+    step = max(1, math.ceil(size / max(chunks, 1)))
+    return [(start, min(start + step, size)) for start in range(0, size, step)]
+
+
+def read_lines(filepath, start, end):
+    """Yields the lines that start in [start, end) of a text file."""
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        if start > 0:
+            f.seek(start - 1)
+            f.readline()
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                return
+            yield line
+
+
+def scan_chunk(filepath, start, end, window, sample_rate):
+    """Builds the sketches of one byte range of a trace."""
+    hll = HyperLogLog()
+    count_min = CountMinSketch()
+    heavy_hitters = MisraGries()
+    operations = Counter()
+    value_bytes = 0
+    window_duplicates = 0
+    window_keys = set()
+    sampled_hashes = []
+    threshold = int(sample_rate * SAMPLE_MODULUS)
+    position = 0
+
+    def flush(keys):
+        hashes = key_hashes(keys)
+        hll.add_hashes(hashes)
+        count_min.add_hashes(hashes)
+        heavy_hitters.update(Counter(keys))
+        sampled = np.flatnonzero((hashes % np.uint64(SAMPLE_MODULUS)) < np.uint64(threshold))
+        sampled_hashes.append(hashes[sampled])
+
+    keys = []
+    for line in read_lines(filepath, start, end):
+        tokens = line.rstrip(b"\r\n").split(b" ", 2)
+        if len(tokens) < 2 or tokens[0] not in (b"GET", b"SET"):
+            raise ValueError(f"unexpected trace line {line[:80]!r}")
+        operations[tokens[0].decode()] += 1
+        if tokens[0] == b"SET" and len(tokens) == 3:
+            value_bytes += len(tokens[2])
+        key = tokens[1]
+        # Repeats inside one window would be fake requests after the shard node isFirst check.
+        # Windows restart at every chunk, which moves at most one window boundary per chunk.
+        if key in window_keys:
+            window_duplicates += 1
+        else:
+            window_keys.add(key)
+        keys.append(key)
+        position += 1
+        if position % window == 0:
+            window_keys.clear()
+        if len(keys) == LINES_PER_BATCH:
+            flush(keys)
+            keys = []
+    if keys:
+        flush(keys)
+    return {
+        "lines": position,
+        "operations": operations,
+        "value_bytes": value_bytes,
+        "window_duplicates": window_duplicates,
+        "hll": hll,
+        "count_min": count_min,
+        "heavy_hitters": heavy_hitters,
+        "sampled_hashes": np.concatenate(sampled_hashes) if sampled_hashes else np.zeros(0, dtype=np.uint64),
+    }
+
+
+def stack_distances(hashes):
+    """Returns the stack distance of every access to the sampled keys; -1 marks a first access.
+
+    The stack distance is the number of distinct keys accessed since the
+    previous access to the same key. A Fenwick tree marks the latest access of
+    every key so each distance is a prefix-sum difference.
+    """
+    size = len(hashes)
+    tree = np.zeros(size + 1, dtype=np.int64).tolist()
+
+    def add(i, delta):
+        i += 1
+        while i <= size:
+            tree[i] += delta
+            i += i & -i
+
+    def prefix(i):
+        total = 0
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    last = {}
+    distances = np.full(size, -1, dtype=np.int64)
+    for t, h in enumerate(hashes.tolist()):
+        previous = last.get(h)
+        if previous is not None:
+            distances[t] = prefix(t) - prefix(previous + 1)
+            add(previous, -1)
+        add(t, 1)
+        last[h] = t
+    return distances
+
+
+def reuse_distance_histogram(hashes, sample_rate):
+    """Histogram of estimated reuse distances in power-of-two buckets, scaled back from the sample."""
+    distances = stack_distances(hashes)
+    cold = int(np.count_nonzero(distances < 0))
+    scaled = distances[distances >= 0] / sample_rate
+    histogram = {"cold": round(cold / sample_rate)}
+    if scaled.size:
+        buckets = np.floor(np.log2(scaled + 1)).astype(np.int64)
+        for bucket, count in enumerate(np.bincount(buckets)):
+            if count:
+                histogram[f"<{2**(bucket + 1) - 1}"] = round(count / sample_rate)
+    return histogram
+
+
+def analyze(filepath, workers=None, window=1000, sample_rate=REUSE_SAMPLE_RATE, top=20):
+    """Scans a trace in parallel byte ranges and merges the per-range sketches."""
+    workers = workers or os.cpu_count() or 1
+    ranges = chunk_ranges(filepath, workers * 4)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(scan_chunk, filepath, start, end, window, sample_rate) for start, end in ranges]
+        chunks = [future.result() for future in futures]
+
+    if not chunks:
+        chunks = [scan_chunk(filepath, 0, 0, window, sample_rate)]
+    merged = chunks[0]
+    for chunk in chunks[1:]:
+        merged["hll"].merge(chunk["hll"])
+        merged["count_min"].merge(chunk["count_min"])
+        merged["heavy_hitters"].merge(chunk["heavy_hitters"])
+        merged["operations"].update(chunk["operations"])
+        for key in ("lines", "value_bytes", "window_duplicates"):
+            merged[key] += chunk[key]
+    hashes = np.concatenate([chunk["sampled_hashes"] for chunk in chunks])
+
+    lines = merged["lines"]
+    top_keys = merged["heavy_hitters"].top(top)
+    estimates = merged["count_min"].estimate(key_hashes([key for key, _ in top_keys])) if top_keys else []
+    writes = merged["operations"]["SET"]
+    return {
+        "trace": os.path.abspath(filepath),
+        "requests": lines,
+        "reads": merged["operations"]["GET"],
+        "writes": writes,
+        "read_proportion": merged["operations"]["GET"] / lines if lines else 0.0,
+        "mean_value_bytes": merged["value_bytes"] / writes if writes else 0.0,
+        "distinct_keys_estimate": round(merged["hll"].estimate()),
+        "heavy_hitters": [{"key": key.decode(), "count_estimate": int(estimate)} for (key, _), estimate in zip(top_keys, estimates)],
+        "top_share": float(sum(int(estimate) for estimate in estimates) / lines) if lines else 0.0,
+        "dedup_window": window,
+        "dedup_fraction": merged["window_duplicates"] / lines if lines else 0.0,
+        "reuse_sample_rate": sample_rate,
+        "reuse_distance_histogram": reuse_distance_histogram(hashes, sample_rate),
+    }
+
+
+def compare_with_properties(summary, properties):
+    """Returns human readable mismatches between a summary and a YCSB properties dict."""
+    problems = []
+    expected_reads = float(properties.get("readproportion", summary["read_proportion"]))
+    if abs(expected_reads - summary["read_proportion"]) > 0.01:
+        problems.append(f"read proportion {summary['read_proportion']:.3f} but the properties ask for {expected_reads}")
+    record_count = int(properties.get("recordcount", 0))
+    if record_count and summary["distinct_keys_estimate"] > record_count * 1.05:
+        problems.append(f"about {summary['distinct_keys_estimate']} distinct keys but recordcount is {record_count}")
+    field_length = int(properties.get("fieldlength", 0))
+    if field_length and summary["writes"] and abs(summary["mean_value_bytes"] - field_length) > 1:
+        problems.append(f"mean value length {summary['mean_value_bytes']:.1f} but fieldlength is {field_length}")
+    return problems
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Summarizes a GET/SET trace in one parallel streaming pass.")
+    parser.add_argument("trace", help="trace.txt or a go-ycsb text output file")
+    parser.add_argument("--output", default=None, help="summary json (defaults to <trace>.summary.json)")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--window", type=int, default=1000, help="requests per epoch used to predict isFirst deduplication")
+    parser.add_argument("--sample-rate", type=float, default=REUSE_SAMPLE_RATE, help="fraction of keys tracked for reuse distances")
+    parser.add_argument("--top", type=int, default=20, help="number of heavy hitters to report")
+    parser.add_argument("--properties", default=None, help="YCSB properties file the trace should match")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    summary = analyze(args.trace, args.workers, args.window, args.sample_rate, args.top)
+    if args.properties:
+        properties = {}
+        with open(args.properties, 'r', encoding='utf-8') as f:
+            for line in f:
+                if "=" in line and not line.lstrip().startswith("#"):
+                    key, value = line.split("=", 1)
+                    properties[key.strip()] = value.strip()
+        summary["property_mismatches"] = compare_with_properties(summary, properties)
+        for problem in summary["property_mismatches"]:
+            print("mismatch:", problem)
+    output = args.output or args.trace + ".summary.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=4)
+    print(json.dumps({k: v for k, v in summary.items() if k not in ("heavy_hitters", "reuse_distance_histogram")}, indent=4))
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from trace_analyzer import CountMinSketch, HyperLogLog, MisraGries, analyze, chunk_ranges, key_hashes, read_lines, stack_distances
+
+
+class TestSketches(unittest.TestCase):
+    def test_hyperloglog_estimate(self):
+        hll = HyperLogLog()
+        hll.add_hashes(key_hashes([f"user{i}".encode() for i in range(100000)]))
+        self.assertAlmostEqual(hll.estimate() / 100000, 1, delta=0.03)
+
+    def test_hyperloglog_merge_ignores_repeats(self):
+        first, second = HyperLogLog(), HyperLogLog()
+        first.add_hashes(key_hashes([f"user{i}".encode() for i in range(1000)]))
+        second.add_hashes(key_hashes([f"user{i}".encode() for i in range(500, 1500)]))
+        first.merge(second)
+        self.assertAlmostEqual(first.estimate() / 1500, 1, delta=0.05)
+
+    def test_count_min_never_underestimates(self):
+        sketch = CountMinSketch(width=64)
+        keys = [f"user{i % 300}".encode() for i in range(3000)]
+        sketch.add_hashes(key_hashes(keys))
+        estimates = sketch.estimate(key_hashes([f"user{i}".encode() for i in range(300)]))
+        self.assertTrue(np.all(estimates >= 10))
+
+    def test_misra_gries_keeps_heavy_hitter(self):
+        summary = MisraGries(counters=4)
+        summary.update({b"hot": 50})
+        summary.update({f"cold{i}".encode(): 1 for i in range(50)})
+        self.assertEqual(summary.top(1)[0][0], b"hot")
+
+
+class TestStackDistances(unittest.TestCase):
+    def test_distinct_keys_between_accesses(self):
+        distances = stack_distances(np.array([1, 2, 1, 3, 3, 2], dtype=np.uint64))
+        self.assertEqual(distances.tolist(), [-1, -1, 1, -1, 0, 2])
+
+
+class TestAnalyze(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".txt")
+        with os.fdopen(fd, 'w') as f:
+            for i in range(2000):
+                if i % 4 == 0:
+                    f.write(f"SET user{i % 10} abcdefgh\n")
+                else:
+                    f.write(f"GET user{i % 50}\n")
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_chunks_cover_every_line_once(self):
+        lines = [line for start, end in chunk_ranges(self.path, 7) for line in read_lines(self.path, start, end)]
+        self.assertEqual(len(lines), 2000)
+
+    def test_summary(self):
+        summary = analyze(self.path, workers=2, window=100, sample_rate=1.0)
+        self.assertEqual(summary["requests"], 2000)
+        self.assertEqual(summary["writes"], 500)
+        self.assertEqual(summary["mean_value_bytes"], 8)
+        self.assertEqual(summary["distinct_keys_estimate"], 50)
+        self.assertEqual(summary["reuse_distance_histogram"]["cold"], 50)
+        self.assertGreater(summary["dedup_fraction"], 0.4)
+
+
+if __name__ == '__main__':
+    unittest.main()